@@ -9,10 +9,14 @@ This Source Code Form is subject to the terms of the Mozilla Public
 License, v. 2.0. If a copy of the MPL was not distributed with this
 file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
+import hashlib
 import logging
+from collections import OrderedDict
 
-from numpy import array, dot, kron, zeros, ones, sqrt, where, newaxis
+from numpy import array, asarray, arange, dot, kron, zeros, ones, eye, sqrt, where, newaxis, tensordot, \
+    ascontiguousarray, dtype
 from scipy.linalg import det
+from scipy.signal import convolve
 
 log = logging.getLogger(__name__)
 
@@ -203,915 +207,381 @@ def L4dd(x):
 
 
 # ======================================================================#
-class TensorProductBasis(object):
-    """ Tensor product basis object for quad elements
-    dimension: number of dimensions
-    basis_matrices: a list of tensor product basis matrices, one for each dimension
-    type: a string containing the names of basis in each dimension
+# polynomial coefficient tensors                                       #
+# ======================================================================#
+def _area_coordinates(dimensions):
+    """ returns the simplex area coordinates, in the order of
+    Simplex2d._cart2area and Simplex3d._cart2area, as coefficient arrays
+    over the monomials of xi.
     """
+    L0 = zeros((2,) * dimensions)
+    L0[(0,) * dimensions] = 1.0
+    L = [L0]
+    for d in range(dimensions):
+        i = [0] * dimensions
+        i[d] = 1
+        L0[tuple(i)] = -1.0
+        Ld = zeros((2,) * dimensions)
+        Ld[tuple(i)] = 1.0
+        L.append(Ld)
+
+    return L
+
+
+def simplex_coefficients(dimensions, order, products):
+    """ expands simplex basis functions written as products of shifted
+    area coordinates into a coefficient tensor.
+
+    products is a list with an entry for each basis function of
+    (scale, [(area coordinate index, shift), ...]), giving the function
+    scale * (L_i - shift_i) * (L_j - shift_j) * ...
+    """
+    L = _area_coordinates(dimensions)
+    C = zeros((len(products),) + (order + 1,) * dimensions)
+    for b, (scale, factors) in enumerate(products):
+        c = array(scale, dtype=float).reshape((1,) * dimensions)
+        for li, shift in factors:
+            f = L[li].copy()
+            f[(0,) * dimensions] -= shift
+            c = convolve(c, f, method='direct')
+        C[b][tuple(slice(0, s) for s in c.shape)] = c
+
+    return C
+
+
+# registry of polynomial coefficient tensors. Each entry is an array C of
+# shape (n_basis, p0 + 1[, p1 + 1, ...]) where C[b, i, j, ...] is the
+# coefficient of x0**i * x1**j * ... in basis function b.
+basis_coefficients = {
+    'L1': basis_matrices_map['linear_lagrange'],
+    'L2': basis_matrices_map['quadratic_lagrange'],
+    'L3': basis_matrices_map['cubic_lagrange'],
+    'L4': (1 / 3.) * array([[3.0, -25.0, 70.0, -80.0, 32.0],
+                            [0.0, 48.0, -208.0, 288.0, -128.0],
+                            [0.0, -36.0, 228.0, -384.0, 192.0],
+                            [0.0, 16.0, -112.0, 224.0, -128.0],
+                            [0.0, -3.0, 22.0, -48.0, 32.0]]),
+    'simplex_L4_L4': simplex_coefficients(2, 4, [
+        (32 / 3., [(0, 0.75), (0, 0.5), (0, 0.25), (0, 0.0)]),
+        (128 / 3., [(0, 0.5), (0, 0.25), (0, 0.0), (1, 0.0)]),
+        (64.0, [(0, 0.25), (0, 0.0), (1, 0.25), (1, 0.0)]),
+        (128 / 3., [(0, 0.0), (1, 0.5), (1, 0.25), (1, 0.0)]),
+        (32 / 3., [(1, 0.75), (1, 0.5), (1, 0.25), (1, 0.0)]),
+        (128 / 3., [(0, 0.5), (0, 0.25), (0, 0.0), (2, 0.0)]),
+        (128.0, [(0, 0.25), (0, 0.0), (1, 0.0), (2, 0.0)]),
+        (128.0, [(0, 0.0), (1, 0.25), (1, 0.0), (2, 0.0)]),
+        (128 / 3., [(1, 0.5), (1, 0.25), (1, 0.0), (2, 0.0)]),
+        (64.0, [(0, 0.25), (0, 0.0), (2, 0.25), (2, 0.0)]),
+        (128.0, [(0, 0.0), (1, 0.0), (2, 0.25), (2, 0.0)]),
+        (64.0, [(1, 0.25), (1, 0.0), (2, 0.25), (2, 0.0)]),
+        (128 / 3., [(0, 0.0), (2, 0.5), (2, 0.25), (2, 0.0)]),
+        (128 / 3., [(1, 0.0), (2, 0.5), (2, 0.25), (2, 0.0)]),
+        (32 / 3., [(2, 0.75), (2, 0.5), (2, 0.25), (2, 0.0)]),
+    ]),
+    'simplex_L4_L1': simplex_coefficients(2, 4, [
+        (32 / 3., [(0, 0.75), (0, 0.5), (0, 0.25), (0, 0.0)]),
+        (128 / 3., [(0, 0.5), (0, 0.25), (0, 0.0), (1, 0.0)]),
+        (64.0, [(0, 0.25), (0, 0.0), (1, 0.25), (1, 0.0)]),
+        (128 / 3., [(0, 0.0), (1, 0.5), (1, 0.25), (1, 0.0)]),
+        (32 / 3., [(1, 0.75), (1, 0.5), (1, 0.25), (1, 0.0)]),
+        (1.0, [(2, 0.0), (2, 0.0), (2, 0.0), (2, 0.0)]),
+    ]),
+}
 
-    def __init__(self, dimensions, basis_matrices, type_):
-
-        self.dimensions = dimensions  # integer of number of dimensions
-        self.basis_matrices = basis_matrices  # list of rank 2 arrays
-        self.type = type_  # string of basis type?
-        self.basis_orders = [(b.shape[0] - 1) for b in self.basis_matrices]
-
-    def eval(self, x):
-        # evaluates the basis function at the given element coordinates
-        # returns a list of values to be dot multiplied with nodal values
-        # x should be a list of lists of xi coordinates
-        # e.g. [ xi1 , xi2 ,...]
-
-        # check x to be of right dimensionality
-        if len(x) != self.dimensions:
-            log.debug('ERROR: wrong number of xi, need', self.dimensions)
-            return None
-        else:
-            # get phis for each dimension
-            phid = []
-            for i in range(self.dimensions):
-                x_vector = [x[i] ** p for p in range(self.basis_orders[i] + 1)]
-                phid.append(dot(self.basis_matrices[i], x_vector))
-
-            # do tensor product using kron
-            # reverse dimensions to get same implementation as cmiss
-            phi = phid[0]
-            if self.dimensions > 1:
-                for d in range(1, self.dimensions):
-                    phi = kron(phid[d], phi)
-
-            return phi
-
-
-# 1D quadratic lagrange
-class LineL2(object):
-    def __init__(self):
-        self.dimensions = 1
-        self.basis_order = [2, ]
-        self.type = 'line_L2'
-        self.tol = 1.0e-12
-
-    def eval(self, x):
-        return L2(x)
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        get_derivatives = {(1,): self.eval_dx0,
-                           (2,): self.eval_dx0x0}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1,)](x), get_derivatives[(2,)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        return L2d(x)
-
-    def eval_dx0x0(self, x):
-        return L2dd(x)
-
-
-# 1D cubic lagrange
-class LineL3(object):
-    def __init__(self):
-        self.dimensions = 1
-        self.basis_order = [3, ]
-        self.type = 'line_L3'
-        self.tol = 1.0e-12
-
-    def eval(self, x):
-        return L3(x)
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        get_derivatives = {(1,): self.eval_dx0,
-                           (2,): self.eval_dx0x0}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1,)](x), get_derivatives[(2,)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        return L3d(x)
-
-    def eval_dx0x0(self, x):
-        return L3dd(x)
-
-
-# 1D quartic lagrange
-class LineL4(object):
-    def __init__(self):
-        self.dimensions = 1
-        self.basis_order = [4, ]
-        self.type = 'line_L4'
-        self.tol = 1.0e-12
-
-    def eval(self, x):
-        return L4(x)
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        get_derivatives = {(1,): self.eval_dx0,
-                           (2,): self.eval_dx0x0}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1,)](x), get_derivatives[(2,)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        return L4d(x)
-
-    def eval_dx0x0(self, x):
-        return L4dd(x)
-
-
-# 2D quad quadratic
-class QuadL2L2(object):
-    def __init__(self):
-        self.dimensions = 2
-        self.basis_order = [2, 2]
-        self.type = 'quad_L2_L2'
-        self.tol = 1.0e-12
-
-    def tensor(self, Phi1, Phi2):
-        Phi = array([
-            Phi1[0] * Phi2[0], Phi1[1] * Phi2[0], Phi1[2] * Phi2[0],
-            Phi1[0] * Phi2[1], Phi1[1] * Phi2[1], Phi1[2] * Phi2[1],
-            Phi1[0] * Phi2[2], Phi1[1] * Phi2[2], Phi1[2] * Phi2[2]])
-
-        return where(abs(Phi) < self.tol, 0.0, Phi)
-
-    def eval(self, x):
-        return self.tensor(L2(x[0]), L2(x[1]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0)](x), get_derivatives[(0, 1)](x), get_derivatives[(2, 0)](x),
-                       get_derivatives[(0, 2)](x), get_derivatives[(1, 1)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        return self.tensor(L2d(x[0]), L2(x[1]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L2(x[0]), L2d(x[1]))
-
-    def eval_dx0x0(self, x):
-        return self.tensor(L2dd(x[0]), L2(x[1]))
-
-    def eval_dx1x1(self, x):
-        return self.tensor(L2(x[0]), L2dd(x[1]))
-
-    def eval_dx0x1(self, x):
-        return self.tensor(L2d(x[0]), L2d(x[1]))
-
-
-# 2D quad cubic
-class QuadL3L3(object):
-    def __init__(self):
-        self.dimensions = 2
-        self.basis_order = [3, 3]
-        self.type = 'quad_L3_L3'
-        self.tol = 1.0e-12
-
-    def tensor(self, Phi1, Phi2):
-        Phi = array([
-            Phi1[0] * Phi2[0], Phi1[1] * Phi2[0], Phi1[2] * Phi2[0], Phi1[3] * Phi2[0],
-            Phi1[0] * Phi2[1], Phi1[1] * Phi2[1], Phi1[2] * Phi2[1], Phi1[3] * Phi2[1],
-            Phi1[0] * Phi2[2], Phi1[1] * Phi2[2], Phi1[2] * Phi2[2], Phi1[3] * Phi2[2],
-            Phi1[0] * Phi2[3], Phi1[1] * Phi2[3], Phi1[2] * Phi2[3], Phi1[3] * Phi2[3]])
-
-        return where(abs(Phi) < self.tol, 0.0, Phi)
-
-    def eval(self, x):
-        return self.tensor(L3(x[0]), L3(x[1]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0)](x), get_derivatives[(0, 1)](x), get_derivatives[(2, 0)](x),
-                       get_derivatives[(0, 2)](x), get_derivatives[(1, 1)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        return self.tensor(L3d(x[0]), L3(x[1]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L3(x[0]), L3d(x[1]))
-
-    def eval_dx0x0(self, x):
-        return self.tensor(L3dd(x[0]), L3(x[1]))
-
-    def eval_dx1x1(self, x):
-        return self.tensor(L3(x[0]), L3dd(x[1]))
-
-    def eval_dx0x1(self, x):
-        return self.tensor(L3d(x[0]), L3d(x[1]))
-
-
-# 3D quad quadratic
-class QuadL2L2L2(object):
-    def __init__(self):
-        self.dimensions = 3
-        self.basis_order = [2, 2, 2]
-        self.type = 'quad_L2_L2_L2'
-        self.tol = 1.0e-12
-
-    def tensor(self, p1, p2, p3):
-        p = array([
-            p1[0] * p2[0] * p3[0], p1[1] * p2[0] * p3[0], p1[2] * p2[0] * p3[0],
-            p1[0] * p2[1] * p3[0], p1[1] * p2[1] * p3[0], p1[2] * p2[1] * p3[0],
-            p1[0] * p2[2] * p3[0], p1[1] * p2[2] * p3[0], p1[2] * p2[2] * p3[0],
-
-            p1[0] * p2[0] * p3[1], p1[1] * p2[0] * p3[1], p1[2] * p2[0] * p3[1],
-            p1[0] * p2[1] * p3[1], p1[1] * p2[1] * p3[1], p1[2] * p2[1] * p3[1],
-            p1[0] * p2[2] * p3[1], p1[1] * p2[2] * p3[1], p1[2] * p2[2] * p3[1],
-
-            p1[0] * p2[0] * p3[2], p1[1] * p2[0] * p3[2], p1[2] * p2[0] * p3[2],
-            p1[0] * p2[1] * p3[2], p1[1] * p2[1] * p3[2], p1[2] * p2[1] * p3[2],
-            p1[0] * p2[2] * p3[2], p1[1] * p2[2] * p3[2], p1[2] * p2[2] * p3[2],
-        ])
-
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(L2(x[0]), L2(x[1]), L2(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        ### no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2
-                           }
 
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
+def eval_monomials(x, order, deriv=0):
+    """ evaluates the deriv-th derivative of the monomials
+    x**0, x**1, ..., x**order. Returns an array of shape
+    (order + 1,) + x.shape, of the floating point type of x.
+    """
+    x = asarray(x)
+    if x.dtype.kind != 'f':
+        x = x.astype(float)
+    p = arange(order + 1)
+    c = ones(order + 1, dtype=x.dtype)
+    for k in range(deriv):
+        c *= p - k
+    # small integer exponents do not promote float32 x to float64
+    e = where(p >= deriv, p - deriv, 0).astype('int8').reshape((-1,) + (1,) * x.ndim)
+    c = c.reshape(e.shape)
+    return c * x[newaxis] ** e
+
+
+def eval_coefficients(C, x, deriv):
+    """ evaluates the polynomials with coefficient tensor C, or their
+    derivatives given by the tuple deriv, at xi coordinates x
+    (C.ndim - 1, ...). Returns an array of shape (n_basis, ...).
+    """
+    M = None
+    for d in range(C.ndim - 1):
+        m = eval_monomials(x[d], C.shape[d + 1] - 1, deriv[d])
+        if M is None:
+            M = m
         else:
-            d = array([get_derivatives[(1, 0, 0)](x), get_derivatives[(0, 1, 0)](x), get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x), get_derivatives[(0, 2, 0)](x), get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x), get_derivatives[(1, 0, 1)](x), get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
+            M = (M[:, newaxis] * m[newaxis]).reshape((-1,) + m.shape[1:])
 
-    def eval_dx0(self, x):
-        return self.tensor(L2d(x[0]), L2(x[1]), L2(x[2]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L2(x[0]), L2d(x[1]), L2(x[2]))
-
-    def eval_dx2(self, x):
-        return self.tensor(L2(x[0]), L2(x[1]), L2d(x[2]))
-
-    def eval_dx0x0(self, x):
-        return self.tensor(L2dd(x[0]), L2(x[1]), L2(x[2]))
+    return tensordot(C.reshape((C.shape[0], -1)).astype(M.dtype, copy=False), M, axes=1)
 
-    def eval_dx1x1(self, x):
-        return self.tensor(L2(x[0]), L2dd(x[1]), L2(x[2]))
 
-    def eval_dx2x2(self, x):
-        return self.tensor(L2(x[0]), L2(x[1]), L2dd(x[2]))
+def tensor_product(phis):
+    """ tensor product of the basis values in phis, each of shape
+    (n_basis_i, ...), with the basis of phis[0] varying fastest.
+    """
+    p = phis[-1]
+    for phi in phis[-2::-1]:
+        p = (p[:, newaxis] * phi[newaxis]).reshape((-1,) + phi.shape[1:])
 
-    def eval_dx0x1(self, x):
-        return self.tensor(L2d(x[0]), L2d(x[1]), L2(x[2]))
+    return p
 
-    def eval_dx0x2(self, x):
-        return self.tensor(L2d(x[0]), L2(x[1]), L2d(x[2]))
 
-    def eval_dx1x2(self, x):
-        return self.tensor(L2(x[0]), L2d(x[1]), L2d(x[2]))
-
-    def eval_dx0x1x2(self, x):
-        return self.tensor(L2d(x[0]), L2d(x[1]), L2d(x[2]))
+class PolynomialBasis(object):
+    """ Basis evaluated from the registered polynomial coefficient tensors
+    in basis_coefficients.
 
+    The basis is the tensor product of factors, each spanning C.ndim - 1
+    consecutive xi dimensions, with the basis of the first factor varying
+    fastest. Values and derivatives of any order are evaluated for all
+    points in x at once, in the floating point type dtype.
+    """
 
-# 3D cube cubic element
-class QuadL3L3L3(object):
-    def __init__(self):
-        self.dimensions = 3
-        self.basis_order = [3, 3, 3]
-        self.type = 'quad_L3_L3_L3'
+    derivatives = {
+        1: [(1,), (2,)],
+        2: [(1, 0), (0, 1), (2, 0), (0, 2), (1, 1)],
+        3: [(1, 0, 0), (0, 1, 0), (0, 0, 1),
+            (2, 0, 0), (0, 2, 0), (0, 0, 2),
+            (1, 1, 0), (1, 0, 1), (0, 1, 1),
+            (1, 1, 1)],
+    }
+
+    def __init__(self, type_, factors, basis_order):
+        self.type = type_
+        self.factors = [basis_coefficients[f] for f in factors]
+        self.dimensions = sum([C.ndim - 1 for C in self.factors])
+        self.basis_order = basis_order
         self.tol = 1.0e-12
-
-    def tensor(self, p1, p2, p3):
-        p = array([
-            p1[0] * p2[0] * p3[0], p1[1] * p2[0] * p3[0], p1[2] * p2[0] * p3[0], p1[3] * p2[0] * p3[0],
-            p1[0] * p2[1] * p3[0], p1[1] * p2[1] * p3[0], p1[2] * p2[1] * p3[0], p1[3] * p2[1] * p3[0],
-            p1[0] * p2[2] * p3[0], p1[1] * p2[2] * p3[0], p1[2] * p2[2] * p3[0], p1[3] * p2[2] * p3[0],
-            p1[0] * p2[3] * p3[0], p1[1] * p2[3] * p3[0], p1[2] * p2[3] * p3[0], p1[3] * p2[3] * p3[0],
-
-            p1[0] * p2[0] * p3[1], p1[1] * p2[0] * p3[1], p1[2] * p2[0] * p3[1], p1[3] * p2[0] * p3[1],
-            p1[0] * p2[1] * p3[1], p1[1] * p2[1] * p3[1], p1[2] * p2[1] * p3[1], p1[3] * p2[1] * p3[1],
-            p1[0] * p2[2] * p3[1], p1[1] * p2[2] * p3[1], p1[2] * p2[2] * p3[1], p1[3] * p2[2] * p3[1],
-            p1[0] * p2[3] * p3[1], p1[1] * p2[3] * p3[1], p1[2] * p2[3] * p3[1], p1[3] * p2[3] * p3[1],
-
-            p1[0] * p2[0] * p3[2], p1[1] * p2[0] * p3[2], p1[2] * p2[0] * p3[2], p1[3] * p2[0] * p3[2],
-            p1[0] * p2[1] * p3[2], p1[1] * p2[1] * p3[2], p1[2] * p2[1] * p3[2], p1[3] * p2[1] * p3[2],
-            p1[0] * p2[2] * p3[2], p1[1] * p2[2] * p3[2], p1[2] * p2[2] * p3[2], p1[3] * p2[2] * p3[2],
-            p1[0] * p2[3] * p3[2], p1[1] * p2[3] * p3[2], p1[2] * p2[3] * p3[2], p1[3] * p2[3] * p3[2],
-
-            p1[0] * p2[0] * p3[3], p1[1] * p2[0] * p3[3], p1[2] * p2[0] * p3[3], p1[3] * p2[0] * p3[3],
-            p1[0] * p2[1] * p3[3], p1[1] * p2[1] * p3[3], p1[2] * p2[1] * p3[3], p1[3] * p2[1] * p3[3],
-            p1[0] * p2[2] * p3[3], p1[1] * p2[2] * p3[3], p1[2] * p2[2] * p3[3], p1[3] * p2[2] * p3[3],
-            p1[0] * p2[3] * p3[3], p1[1] * p2[3] * p3[3], p1[2] * p2[3] * p3[3], p1[3] * p2[3] * p3[3],
-        ])
-
-        # ~ try:
-        return where(abs(p) < self.tol, 0.0, p)
-        # ~ except ValueError:
-        # ~ pdb.set_trace()
-
-    def eval(self, x):
-        return self.tensor(L3(x[0]), L3(x[1]), L3(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
+        self.dtype = dtype(float)
+
+    def _eval(self, x, deriv):
+        x = asarray(x, dtype=self.dtype)
+        if self.dimensions == 1:
+            x = x[newaxis]
+
+        phis = []
+        d0 = 0
+        for C in self.factors:
+            d1 = d0 + C.ndim - 1
+            phis.append(eval_coefficients(C, x[d0:d1], deriv[d0:d1]))
+            d0 = d1
+
+        p = tensor_product(phis)
+        p[abs(p) < self.tol] = 0.0
+        return p
+
+    def is_tensor_product(self):
+        """ returns True if every factor of the basis is 1D
         """
-        ### no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x), get_derivatives[(0, 1, 0)](x), get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x), get_derivatives[(0, 2, 0)](x), get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x), get_derivatives[(1, 0, 1)](x), get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
-
-    def eval_dx0(self, x):
-        return self.tensor(L3d(x[0]), L3(x[1]), L3(x[2]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L3(x[0]), L3d(x[1]), L3(x[2]))
-
-    def eval_dx2(self, x):
-        return self.tensor(L3(x[0]), L3(x[1]), L3d(x[2]))
+        return all([C.ndim == 2 for C in self.factors])
 
-    def eval_dx0x0(self, x):
-        return self.tensor(L3dd(x[0]), L3(x[1]), L3(x[2]))
-
-    def eval_dx1x1(self, x):
-        return self.tensor(L3(x[0]), L3dd(x[1]), L3(x[2]))
-
-    def eval_dx2x2(self, x):
-        return self.tensor(L3(x[0]), L3d(x[1]), L3dd(x[2]))
-
-    def eval_dx0x1(self, x):
-        return self.tensor(L3d(x[0]), L3d(x[1]), L3(x[2]))
-
-    def eval_dx0x2(self, x):
-        return self.tensor(L3d(x[0]), L3(x[1]), L3d(x[2]))
-
-    def eval_dx1x2(self, x):
-        return self.tensor(L3(x[0]), L3d(x[1]), L3d(x[2]))
-
-    def eval_dx0x1x2(self, x):
-        return self.tensor(L3d(x[0]), L3d(x[1]), L3d(x[2]))
-
-
-# 2D quad quartic element
-class QuadL4L4(object):
-
-    def __init__(self):
-        self.dimensions = 2
-        self.basis_order = [4, 4]
-        self.type = 'quad_L4_L4'
-        self.tol = 1.0e-12
-
-    def tensor(self, p1, p2):
-        p = array([
-            p1[0] * p2[0], p1[1] * p2[0], p1[2] * p2[0], p1[3] * p2[0], p1[4] * p2[0],
-            p1[0] * p2[1], p1[1] * p2[1], p1[2] * p2[1], p1[3] * p2[1], p1[4] * p2[1],
-            p1[0] * p2[2], p1[1] * p2[2], p1[2] * p2[2], p1[3] * p2[2], p1[4] * p2[2],
-            p1[0] * p2[3], p1[1] * p2[3], p1[2] * p2[3], p1[3] * p2[3], p1[4] * p2[3],
-            p1[0] * p2[4], p1[1] * p2[4], p1[2] * p2[4], p1[3] * p2[4], p1[4] * p2[4],
-        ])
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
+    def eval_factors(self, xi, deriv):
+        """ for tensor product bases, evaluates the 1D basis of each
+        dimension, or its derivative given by deriv, at the 1D coordinates
+        xi[d]. Returns a list of (n_basis_d, len(xi[d])) arrays.
         """
-        ### no cross derivatives yet
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1,
-                           }
+        return [eval_coefficients(C, asarray([x], dtype=self.dtype), (d,)) for C, x, d in zip(self.factors, xi, deriv)]
 
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            x00 = L4(x[0])
-            x01 = L4d(x[0])
-            x02 = L4dd(x[0])
-            x10 = L4(x[1])
-            x11 = L4d(x[1])
-            x12 = L4dd(x[1])
-            d = array([self.tensor(x01, x10), self.tensor(x00, x11),
-                       self.tensor(x02, x10), self.tensor(x00, x12),
-                       self.tensor(x01, x11)])
-
-            # ~ d = array( [ get_derivatives[(1,0)](x),get_derivatives[(0,1)](x),\
-            # ~ get_derivatives[(2,0)](x),get_derivatives[(0,2)](x),get_derivatives[(1,1)](x) ] )
-
-        return d
-
-    def eval_dx0(self, x):
-        return self.tensor(L4d(x[0]), L4(x[1]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L4(x[0]), L4d(x[1]))
-
-    def eval_dx0x0(self, x):
-        return self.tensor(L4dd(x[0]), L4(x[1]))
-
-    def eval_dx1x1(self, x):
-        return self.tensor(L4(x[0]), L4dd(x[1]))
-
-    def eval_dx0x1(self, x):
-        return self.tensor(L4d(x[0]), L4d(x[1]))
-
-
-# 2D quad quartic cubic element
-class QuadL4L3(object):
-
-    def __init__(self):
-        self.dimensions = 2
-        self.basis_order = [4, 3]
-        self.type = 'quad_L4_L3'
-        self.tol = 1.0e-12
-
-    def tensor(self, p1, p2):
-        p = array([
-            p1[0] * p2[0], p1[1] * p2[0], p1[2] * p2[0], p1[3] * p2[0], p1[4] * p2[0],
-            p1[0] * p2[1], p1[1] * p2[1], p1[2] * p2[1], p1[3] * p2[1], p1[4] * p2[1],
-            p1[0] * p2[2], p1[1] * p2[2], p1[2] * p2[2], p1[3] * p2[2], p1[4] * p2[2],
-            p1[0] * p2[3], p1[1] * p2[3], p1[2] * p2[3], p1[3] * p2[3], p1[4] * p2[3],
-        ])
-        return where(abs(p) < self.tol, 0.0, p)
+    def tensor(self, *phis):
+        p = tensor_product(phis)
+        p[abs(p) < self.tol] = 0.0
+        return p
 
     def eval(self, x):
-        return self.tensor(L4(x[0]), L3(x[1]))
+        return self._eval(x, (0,) * self.dimensions)
 
     def eval_derivatives(self, x, deriv=None):
         """ if deriv==None, evaluate all derivatives
         """
-        ### no cross derivatives yet
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1,
-                           }
-
         if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
+            if len(deriv) != self.dimensions:
                 raise Warning('derivative ' + str(deriv) + ' not supported')
+            d = self._eval(x, tuple(deriv))
         else:
-            x00 = L4(x[0])
-            x01 = L4d(x[0])
-            x02 = L4dd(x[0])
-            x10 = L3(x[1])
-            x11 = L3d(x[1])
-            x12 = L3dd(x[1])
-            d = array([self.tensor(x01, x10), self.tensor(x00, x11),
-                       self.tensor(x02, x10), self.tensor(x00, x12),
-                       self.tensor(x01, x11)])
-
-            # ~ d = array( [ get_derivatives[(1,0)](x),get_derivatives[(0,1)](x),\
-            # ~ get_derivatives[(2,0)](x),get_derivatives[(0,2)](x),get_derivatives[(1,1)](x) ] )
+            d = array([self._eval(x, deriv) for deriv in self.derivatives[self.dimensions]])
 
         return d
 
-    def eval_dx0(self, x):
-        return self.tensor(L4d(x[0]), L3(x[1]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L4(x[0]), L3d(x[1]))
-
-    def eval_dx0x0(self, x):
-        return self.tensor(L4dd(x[0]), L3(x[1]))
-
-    def eval_dx1x1(self, x):
-        return self.tensor(L4(x[0]), L3dd(x[1]))
-
-    def eval_dx0x1(self, x):
-        return self.tensor(L4d(x[0]), L3d(x[1]))
-
-
-# 3D cube quartic element
-class QuadL4L4L4(object):
-
-    def __init__(self):
-        self.dimensions = 3
-        self.basis_order = [4, 4, 4]
-        self.type = 'quad_L4_L4_L4'
-        self.tol = 1.0e-12
-
-    def tensor(self, p1, p2, p3):
-        p = array([
-            p1[0] * p2[0] * p3[0], p1[1] * p2[0] * p3[0], p1[2] * p2[0] * p3[0], p1[3] * p2[0] * p3[0],
-            p1[4] * p2[0] * p3[0],
-            p1[0] * p2[1] * p3[0], p1[1] * p2[1] * p3[0], p1[2] * p2[1] * p3[0], p1[3] * p2[1] * p3[0],
-            p1[4] * p2[1] * p3[0],
-            p1[0] * p2[2] * p3[0], p1[1] * p2[2] * p3[0], p1[2] * p2[2] * p3[0], p1[3] * p2[2] * p3[0],
-            p1[4] * p2[2] * p3[0],
-            p1[0] * p2[3] * p3[0], p1[1] * p2[3] * p3[0], p1[2] * p2[3] * p3[0], p1[3] * p2[3] * p3[0],
-            p1[4] * p2[3] * p3[0],
-            p1[0] * p2[4] * p3[0], p1[1] * p2[4] * p3[0], p1[2] * p2[4] * p3[0], p1[3] * p2[4] * p3[0],
-            p1[4] * p2[4] * p3[0],
-
-            p1[0] * p2[0] * p3[1], p1[1] * p2[0] * p3[1], p1[2] * p2[0] * p3[1], p1[3] * p2[0] * p3[1],
-            p1[4] * p2[0] * p3[1],
-            p1[0] * p2[1] * p3[1], p1[1] * p2[1] * p3[1], p1[2] * p2[1] * p3[1], p1[3] * p2[1] * p3[1],
-            p1[4] * p2[1] * p3[1],
-            p1[0] * p2[2] * p3[1], p1[1] * p2[2] * p3[1], p1[2] * p2[2] * p3[1], p1[3] * p2[2] * p3[1],
-            p1[4] * p2[2] * p3[1],
-            p1[0] * p2[3] * p3[1], p1[1] * p2[3] * p3[1], p1[2] * p2[3] * p3[1], p1[3] * p2[3] * p3[1],
-            p1[4] * p2[3] * p3[1],
-            p1[0] * p2[4] * p3[1], p1[1] * p2[4] * p3[1], p1[2] * p2[4] * p3[1], p1[3] * p2[4] * p3[1],
-            p1[4] * p2[4] * p3[1],
-
-            p1[0] * p2[0] * p3[2], p1[1] * p2[0] * p3[2], p1[2] * p2[0] * p3[2], p1[3] * p2[0] * p3[2],
-            p1[4] * p2[0] * p3[2],
-            p1[0] * p2[1] * p3[2], p1[1] * p2[1] * p3[2], p1[2] * p2[1] * p3[2], p1[3] * p2[1] * p3[2],
-            p1[4] * p2[1] * p3[2],
-            p1[0] * p2[2] * p3[2], p1[1] * p2[2] * p3[2], p1[2] * p2[2] * p3[2], p1[3] * p2[2] * p3[2],
-            p1[4] * p2[2] * p3[2],
-            p1[0] * p2[3] * p3[2], p1[1] * p2[3] * p3[2], p1[2] * p2[3] * p3[2], p1[3] * p2[3] * p3[2],
-            p1[4] * p2[3] * p3[2],
-            p1[0] * p2[4] * p3[2], p1[1] * p2[4] * p3[2], p1[2] * p2[4] * p3[2], p1[3] * p2[4] * p3[2],
-            p1[4] * p2[4] * p3[2],
-
-            p1[0] * p2[0] * p3[3], p1[1] * p2[0] * p3[3], p1[2] * p2[0] * p3[3], p1[3] * p2[0] * p3[3],
-            p1[4] * p2[0] * p3[3],
-            p1[0] * p2[1] * p3[3], p1[1] * p2[1] * p3[3], p1[2] * p2[1] * p3[3], p1[3] * p2[1] * p3[3],
-            p1[4] * p2[1] * p3[3],
-            p1[0] * p2[2] * p3[3], p1[1] * p2[2] * p3[3], p1[2] * p2[2] * p3[3], p1[3] * p2[2] * p3[3],
-            p1[4] * p2[2] * p3[3],
-            p1[0] * p2[3] * p3[3], p1[1] * p2[3] * p3[3], p1[2] * p2[3] * p3[3], p1[3] * p2[3] * p3[3],
-            p1[4] * p2[3] * p3[3],
-            p1[0] * p2[4] * p3[3], p1[1] * p2[4] * p3[3], p1[2] * p2[4] * p3[3], p1[3] * p2[4] * p3[3],
-            p1[4] * p2[4] * p3[3],
-
-            p1[0] * p2[0] * p3[4], p1[1] * p2[0] * p3[4], p1[2] * p2[0] * p3[4], p1[3] * p2[0] * p3[4],
-            p1[4] * p2[0] * p3[4],
-            p1[0] * p2[1] * p3[4], p1[1] * p2[1] * p3[4], p1[2] * p2[1] * p3[4], p1[3] * p2[1] * p3[4],
-            p1[4] * p2[1] * p3[4],
-            p1[0] * p2[2] * p3[4], p1[1] * p2[2] * p3[4], p1[2] * p2[2] * p3[4], p1[3] * p2[2] * p3[4],
-            p1[4] * p2[2] * p3[4],
-            p1[0] * p2[3] * p3[4], p1[1] * p2[3] * p3[4], p1[2] * p2[3] * p3[4], p1[3] * p2[3] * p3[4],
-            p1[4] * p2[3] * p3[4],
-            p1[0] * p2[4] * p3[4], p1[1] * p2[4] * p3[4], p1[2] * p2[4] * p3[4], p1[3] * p2[4] * p3[4],
-            p1[4] * p2[4] * p3[4],
-        ])
-
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L4(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
+    def eval_with_gradient(self, x):
+        """ returns the basis values (n_basis, n) and their first
+        derivatives along each xi dimension (dimensions, n_basis, n) at x.
+        Factor values are shared between the two, and small values are
+        not zeroed.
         """
-        ### no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x), get_derivatives[(0, 1, 0)](x), get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x), get_derivatives[(0, 2, 0)](x), get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x), get_derivatives[(1, 0, 1)](x), get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
+        x = asarray(x, dtype=self.dtype)
+        if self.dimensions == 1:
+            x = x[newaxis]
+
+        values = []
+        gradients = []
+        d0 = 0
+        for C in self.factors:
+            n = C.ndim - 1
+            values.append(eval_coefficients(C, x[d0:d0 + n], (0,) * n))
+            gradients.append([eval_coefficients(C, x[d0:d0 + n], tuple(eye(n, dtype=int)[k])) for k in range(n)])
+            d0 += n
+
+        dB = []
+        for fi, g in enumerate(gradients):
+            for gk in g:
+                dB.append(tensor_product(values[:fi] + [gk] + values[fi + 1:]))
+
+        return tensor_product(values), array(dB)
+
+    def _eval_dx(self, x, *dims):
+        deriv = [0] * self.dimensions
+        for d in dims:
+            deriv[d] += 1
+        return self._eval(x, tuple(deriv))
 
     def eval_dx0(self, x):
-        return self.tensor(L4d(x[0]), L4(x[1]), L4(x[2]))
+        return self._eval_dx(x, 0)
 
     def eval_dx1(self, x):
-        return self.tensor(L4(x[0]), L4d(x[1]), L4(x[2]))
+        return self._eval_dx(x, 1)
 
     def eval_dx2(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L4d(x[2]))
+        return self._eval_dx(x, 2)
 
     def eval_dx0x0(self, x):
-        return self.tensor(L4dd(x[0]), L4(x[1]), L4(x[2]))
+        return self._eval_dx(x, 0, 0)
 
     def eval_dx1x1(self, x):
-        return self.tensor(L4(x[0]), L4dd(x[1]), L4(x[2]))
+        return self._eval_dx(x, 1, 1)
 
     def eval_dx2x2(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L4dd(x[2]))
+        return self._eval_dx(x, 2, 2)
 
     def eval_dx0x1(self, x):
-        return self.tensor(L4d(x[0]), L4d(x[1]), L4(x[2]))
+        return self._eval_dx(x, 0, 1)
 
     def eval_dx0x2(self, x):
-        return self.tensor(L4d(x[0]), L4(x[1]), L4d(x[2]))
+        return self._eval_dx(x, 0, 2)
 
     def eval_dx1x2(self, x):
-        return self.tensor(L4(x[0]), L4d(x[1]), L4d(x[2]))
+        return self._eval_dx(x, 1, 2)
 
     def eval_dx0x1x2(self, x):
-        return self.tensor(L4d(x[0]), L4d(x[1]), L4d(x[2]))
+        return self._eval_dx(x, 0, 1, 2)
 
 
-class QuadL4L3L1(object):
-
-    def __init__(self):
-        self.dimensions = 3
-        self.basis_order = [4, 3, 1]
-        self.type = 'quad_L4_L3_L1'
-        self.tol = 1.0e-12
+# ======================================================================#
+class TensorProductBasis(object):
+    """ Tensor product basis object for quad elements
+    dimension: number of dimensions
+    basis_matrices: a list of tensor product basis matrices, one for each dimension
+    type: a string containing the names of basis in each dimension
+    """
 
-    def tensor(self, p1, p2, p3):
-        p = array([
-            p1[0] * p2[0] * p3[0], p1[1] * p2[0] * p3[0], p1[2] * p2[0] * p3[0], p1[3] * p2[0] * p3[0],
-            p1[4] * p2[0] * p3[0],
-            p1[0] * p2[1] * p3[0], p1[1] * p2[1] * p3[0], p1[2] * p2[1] * p3[0], p1[3] * p2[1] * p3[0],
-            p1[4] * p2[1] * p3[0],
-            p1[0] * p2[2] * p3[0], p1[1] * p2[2] * p3[0], p1[2] * p2[2] * p3[0], p1[3] * p2[2] * p3[0],
-            p1[4] * p2[2] * p3[0],
-            p1[0] * p2[3] * p3[0], p1[1] * p2[3] * p3[0], p1[2] * p2[3] * p3[0], p1[3] * p2[3] * p3[0],
-            p1[4] * p2[3] * p3[0],
-
-            p1[0] * p2[0] * p3[1], p1[1] * p2[0] * p3[1], p1[2] * p2[0] * p3[1], p1[3] * p2[0] * p3[1],
-            p1[4] * p2[0] * p3[1],
-            p1[0] * p2[1] * p3[1], p1[1] * p2[1] * p3[1], p1[2] * p2[1] * p3[1], p1[3] * p2[1] * p3[1],
-            p1[4] * p2[1] * p3[1],
-            p1[0] * p2[2] * p3[1], p1[1] * p2[2] * p3[1], p1[2] * p2[2] * p3[1], p1[3] * p2[2] * p3[1],
-            p1[4] * p2[2] * p3[1],
-            p1[0] * p2[3] * p3[1], p1[1] * p2[3] * p3[1], p1[2] * p2[3] * p3[1], p1[3] * p2[3] * p3[1],
-            p1[4] * p2[3] * p3[1],
-        ])
+    def __init__(self, dimensions, basis_matrices, type_):
 
-        return where(abs(p) < self.tol, 0.0, p)
+        self.dimensions = dimensions  # integer of number of dimensions
+        self.basis_matrices = basis_matrices  # list of rank 2 arrays
+        self.type = type_  # string of basis type?
+        self.basis_orders = [(b.shape[0] - 1) for b in self.basis_matrices]
 
     def eval(self, x):
-        return self.tensor(L4(x[0]), L3(x[1]), L1(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        # no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x), get_derivatives[(0, 1, 0)](x), get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x), get_derivatives[(0, 2, 0)](x), get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x), get_derivatives[(1, 0, 1)](x), get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-    def eval_dx0(self, x):
-        return self.tensor(L4d(x[0]), L3(x[1]), L1(x[2]))
-
-    def eval_dx1(self, x):
-        return self.tensor(L4(x[0]), L3d(x[1]), L1(x[2]))
-
-    def eval_dx2(self, x):
-        return self.tensor(L4(x[0]), L3(x[1]), L1d(x[2]))
+        # evaluates the basis function at the given element coordinates
+        # returns a list of values to be dot multiplied with nodal values
+        # x should be a list of lists of xi coordinates
+        # e.g. [ xi1 , xi2 ,...]
 
-    def eval_dx0x0(self, x):
-        return self.tensor(L4dd(x[0]), L3(x[1]), L1(x[2]))
+        # check x to be of right dimensionality
+        if len(x) != self.dimensions:
+            log.debug('ERROR: wrong number of xi, need', self.dimensions)
+            return None
+        else:
+            # get phis for each dimension
+            phid = []
+            for i in range(self.dimensions):
+                x_vector = [x[i] ** p for p in range(self.basis_orders[i] + 1)]
+                phid.append(dot(self.basis_matrices[i], x_vector))
 
-    def eval_dx1x1(self, x):
-        return self.tensor(L4(x[0]), L3dd(x[1]), L1(x[2]))
+            # do tensor product using kron
+            # reverse dimensions to get same implementation as cmiss
+            phi = phid[0]
+            if self.dimensions > 1:
+                for d in range(1, self.dimensions):
+                    phi = kron(phid[d], phi)
 
-    def eval_dx1x2(self, x):
-        return self.tensor(L4(x[0]), L3dd(x[1]), L1(x[2]))
+            return phi
 
-    def eval_dx2x2(self, x):
-        return self.tensor(L4(x[0]), L3(x[1]), L1dd(x[2]))
 
-    def eval_dx0x1(self, x):
-        return self.tensor(L4d(x[0]), L3d(x[1]), L1(x[2]))
+# 1D quadratic lagrange
+class LineL2(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'line_L2', ('L2',), [2, ])
 
-    def eval_dx0x2(self, x):
-        return self.tensor(L4d(x[0]), L3(x[1]), L1d(x[2]))
 
-    def eval_dx1x2(self, x):
-        return self.tensor(L4(x[0]), L3d(x[1]), L1d(x[2]))
+# 1D cubic lagrange
+class LineL3(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'line_L3', ('L3',), [3, ])
 
-    def eval_dx0x1x2(self, x):
-        return self.tensor(L4d(x[0]), L3d(x[1]), L1d(x[2]))
 
+# 1D quartic lagrange
+class LineL4(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'line_L4', ('L4',), [4, ])
 
-class QuadL4L4L1(object):
 
+# 2D quad quadratic
+class QuadL2L2(PolynomialBasis):
     def __init__(self):
-        self.dimensions = 3
-        self.basis_order = [4, 4, 1]
-        self.type = 'quad_L4_L4_L1'
-        self.tol = 1.0e-12
+        PolynomialBasis.__init__(self, 'quad_L2_L2', ('L2', 'L2'), [2, 2])
 
-    def tensor(self, p1, p2, p3):
-        p = array([
-            p1[0] * p2[0] * p3[0], p1[1] * p2[0] * p3[0], p1[2] * p2[0] * p3[0], p1[3] * p2[0] * p3[0],
-            p1[4] * p2[0] * p3[0],
-            p1[0] * p2[1] * p3[0], p1[1] * p2[1] * p3[0], p1[2] * p2[1] * p3[0], p1[3] * p2[1] * p3[0],
-            p1[4] * p2[1] * p3[0],
-            p1[0] * p2[2] * p3[0], p1[1] * p2[2] * p3[0], p1[2] * p2[2] * p3[0], p1[3] * p2[2] * p3[0],
-            p1[4] * p2[2] * p3[0],
-            p1[0] * p2[3] * p3[0], p1[1] * p2[3] * p3[0], p1[2] * p2[3] * p3[0], p1[3] * p2[3] * p3[0],
-            p1[4] * p2[3] * p3[0],
-            p1[0] * p2[4] * p3[0], p1[1] * p2[4] * p3[0], p1[2] * p2[4] * p3[0], p1[3] * p2[4] * p3[0],
-            p1[4] * p2[4] * p3[0],
-
-            p1[0] * p2[0] * p3[1], p1[1] * p2[0] * p3[1], p1[2] * p2[0] * p3[1], p1[3] * p2[0] * p3[1],
-            p1[4] * p2[0] * p3[1],
-            p1[0] * p2[1] * p3[1], p1[1] * p2[1] * p3[1], p1[2] * p2[1] * p3[1], p1[3] * p2[1] * p3[1],
-            p1[4] * p2[1] * p3[1],
-            p1[0] * p2[2] * p3[1], p1[1] * p2[2] * p3[1], p1[2] * p2[2] * p3[1], p1[3] * p2[2] * p3[1],
-            p1[4] * p2[2] * p3[1],
-            p1[0] * p2[3] * p3[1], p1[1] * p2[3] * p3[1], p1[2] * p2[3] * p3[1], p1[3] * p2[3] * p3[1],
-            p1[4] * p2[3] * p3[1],
-            p1[0] * p2[4] * p3[1], p1[1] * p2[4] * p3[1], p1[2] * p2[4] * p3[1], p1[3] * p2[4] * p3[1],
-            p1[4] * p2[4] * p3[1],
-        ])
 
-        return where(abs(p) < self.tol, 0.0, p)
+# 2D quad cubic
+class QuadL3L3(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L3_L3', ('L3', 'L3'), [3, 3])
 
-    def eval(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L1(x[2]))
 
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        # no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2
-                           }
+# 3D quad quadratic
+class QuadL2L2L2(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L2_L2_L2', ('L2', 'L2', 'L2'), [2, 2, 2])
 
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x), get_derivatives[(0, 1, 0)](x), get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x), get_derivatives[(0, 2, 0)](x), get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x), get_derivatives[(1, 0, 1)](x), get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
 
-    def eval_dx0(self, x):
-        return self.tensor(L4d(x[0]), L4(x[1]), L1(x[2]))
+# 3D cube cubic element
+class QuadL3L3L3(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L3_L3_L3', ('L3', 'L3', 'L3'), [3, 3, 3])
 
-    def eval_dx1(self, x):
-        return self.tensor(L4(x[0]), L4d(x[1]), L1(x[2]))
 
-    def eval_dx2(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L1d(x[2]))
+# 2D quad quartic element
+class QuadL4L4(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L4_L4', ('L4', 'L4'), [4, 4])
 
-    def eval_dx0x0(self, x):
-        return self.tensor(L4dd(x[0]), L4(x[1]), L1(x[2]))
 
-    def eval_dx1x2(self, x):
-        return self.tensor(L4(x[0]), L4dd(x[1]), L1(x[2]))
+# 2D quad quartic cubic element
+class QuadL4L3(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L4_L3', ('L4', 'L3'), [4, 3])
 
-    def eval_dx1x1(self, x):
-        return self.tensor(L4(x[0]), L4dd(x[1]), L1(x[2]))
 
-    def eval_dx2x2(self, x):
-        return self.tensor(L4(x[0]), L4(x[1]), L1dd(x[2]))
+# 3D cube quartic element
+class QuadL4L4L4(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L4_L4_L4', ('L4', 'L4', 'L4'), [4, 4, 4])
 
-    def eval_dx0x1(self, x):
-        return self.tensor(L4d(x[0]), L4d(x[1]), L1(x[2]))
 
-    def eval_dx0x2(self, x):
-        return self.tensor(L4d(x[0]), L4(x[1]), L1d(x[2]))
+class QuadL4L3L1(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L4_L3_L1', ('L4', 'L3', 'L1'), [4, 3, 1])
 
-    def eval_dx1x2(self, x):
-        return self.tensor(L4(x[0]), L4d(x[1]), L1d(x[2]))
 
-    def eval_dx0x1x2(self, x):
-        return self.tensor(L4d(x[0]), L4d(x[1]), L1d(x[2]))
+class QuadL4L4L1(PolynomialBasis):
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'quad_L4_L4_L1', ('L4', 'L4', 'L1'), [4, 4, 1])
 
 
 # ======================================================================#
@@ -1427,620 +897,91 @@ class SimplexL3L3(Simplex2d):
                              self.D2 - 3.0 * T2) - self.D98 * self.b[2] * self.b[2] * T2])
 
         return where(abs(phi) < self.tol, 0.0, phi)
-        # ~ return phi
-
-    def eval_dx1x1(self, x):
-        T0, T1, T2 = self._cart2area(x)
-
-        phi = array([self.D38 * self.c[0] * self.c[0] * (self.D4 - 3.0 * T0) + self.D38 * self.c[0] * self.c[0] * (
-                self.D2 - 3.0 * T0) - self.D98 * self.c[0] * self.c[0] * T0,
-                     self.D98 * self.c[0] * self.c[1] * (self.D2 - 3.0 * T0) + self.D27 * self.c[0] * self.c[
-                         0] * T1 + self.D27 * self.c[0] * self.c[1] * T0,
-                     self.D98 * self.c[0] * self.c[1] * (self.D2 - 3.0 * T1) + self.D27 * self.c[0] * self.c[
-                         1] * T1 + self.D27 * self.c[1] * self.c[1] * T0,
-                     self.D38 * self.c[1] * self.c[1] * (self.D4 - 3.0 * T1) + self.D38 * self.c[1] * self.c[1] * (
-                             self.D2 - 3.0 * T1) - self.D98 * self.c[1] * self.c[1] * T1,
-                     self.D98 * self.c[0] * self.c[2] * (self.D2 - 3.0 * T0) + self.D27 * self.c[0] * self.c[
-                         0] * T2 + self.D27 * self.c[0] * self.c[2] * T0,
-                     2.0 * self.D27 * self.c[0] * self.c[1] * T2 + 2.0 * self.D27 * self.c[0] * self.c[
-                         2] * T1 + 2.0 * self.D27 * self.c[1] * self.c[2] * T0,
-                     self.D98 * self.c[1] * self.c[2] * (self.D2 - 3.0 * T1) + self.D27 * self.c[1] * self.c[
-                         1] * T2 + self.D27 * self.c[1] * self.c[2] * T1,
-                     self.D98 * self.c[0] * self.c[2] * (self.D2 - 3.0 * T2) + self.D27 * self.c[0] * self.c[
-                         2] * T2 + self.D27 * self.c[2] * self.c[2] * T0,
-                     self.D98 * self.c[1] * self.c[2] * (self.D2 - 3.0 * T2) + self.D27 * self.c[1] * self.c[
-                         2] * T2 + self.D27 * self.c[2] * self.c[2] * T1,
-                     self.D38 * self.c[2] * self.c[2] * (self.D4 - 3.0 * T2) + self.D38 * self.c[2] * self.c[2] * (
-                             self.D2 - 3.0 * T2) - self.D98 * self.c[2] * self.c[2] * T2])
-
-        return where(abs(phi) < self.tol, 0.0, phi)
-        # ~ return phi
-
-    def eval_dx0x1(self, x):
-        T0, T1, T2 = self._cart2area(x)
-
-        phi = array([self.D38 * self.b[0] * self.c[0] * (self.D4 - 3.0 * T0) + self.D38 * self.b[0] * self.c[0] * (
-                self.D2 - 3.0 * T0) - self.D98 * self.b[0] * self.c[0] * T0,
-                     0.5 * self.D98 * self.b[0] * self.c[1] * (self.D2 - 3.0 * T0) + 0.5 * self.D98 * self.b[1] *
-                     self.c[0] * (self.D2 - 3.0 * T0) + self.D27 * self.b[0] * self.c[0] * T1 + 0.5 * self.D27 * self.b[
-                         0] * self.c[1] * T0 + 0.5 * self.D27 * self.b[1] * self.c[0] * T0,
-                     0.5 * self.D98 * self.b[0] * self.c[1] * (self.D2 - 3.0 * T1) + 0.5 * self.D98 * self.b[1] *
-                     self.c[0] * (self.D2 - 3.0 * T1) + self.D27 * self.b[0] * self.c[1] * T1 + 0.5 * self.D27 * self.b[
-                         1] * self.c[0] * T1 + 0.5 * self.D27 * self.b[1] * self.c[1] * T0,
-                     self.D38 * self.b[1] * self.c[1] * (self.D4 - 3.0 * T1) + self.D38 * self.b[1] * self.c[1] * (
-                             self.D2 - 3.0 * T1) - self.D98 * self.b[1] * self.c[1] * T1,
-                     0.5 * self.D98 * self.b[0] * self.c[2] * (self.D2 - 3.0 * T0) + 0.5 * self.D98 * self.b[2] *
-                     self.c[0] * (self.D2 - 3.0 * T0) + self.D27 * self.b[0] * self.c[0] * T2 + 0.5 * self.D27 * self.b[
-                         0] * self.c[2] * T0 + 0.5 * self.D27 * self.b[2] * self.c[0] * T0,
-                     self.D27 * self.b[0] * self.c[1] * T2 + self.D27 * self.b[1] * self.c[0] * T2 + self.D27 * self.b[
-                         0] * self.c[2] * T1 + self.D27 * self.b[2] * self.c[0] * T1 + self.D27 * self.b[1] * self.c[
-                         2] * T0 + self.D27 * self.b[2] * self.c[1] * T0,
-                     0.5 * self.D98 * self.b[1] * self.c[2] * (self.D2 - 3.0 * T1) + 0.5 * self.D98 * self.b[2] *
-                     self.c[1] * (self.D2 - 3.0 * T1) + self.D27 * self.b[1] * self.c[1] * T2 + 0.5 * self.D27 * self.b[
-                         1] * self.c[2] * T1 + 0.5 * self.D27 * self.b[2] * self.c[1] * T1,
-                     0.5 * self.D98 * self.b[0] * self.c[2] * (self.D2 - 3.0 * T2) + 0.5 * self.D98 * self.b[2] *
-                     self.c[0] * (self.D2 - 3.0 * T2) + self.D27 * self.b[0] * self.c[2] * T2 + 0.5 * self.D27 * self.b[
-                         2] * self.c[0] * T2 + 0.5 * self.D27 * self.b[2] * self.c[2] * T0,
-                     0.5 * self.D98 * self.b[1] * self.c[2] * (self.D2 - 3.0 * T2) + 0.5 * self.D98 * self.b[2] *
-                     self.c[1] * (self.D2 - 3.0 * T2) + self.D27 * self.b[1] * self.c[2] * T2 + 0.5 * self.D27 * self.b[
-                         2] * self.c[1] * T2 + 0.5 * self.D27 * self.b[2] * self.c[2] * T1,
-                     self.D38 * self.b[2] * self.c[2] * (self.D4 - 3.0 * T2) + self.D38 * self.b[2] * self.c[2] * (
-                             self.D2 - 3.0 * T2) - self.D98 * self.b[2] * self.c[2] * T2])
-
-        # ~ self.b[0]*self.c[0]*( self.D38*( self.D4 + self.D2 - 6.0*T0 ) + self.D98*T0 )
-        # ~ 0.5*self.D98*self.b[0]*self.c[1]*(self.D2 - 3.0*T0) + 0.5*self.D98*self.b[1]*self.c[0]*(self.D2 - 3.0*T0) + self.D27*self.b[0]*self.c[0]*T1 + 0.5*self.D27*self.b[0]*self.c[1]*T0 + 0.5*self.D27*self.b[1]*self.c[0]*T0,\
-        # ~ 0.5*self.D98*self.b[0]*self.c[1]*(self.D2 - 3.0*T1) + 0.5*self.D98*self.b[1]*self.c[0]*(self.D2 - 3.0*T1) + self.D27*self.b[0]*self.c[1]*T1 + 0.5*self.D27*self.b[1]*self.c[0]*T1 + 0.5*self.D27*self.b[1]*self.c[1]*T0,\
-        # ~ self.D38*self.b[1]*self.c[1]*(self.D4 - 3.0*T1) + self.D38*self.b[1]*self.c[1]*(self.D2 - 3.0*T1) - self.D98*self.b[1]*self.c[1]*T1,\
-        # ~ 0.5*self.D98*self.b[0]*self.c[2]*(self.D2 - 3.0*T0) + 0.5*self.D98*self.b[2]*self.c[0]*(self.D2 - 3.0*T0) + self.D27*self.b[0]*self.c[0]*T2 + 0.5*self.D27*self.b[0]*self.c[2]*T0 + 0.5*self.D27*self.b[2]*self.c[0]*T0,\
-        # ~ self.D27*self.b[0]*self.c[1]*T2 + self.D27*self.b[1]*self.c[0]*T2 + self.D27*self.b[0]*self.c[2]*T1 + self.D27*self.b[2]*self.c[0]*T1 + self.D27*self.b[1]*self.c[2]*T0 + self.D27*self.b[2]*self.c[1]*T0,\
-        # ~ 0.5*self.D98*self.b[1]*self.c[2]*(self.D2 - 3.0*T1) + 0.5*self.D98*self.b[2]*self.c[1]*(self.D2 - 3.0*T1) + self.D27*self.b[1]*self.c[1]*T2 + 0.5*self.D27*self.b[1]*self.c[2]*T1 + 0.5*self.D27*self.b[2]*self.c[1]*T1,\
-        # ~ 0.5*self.D98*self.b[0]*self.c[2]*(self.D2 - 3.0*T2) + 0.5*self.D98*self.b[2]*self.c[0]*(self.D2 - 3.0*T2) + self.D27*self.b[0]*self.c[2]*T2 + 0.5*self.D27*self.b[2]*self.c[0]*T2 + 0.5*self.D27*self.b[2]*self.c[2]*T0,\
-        # ~ 0.5*self.D98*self.b[1]*self.c[2]*(self.D2 - 3.0*T2) + 0.5*self.D98*self.b[2]*self.c[1]*(self.D2 - 3.0*T2) + self.D27*self.b[1]*self.c[2]*T2 + 0.5*self.D27*self.b[2]*self.c[1]*T2 + 0.5*self.D27*self.b[2]*self.c[2]*T1,\
-        # ~ self.D38*self.b[2]*self.c[2]*(self.D4 - 3.0*T2) + self.D38*self.b[2]*self.c[2]*(self.D2 - 3.0*T2) - self.D98*self.b[2]*self.c[2]*T2 ])
-
-        return where(abs(phi) < self.tol, 0.0, phi)
-        # ~ return phi
-
-
-class SimplexL4L1(Simplex2d):
-
-    def __init__(self):
-        self.dimensions = 2
-        self.type = 'simplex_L4_L1'
-        self.basis_order = 4
-        self.tol = 1e-12
-
-    def eval(self, x):
-        L0, L1, L2 = self._cart2area(x)
-        phi = array([
-            (32 / 3.) * (L0 - 0.75) * (L0 - 0.5) * (L0 - 0.25) * L0,
-            (128 / 3.) * (L0 - 0.5) * (L0 - 0.25) * L0 * L1,
-            64 * (L0 - 0.25) * L0 * (L1 - 0.25) * L1,
-            (128 / 3.) * L0 * (L1 - 0.5) * (L1 - 0.25) * L1,
-            (32 / 3.) * (L1 - 0.75) * (L1 - 0.5) * (L1 - 0.25) * L1,
-            L2 ** 4.0,
-        ])
-        return where(abs(phi) < self.tol, 0.0, phi)
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0)](x),
-                       get_derivatives[(0, 1)](x),
-                       get_derivatives[(2, 0)](x),
-                       get_derivatives[(0, 2)](x),
-                       get_derivatives[(1, 1)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        raise NotImplementedError
-
-    def eval_dx1(self, x):
-        raise NotImplementedError
-
-    def eval_dx0x0(self, x):
-        raise NotImplementedError
-
-    def eval_dx1x1(self, x):
-        raise NotImplementedError
-
-    def eval_dx0x1(self, x):
-        raise NotImplementedError
-
-
-class SimplexL4L4(Simplex2d):
-
-    def __init__(self):
-        self.dimensions = 2
-        self.type = 'simplex_L4_L4'
-        self.basis_order = 4
-        self.tol = 1e-12
-        self.D4 = self.D ** 4.0
-
-    def _T(self, x):
-        T0 = self.a[0] + self.b[0] * x[0] + self.c[0] * x[1]
-        T1 = self.a[1] + self.b[1] * x[0] + self.c[1] * x[1]
-        T2 = self.a[2] + self.b[2] * x[0] + self.c[2] * x[1]
-        return T0, T1, T2
-
-    def _cart2area(self, x):
-        return 1 - x[0] - x[1], x[0], x[1]
-
-    def eval(self, x):
-        L1, L2, L3 = self._cart2area(x)
-        phi = array([
-            (32 / 3.) * (L1 - 0.75) * (L1 - 0.5) * (L1 - 0.25) * L1,
-            (128 / 3.) * (L1 - 0.5) * (L1 - 0.25) * L1 * L2,
-            64 * (L1 - 0.25) * L1 * (L2 - 0.25) * L2,
-            (128 / 3.) * L1 * (L2 - 0.5) * (L2 - 0.25) * L2,
-            (32 / 3.) * (L2 - 0.75) * (L2 - 0.5) * (L2 - 0.25) * L2,
-            (128 / 3.) * (L1 - 0.5) * (L1 - 0.25) * L1 * L3,
-            128 * (L1 - 0.25) * L1 * L2 * L3,
-            128 * L1 * (L2 - 0.25) * L2 * L3,
-            (128 / 3.) * (L2 - 0.5) * (L2 - 0.25) * L2 * L3,
-            64 * (L1 - 0.25) * L1 * (L3 - 0.25) * L3,
-            128 * L1 * L2 * (L3 - 0.25) * L3,
-            64 * (L2 - 0.25) * L2 * (L3 - 0.25) * L3,
-            (128 / 3.) * L1 * (L3 - 0.5) * (L3 - 0.25) * L3,
-            (128 / 3.) * L2 * (L3 - 0.5) * (L3 - 0.25) * L3,
-            (32 / 3.) * (L3 - 0.75) * (L3 - 0.5) * (L3 - 0.25) * L3
-        ])
-        return where(abs(phi) < self.tol, 0.0, phi)
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-
-        get_derivatives = {(1, 0): self.eval_dx0,
-                           (0, 1): self.eval_dx1,
-                           (2, 0): self.eval_dx0x0,
-                           (0, 2): self.eval_dx1x1,
-                           (1, 1): self.eval_dx0x1}
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0)](x),
-                       get_derivatives[(0, 1)](x),
-                       get_derivatives[(2, 0)](x),
-                       get_derivatives[(0, 2)](x),
-                       get_derivatives[(1, 1)](x)])
-
-        return d
-
-    def eval_dx0(self, x):
-        a0, a1, a2 = self.a
-        b0, b1, b2 = self.b
-        c0, c1, c2 = self.c
-        D = self.D
-        D4 = self.D4
-        T0, T1, T2 = self._cart2area(x)
-        phi = array([-(b0 * (D - 2.0 * T0) * (D - T0) * (3 * D - 2.0 * T0)) / (6 * D4) + (
-                b0 * (T0) * (D - T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                             b0 * (T0) * (D - 2.0 * T0) * (3 * D - 2.0 * T0)) / (6 * D4) + (
-                             b0 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4),
-                     (4 * b0 * (T1) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * b1 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 * (T0) * (T1) * (D - T0)) / (3 * D4) - (
-                             4 * b0 * (T0) * (T1) * (D - 2.0 * T0)) / (3 * D4),
-                     (b0 * (T1) * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 + (
-                             b1 * (T0) * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 - (
-                             2 * b0 * (T0) * (T1) * (D - 2.0 * T1)) / D4 - (
-                             2 * b1 * (T0) * (T1) * (D - 2.0 * T0)) / D4,
-                     (4 * b0 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * b1 * (T0) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             8 * b1 * (T0) * (T1) * (D - T1)) / (3 * D4) - (
-                             4 * b1 * (T0) * (T1) * (D - 2.0 * T1)) / (3 * D4),
-                     -(b1 * (D - 2.0 * T1) * (D - T1) * (3 * D - 2.0 * T1)) / (6 * D4) + (
-                             b1 * (T1) * (D - T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             b1 * (T1) * (D - 2.0 * T1) * (3 * D - 2.0 * T1)) / (6 * D4) + (
-                             b1 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4),
-                     (4 * b0 * (T2) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * b2 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 * (T0) * (T2) * (D - T0)) / (3 * D4) - (
-                             4 * b0 * (T0) * (T2) * (D - 2.0 * T0)) / (3 * D4),
-                     -(4 * b0 * (T1) * (T2) * (D - 2.0 * T0)) / D4 - (4 * b1 * (T0) * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * b2 * (T0) * (T1) * (D - 2.0 * T0)) / D4 + (8 * b0 * (T0) * (T1) * (T2)) / D4,
-                     -(4 * b0 * (T1) * (T2) * (D - 2.0 * T1)) / D4 - (4 * b1 * (T0) * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * b2 * (T0) * (T1) * (D - 2.0 * T1)) / D4 + (8 * b1 * (T0) * (T1) * (T2)) / D4,
-                     (4 * b1 * (T2) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * b2 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             8 * b1 * (T1) * (T2) * (D - T1)) / (3 * D4) - (
-                             4 * b1 * (T1) * (T2) * (D - 2.0 * T1)) / (3 * D4),
-                     (b0 * (T2) * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 + (
-                             b2 * (T0) * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 - (
-                             2 * b0 * (T0) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * b2 * (T0) * (T2) * (D - 2.0 * T0)) / D4,
-                     -(4 * b0 * (T1) * (T2) * (D - 2.0 * T2)) / D4 - (4 * b1 * (T0) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * b2 * (T0) * (T1) * (D - 2.0 * T2)) / D4 + (8 * b2 * (T0) * (T1) * (T2)) / D4,
-                     (b1 * (T2) * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 + (
-                             b2 * (T1) * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 - (
-                             2 * b1 * (T1) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * b2 * (T1) * (T2) * (D - 2.0 * T1)) / D4,
-                     (4 * b0 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * b2 * (T0) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * b2 * (T0) * (T2) * (D - T2)) / (3 * D4) - (
-                             4 * b2 * (T0) * (T2) * (D - 2.0 * T2)) / (3 * D4),
-                     (4 * b1 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * b2 * (T1) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * b2 * (T1) * (T2) * (D - T2)) / (3 * D4) - (
-                             4 * b2 * (T1) * (T2) * (D - 2.0 * T2)) / (3 * D4),
-                     -(b2 * (D - 2.0 * T2) * (D - T2) * (3 * D - 2.0 * T2)) / (6 * D4) + (
-                             b2 * (T2) * (D - T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             b2 * (T2) * (D - 2.0 * T2) * (3 * D - 2.0 * T2)) / (6 * D4) + (
-                             b2 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4)
-                     ])
-
-        return where(abs(phi) < self.tol, 0.0, phi)
+        # ~ return phi
 
-    def eval_dx1(self, x):
-        a0, a1, a2 = self.a
-        b0, b1, b2 = self.b
-        c0, c1, c2 = self.c
-        D = self.D
-        D4 = self.D4
+    def eval_dx1x1(self, x):
         T0, T1, T2 = self._cart2area(x)
-        phi = array([-(c0 * (D - 2.0 * T0) * (D - T0) * (3 * D - 2.0 * T0)) / (6 * D4) + (
-                c0 * (T0) * (D - T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                             c0 * (T0) * (D - 2.0 * T0) * (3 * D - 2.0 * T0)) / (6 * D4) + (
-                             c0 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4),
-                     (4 * c0 * (T1) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * c1 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             8 * c0 * (T0) * (T1) * (D - T0)) / (3 * D4) - (
-                             4 * c0 * (T0) * (T1) * (D - 2.0 * T0)) / (3 * D4),
-                     (c0 * (T1) * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 + (
-                             c1 * (T0) * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 - (
-                             2 * c0 * (T0) * (T1) * (D - 2.0 * T1)) / D4 - (
-                             2 * c1 * (T0) * (T1) * (D - 2.0 * T0)) / D4,
-                     (4 * c0 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * c1 * (T0) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             8 * c1 * (T0) * (T1) * (D - T1)) / (3 * D4) - (
-                             4 * c1 * (T0) * (T1) * (D - 2.0 * T1)) / (3 * D4),
-                     -(c1 * (D - 2.0 * T1) * (D - T1) * (3 * D - 2.0 * T1)) / (6 * D4) + (
-                             c1 * (T1) * (D - T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             c1 * (T1) * (D - 2.0 * T1) * (3 * D - 2.0 * T1)) / (6 * D4) + (
-                             c1 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4),
-                     (4 * c0 * (T2) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * c2 * (T0) * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             8 * c0 * (T0) * (T2) * (D - T0)) / (3 * D4) - (
-                             4 * c0 * (T0) * (T2) * (D - 2.0 * T0)) / (3 * D4),
-                     -(4 * c0 * (T1) * (T2) * (D - 2.0 * T0)) / D4 - (4 * c1 * (T0) * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * c2 * (T0) * (T1) * (D - 2.0 * T0)) / D4 + (8 * c0 * (T0) * (T1) * (T2)) / D4,
-                     -(4 * c0 * (T1) * (T2) * (D - 2.0 * T1)) / D4 - (4 * c1 * (T0) * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * c2 * (T0) * (T1) * (D - 2.0 * T1)) / D4 + (8 * c1 * (T0) * (T1) * (T2)) / D4,
-                     (4 * c1 * (T2) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * c2 * (T1) * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             8 * c1 * (T1) * (T2) * (D - T1)) / (3 * D4) - (
-                             4 * c1 * (T1) * (T2) * (D - 2.0 * T1)) / (3 * D4),
-                     (c0 * (T2) * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 + (
-                             c2 * (T0) * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 - (
-                             2 * c0 * (T0) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * c2 * (T0) * (T2) * (D - 2.0 * T0)) / D4,
-                     -(4 * c0 * (T1) * (T2) * (D - 2.0 * T2)) / D4 - (4 * c1 * (T0) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * c2 * (T0) * (T1) * (D - 2.0 * T2)) / D4 + (8 * c2 * (T0) * (T1) * (T2)) / D4,
-                     (c1 * (T2) * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 + (
-                             c2 * (T1) * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 - (
-                             2 * c1 * (T1) * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * c2 * (T1) * (T2) * (D - 2.0 * T1)) / D4,
-                     (4 * c0 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * c2 * (T0) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * c2 * (T0) * (T2) * (D - T2)) / (3 * D4) - (
-                             4 * c2 * (T0) * (T2) * (D - 2.0 * T2)) / (3 * D4),
-                     (4 * c1 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * c2 * (T1) * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * c2 * (T1) * (T2) * (D - T2)) / (3 * D4) - (
-                             4 * c2 * (T1) * (T2) * (D - 2.0 * T2)) / (3 * D4),
-                     -(c2 * (D - 2.0 * T2) * (D - T2) * (3 * D - 2.0 * T2)) / (6 * D4) + (
-                             c2 * (T2) * (D - T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             c2 * (T2) * (D - 2.0 * T2) * (3 * D - 2.0 * T2)) / (6 * D4) + (
-                             c2 * (T2) * (D - 2.0 * T2) * (D - T2)) / (3 * D4)
-                     ])
-        return where(abs(phi) < self.tol, 0.0, phi)
 
-    def eval_dx0x0(self, x):
-        a0, a1, a2 = self.a
-        b0, b1, b2 = self.b
-        c0, c1, c2 = self.c
-        D = self.D
-        D4 = self.D4
-        T0, T1, T2 = self._cart2area(x)
-        phi = array([(2 * b0 ** 2 * (D - T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                b0 ** 2 * (D - 2.0 * T0) * (3 * D - 2.0 * T0)) / (3 * D4) - (
-                             2 * b0 ** 2 * (T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                             2 * b0 ** 2 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             4 * b0 ** 2 * (T0) * (D - T0)) / (3 * D4) - (2 * b0 ** 2 * (T0) * (D - 2.0 * T0)) / (
-                             3 * D4),
-                     (8 * b0 * b1 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (16 * b0 ** 2 * (T1) * (D - T0)) / (
-                             3 * D4) - (16 * b0 * b1 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 ** 2 * (T1) * (D - 2.0 * T0)) / (3 * D4) - (
-                             8 * b0 * b1 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * b0 ** 2 * (T0) * (T1)) / (
-                             3 * D4),
-                     (2 * b0 * b1 * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * b0 ** 2 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             4 * b0 * b1 * (T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * b0 * b1 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             4 * b1 ** 2 * (T0) * (D - 2.0 * T0)) / D4 + (8 * b0 * b1 * (T0) * (T1)) / D4,
-                     (8 * b0 * b1 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (16 * b0 * b1 * (T1) * (D - T1)) / (
-                             3 * D4) - (16 * b1 ** 2 * (T0) * (D - T1)) / (3 * D4) - (
-                             8 * b0 * b1 * (T1) * (D - 2.0 * T1)) / (3 * D4) - (
-                             8 * b1 ** 2 * (T0) * (D - 2.0 * T1)) / (3 * D4) + (16 * b1 ** 2 * (T0) * (T1)) / (
-                             3 * D4),
-                     (2 * b1 ** 2 * (D - T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             b1 ** 2 * (D - 2.0 * T1) * (3 * D - 2.0 * T1)) / (3 * D4) - (
-                             2 * b1 ** 2 * (T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             2 * b1 ** 2 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             4 * b1 ** 2 * (T1) * (D - T1)) / (3 * D4) - (2 * b1 ** 2 * (T1) * (D - 2.0 * T1)) / (
-                             3 * D4),
-                     (8 * b0 * b2 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (16 * b0 ** 2 * (T2) * (D - T0)) / (
-                             3 * D4) - (16 * b0 * b2 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 ** 2 * (T2) * (D - 2.0 * T0)) / (3 * D4) - (
-                             8 * b0 * b2 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * b0 ** 2 * (T0) * (T2)) / (
-                             3 * D4),
-                     -(8 * b0 * b1 * (T2) * (D - 2.0 * T0)) / D4 - (8 * b0 * b2 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             8 * b1 * b2 * (T0) * (D - 2.0 * T0)) / D4 + (16 * b0 ** 2 * (T1) * (T2)) / D4 + (
-                             16 * b0 * b1 * (T0) * (T2)) / D4 + (16 * b0 * b2 * (T0) * (T1)) / D4,
-                     -(8 * b0 * b1 * (T2) * (D - 2.0 * T1)) / D4 - (8 * b0 * b2 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             8 * b1 * b2 * (T0) * (D - 2.0 * T1)) / D4 + (16 * b0 * b1 * (T1) * (T2)) / D4 + (
-                             16 * b1 ** 2 * (T0) * (T2)) / D4 + (16 * b1 * b2 * (T0) * (T1)) / D4,
-                     (8 * b1 * b2 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (16 * b1 ** 2 * (T2) * (D - T1)) / (
-                             3 * D4) - (16 * b1 * b2 * (T1) * (D - T1)) / (3 * D4) - (
-                             8 * b1 ** 2 * (T2) * (D - 2.0 * T1)) / (3 * D4) - (
-                             8 * b1 * b2 * (T1) * (D - 2.0 * T1)) / (3 * D4) + (16 * b1 ** 2 * (T1) * (T2)) / (
-                             3 * D4),
-                     (2 * b0 * b2 * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * b0 ** 2 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * b0 * b2 * (T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * b0 * b2 * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * b2 ** 2 * (T0) * (D - 2.0 * T0)) / D4 + (8 * b0 * b2 * (T0) * (T2)) / D4,
-                     -(8 * b0 * b1 * (T2) * (D - 2.0 * T2)) / D4 - (8 * b0 * b2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             8 * b1 * b2 * (T0) * (D - 2.0 * T2)) / D4 + (16 * b0 * b2 * (T1) * (T2)) / D4 + (
-                             16 * b1 * b2 * (T0) * (T2)) / D4 + (16 * b2 ** 2 * (T0) * (T1)) / D4,
-                     (2 * b1 * b2 * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * b1 ** 2 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * b1 * b2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * b1 * b2 * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * b2 ** 2 * (T1) * (D - 2.0 * T1)) / D4 + (8 * b1 * b2 * (T1) * (T2)) / D4,
-                     (8 * b0 * b2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (16 * b0 * b2 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * b2 ** 2 * (T0) * (D - T2)) / (3 * D4) - (
-                             8 * b0 * b2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * b2 ** 2 * (T0) * (D - 2.0 * T2)) / (3 * D4) + (16 * b2 ** 2 * (T0) * (T2)) / (
-                             3 * D4),
-                     (8 * b1 * b2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (16 * b1 * b2 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * b2 ** 2 * (T1) * (D - T2)) / (3 * D4) - (
-                             8 * b1 * b2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * b2 ** 2 * (T1) * (D - 2.0 * T2)) / (3 * D4) + (16 * b2 ** 2 * (T1) * (T2)) / (
-                             3 * D4),
-                     (2 * b2 ** 2 * (D - T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             b2 ** 2 * (D - 2.0 * T2) * (3 * D - 2.0 * T2)) / (3 * D4) - (
-                             2 * b2 ** 2 * (T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             2 * b2 ** 2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             4 * b2 ** 2 * (T2) * (D - T2)) / (3 * D4) - (2 * b2 ** 2 * (T2) * (D - 2.0 * T2)) / (
-                             3 * D4)
-                     ])
-        return where(abs(phi) < self.tol, 0.0, phi)
+        phi = array([self.D38 * self.c[0] * self.c[0] * (self.D4 - 3.0 * T0) + self.D38 * self.c[0] * self.c[0] * (
+                self.D2 - 3.0 * T0) - self.D98 * self.c[0] * self.c[0] * T0,
+                     self.D98 * self.c[0] * self.c[1] * (self.D2 - 3.0 * T0) + self.D27 * self.c[0] * self.c[
+                         0] * T1 + self.D27 * self.c[0] * self.c[1] * T0,
+                     self.D98 * self.c[0] * self.c[1] * (self.D2 - 3.0 * T1) + self.D27 * self.c[0] * self.c[
+                         1] * T1 + self.D27 * self.c[1] * self.c[1] * T0,
+                     self.D38 * self.c[1] * self.c[1] * (self.D4 - 3.0 * T1) + self.D38 * self.c[1] * self.c[1] * (
+                             self.D2 - 3.0 * T1) - self.D98 * self.c[1] * self.c[1] * T1,
+                     self.D98 * self.c[0] * self.c[2] * (self.D2 - 3.0 * T0) + self.D27 * self.c[0] * self.c[
+                         0] * T2 + self.D27 * self.c[0] * self.c[2] * T0,
+                     2.0 * self.D27 * self.c[0] * self.c[1] * T2 + 2.0 * self.D27 * self.c[0] * self.c[
+                         2] * T1 + 2.0 * self.D27 * self.c[1] * self.c[2] * T0,
+                     self.D98 * self.c[1] * self.c[2] * (self.D2 - 3.0 * T1) + self.D27 * self.c[1] * self.c[
+                         1] * T2 + self.D27 * self.c[1] * self.c[2] * T1,
+                     self.D98 * self.c[0] * self.c[2] * (self.D2 - 3.0 * T2) + self.D27 * self.c[0] * self.c[
+                         2] * T2 + self.D27 * self.c[2] * self.c[2] * T0,
+                     self.D98 * self.c[1] * self.c[2] * (self.D2 - 3.0 * T2) + self.D27 * self.c[1] * self.c[
+                         2] * T2 + self.D27 * self.c[2] * self.c[2] * T1,
+                     self.D38 * self.c[2] * self.c[2] * (self.D4 - 3.0 * T2) + self.D38 * self.c[2] * self.c[2] * (
+                             self.D2 - 3.0 * T2) - self.D98 * self.c[2] * self.c[2] * T2])
 
-    def eval_dx1x1(self, x):
-        a0, a1, a2 = self.a
-        b0, b1, b2 = self.b
-        c0, c1, c2 = self.c
-        D = self.D
-        D4 = self.D4
-        T0, T1, T2 = self._cart2area(x)
-        phi = array([(2 * c0 ** 2 * (D - T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                c0 ** 2 * (D - 2.0 * T0) * (3 * D - 2.0 * T0)) / (3 * D4) - (
-                             2 * c0 ** 2 * (T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                             2 * c0 ** 2 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             4 * c0 ** 2 * (T0) * (D - T0)) / (3 * D4) - (2 * c0 ** 2 * (T0) * (D - 2.0 * T0)) / (
-                             3 * D4),
-                     (8 * c0 * c1 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (16 * c0 ** 2 * (T1) * (D - T0)) / (
-                             3 * D4) - (16 * c0 * c1 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * c0 ** 2 * (T1) * (D - 2.0 * T0)) / (3 * D4) - (
-                             8 * c0 * c1 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * c0 ** 2 * (T0) * (T1)) / (
-                             3 * D4),
-                     (2 * c0 * c1 * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * c0 ** 2 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             4 * c0 * c1 * (T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * c0 * c1 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             4 * c1 ** 2 * (T0) * (D - 2.0 * T0)) / D4 + (8 * c0 * c1 * (T0) * (T1)) / D4,
-                     (8 * c0 * c1 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (16 * c0 * c1 * (T1) * (D - T1)) / (
-                             3 * D4) - (16 * c1 ** 2 * (T0) * (D - T1)) / (3 * D4) - (
-                             8 * c0 * c1 * (T1) * (D - 2.0 * T1)) / (3 * D4) - (
-                             8 * c1 ** 2 * (T0) * (D - 2.0 * T1)) / (3 * D4) + (16 * c1 ** 2 * (T0) * (T1)) / (
-                             3 * D4),
-                     (2 * c1 ** 2 * (D - T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             c1 ** 2 * (D - 2.0 * T1) * (3 * D - 2.0 * T1)) / (3 * D4) - (
-                             2 * c1 ** 2 * (T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             2 * c1 ** 2 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             4 * c1 ** 2 * (T1) * (D - T1)) / (3 * D4) - (2 * c1 ** 2 * (T1) * (D - 2.0 * T1)) / (
-                             3 * D4),
-                     (8 * c0 * c2 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (16 * c0 ** 2 * (T2) * (D - T0)) / (
-                             3 * D4) - (16 * c0 * c2 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * c0 ** 2 * (T2) * (D - 2.0 * T0)) / (3 * D4) - (
-                             8 * c0 * c2 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * c0 ** 2 * (T0) * (T2)) / (
-                             3 * D4),
-                     -(8 * c0 * c1 * (T2) * (D - 2.0 * T0)) / D4 - (8 * c0 * c2 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             8 * c1 * c2 * (T0) * (D - 2.0 * T0)) / D4 + (16 * c0 ** 2 * (T1) * (T2)) / D4 + (
-                             16 * c0 * c1 * (T0) * (T2)) / D4 + (16 * c0 * c2 * (T0) * (T1)) / D4,
-                     -(8 * c0 * c1 * (T2) * (D - 2.0 * T1)) / D4 - (8 * c0 * c2 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             8 * c1 * c2 * (T0) * (D - 2.0 * T1)) / D4 + (16 * c0 * c1 * (T1) * (T2)) / D4 + (
-                             16 * c1 ** 2 * (T0) * (T2)) / D4 + (16 * c1 * c2 * (T0) * (T1)) / D4,
-                     (8 * c1 * c2 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (16 * c1 ** 2 * (T2) * (D - T1)) / (
-                             3 * D4) - (16 * c1 * c2 * (T1) * (D - T1)) / (3 * D4) - (
-                             8 * c1 ** 2 * (T2) * (D - 2.0 * T1)) / (3 * D4) - (
-                             8 * c1 * c2 * (T1) * (D - 2.0 * T1)) / (3 * D4) + (16 * c1 ** 2 * (T1) * (T2)) / (
-                             3 * D4),
-                     (2 * c0 * c2 * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * c0 ** 2 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * c0 * c2 * (T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * c0 * c2 * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * c2 ** 2 * (T0) * (D - 2.0 * T0)) / D4 + (8 * c0 * c2 * (T0) * (T2)) / D4,
-                     -(8 * c0 * c1 * (T2) * (D - 2.0 * T2)) / D4 - (8 * c0 * c2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             8 * c1 * c2 * (T0) * (D - 2.0 * T2)) / D4 + (16 * c0 * c2 * (T1) * (T2)) / D4 + (
-                             16 * c1 * c2 * (T0) * (T2)) / D4 + (16 * c2 ** 2 * (T0) * (T1)) / D4,
-                     (2 * c1 * c2 * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * c1 ** 2 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * c1 * c2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * c1 * c2 * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * c2 ** 2 * (T1) * (D - 2.0 * T1)) / D4 + (8 * c1 * c2 * (T1) * (T2)) / D4,
-                     (8 * c0 * c2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (16 * c0 * c2 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * c2 ** 2 * (T0) * (D - T2)) / (3 * D4) - (
-                             8 * c0 * c2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * c2 ** 2 * (T0) * (D - 2.0 * T2)) / (3 * D4) + (16 * c2 ** 2 * (T0) * (T2)) / (
-                             3 * D4),
-                     (8 * c1 * c2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (16 * c1 * c2 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * c2 ** 2 * (T1) * (D - T2)) / (3 * D4) - (
-                             8 * c1 * c2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * c2 ** 2 * (T1) * (D - 2.0 * T2)) / (3 * D4) + (16 * c2 ** 2 * (T1) * (T2)) / (
-                             3 * D4),
-                     (2 * c2 ** 2 * (D - T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             c2 ** 2 * (D - 2.0 * T2) * (3 * D - 2.0 * T2)) / (3 * D4) - (
-                             2 * c2 ** 2 * (T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             2 * c2 ** 2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             4 * c2 ** 2 * (T2) * (D - T2)) / (3 * D4) - (2 * c2 ** 2 * (T2) * (D - 2.0 * T2)) / (
-                             3 * D4),
-                     ])
         return where(abs(phi) < self.tol, 0.0, phi)
+        # ~ return phi
 
     def eval_dx0x1(self, x):
-        a0, a1, a2 = self.a
-        b0, b1, b2 = self.b
-        c0, c1, c2 = self.c
-        D = self.D
-        D4 = self.D4
         T0, T1, T2 = self._cart2area(x)
-        phi = array([(2 * b0 * c0 * (D - T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                b0 * c0 * (D - 2.0 * T0) * (3 * D - 2.0 * T0)) / (3 * D4) - (
-                             2 * b0 * c0 * (T0) * (3 * D - 2.0 * T0)) / (3 * D4) + (
-                             2 * b0 * c0 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             4 * b0 * c0 * (T0) * (D - T0)) / (3 * D4) - (2 * b0 * c0 * (T0) * (D - 2.0 * T0)) / (
-                             3 * D4),
-                     (4 * b0 * c1 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * b1 * c0 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             16 * b0 * c0 * (T1) * (D - T0)) / (3 * D4) - (8 * b0 * c1 * (T0) * (D - T0)) / (
-                             3 * D4) - (8 * b1 * c0 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 * c0 * (T1) * (D - 2.0 * T0)) / (3 * D4) - (
-                             4 * b0 * c1 * (T0) * (D - 2.0 * T0)) / (3 * D4) - (
-                             4 * b1 * c0 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * b0 * c0 * (T0) * (T1)) / (
-                             3 * D4),
-                     (b0 * c1 * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 + (
-                             b1 * c0 * (D - 2.0 * T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * b0 * c0 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             2 * b0 * c1 * (T0) * (D - 2.0 * T1)) / D4 - (
-                             2 * b1 * c0 * (T0) * (D - 2.0 * T1)) / D4 - (
-                             2 * b0 * c1 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             2 * b1 * c0 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             4 * b1 * c1 * (T0) * (D - 2.0 * T0)) / D4 + (4 * b0 * c1 * (T0) * (T1)) / D4 + (
-                             4 * b1 * c0 * (T0) * (T1)) / D4,
-                     (4 * b0 * c1 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * b1 * c0 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             8 * b0 * c1 * (T1) * (D - T1)) / (3 * D4) - (8 * b1 * c0 * (T1) * (D - T1)) / (
-                             3 * D4) - (16 * b1 * c1 * (T0) * (D - T1)) / (3 * D4) - (
-                             4 * b0 * c1 * (T1) * (D - 2.0 * T1)) / (3 * D4) - (
-                             4 * b1 * c0 * (T1) * (D - 2.0 * T1)) / (3 * D4) - (
-                             8 * b1 * c1 * (T0) * (D - 2.0 * T1)) / (3 * D4) + (16 * b1 * c1 * (T0) * (T1)) / (
-                             3 * D4),
-                     (2 * b1 * c1 * (D - T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             b1 * c1 * (D - 2.0 * T1) * (3 * D - 2.0 * T1)) / (3 * D4) - (
-                             2 * b1 * c1 * (T1) * (3 * D - 2.0 * T1)) / (3 * D4) + (
-                             2 * b1 * c1 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             4 * b1 * c1 * (T1) * (D - T1)) / (3 * D4) - (2 * b1 * c1 * (T1) * (D - 2.0 * T1)) / (
-                             3 * D4),
-                     (4 * b0 * c2 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) + (
-                             4 * b2 * c0 * (D - 2.0 * T0) * (D - T0)) / (3 * D4) - (
-                             16 * b0 * c0 * (T2) * (D - T0)) / (3 * D4) - (8 * b0 * c2 * (T0) * (D - T0)) / (
-                             3 * D4) - (8 * b2 * c0 * (T0) * (D - T0)) / (3 * D4) - (
-                             8 * b0 * c0 * (T2) * (D - 2.0 * T0)) / (3 * D4) - (
-                             4 * b0 * c2 * (T0) * (D - 2.0 * T0)) / (3 * D4) - (
-                             4 * b2 * c0 * (T0) * (D - 2.0 * T0)) / (3 * D4) + (16 * b0 * c0 * (T0) * (T2)) / (
-                             3 * D4),
-                     -(4 * b0 * c1 * (T2) * (D - 2.0 * T0)) / D4 - (4 * b1 * c0 * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * b0 * c2 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             4 * b2 * c0 * (T1) * (D - 2.0 * T0)) / D4 - (
-                             4 * b1 * c2 * (T0) * (D - 2.0 * T0)) / D4 - (
-                             4 * b2 * c1 * (T0) * (D - 2.0 * T0)) / D4 + (16 * b0 * c0 * (T1) * (T2)) / D4 + (
-                             8 * b0 * c1 * (T0) * (T2)) / D4 + (8 * b1 * c0 * (T0) * (T2)) / D4 + (
-                             8 * b0 * c2 * (T0) * (T1)) / D4 + (8 * b2 * c0 * (T0) * (T1)) / D4,
-                     -(4 * b0 * c1 * (T2) * (D - 2.0 * T1)) / D4 - (4 * b1 * c0 * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * b0 * c2 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             4 * b2 * c0 * (T1) * (D - 2.0 * T1)) / D4 - (
-                             4 * b1 * c2 * (T0) * (D - 2.0 * T1)) / D4 - (
-                             4 * b2 * c1 * (T0) * (D - 2.0 * T1)) / D4 + (8 * b0 * c1 * (T1) * (T2)) / D4 + (
-                             8 * b1 * c0 * (T1) * (T2)) / D4 + (16 * b1 * c1 * (T0) * (T2)) / D4 + (
-                             8 * b1 * c2 * (T0) * (T1)) / D4 + (8 * b2 * c1 * (T0) * (T1)) / D4,
-                     (4 * b1 * c2 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) + (
-                             4 * b2 * c1 * (D - 2.0 * T1) * (D - T1)) / (3 * D4) - (
-                             16 * b1 * c1 * (T2) * (D - T1)) / (3 * D4) - (8 * b1 * c2 * (T1) * (D - T1)) / (
-                             3 * D4) - (8 * b2 * c1 * (T1) * (D - T1)) / (3 * D4) - (
-                             8 * b1 * c1 * (T2) * (D - 2.0 * T1)) / (3 * D4) - (
-                             4 * b1 * c2 * (T1) * (D - 2.0 * T1)) / (3 * D4) - (
-                             4 * b2 * c1 * (T1) * (D - 2.0 * T1)) / (3 * D4) + (16 * b1 * c1 * (T1) * (T2)) / (
-                             3 * D4),
-                     (b0 * c2 * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 + (
-                             b2 * c0 * (D - 2.0 * T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * b0 * c0 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * b0 * c2 * (T0) * (D - 2.0 * T2)) / D4 - (
-                             2 * b2 * c0 * (T0) * (D - 2.0 * T2)) / D4 - (
-                             2 * b0 * c2 * (T2) * (D - 2.0 * T0)) / D4 - (
-                             2 * b2 * c0 * (T2) * (D - 2.0 * T0)) / D4 - (
-                             4 * b2 * c2 * (T0) * (D - 2.0 * T0)) / D4 + (4 * b0 * c2 * (T0) * (T2)) / D4 + (
-                             4 * b2 * c0 * (T0) * (T2)) / D4,
-                     -(4 * b0 * c1 * (T2) * (D - 2.0 * T2)) / D4 - (4 * b1 * c0 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             4 * b0 * c2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * b2 * c0 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * b1 * c2 * (T0) * (D - 2.0 * T2)) / D4 - (
-                             4 * b2 * c1 * (T0) * (D - 2.0 * T2)) / D4 + (8 * b0 * c2 * (T1) * (T2)) / D4 + (
-                             8 * b2 * c0 * (T1) * (T2)) / D4 + (8 * b1 * c2 * (T0) * (T2)) / D4 + (
-                             8 * b2 * c1 * (T0) * (T2)) / D4 + (16 * b2 * c2 * (T0) * (T1)) / D4,
-                     (b1 * c2 * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 + (
-                             b2 * c1 * (D - 2.0 * T1) * (D - 2.0 * T2)) / D4 - (
-                             4 * b1 * c1 * (T2) * (D - 2.0 * T2)) / D4 - (
-                             2 * b1 * c2 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             2 * b2 * c1 * (T1) * (D - 2.0 * T2)) / D4 - (
-                             2 * b1 * c2 * (T2) * (D - 2.0 * T1)) / D4 - (
-                             2 * b2 * c1 * (T2) * (D - 2.0 * T1)) / D4 - (
-                             4 * b2 * c2 * (T1) * (D - 2.0 * T1)) / D4 + (4 * b1 * c2 * (T1) * (T2)) / D4 + (
-                             4 * b2 * c1 * (T1) * (T2)) / D4,
-                     (4 * b0 * c2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * b2 * c0 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * b0 * c2 * (T2) * (D - T2)) / (3 * D4) - (8 * b2 * c0 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * b2 * c2 * (T0) * (D - T2)) / (3 * D4) - (
-                             4 * b0 * c2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             4 * b2 * c0 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * b2 * c2 * (T0) * (D - 2.0 * T2)) / (3 * D4) + (16 * b2 * c2 * (T0) * (T2)) / (
-                             3 * D4),
-                     (4 * b1 * c2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) + (
-                             4 * b2 * c1 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             8 * b1 * c2 * (T2) * (D - T2)) / (3 * D4) - (8 * b2 * c1 * (T2) * (D - T2)) / (
-                             3 * D4) - (16 * b2 * c2 * (T1) * (D - T2)) / (3 * D4) - (
-                             4 * b1 * c2 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             4 * b2 * c1 * (T2) * (D - 2.0 * T2)) / (3 * D4) - (
-                             8 * b2 * c2 * (T1) * (D - 2.0 * T2)) / (3 * D4) + (16 * b2 * c2 * (T1) * (T2)) / (
-                             3 * D4),
-                     (2 * b2 * c2 * (D - T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             b2 * c2 * (D - 2.0 * T2) * (3 * D - 2.0 * T2)) / (3 * D4) - (
-                             2 * b2 * c2 * (T2) * (3 * D - 2.0 * T2)) / (3 * D4) + (
-                             2 * b2 * c2 * (D - 2.0 * T2) * (D - T2)) / (3 * D4) - (
-                             4 * b2 * c2 * (T2) * (D - T2)) / (3 * D4) - (2 * b2 * c2 * (T2) * (D - 2.0 * T2)) / (
-                             3 * D4),
-                     ])
+
+        phi = array([self.D38 * self.b[0] * self.c[0] * (self.D4 - 3.0 * T0) + self.D38 * self.b[0] * self.c[0] * (
+                self.D2 - 3.0 * T0) - self.D98 * self.b[0] * self.c[0] * T0,
+                     0.5 * self.D98 * self.b[0] * self.c[1] * (self.D2 - 3.0 * T0) + 0.5 * self.D98 * self.b[1] *
+                     self.c[0] * (self.D2 - 3.0 * T0) + self.D27 * self.b[0] * self.c[0] * T1 + 0.5 * self.D27 * self.b[
+                         0] * self.c[1] * T0 + 0.5 * self.D27 * self.b[1] * self.c[0] * T0,
+                     0.5 * self.D98 * self.b[0] * self.c[1] * (self.D2 - 3.0 * T1) + 0.5 * self.D98 * self.b[1] *
+                     self.c[0] * (self.D2 - 3.0 * T1) + self.D27 * self.b[0] * self.c[1] * T1 + 0.5 * self.D27 * self.b[
+                         1] * self.c[0] * T1 + 0.5 * self.D27 * self.b[1] * self.c[1] * T0,
+                     self.D38 * self.b[1] * self.c[1] * (self.D4 - 3.0 * T1) + self.D38 * self.b[1] * self.c[1] * (
+                             self.D2 - 3.0 * T1) - self.D98 * self.b[1] * self.c[1] * T1,
+                     0.5 * self.D98 * self.b[0] * self.c[2] * (self.D2 - 3.0 * T0) + 0.5 * self.D98 * self.b[2] *
+                     self.c[0] * (self.D2 - 3.0 * T0) + self.D27 * self.b[0] * self.c[0] * T2 + 0.5 * self.D27 * self.b[
+                         0] * self.c[2] * T0 + 0.5 * self.D27 * self.b[2] * self.c[0] * T0,
+                     self.D27 * self.b[0] * self.c[1] * T2 + self.D27 * self.b[1] * self.c[0] * T2 + self.D27 * self.b[
+                         0] * self.c[2] * T1 + self.D27 * self.b[2] * self.c[0] * T1 + self.D27 * self.b[1] * self.c[
+                         2] * T0 + self.D27 * self.b[2] * self.c[1] * T0,
+                     0.5 * self.D98 * self.b[1] * self.c[2] * (self.D2 - 3.0 * T1) + 0.5 * self.D98 * self.b[2] *
+                     self.c[1] * (self.D2 - 3.0 * T1) + self.D27 * self.b[1] * self.c[1] * T2 + 0.5 * self.D27 * self.b[
+                         1] * self.c[2] * T1 + 0.5 * self.D27 * self.b[2] * self.c[1] * T1,
+                     0.5 * self.D98 * self.b[0] * self.c[2] * (self.D2 - 3.0 * T2) + 0.5 * self.D98 * self.b[2] *
+                     self.c[0] * (self.D2 - 3.0 * T2) + self.D27 * self.b[0] * self.c[2] * T2 + 0.5 * self.D27 * self.b[
+                         2] * self.c[0] * T2 + 0.5 * self.D27 * self.b[2] * self.c[2] * T0,
+                     0.5 * self.D98 * self.b[1] * self.c[2] * (self.D2 - 3.0 * T2) + 0.5 * self.D98 * self.b[2] *
+                     self.c[1] * (self.D2 - 3.0 * T2) + self.D27 * self.b[1] * self.c[2] * T2 + 0.5 * self.D27 * self.b[
+                         2] * self.c[1] * T2 + 0.5 * self.D27 * self.b[2] * self.c[2] * T1,
+                     self.D38 * self.b[2] * self.c[2] * (self.D4 - 3.0 * T2) + self.D38 * self.b[2] * self.c[2] * (
+                             self.D2 - 3.0 * T2) - self.D98 * self.b[2] * self.c[2] * T2])
+
+        # ~ self.b[0]*self.c[0]*( self.D38*( self.D4 + self.D2 - 6.0*T0 ) + self.D98*T0 )
+        # ~ 0.5*self.D98*self.b[0]*self.c[1]*(self.D2 - 3.0*T0) + 0.5*self.D98*self.b[1]*self.c[0]*(self.D2 - 3.0*T0) + self.D27*self.b[0]*self.c[0]*T1 + 0.5*self.D27*self.b[0]*self.c[1]*T0 + 0.5*self.D27*self.b[1]*self.c[0]*T0,\
+        # ~ 0.5*self.D98*self.b[0]*self.c[1]*(self.D2 - 3.0*T1) + 0.5*self.D98*self.b[1]*self.c[0]*(self.D2 - 3.0*T1) + self.D27*self.b[0]*self.c[1]*T1 + 0.5*self.D27*self.b[1]*self.c[0]*T1 + 0.5*self.D27*self.b[1]*self.c[1]*T0,\
+        # ~ self.D38*self.b[1]*self.c[1]*(self.D4 - 3.0*T1) + self.D38*self.b[1]*self.c[1]*(self.D2 - 3.0*T1) - self.D98*self.b[1]*self.c[1]*T1,\
+        # ~ 0.5*self.D98*self.b[0]*self.c[2]*(self.D2 - 3.0*T0) + 0.5*self.D98*self.b[2]*self.c[0]*(self.D2 - 3.0*T0) + self.D27*self.b[0]*self.c[0]*T2 + 0.5*self.D27*self.b[0]*self.c[2]*T0 + 0.5*self.D27*self.b[2]*self.c[0]*T0,\
+        # ~ self.D27*self.b[0]*self.c[1]*T2 + self.D27*self.b[1]*self.c[0]*T2 + self.D27*self.b[0]*self.c[2]*T1 + self.D27*self.b[2]*self.c[0]*T1 + self.D27*self.b[1]*self.c[2]*T0 + self.D27*self.b[2]*self.c[1]*T0,\
+        # ~ 0.5*self.D98*self.b[1]*self.c[2]*(self.D2 - 3.0*T1) + 0.5*self.D98*self.b[2]*self.c[1]*(self.D2 - 3.0*T1) + self.D27*self.b[1]*self.c[1]*T2 + 0.5*self.D27*self.b[1]*self.c[2]*T1 + 0.5*self.D27*self.b[2]*self.c[1]*T1,\
+        # ~ 0.5*self.D98*self.b[0]*self.c[2]*(self.D2 - 3.0*T2) + 0.5*self.D98*self.b[2]*self.c[0]*(self.D2 - 3.0*T2) + self.D27*self.b[0]*self.c[2]*T2 + 0.5*self.D27*self.b[2]*self.c[0]*T2 + 0.5*self.D27*self.b[2]*self.c[2]*T0,\
+        # ~ 0.5*self.D98*self.b[1]*self.c[2]*(self.D2 - 3.0*T2) + 0.5*self.D98*self.b[2]*self.c[1]*(self.D2 - 3.0*T2) + self.D27*self.b[1]*self.c[2]*T2 + 0.5*self.D27*self.b[2]*self.c[1]*T2 + 0.5*self.D27*self.b[2]*self.c[2]*T1,\
+        # ~ self.D38*self.b[2]*self.c[2]*(self.D4 - 3.0*T2) + self.D38*self.b[2]*self.c[2]*(self.D2 - 3.0*T2) - self.D98*self.b[2]*self.c[2]*T2 ])
+
         return where(abs(phi) < self.tol, 0.0, phi)
+        # ~ return phi
+
+
+class SimplexL4L1(Simplex2d, PolynomialBasis):
+
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'simplex_L4_L1', ('simplex_L4_L1',), 4)
+
+
+class SimplexL4L4(Simplex2d, PolynomialBasis):
+
+    def __init__(self):
+        PolynomialBasis.__init__(self, 'simplex_L4_L4', ('simplex_L4_L4',), 4)
 
 
 class SimplexL4L4L4(Simplex3d):
@@ -2740,321 +1681,30 @@ class SimplexB3B3(object):
         return self.phi.copy()
 
 
-class PrismSl4Sl4Ql4(object):
+class PrismSl4Sl4Ql4(PolynomialBasis):
     """ prism shaped element basis with quartic lagrange
     """
 
     def __init__(self):
-        self.dimensions = 3
-        self.type = 'prism_sL4_sL4_qL4'
-        self.basis_order = 4
-        self.tol = 1e-12
-        self.sL4 = SimplexL4L4()
-
-    def tensor(self, sp, p3):
-        p = array([
-            sp[0] * p3[0], sp[1] * p3[0], sp[2] * p3[0], sp[3] * p3[0], sp[4] * p3[0],
-            sp[5] * p3[0], sp[6] * p3[0], sp[7] * p3[0], sp[8] * p3[0],
-            sp[9] * p3[0], sp[10] * p3[0], sp[11] * p3[0],
-            sp[12] * p3[0], sp[13] * p3[0],
-            sp[14] * p3[0],
-
-            sp[0] * p3[1], sp[1] * p3[1], sp[2] * p3[1], sp[3] * p3[1], sp[4] * p3[1],
-            sp[5] * p3[1], sp[6] * p3[1], sp[7] * p3[1], sp[8] * p3[1],
-            sp[9] * p3[1], sp[10] * p3[1], sp[11] * p3[1],
-            sp[12] * p3[1], sp[13] * p3[1],
-            sp[14] * p3[1],
-
-            sp[0] * p3[2], sp[1] * p3[2], sp[2] * p3[2], sp[3] * p3[2], sp[4] * p3[2],
-            sp[5] * p3[2], sp[6] * p3[2], sp[7] * p3[2], sp[8] * p3[2],
-            sp[9] * p3[2], sp[10] * p3[2], sp[11] * p3[2],
-            sp[12] * p3[2], sp[13] * p3[2],
-            sp[14] * p3[2],
-
-            sp[0] * p3[3], sp[1] * p3[3], sp[2] * p3[3], sp[3] * p3[3], sp[4] * p3[3],
-            sp[5] * p3[3], sp[6] * p3[3], sp[7] * p3[3], sp[8] * p3[3],
-            sp[9] * p3[3], sp[10] * p3[3], sp[11] * p3[3],
-            sp[12] * p3[3], sp[13] * p3[3],
-            sp[14] * p3[3],
-
-            sp[0] * p3[4], sp[1] * p3[4], sp[2] * p3[4], sp[3] * p3[4], sp[4] * p3[4],
-            sp[5] * p3[4], sp[6] * p3[4], sp[7] * p3[4], sp[8] * p3[4],
-            sp[9] * p3[4], sp[10] * p3[4], sp[11] * p3[4],
-            sp[12] * p3[4], sp[13] * p3[4],
-            sp[14] * p3[4],
-        ])
-
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(self.sL4.eval(x[:2]), L4(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        # no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2,
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x),
-                       get_derivatives[(0, 1, 0)](x),
-                       get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x),
-                       get_derivatives[(0, 2, 0)](x),
-                       get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x),
-                       get_derivatives[(1, 0, 1)](x),
-                       get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
-
-    def eval_dx0(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L4(x[2]))
-
-    def eval_dx1(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L4(x[2]))
-
-    def eval_dx2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L4d(x[2]))
-
-    def eval_dx0x0(self, x):
-        self.tensor(self.sL4.eval_dx0x0(x[:2]), L4(x[2]))
-
-    def eval_dx1x1(self, x):
-        self.tensor(self.sL4.eval_dx1x1(x[:2]), L4(x[2]))
-
-    def eval_dx2x2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L4dd(x[2]))
-
-    def eval_dx0x1(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L4(x[2]))
-
-    def eval_dx0x2(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L4d(x[2]))
-
-    def eval_dx1x2(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L4d(x[2]))
-
-    def eval_dx0x1x2(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L4d(x[2]))
+        PolynomialBasis.__init__(self, 'prism_sL4_sL4_qL4', ('simplex_L4_L4', 'L4'), 4)
 
 
-class PrismSl4Sl4Ql1(object):
+class PrismSl4Sl4Ql1(PolynomialBasis):
     """ prism shaped element basis with quartic lagrange in triangle face
     and linear in z
     """
 
     def __init__(self):
-        self.dimensions = 3
-        self.type = 'prism_sL4_sL4_qL1'
-        self.basis_order = 4
-        self.tol = 1e-12
-        self.sL4 = SimplexL4L4()
-
-    def tensor(self, sp, p3):
-        p = array([
-            sp[0] * p3[0], sp[1] * p3[0], sp[2] * p3[0], sp[3] * p3[0], sp[4] * p3[0],
-            sp[5] * p3[0], sp[6] * p3[0], sp[7] * p3[0], sp[8] * p3[0],
-            sp[9] * p3[0], sp[10] * p3[0], sp[11] * p3[0],
-            sp[12] * p3[0], sp[13] * p3[0],
-            sp[14] * p3[0],
-
-            sp[0] * p3[1], sp[1] * p3[1], sp[2] * p3[1], sp[3] * p3[1], sp[4] * p3[1],
-            sp[5] * p3[1], sp[6] * p3[1], sp[7] * p3[1], sp[8] * p3[1],
-            sp[9] * p3[1], sp[10] * p3[1], sp[11] * p3[1],
-            sp[12] * p3[1], sp[13] * p3[1],
-            sp[14] * p3[1],
-        ])
-
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(self.sL4.eval(x[:2]), L1(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        # no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2,
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x),
-                       get_derivatives[(0, 1, 0)](x),
-                       get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x),
-                       get_derivatives[(0, 2, 0)](x),
-                       get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x),
-                       get_derivatives[(1, 0, 1)](x),
-                       get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
-
-    def eval_dx0(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L1(x[2]))
-
-    def eval_dx1(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L1(x[2]))
-
-    def eval_dx2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L1d(x[2]))
-
-    def eval_dx0x0(self, x):
-        self.tensor(self.sL4.eval_dx0x0(x[:2]), L1(x[2]))
-
-    def eval_dx1x1(self, x):
-        self.tensor(self.sL4.eval_dx1x1(x[:2]), L1(x[2]))
-
-    def eval_dx2x2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L1dd(x[2]))
-
-    def eval_dx0x1(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L1(x[2]))
-
-    def eval_dx0x2(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L1d(x[2]))
-
-    def eval_dx1x2(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L1d(x[2]))
-
-    def eval_dx0x1x2(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L1d(x[2]))
+        PolynomialBasis.__init__(self, 'prism_sL4_sL4_qL1', ('simplex_L4_L4', 'L1'), 4)
 
 
-class PrismSl4Sl1Ql4:
-    """ prism shaped element basis with quartic lagrange in triangle face
-    and linear in z
+class PrismSl4Sl1Ql4(PolynomialBasis):
+    """ prism shaped element basis with quartic lagrange on the triangle
+    face edges and quartic lagrange in z
     """
 
     def __init__(self):
-        self.dimensions = 3
-        self.type = 'prism_sL4_sL4_qL1'
-        self.basis_order = 4
-        self.tol = 1e-12
-        self.sL4 = SimplexL4L1()
-
-    def tensor(self, sp, p3):
-        p = array([
-            sp[0] * p3[0], sp[1] * p3[0], sp[2] * p3[0], sp[3] * p3[0], sp[4] * p3[0],
-            sp[5] * p3[0],
-
-            sp[0] * p3[1], sp[1] * p3[1], sp[2] * p3[1], sp[3] * p3[1], sp[4] * p3[1],
-            sp[5] * p3[1],
-
-            sp[0] * p3[2], sp[1] * p3[2], sp[2] * p3[2], sp[3] * p3[2], sp[4] * p3[2],
-            sp[5] * p3[2],
-
-            sp[0] * p3[3], sp[1] * p3[3], sp[2] * p3[3], sp[3] * p3[3], sp[4] * p3[3],
-            sp[5] * p3[3],
-
-            sp[0] * p3[4], sp[1] * p3[4], sp[2] * p3[4], sp[3] * p3[4], sp[4] * p3[4],
-            sp[5] * p3[4],
-        ])
-
-        return where(abs(p) < self.tol, 0.0, p)
-
-    def eval(self, x):
-        return self.tensor(self.sL4.eval(x[:2]), L4(x[2]))
-
-    def eval_derivatives(self, x, deriv=None):
-        """ if deriv==None, evaluate all derivatives
-        """
-        # no cross derivatives yet
-        get_derivatives = {(1, 0, 0): self.eval_dx0,
-                           (0, 1, 0): self.eval_dx1,
-                           (0, 0, 1): self.eval_dx2,
-                           (2, 0, 0): self.eval_dx0x0,
-                           (0, 2, 0): self.eval_dx1x1,
-                           (0, 0, 2): self.eval_dx2x2,
-                           (1, 1, 0): self.eval_dx0x1,
-                           (1, 0, 1): self.eval_dx0x2,
-                           (0, 1, 1): self.eval_dx1x2,
-                           (1, 1, 1): self.eval_dx0x1x2,
-                           }
-
-        if deriv:
-            try:
-                d = get_derivatives[deriv](x)
-            except KeyError:
-                raise Warning('derivative ' + str(deriv) + ' not supported')
-        else:
-            d = array([get_derivatives[(1, 0, 0)](x),
-                       get_derivatives[(0, 1, 0)](x),
-                       get_derivatives[(0, 0, 1)](x),
-                       get_derivatives[(2, 0, 0)](x),
-                       get_derivatives[(0, 2, 0)](x),
-                       get_derivatives[(0, 0, 2)](x),
-                       get_derivatives[(1, 1, 0)](x),
-                       get_derivatives[(1, 0, 1)](x),
-                       get_derivatives[(0, 1, 1)](x),
-                       get_derivatives[(1, 1, 1)](x),
-                       ])
-
-        return d
-
-    def eval_dx0(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L1(x[2]))
-
-    def eval_dx1(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L1(x[2]))
-
-    def eval_dx2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L1d(x[2]))
-
-    def eval_dx0x0(self, x):
-        self.tensor(self.sL4.eval_dx0x0(x[:2]), L1(x[2]))
-
-    def eval_dx1x1(self, x):
-        self.tensor(self.sL4.eval_dx1x1(x[:2]), L1(x[2]))
-
-    def eval_dx2x2(self, x):
-        self.tensor(self.sL4.eval(x[:2]), L1dd(x[2]))
-
-    def eval_dx0x1(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L1(x[2]))
-
-    def eval_dx0x2(self, x):
-        self.tensor(self.sL4.eval_dx0(x[:2]), L1d(x[2]))
-
-    def eval_dx1x2(self, x):
-        self.tensor(self.sL4.eval_dx1(x[:2]), L1d(x[2]))
-
-    def eval_dx0x1x2(self, x):
-        self.tensor(self.sL4.eval_dx0x1(x[:2]), L1d(x[2]))
+        PolynomialBasis.__init__(self, 'prism_sL4_sL1_qL4', ('simplex_L4_L1', 'L4'), 4)
 
 
 # ======================================================================#
@@ -3104,3 +1754,76 @@ basis_types = {
 
 def make_basis(basis_type):
     return basis_types[basis_type]()
+
+
+# ======================================================================#
+class BasisValueCache(object):
+    """ Bounded cache of basis values shared across calls.
+
+    Entries are keyed by the basis class and type, the derivative
+    requested and a hash of the xi array bytes, so identical xi sets
+    evaluated by different objects share one entry. Values are returned
+    read-only. Least recently used entries are evicted once the cached
+    arrays exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+
+    def _key(self, basis, x, deriv):
+        x = ascontiguousarray(x, dtype=float)
+        digest = hashlib.blake2b(x.tobytes(), digest_size=16).digest()
+        return (type(basis).__name__, getattr(basis, 'type', None), str(getattr(basis, 'dtype', '')), deriv, x.shape,
+                digest)
+
+    def _get(self, basis, x, deriv, evaluate):
+        key = self._key(basis, x, deriv)
+        try:
+            values = self._values[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return values
+
+        values = asarray(evaluate())
+        values.flags.writeable = False
+        if values.nbytes <= self.max_bytes:
+            self._values[key] = values
+            self.nbytes += values.nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._values.popitem(last=False)[1].nbytes
+
+        return values
+
+    def eval(self, basis, x):
+        """ cached basis.eval(x)
+        """
+        return self._get(basis, x, None, lambda: basis.eval(x))
+
+    def eval_derivatives(self, basis, x, deriv=None):
+        """ cached basis.eval_derivatives(x, deriv). deriv=None evaluates
+        all derivatives.
+        """
+        key = 'all' if deriv is None or len(deriv) == 0 else tuple(deriv)
+        return self._get(basis, x, key, lambda: basis.eval_derivatives(x, deriv))
+
+    def stats(self):
+        """ returns a dict of the hits, misses, number of entries and
+        bytes held by the cache
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._values), 'nbytes': self.nbytes}
+
+    def clear(self):
+        self._values.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+basis_value_cache = BasisValueCache()
@@ -20,7 +20,10 @@ import json
 import os
 import shelve
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy
+from scipy import sparse
 
 from gias3.fieldwork.field import mapper
 from gias3.fieldwork.field.basis import basis
@@ -148,6 +151,68 @@ def dot_Evaluator(B, P):
     return numpy.dot(P, B)
 
 
+def eval_multi_component(B, P):
+    """ evaluates basis values B (n_basis, n_xi) for element parameters P
+    of shape (n_basis, n_components). Returns a (n_components, n_xi) array.
+    """
+    return numpy.dot(P.T, B)
+
+
+def eval_multi_component_derivatives(B, P):
+    """ evaluates a stack of basis derivatives B (n_derivs, n_basis, n_xi)
+    for element parameters P of shape (n_basis, n_components). Returns a
+    (n_components, n_derivs, n_xi) array. If B is a single derivative
+    (n_basis, n_xi), returns a (n_components, n_xi) array.
+    """
+    B = numpy.asarray(B)
+    if B.ndim == 2:
+        return numpy.dot(P.T, B)
+    else:
+        return numpy.tensordot(P, B, axes=([0], [1]))
+
+
+def eval_element_block(B, P):
+    """ evaluates basis values or derivatives B (..., n_basis, n_xi) for a
+    block of k elements of the same type with stacked element parameters P
+    of shape (k, n_basis) or (k, n_basis, n_components). Returns an array
+    of shape ([n_components,] ..., k * n_xi) holding the elements' values
+    one after the other along the last axis, as evaluate_field_in_mesh
+    does. The whole block is evaluated in a single BLAS product.
+    """
+    E = numpy.tensordot(P, B, axes=([1], [B.ndim - 2]))
+    E = numpy.moveaxis(E, 0, -2)
+    return E.reshape(E.shape[:-2] + (-1,))
+
+
+def basis_matrix_triplets(B, row, ensemble_points):
+    """ returns the (rows, columns, values) triplets of an evaluation
+    matrix block holding basis values B (n_points, n_basis) in rows
+    row:row+n_points. ensemble_points is the ensemble point each basis
+    function maps to.
+    """
+    B = numpy.asarray(B, dtype=float)
+    n_points, n_basis = B.shape
+    rows = numpy.repeat(numpy.arange(row, row + n_points), n_basis)
+    cols = numpy.tile(numpy.asarray(ensemble_points, dtype=int), n_points)
+    return rows, cols, B.ravel()
+
+
+def assemble_sparse_matrix(triplets, shape, format='csc'):
+    """ assembles a sparse matrix of the given shape from a list of
+    (rows, columns, values) triplets without building a dense
+    intermediate. Values at repeated entries are summed.
+    """
+    if triplets:
+        rows, cols, vals = [numpy.hstack(t) for t in zip(*triplets)]
+    else:
+        rows = cols = numpy.zeros(0, dtype=int)
+        vals = numpy.zeros(0, dtype=float)
+
+    A = sparse.coo_matrix((vals, (rows, cols)), shape=shape).asformat(format)
+    A.eliminate_zeros()
+    return A
+
+
 class EnsembleFieldFunction:
     """ Class that combines basis, mesh and mapper to create a field.
     Acts as a wrapper for methods in mesh and mapper and handles field
@@ -191,7 +256,9 @@ class EnsembleFieldFunction:
         self.subfield_counter = 0
         self.is_element = False
         self.element_param_cache = {}  # caches parameters for elements
+        self._evaluation_plans = {}  # caches evaluation plans {(density, derivs): EvaluationPlan}
         self.mesh_filename = None
+        self.dtype = numpy.dtype(float)  # floating point type of basis values, element parameters and field values
 
         self.debug = debug
 
@@ -284,6 +351,30 @@ class EnsembleFieldFunction:
         for e_type, b_type in list(types.items()):
             self.basis[e_type] = basis.make_basis(b_type)
             self.basis_types.append(self.basis[e_type].type)
+            if isinstance(self.basis[e_type], basis.PolynomialBasis):
+                self.basis[e_type].dtype = self.dtype
+
+    # ==================================================================#
+    def set_dtype(self, dtype):
+        """ Set the floating point type, e.g. numpy.float32, in which
+        basis values, element parameters and field values are evaluated.
+        Ensemble parameters, sparse matrix assembly and fitting stay in
+        float64.
+        """
+        self.dtype = numpy.dtype(dtype)
+        for b in self.basis.values():
+            if isinstance(b, basis.PolynomialBasis):
+                b.dtype = self.dtype
+        for subfield in self.subfields.values():
+            subfield.set_dtype(dtype)
+
+        self.element_param_cache.clear()
+        self._evaluation_plans = {}
+
+    def _cast(self, values):
+        """ basis values of bases without a dtype, in self.dtype
+        """
+        return numpy.asarray(values, dtype=self.dtype)
 
     # ==================================================================#
     def set_new_mesh(self, name):
@@ -486,6 +577,7 @@ class EnsembleFieldFunction:
         # ==============================================================#
         # create new ESF with same dimensions and basis as self
         f_new = EnsembleFieldFunction(self.name + '_flat', self.dimensions)
+        f_new.dtype = self.dtype
         f_new.set_basis(dict([[i[0], i[1].type] for i in list(self.basis.items())]))
         f_new.set_new_mesh(self.mesh.name + '_flat')
 
@@ -720,17 +812,37 @@ class EnsembleFieldFunction:
     # ==================================================================#
     def _get_element_parameters(self, e_i):
 
-        # first look in cache
+        # first look in cache, else map parameters for all elements at once
         try:
             params = self.element_param_cache[e_i]
         except KeyError:
-            params = self.mapper.get_element_parameters(e_i, self.parameters)
-            self.element_param_cache[e_i] = params
+            self.element_param_cache.update(self.mapper.get_all_element_parameters(self.parameters, self.dtype))
+            params = self.element_param_cache[e_i]
 
         return params
 
     # ==================================================================#
-    def evaluate_field_in_mesh(self, density, parameters=None, derivs=None, unpack=True, subUnpack=True):
+    def _evaluate_basis(self, e_type, B, P):
+        """ evaluates basis values B with element parameters P. P is
+        (n_basis,) for a single component or (n_basis, n_components).
+        """
+        if P.ndim > 1:
+            return eval_multi_component(B, P)
+        else:
+            return self.evaluators[e_type](B, P)
+
+    def _evaluate_basis_derivatives(self, e_type, B, P):
+        """ evaluates a stack of basis derivatives B with element
+        parameters P.
+        """
+        if P.ndim > 1:
+            return eval_multi_component_derivatives(B, P)
+        else:
+            return numpy.array([self.evaluators[e_type](b, P) for b in B])
+
+    # ==================================================================#
+    def evaluate_field_in_mesh(self, density, parameters=None, derivs=None, unpack=True, subUnpack=True,
+                               executor=None, chunk_size=None):
         """ Evaluates the field over the whole mesh, i.e. in all 
         elements. Returns a list of field values.
         
@@ -738,6 +850,15 @@ class EnsembleFieldFunction:
         parameters is a list of field parameters, with a list for each 
         ensemble point. If parameters is not passed, will look to see if
         parameters have been set. If not, raises error.
+
+        parameters can also be a (n_ensemble_points, n_components) array,
+        in which case all components are evaluated in one pass and the
+        field values returned have shape (n_components, n_points).
+        Derivatives have shape (n_components, n_derivs, n_points).
+
+        executor, if given, is a concurrent.futures executor (or a number
+        of threads) used to evaluate chunks of chunk_size elements
+        concurrently. See _evaluate_in_mesh_parallel.
         """
         if parameters is not None:
             self.set_parameters(parameters)
@@ -753,6 +874,13 @@ class EnsembleFieldFunction:
             raise ValueError(
                 'ERROR: evaluate_element: needed ' + str(self.dimensions) + ' density values. Got ' + str(len(density)))
 
+        if (executor is not None) and unpack and (not self.subfields):
+            if derivs and (derivs != -1) and (type(derivs) != tuple):
+                raise NotImplementedError('derivs must be a tuple or -1')
+            return self._evaluate_in_mesh_parallel(
+                density, executor, chunk_size=chunk_size, values=True, derivs=derivs
+            )
+
         field_values = []
         field_derivatives = []
         element_field_values = None
@@ -771,35 +899,34 @@ class EnsembleFieldFunction:
                 # assume all local true elements are of the same type (since they use the same basis)
                 # so generate grid points once, and calculate basis weights once
                 e_type = element.type
-                evaluator = self.evaluators[e_type]
                 try:
                     # ~ element_field_values = numpy.dot( basis_values[e_type], element_parameters )
-                    element_field_values = evaluator(basis_values[e_type], element_parameters)
+                    element_field_values = self._evaluate_basis(e_type, basis_values[e_type], element_parameters)
 
                     if derivs:
                         # ~ element_field_derivatives = numpy.array( [ numpy.dot( b.T, element_parameters ) for b in basis_derivatives[e_type] ] )
-                        element_field_derivatives = numpy.array(
-                            [evaluator(b, element_parameters) for b in basis_derivatives[e_type]])
+                        element_field_derivatives = self._evaluate_basis_derivatives(
+                            e_type, basis_derivatives[e_type], element_parameters)
                     # ~ pdb.set_trace()
                 except KeyError:
                     eval_grid[e_type] = element.generate_eval_grid(density)
                     # ~ pdb.set_trace()
-                    basis_values[e_type] = self.basis[e_type].eval(eval_grid[e_type].T)
-                    element_field_values = evaluator(basis_values[e_type], element_parameters)
+                    basis_values[e_type] = self._cast(basis.basis_value_cache.eval(self.basis[e_type], eval_grid[e_type].T))
+                    element_field_values = self._evaluate_basis(e_type, basis_values[e_type], element_parameters)
 
                     if derivs:
                         if derivs == -1:
                             # ~ pdb.set_trace()
-                            basis_derivatives[e_type] = self.basis[element.type].eval_derivatives(eval_grid[e_type].T,
-                                                                                                  None)
+                            basis_derivatives[e_type] = self._cast(basis.basis_value_cache.eval_derivatives(
+                                self.basis[element.type], eval_grid[e_type].T, None))
                         elif type(derivs) == tuple:
-                            basis_derivatives[e_type] = self.basis[element.type].eval_derivatives(eval_grid[e_type].T,
-                                                                                                  derivs)
+                            basis_derivatives[e_type] = self._cast(basis.basis_value_cache.eval_derivatives(
+                                self.basis[element.type], eval_grid[e_type].T, derivs))
                         else:
                             raise NotImplementedError('derivs must be a tuple or -1')
 
-                        element_field_derivatives = numpy.array(
-                            [evaluator(b, element_parameters) for b in basis_derivatives[e_type]])
+                        element_field_derivatives = self._evaluate_basis_derivatives(
+                            e_type, basis_derivatives[e_type], element_parameters)
 
             else:
                 # else element is a sub mesh, evaluate the corresponding subfield
@@ -818,17 +945,104 @@ class EnsembleFieldFunction:
 
         if derivs:
             if unpack:
-                return numpy.hstack(field_values), numpy.hstack(field_derivatives)
+                return numpy.concatenate(field_values, axis=-1), numpy.concatenate(field_derivatives, axis=-1)
             else:
                 return field_values, field_derivatives
         else:
             if unpack:
-                return numpy.hstack(field_values)
+                return numpy.concatenate(field_values, axis=-1)
             else:
                 return field_values
 
     # ==================================================================#
-    def evaluate_derivatives_in_mesh(self, density, parameters=None, derivs=None, unpack=True):
+    def _evaluate_in_mesh_parallel(self, density, executor, chunk_size=None, values=True, derivs=None):
+        """ Evaluates field values and/or derivatives in all elements of a
+        mesh without subfields, with chunks of same-type elements
+        evaluated concurrently by executor.
+
+        Everything shared is prepared on the calling thread before any
+        chunk is submitted: element parameters are gathered once into a
+        local dict rather than through element_param_cache, and basis
+        values are computed once per element type, so workers never touch
+        the parameter cache, the basis value cache or the element
+        instances shared between meshes. Each chunk is evaluated with one
+        BLAS product (see eval_element_block), which releases the GIL, and
+        written into its own slice of a preallocated output array.
+
+        executor can be a concurrent.futures executor or a number of
+        threads. chunk_size is the maximum number of elements per chunk,
+        by default enough for about 4 chunks per cpu.
+
+        Returns the values, the derivatives, or (values, derivatives) as
+        evaluate_field_in_mesh and evaluate_derivatives_in_mesh do.
+        """
+        if isinstance(executor, int):
+            with ThreadPoolExecutor(executor) as pool:
+                return self._evaluate_in_mesh_parallel(density, pool, chunk_size, values, derivs)
+
+        element_numbers = numpy.sort(list(self.mesh.elements.keys()))
+        element_parameters = self.mapper.get_all_element_parameters(self.parameters, self.dtype)
+
+        # basis values for each element type
+        targets = []
+        if values:
+            targets.append({})
+        if derivs:
+            targets.append({})
+        for element_number in element_numbers:
+            element = self.mesh.elements[element_number]
+            e_type = element.type
+            if e_type in targets[0]:
+                continue
+            eval_grid = element.generate_eval_grid(density)
+            t = 0
+            if values:
+                targets[t][e_type] = self._cast(basis.basis_value_cache.eval(self.basis[e_type], eval_grid.T))
+                t += 1
+            if derivs:
+                targets[t][e_type] = self._cast(basis.basis_value_cache.eval_derivatives(
+                    self.basis[e_type], eval_grid.T, None if derivs == -1 else derivs))
+
+        # split runs of same-type elements into chunks
+        if chunk_size is None:
+            chunk_size = max(1, int(numpy.ceil(len(element_numbers) / (4.0 * (os.cpu_count() or 1)))))
+        chunks = []
+        column = 0
+        for element_number in element_numbers:
+            e_type = self.mesh.elements[element_number].type
+            n_xi = targets[0][e_type].shape[-1]
+            if chunks and (chunks[-1][0] == e_type) and (len(chunks[-1][1]) < chunk_size):
+                chunks[-1][1].append(element_number)
+            else:
+                chunks.append((e_type, [element_number], column))
+            column += n_xi
+
+        # preallocate outputs
+        P0 = numpy.asarray(element_parameters[element_numbers[0]])
+        outputs = []
+        for basis_arrays in targets:
+            B0 = basis_arrays[chunks[0][0]]
+            shape = P0.shape[1:] + B0.shape[:-2] + (column,)
+            outputs.append(numpy.empty(shape, dtype=numpy.result_type(P0, B0)))
+
+        def evaluate_chunk(e_type, chunk, start):
+            P = numpy.array([element_parameters[e] for e in chunk])
+            for basis_arrays, out in zip(targets, outputs):
+                B = basis_arrays[e_type]
+                out[..., start:start + len(chunk) * B.shape[-1]] = eval_element_block(B, P)
+
+        futures = [executor.submit(evaluate_chunk, *c) for c in chunks]
+        for f in futures:
+            f.result()
+
+        if len(outputs) == 1:
+            return outputs[0]
+        else:
+            return tuple(outputs)
+
+    # ==================================================================#
+    def evaluate_derivatives_in_mesh(self, density, parameters=None, derivs=None, unpack=True,
+                                     executor=None, chunk_size=None):
         """ Evaluates the field derivatives over the whole mesh, i.e. 
         in all elements. Returns a list of field derivatives.
         
@@ -836,6 +1050,12 @@ class EnsembleFieldFunction:
         parameters is a list of field parameters, with a list for each 
         ensemble point. If parameters is not passed, will look to see if
         parameters have been set. If not, raises error.
+
+        parameters can also be a (n_ensemble_points, n_components) array,
+        in which case all components are evaluated in one pass and a
+        component axis is prepended to the returned derivatives.
+
+        executor and chunk_size are as for evaluate_field_in_mesh.
         """
         if parameters is not None:
             self.set_parameters(parameters)
@@ -851,6 +1071,11 @@ class EnsembleFieldFunction:
             raise ValueError(
                 'ERROR: evaluate_element: needed ' + str(self.dimensions) + ' density values. Got ' + str(len(density)))
 
+        if (executor is not None) and unpack and (not self.subfields):
+            return self._evaluate_in_mesh_parallel(
+                density, executor, chunk_size=chunk_size, values=False, derivs=-1 if derivs is None else derivs
+            )
+
         field_derivatives = []
         basis_derivatives = {}
         eval_grid = {}
@@ -866,26 +1091,28 @@ class EnsembleFieldFunction:
                 # assume all local true elements are of the same type (since they use the same basis)
                 # so generate grid points once, and calculate basis weights once
                 e_type = element.type
-                evaluator = self.evaluators[e_type]
                 try:
                     if derivs == -1:
-                        element_field_derivatives = numpy.array(
-                            [evaluator(b, element_parameters) for b in basis_derivatives[e_type]])
+                        element_field_derivatives = self._evaluate_basis_derivatives(
+                            e_type, basis_derivatives[e_type], element_parameters)
                     else:
-                        element_field_derivatives = evaluator(basis_derivatives[e_type], element_parameters)
+                        element_field_derivatives = self._evaluate_basis(
+                            e_type, basis_derivatives[e_type], element_parameters)
                     # ~ pdb.set_trace()
                 except KeyError:
                     eval_grid[e_type] = element.generate_eval_grid(density)
 
                     if derivs == -1:
                         # ~ pdb.set_trace()
-                        basis_derivatives[e_type] = self.basis[element.type].eval_derivatives(eval_grid[e_type].T, None)
-                        element_field_derivatives = numpy.array(
-                            [evaluator(b, element_parameters) for b in basis_derivatives[e_type]])
+                        basis_derivatives[e_type] = self._cast(basis.basis_value_cache.eval_derivatives(
+                            self.basis[element.type], eval_grid[e_type].T, None))
+                        element_field_derivatives = self._evaluate_basis_derivatives(
+                            e_type, basis_derivatives[e_type], element_parameters)
                     else:
-                        basis_derivatives[e_type] = self.basis[element.type].eval_derivatives(eval_grid[e_type].T,
-                                                                                              derivs)
-                        element_field_derivatives = evaluator(basis_derivatives[e_type], element_parameters)
+                        basis_derivatives[e_type] = self._cast(basis.basis_value_cache.eval_derivatives(
+                            self.basis[element.type], eval_grid[e_type].T, derivs))
+                        element_field_derivatives = self._evaluate_basis(
+                            e_type, basis_derivatives[e_type], element_parameters)
 
             else:
                 # else element is a sub mesh, evaluate the corresponding subfield
@@ -897,13 +1124,16 @@ class EnsembleFieldFunction:
 
         # ~ pdb.set_trace()
         if unpack:
-            return numpy.hstack(field_derivatives)
+            return numpy.concatenate(field_derivatives, axis=-1)
         else:
             return field_derivatives
 
     # ==================================================================#
     def evaluate_field_in_element(self, element_number, density, parameters=None, derivs=None, unpack=True):
         """ evaluates the field in an element defined by element_number
+
+        parameters can be a (n_ensemble_points, n_components) array to
+        evaluate all components in one pass.
         """
         if parameters is not None:
             self.set_parameters(parameters)
@@ -935,8 +1165,9 @@ class EnsembleFieldFunction:
                 # if element is local, evaluate using evaluate_field_in_element
                 eval_grid = element.generate_eval_grid(density)
                 # ~ element_field_values = self._evaluate_element( element.type, element_parameters, eval_grid )
-                element_field_values = self.evaluators[element.type](self.basis[element.type].eval(eval_grid.T),
-                                                                     element_parameters)
+                element_field_values = self._evaluate_basis(
+                    element.type, self.basis[element.type].eval(eval_grid.T), element_parameters
+                )
 
                 if derivs:
                     if derivs == -1:
@@ -963,6 +1194,10 @@ class EnsembleFieldFunction:
         if derivs = -1, evaluates all derivatives
         derivative tuples: ( order, direction ), direction=3 for cross
 
+        parameters can be a (n_ensemble_points, n_components) array to
+        evaluate all components in one pass. A leading component axis is
+        then added to the returned values and derivatives.
+
         returns
         -------
         element_field_values : field values at the specified xi positions
@@ -987,19 +1222,19 @@ class EnsembleFieldFunction:
             if element.is_element:
                 # if element is local, evaluate using evaluate_field_in_element
                 # ~ element_field_values = self._evaluate_element( element.type, element_parameters, xi )
-                element_field_values = self.evaluators[element.type](
-                    self.basis[element.type].eval(xi.T), element_parameters
+                element_field_values = self._evaluate_basis(
+                    element.type, self.basis[element.type].eval(xi.T), element_parameters
                 )
                 if derivs is not None:
                     if derivs == -1:
                         element_deriv_basis_values = self.basis[element.type].eval_derivatives(xi.T, None)
-                        element_deriv_values = numpy.array([
-                            self.evaluators[element.type](b, element_parameters) for b in element_deriv_basis_values
-                        ])
+                        element_deriv_values = self._evaluate_basis_derivatives(
+                            element.type, element_deriv_basis_values, element_parameters
+                        )
                         # ~ element_deriv_values = self._evaluate_element_derivatives( element.type, element_parameters, numpy.array(xi), None )
                     else:
-                        element_deriv_values = self.evaluators[element.type](
-                            self.basis[element.type].eval_derivatives(xi.T, derivs), element_parameters
+                        element_deriv_values = self._evaluate_basis(
+                            element.type, self.basis[element.type].eval_derivatives(xi.T, derivs), element_parameters
                         )
                         # ~ element_deriv_values = self._evaluate_element_derivatives( element.type, element_parameters, numpy.array(xi), derivs )
 
@@ -1051,15 +1286,41 @@ class EnsembleFieldFunction:
         # a particular derivative
         if derivatives:
             basis_values = numpy.array(
-                [self.basis[element_type].eval_derivatives(numpy.array(XI).T, d).T for d in derivatives])
-            eval_values = numpy.dot(basis_values, element_parameters)
+                [self.basis[element_type].eval_derivatives(numpy.array(XI).T, d) for d in derivatives])
         # all derivatives
         else:
             basis_values = self.basis[element_type].eval_derivatives(numpy.array(XI).T, None)
+
+        if element_parameters.ndim > 1:
+            eval_values = eval_multi_component_derivatives(basis_values, element_parameters)
+        else:
             eval_values = numpy.array([numpy.dot(b.T, element_parameters) for b in basis_values])
 
         return eval_values
 
+    # ==================================================================#
+    def make_evaluation_plan(self, density=None, xi=None, derivs=None, sum_factorise=None):
+        """ returns an EvaluationPlan for evaluating the field at a fixed
+        set of element points, either on an eval grid of the given
+        density or at the element coordinates xi in every element.
+        """
+        return EvaluationPlan(self, density=density, xi=xi, derivs=derivs, sum_factorise=sum_factorise)
+
+    def get_evaluation_plan(self, density, derivs=None):
+        """ returns a cached EvaluationPlan for the given density and
+        derivs. The plan is recompiled if the mesh or mapping has changed
+        since it was made.
+        """
+        if isinstance(density, int):
+            density = [density] * self.dimensions
+        key = (tuple(density), derivs)
+        plan = self._evaluation_plans.get(key)
+        if (plan is None) or (not plan.is_valid()):
+            plan = EvaluationPlan(self, density=density, derivs=derivs)
+            self._evaluation_plans[key] = plan
+
+        return plan
+
     # ==================================================================#
     def get_element_point_evaluator(self, element_number):
         """ returns an object for evaluating points within element
@@ -1221,7 +1482,7 @@ class ElementPointEvaluator:
         """
 
         # evaluate basis function
-        basis_coeff = self.basis.eval(element_coordinates)
+        basis_coeff = basis.basis_value_cache.eval(self.basis, element_coordinates)
         if basis_coeff is not None:
             try:
                 field_value = numpy.dot(basis_coeff, self.parameters)
@@ -1235,6 +1496,248 @@ class ElementPointEvaluator:
             return None
 
 
+def _tensor_grid_axes(xi):
+    """ returns the 1D coordinates along each dimension if the points xi
+    (n_points, n_dimensions) form a tensor grid with the last dimension
+    varying fastest, as generated by Element.generate_eval_grid for quad
+    elements. Otherwise returns None.
+    """
+    xi = xi.reshape((xi.shape[0], -1))
+    axes = []
+    for d in range(xi.shape[1]):
+        _, first = numpy.unique(xi[:, d], return_index=True)
+        axes.append(xi[numpy.sort(first), d])
+
+    if numpy.prod([len(a) for a in axes]) != xi.shape[0]:
+        return None
+
+    grid = numpy.stack(numpy.meshgrid(*axes, indexing='ij'), axis=-1).reshape(xi.shape)
+    if not numpy.array_equal(grid, xi):
+        return None
+
+    return axes
+
+
+class EvaluationPlan(object):
+    """ Compiled evaluation of an EnsembleFieldFunction at a fixed set of
+    element points in every element of its mesh.
+
+    Elements are grouped by type, and the eval grid, basis values, basis
+    derivatives and parameter gather operator of each type are computed
+    once. Evaluating the field for new parameters is then one sparse
+    product and one tensor contraction per element type. Points are
+    ordered as in EnsembleFieldFunction.evaluate_field_in_mesh.
+
+    For tensor product bases evaluated on a tensor grid of xi, the full
+    basis matrix need not be formed. Instead the element node tensors are
+    contracted with the 1D basis of each dimension in turn
+    (sum-factorisation). sum_factorise=None uses this when there are more
+    points than basis functions per element, True always uses it where
+    possible, and False never does.
+
+    The plan is only valid for the mesh and mapping it was compiled
+    against. Subfield elements are not supported.
+    """
+
+    def __init__(self, field_function, density=None, xi=None, derivs=None, sum_factorise=None):
+        if (density is None) == (xi is None):
+            raise ValueError('one of density or xi must be given')
+
+        self.field_function = field_function
+        if density is not None:
+            if isinstance(density, int):
+                density = [density] * field_function.dimensions
+            elif len(density) != field_function.dimensions:
+                raise ValueError('needed {} density values, got {}'.format(field_function.dimensions, len(density)))
+        self.density = density
+        self.xi = xi
+        self.derivs = derivs
+        self.sum_factorise = sum_factorise
+
+        if (derivs is not None) and (derivs != -1) and (type(derivs) != tuple):
+            raise NotImplementedError('derivs must be a tuple or -1')
+
+        self.element_numbers = None
+        self.n_points = 0
+        self.groups = []  # one dict per element type
+        self._gather_operator = None
+        self._compile()
+
+    def _compile(self):
+        F = self.field_function
+        self.element_numbers = numpy.sort(list(F.mesh.elements.keys()))
+
+        # group elements by type, generating eval grids and basis values once per type
+        groups = {}
+        offset = 0
+        for element_number in self.element_numbers:
+            element = F.mesh.elements[element_number]
+            if not element.is_element:
+                raise ValueError('element {} is a subfield, evaluation plans do not support subfields'.format(
+                    element_number))
+
+            e_type = element.type
+            if e_type not in groups:
+                if self.xi is None:
+                    xi = element.generate_eval_grid(self.density)
+                else:
+                    xi = numpy.asarray(self.xi, dtype=float)
+                groups[e_type] = self._compile_group(e_type, xi)
+
+            group = groups[e_type]
+            group['elements'].append(element_number)
+            group['indices'].append(numpy.arange(offset, offset + group['n_xi']))
+            offset += group['n_xi']
+
+        self.n_points = offset
+        self.groups = []
+        for group in groups.values():
+            group['gather'] = F.mapper.get_gather_operator(group['elements'], dtype=F.dtype)
+            group['indices'] = numpy.hstack(group['indices'])
+            self.groups.append(group)
+        self._gather_operator = F.mapper.get_gather_operator()
+
+    def _compile_group(self, e_type, xi):
+        basis_function = self.field_function.basis[e_type]
+        group = {'type': e_type, 'elements': [], 'indices': [], 'n_xi': xi.shape[0]}
+
+        axes = None
+        if (self.sum_factorise is not False) and isinstance(basis_function, basis.PolynomialBasis) and \
+                basis_function.is_tensor_product():
+            axes = _tensor_grid_axes(xi)
+            # by default, only sum-factorise when there are more points
+            # than basis functions per element, otherwise the dense basis
+            # matrix is cheaper
+            n_basis = numpy.prod([len(C) for C in basis_function.factors])
+            if (axes is not None) and (self.sum_factorise is None) and (xi.shape[0] <= n_basis):
+                axes = None
+
+        if axes is not None:
+            # sum-factorised evaluation, store the 1D basis of each dimension
+            if self.derivs == -1:
+                derivs = basis_function.derivatives[basis_function.dimensions]
+            elif self.derivs is not None:
+                derivs = [self.derivs]
+            else:
+                derivs = []
+            group['sum_factorise'] = True
+            group['value_factors'] = basis_function.eval_factors(axes, (0,) * basis_function.dimensions)
+            group['derivative_factors'] = [basis_function.eval_factors(axes, d) for d in derivs]
+            group['n_basis'] = int(numpy.prod([len(C) for C in basis_function.factors]))
+        else:
+            group['sum_factorise'] = False
+            F = self.field_function
+            group['B'] = F._cast(basis.basis_value_cache.eval(basis_function, xi.T))
+            group['n_basis'] = group['B'].shape[0]
+            if self.derivs == -1:
+                group['D'] = F._cast(basis.basis_value_cache.eval_derivatives(basis_function, xi.T, None))
+            elif self.derivs is not None:
+                group['D'] = F._cast(basis.basis_value_cache.eval_derivatives(basis_function, xi.T, self.derivs))
+
+        return group
+
+    def is_valid(self):
+        """ returns True if the mesh and mapping of the field function are
+        the same as when the plan was compiled.
+        """
+        F = self.field_function
+        return (F.mapper._gather_operator is self._gather_operator) and \
+               (len(F.mesh.elements) == len(self.element_numbers))
+
+    def _get_parameters(self, parameters):
+        if parameters is None:
+            parameters = self.field_function.parameters
+            if parameters is None:
+                raise RuntimeError('no parameters passed or set')
+
+        P = numpy.asarray(parameters, dtype=self.field_function.dtype)
+        if P.shape[0] != self._gather_operator.shape[1]:
+            raise ValueError('wrong number of parameter sets, there are {} node, given {} set of nodal parameters'.format(
+                self._gather_operator.shape[1], P.shape[0]))
+
+        return P.reshape((P.shape[0], -1))
+
+    def _sum_factorise(self, G, phis):
+        """ contracts element parameters G (n_elements, n_basis,
+        n_components) with the 1D basis values phis of each dimension,
+        returning (n_components, n_elements * n_xi).
+        """
+        n_dims = len(phis)
+        # element node tensors (n_components, n_elements, n_{d-1}, ..., n_0)
+        T = numpy.moveaxis(G, 2, 0).reshape((G.shape[2], G.shape[0]) + tuple([phi.shape[0] for phi in phis[::-1]]))
+        for d, phi in enumerate(phis):
+            # contract node axis of dimension d, then move the node axis of
+            # the next dimension to the end
+            T = numpy.matmul(T, phi)
+            if d < n_dims - 1:
+                T = numpy.moveaxis(T, n_dims - d, -1)
+
+        return T.reshape((G.shape[2], -1))
+
+    def _evaluate(self, P, derivatives):
+        n_comp = P.shape[1]
+        out = None
+        for group in self.groups:
+            # element parameters (n_elements, n_basis, n_components)
+            G = group['gather'].dot(P).reshape((-1, group['n_basis'], n_comp))
+            if group['sum_factorise']:
+                if derivatives:
+                    values = [self._sum_factorise(G, phis) for phis in group['derivative_factors']]
+                    if self.derivs == -1:
+                        values = numpy.stack(values, axis=1)
+                    else:
+                        values = values[0]
+                else:
+                    values = self._sum_factorise(G, group['value_factors'])
+            else:
+                B = group['D'] if derivatives else group['B']
+                # contract to (n_elements, n_components, ..., n_xi)
+                values = numpy.tensordot(G, B, axes=([1], [-2]))
+                values = numpy.moveaxis(values, 0, -2)
+                values = values.reshape(values.shape[:-2] + (-1,))
+
+            if out is None:
+                out = numpy.empty(values.shape[:-1] + (self.n_points,), dtype=values.dtype)
+            out[..., group['indices']] = values
+
+        if n_comp == 1:
+            return out[0]
+        else:
+            return out
+
+    def evaluate_field(self, parameters=None):
+        """ evaluates the field values at the plan's element points.
+        parameters is (n_ensemble_points,) or (n_ensemble_points, 1) for a
+        single component field, returning (n_points,), or
+        (n_ensemble_points, n_components), returning
+        (n_components, n_points). If parameters is None, the parameters
+        set on the field function are used.
+        """
+        return self._evaluate(self._get_parameters(parameters), False)
+
+    def evaluate_derivatives(self, parameters=None):
+        """ evaluates the field derivatives given at plan compilation at
+        the plan's element points. Returns (n_points,) or
+        (n_components, n_points) for a derivs tuple, and
+        (n_derivs, n_points) or (n_components, n_derivs, n_points) if
+        derivs is -1.
+        """
+        if self.derivs is None:
+            raise RuntimeError('plan was compiled without derivs')
+
+        return self._evaluate(self._get_parameters(parameters), True)
+
+    def evaluate(self, parameters=None):
+        """ evaluates the field, and derivatives if the plan has derivs,
+        returning the same as EnsembleFieldFunction.evaluate_field_in_mesh.
+        """
+        P = self._get_parameters(parameters)
+        if self.derivs:
+            return self._evaluate(P, False), self._evaluate(P, True)
+        else:
+            return self._evaluate(P, False)
+
+
 def reverse_dict(d):
     d_r = {}
     for k in list(d.keys()):
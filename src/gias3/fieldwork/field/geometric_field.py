@@ -15,6 +15,7 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 import copy
 import json
 import logging
+import multiprocessing
 import os
 import shelve
 import sys
@@ -29,10 +30,13 @@ from gias3.common import math
 from gias3.common import transform3D
 from gias3.fieldwork.field import template_fields
 from gias3.fieldwork.field import ensemble_field_function as EFF
+from gias3.fieldwork.field.basis.basis import basis_value_cache, make_basis
+from gias3.fieldwork.field.tools import bvh
 from gias3.fieldwork.field.tools import curvature_tools as CT
 from gias3.fieldwork.field.tools import discretisation
 from gias3.fieldwork.field.tools import misc
 from gias3.fieldwork.field.tools import triangulate
+from gias3.fieldwork.field.tools import winding
 from gias3.fieldwork.field.topology import element_types
 
 log = logging.getLogger(__name__)
@@ -72,6 +76,12 @@ class GeometricField:
         self.ensemble_field_function_old = None
         self.basisWeights = {}  # {elemNumber: {[xi]:[weights]}}
         self.elementXis = {}  # {elemNumber: [xis]}
+        self._element_bvh = None
+        self._element_bvh_params = None
+        self._element_neighbours = None
+        self._element_neighbours_key = None
+        self._surface_winding = None
+        self._surface_winding_key = None
 
         # ~ for i in range( self.dimensions ):
         # ~ self.field_parameters.append( [] )
@@ -228,30 +238,69 @@ class GeometricField:
         if len(field_parameters) != self.dimensions:
             raise ValueError('ERROR: geometric_field.set_parameters: parameters inconsistent with number of dimensions')
 
-        p_lengths = [len(p) for p in field_parameters]
-        n_ensemble_points = self.ensemble_field_function.get_number_of_ensemble_points()
-        if (sum(p_lengths) / self.dimensions) != p_lengths[0]:
+        try:
+            field_parameters = numpy.asarray(field_parameters, dtype=float)
+        except ValueError:
+            raise ValueError('ERROR: geometric_field.set_field_parameters: parameter vector lengths not equal')
+        if field_parameters.ndim < 2:
             raise ValueError('ERROR: geometric_field.set_field_parameters: parameter vector lengths not equal')
 
-        if p_lengths[0] != n_ensemble_points:
+        n_params = field_parameters.shape[1]
+        n_ensemble_points = self.ensemble_field_function.get_number_of_ensemble_points()
+        if n_params != n_ensemble_points:
             raise ValueError('ERROR: geometric_field.set_field_parameters: number of given parameters ( ' + str(
-                p_lengths[0]) + ') does not match number of field ensemble points ( ' + str(n_ensemble_points) + ')')
+                n_params) + ') does not match number of field ensemble points ( ' + str(n_ensemble_points) + ')')
 
         # if nothings wrong so far
-        self.field_parameters = numpy.array(field_parameters, dtype=float)
+        self.field_parameters = field_parameters
 
-        # set geometric points associated with ensemble point with these parameters
-        # ~ for i in self.ensemble_to_points_map.keys():
-        # ~ print i
-        # ~ print self.ensemble_to_points_map[i]
-        # ~ print self.field_parameters[:,i]
-        # ~
-        # ~ self.points[ self.ensemble_to_points_map[i] ].set_field_parameters( self.field_parameters[:,i] )
-        # ~
+        return 1
+
+    # ==================================================================#
+    @property
+    def field_parameters(self):
+        """ the canonical (dimensions, n_points, n_derivs) parameter array.
+        Mapped geometric points hold views into this array.
+        """
+        return self._field_parameters
+
+    @field_parameters.setter
+    def field_parameters(self, field_parameters):
+        if field_parameters is None:
+            self._field_parameters = None
+            return
+
+        current = self.__dict__.get('_field_parameters')
+        if (current is not None) and (numpy.shape(field_parameters) == current.shape):
+            # same layout, update in place so point views stay valid
+            numpy.copyto(current, field_parameters, casting='unsafe')
+        else:
+            self._field_parameters = numpy.array(field_parameters, dtype=float, order='C')
+            self._bind_point_views()
+
+    def _bind_point_views(self):
+        """ point the geometric points of each ensemble point at their
+        column of the field parameters array
+        """
+        if self._field_parameters is None:
+            return
+
+        n_params = self._field_parameters.shape[1]
         for i, ens_i in enumerate(self.ensemble_to_points_map.keys()):
-            self.points[self.ensemble_to_points_map[ens_i]].set_field_parameters(self.field_parameters[:, i])
+            if i >= n_params:
+                break
+            self.points[self.ensemble_to_points_map[ens_i]].bind_field_parameters(
+                self._field_parameters[:, i]
+            )
 
-        return 1
+    def __setstate__(self, state):
+        # views into field_parameters do not survive pickling or deepcopy
+        state = dict(state)
+        if 'field_parameters' in state:
+            state['_field_parameters'] = state.pop('field_parameters')
+        self.__dict__.update(state)
+        if self.__dict__.get('_field_parameters') is not None:
+            self._bind_point_views()
 
     # ==================================================================#
     def transformAffine(self, T):
@@ -321,16 +370,33 @@ class GeometricField:
         self.field_parameters = xT.T[:, :, numpy.newaxis]
 
     # ==================================================================#
-    def get_field_parameters(self):
-
+    def get_field_parameters(self, copy=True):
+        """ returns the field parameters. If copy is False, a read-only
+        view of the field's parameter array is returned. The view follows
+        later calls to set_field_parameters.
+        """
         if self.field_parameters is not None:
-            return self.field_parameters.copy()
+            if copy:
+                return self.field_parameters.copy()
+            view = self.field_parameters.view()
+            view.flags.writeable = False
+            return view
         else:
             log.debug("no field parameters set")
             return None
 
-            # ==================================================================#
+    def _get_component_parameters(self):
+        """ returns the field parameters as a (n_points, n_dimensions)
+        array for evaluating all coordinates in one pass through the 
+        ensemble field function. Parameters may be (n_dimensions,
+        n_points, 1) or (n_dimensions, n_points).
+        """
+        P = self.field_parameters
+        if P.ndim == 3:
+            P = P[:, :, 0]
+        return P.T
 
+    # ==================================================================#
     def add_geometric_point(self, field_parameters, name=None):
         """ Add a point to the geometric field. 
         
@@ -455,6 +521,7 @@ class GeometricField:
 
         # element point counter
         ep = 0
+        new_fps = []
         # add element to mesh
         e_number = self.ensemble_field_function.add_element(element)
 
@@ -484,18 +551,17 @@ class GeometricField:
                 self.ensemble_point_counter += 1
 
                 # add new field parameters to field_parameters
-                fp = self.points[p].get_field_parameters()
-
-                # ~ pdb.set_trace()
-                try:
-                    self.field_parameters = numpy.hstack([self.field_parameters, numpy.array(fp)[:, numpy.newaxis]])
-                except ValueError:
-                    self.field_parameters = numpy.array(fp)[:, numpy.newaxis].copy()
-                # ~ for i in range( self.dimensions ):
-                # ~ self.field_parameters[i].append( fp[i] )
+                new_fps.append(numpy.array(self.points[p].get_field_parameters())[:, numpy.newaxis])
 
             ep += 1
 
+        # append new field parameters in one go
+        if new_fps:
+            if self.field_parameters is None:
+                self.field_parameters = numpy.hstack(new_fps)
+            else:
+                self.field_parameters = numpy.hstack([self.field_parameters] + new_fps)
+
         # update mapper
         self.ensemble_field_function.map_parameters()
 
@@ -752,29 +818,35 @@ class GeometricField:
         return self.ensemble_field_function.mapper._ensemble_to_element_map[self.points_to_ensemble_map[point]]
 
     # ==================================================================#
-    def evaluate_geometric_field(self, density, derivs=None):
+    def evaluate_geometric_field(self, density, derivs=None, executor=None):
         """ evaluates the field for all parameter components.
         Returns a list of self.dimension lists
+
+        executor, if given, is a concurrent.futures executor or number of
+        threads used to evaluate elements concurrently. See
+        EnsembleFieldFunction.evaluate_field_in_mesh.
         """
-        V = []
-        D = []
 
-        # evaluate each coordinate in field
+        # evaluate all coordinates in one pass
+        P = self._get_component_parameters()
+        F = self.ensemble_field_function
         if not derivs:
+            derivs = None
 
-            return numpy.array([self.ensemble_field_function.evaluate_field_in_mesh(density, d, unpack=True) for d in
-                                self.field_parameters])
+        # use a cached evaluation plan unless there are subfields
+        if (executor is None) and (not F.subfields):
+            return F.get_evaluation_plan(density, derivs).evaluate(P)
 
-            # ~ for d in self.field_parameters:
-            # ~ V.append( numpy.array(self.ensemble_field_function.evaluate_field_in_mesh( density, d )).flatten() )
-            # ~ return numpy.array(V)
+        if derivs is None:
+            return F.evaluate_field_in_mesh(density, P, unpack=True, executor=executor)
         else:
-            for d in self.field_parameters:
-                v, d = self.ensemble_field_function.evaluate_field_in_mesh(density, d, derivs)
-                V.append(numpy.array(v).flatten())
-                D.append(d)
+            return F.evaluate_field_in_mesh(density, P, derivs, executor=executor)
 
-            return numpy.array(V), numpy.array(D)
+    def set_dtype(self, dtype):
+        """ set the floating point type, e.g. numpy.float32, of field
+        evaluation. See EnsembleFieldFunction.set_dtype.
+        """
+        self.ensemble_field_function.set_dtype(dtype)
 
     # ==================================================================#
     def get_element_numbers(self, coordinates=True):
@@ -814,36 +886,25 @@ class GeometricField:
         elements.
         Returns a list of self.dimension lists
         """
-        V = []
-        D = []
-
-        # evaluate each coordinate in field
+        # evaluate all coordinates in one pass
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
         if not derivs:
-            for p in self.field_parameters:
-                V.append(
-                    numpy.hstack([
-                        self.ensemble_field_function.evaluate_field_in_element(
-                            e, density, p, unpack=True
-                        ) for e in elements
-                    ])
-                )
-
-            return numpy.array(V)
+            return numpy.concatenate([
+                self.ensemble_field_function.evaluate_field_in_element(
+                    e, density, unpack=True
+                ) for e in elements
+            ], axis=-1)
         else:
-            for p in self.field_parameters:
-                vv = []
-                dd = []
-                for e in elements:
-                    v, d = self.ensemble_field_function.evaluate_field_in_element(
-                        e, density, p, derivs
-                    )
-                    vv.append(v)
-                    dd.append(d)
-
-                V.append(numpy.hstack(vv))
-                D.append(numpy.hstack(dd))
+            V = []
+            D = []
+            for e in elements:
+                v, d = self.ensemble_field_function.evaluate_field_in_element(
+                    e, density, derivs=derivs
+                )
+                V.append(v)
+                D.append(d)
 
-            return numpy.array(V), numpy.array(D)
+            return numpy.concatenate(V, axis=-1), numpy.concatenate(D, axis=-1)
 
     # ==================================================================#
     def evaluate_geometric_field_at_element_points(self, element, XI, derivs=None):
@@ -861,6 +922,11 @@ class GeometricField:
             if derivs is defined, X is of shape (p,q,n) where q is the number of
             derivatives + 1. (:,0,:) is always the field value.
         """
+        if derivs is None:
+            return self.ensemble_field_function.evaluate_field_at_element_point(
+                element, XI, parameters=self._get_component_parameters()
+            )
+
         C = []
         # evaluate derivatives of coordinate fields
         for P in self.field_parameters:
@@ -918,20 +984,13 @@ class GeometricField:
         """ evaluates the guassian K and mean H curvature over the mesh
         at the desired density
         """
-        D = []
-        V = []
-
-        # evaluate derivatives of coordinate fields
-        for P in self.field_parameters:
-            v, d = self.ensemble_field_function.evaluate_field_in_mesh(
-                density, parameters=P, derivs=-1
-            )
-            D.append(d)
-            V.append(v)
-            # ~ D.append( self.ensemble_field_function.evaluate_field_in_mesh( density, parameters=P, derivs=-1 )[1] )
+        # evaluate derivatives of all coordinate fields
+        V, D = self.ensemble_field_function.evaluate_field_in_mesh(
+            density, parameters=self._get_component_parameters(), derivs=-1
+        )
 
         K, H, k1, k2 = self._calculate_curvature(D)
-        V = numpy.array(V).T
+        V = V.T
         # smooth curvature field
         if smooth:
             H = smoothCurvField(V, H)
@@ -947,62 +1006,53 @@ class GeometricField:
         at a list of xi positions
         """
 
-        D = []
-        # evaluate derivatives of coordinate fields
-        for P in self.field_parameters:
-            D.append(
-                self.ensemble_field_function.evaluate_field_at_element_point(
-                    element, XI, parameters=P, derivs=-1
-                )[1]
-            )
+        # evaluate derivatives of all coordinate fields
+        D = self.ensemble_field_function.evaluate_field_at_element_point(
+            element, XI, parameters=self._get_component_parameters(), derivs=-1
+        )[1]
 
         return self._calculate_curvature(D)
 
     # ==================================================================#
-    def evaluate_normal_in_mesh(self, d, elemXi=None):
+    def evaluate_normal_in_mesh(self, d, elemXi=None, executor=None):
         """ evaluates the normal vector at points on elements for all
         elements in the mesh if d is tuple for discretisation.
         
         If elemXi is not none, it should be a dictionary of element
         number: xi coordinates that define where the normals should be
         calculated
+
+        executor is as for evaluate_geometric_field and is only used when
+        elemXi is None.
         """
 
+        # element parameters are gathered once for all coordinates and
+        # reused for both derivatives
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
         if elemXi is None:
+            d10 = self.ensemble_field_function.evaluate_derivatives_in_mesh(
+                d, derivs=(1, 0), unpack=True, executor=executor
+            )
+            d01 = self.ensemble_field_function.evaluate_derivatives_in_mesh(
+                d, derivs=(0, 1), unpack=True, executor=executor
+            )
+        else:
             d10 = []
             d01 = []
-            for p in self.field_parameters:
+            for elemNumber in list(elemXi.keys()):
                 d10.append(
-                    self.ensemble_field_function.evaluate_derivatives_in_mesh(
-                        d, parameters=p, derivs=(1, 0), unpack=True
-                    )
+                    self.ensemble_field_function.evaluate_field_at_element_point(
+                        elemNumber, elemXi[elemNumber], derivs=(1, 0)
+                    )[1]
                 )
                 d01.append(
-                    self.ensemble_field_function.evaluate_derivatives_in_mesh(
-                        d, parameters=p, derivs=(0, 1), unpack=True
-                    )
+                    self.ensemble_field_function.evaluate_field_at_element_point(
+                        elemNumber, elemXi[elemNumber], derivs=(0, 1)
+                    )[1]
                 )
-        else:
-            d10 = []
-            d01 = []
-            for p in self.field_parameters:
-                self.ensemble_field_function.set_parameters(p)
-                d10i = []
-                d01i = []
-                for elemNumber in list(elemXi.keys()):
-                    d10i.append(
-                        self.ensemble_field_function.evaluate_field_at_element_point(
-                            elemNumber, elemXi[elemNumber], derivs=(1, 0)
-                        )[1]
-                    )
-                    d01i.append(
-                        self.ensemble_field_function.evaluate_field_at_element_point(
-                            elemNumber, elemXi[elemNumber], derivs=(0, 1)
-                        )[1]
-                    )
-
-                d10.append(numpy.hstack(d10i))
-                d01.append(numpy.hstack(d01i))
+
+            d10 = numpy.concatenate(d10, axis=-1)
+            d01 = numpy.concatenate(d01, axis=-1)
 
         # ~ pdb.set_trace()
         # d10Norm = normaliseVectors( numpy.array(d10).T )
@@ -1017,22 +1067,19 @@ class GeometricField:
 
         N = math.norms(
             numpy.cross(
-                numpy.array(d10).T, numpy.array(d01).T
+                d10.T, d01.T
             )
         ).T
         return N
 
     def evaluate_normal_at_element_point(self, elem, xi):
-        d10 = numpy.zeros(3, dtype=float)
-        d01 = numpy.zeros(3, dtype=float)
-        for i, p in enumerate(self.field_parameters):
-            self.ensemble_field_function.set_parameters(p)
-            d10[i] = self.ensemble_field_function.evaluate_field_at_element_point(
-                elem, xi, derivs=(1, 0)
-            )[1]
-            d01[i] = self.ensemble_field_function.evaluate_field_at_element_point(
-                elem, xi, derivs=(0, 1)
-            )[1]
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
+        d10 = self.ensemble_field_function.evaluate_field_at_element_point(
+            elem, xi, derivs=(1, 0)
+        )[1].reshape(3)
+        d01 = self.ensemble_field_function.evaluate_field_at_element_point(
+            elem, xi, derivs=(0, 1)
+        )[1].reshape(3)
 
         # d10Norm = normaliseVector(d10)
         # d01Norm = normaliseVector(d01)
@@ -1141,14 +1188,8 @@ class GeometricField:
         E = self.ensemble_field_function.mesh.elements[elemNum]
         evaluator = self.ensemble_field_function.evaluators[E.type]
         basis = self.ensemble_field_function.basis[E.type]
-        P = []
-        for p in self.field_parameters:
-            self.ensemble_field_function.set_parameters(p)
-            P.append(
-                self.ensemble_field_function._get_element_parameters(
-                    elemNum
-                )
-            )
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
+        P = self.ensemble_field_function._get_element_parameters(elemNum).T
 
         # objective function
         def findXiObj(xi, target):
@@ -1197,21 +1238,104 @@ class GeometricField:
         coord = numpy.dot(findXiObj.P, findXiObj.basis.eval(xiOpt))
         return xiOpt, coord, d
 
+    def findXiParallel(self, elems, targets, initXis=None, processes=None, chunk_size=None):
+        """ findXi for many targets in a pool of worker processes. Target
+        i is searched for in element elems[i] starting from initXis[i].
+
+        A FieldEvaluationSnapshot of the field is sent to each worker once
+        when the pool starts, then chunks of chunk_size targets are
+        distributed. processes defaults to the number of cpus.
+
+        returns arrays of the xi, coordinates and distance of each target,
+        in the order of targets.
+        """
+        targets = numpy.asarray(targets, dtype=float)
+        nTargets = targets.shape[0]
+        if initXis is None:
+            initXis = numpy.ones((nTargets, self.ensemble_field_function.dimensions), dtype=float) * 0.5
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, int(numpy.ceil(nTargets / (4.0 * processes))))
+
+        snapshot = FieldEvaluationSnapshot(self)
+        chunks = [
+            (elems[i:i + chunk_size], targets[i:i + chunk_size], initXis[i:i + chunk_size])
+            for i in range(0, nTargets, chunk_size)
+        ]
+        if processes == 1:
+            _init_snapshot_worker(snapshot)
+            results = [_find_xi_chunk(c) for c in chunks]
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_snapshot_worker, initargs=(snapshot,)) as pool:
+                results = pool.map(_find_xi_chunk, chunks)
+
+        results = [r for chunk in results for r in chunk]
+        xi = numpy.array([r[0] for r in results])
+        coords = numpy.array([r[1] for r in results])
+        distances = numpy.array([r[2] for r in results])
+        return xi, coords, distances
+
     # ==================================================================#
-    def find_closest_material_points(self, data_points, init_gd=None, verbose=False):
+    def find_closest_material_points(self, data_points, init_gd=None, verbose=False, method='newton',
+                                     n_seeds=4, max_iter=50, xtol=1e-8, max_crossovers=4, use_bvh=False,
+                                     processes=None):
         """
         returns 
         closestMPs = [ (elem, xi),... ]
         closestPoints = [ (x,y,z), (x,y,z),...]
         distances = [ d1, d2,....]
         for each data point
+
+        Each data point is seeded at the closest point of an init_gd
+        discretisation of every element. If method is 'newton', seeds are
+        refined for all points at once by project_points, starting from
+        the closest seed in each of the elements of the n_seeds closest
+        seeds. If method is 'fmin', each point is refined by findXi in its
+        seed element.
+
+        If use_bvh is True (method 'newton' only), each data point is
+        instead seeded in every element that can contain its closest
+        point according to the element bounding volume hierarchy (see
+        get_element_bvh), at the closest point of an init_gd
+        discretisation of that element.
+
+        If processes is given (method 'fmin' only), the findXi
+        refinements are run in that many worker processes, see
+        findXiParallel.
         """
 
         if verbose:
             log.debug('searching for closest material point for %i points' % (len(data_points)))
 
         if init_gd is None:
-            init_gd = numpy.ones(self.ensemble_field_function.dimensions, dtype=int) * 40
+            if method == 'fmin':
+                init_gd = numpy.ones(self.ensemble_field_function.dimensions, dtype=int) * 40
+            else:
+                init_gd = numpy.ones(self.ensemble_field_function.dimensions, dtype=int) * 10
+
+        if (processes is not None) and (method != 'fmin'):
+            raise ValueError('processes requires method fmin')
+
+        if use_bvh:
+            if method != 'newton':
+                raise ValueError('use_bvh requires method newton')
+            data_points = numpy.asarray(data_points, dtype=float)
+            pointInd, seedElems = self.get_element_bvh().query_nearest(data_points)
+            seedXi = numpy.zeros((len(pointInd), self.ensemble_field_function.dimensions), dtype=float)
+            for e in numpy.unique(seedElems):
+                pairs = numpy.where(seedElems == e)[0]
+                seedXi[pairs] = self._closest_grid_xi(e, data_points[pointInd[pairs]], density=int(init_gd[0]))
+
+            elems, xi, closestPoints, distances = self.project_points(
+                data_points, seedElems, seedXi, point_index=pointInd, max_iter=max_iter, xtol=xtol,
+                max_crossovers=max_crossovers,
+            )
+            closestMPs = [[e, x] for e, x in zip(elems, xi)]
+            if verbose:
+                log.debug('mean closest distance: %5.3f' % (distances.mean()))
+
+            return closestMPs, closestPoints, distances
 
         # initial scattering of EPs
         elemNumbers = list(self.ensemble_field_function.mesh.elements.keys())
@@ -1224,10 +1348,8 @@ class GeometricField:
         initXi = [e.generate_eval_grid(init_gd) for e in elements]
 
         initEP = []
-        elemXiObjs = {}
         for ei, e in enumerate(elemNumbers):
             initEP.append(self.evaluate_geometric_field_at_element_points(e, initXi[ei]).T)
-            elemXiObjs[e] = self._makeXiObj(e)
 
         # if self.ensemble_field_function.is_flat():
         #     initXi, initEP = misc._removeDuplicatesFlat( initXi, initEP )
@@ -1247,11 +1369,48 @@ class GeometricField:
 
         # for each datapoint, find its closest ep, and ep element
         initEPTree = cKDTree(initEP)
-        initClosestInd = initEPTree.query(list(data_points))[1]
+        data_points = numpy.asarray(data_points, dtype=float)
+
+        if method == 'newton':
+            # closest seed in each element among the n_seeds closest seeds
+            nSeeds = min(n_seeds, initEP.shape[0])
+            seedInd = initEPTree.query(data_points, k=nSeeds)[1].reshape((data_points.shape[0], nSeeds))
+            seedElems = epElems[seedInd]
+            newElem = numpy.ones(seedElems.shape, dtype=bool)
+            for j in range(1, nSeeds):
+                newElem[:, j] = (seedElems[:, j, numpy.newaxis] != seedElems[:, :j]).all(1)
+            pointInd, seedCol = numpy.where(newElem)
+
+            elems, xi, closestPoints, distances = self.project_points(
+                data_points, seedElems[pointInd, seedCol], initXi[seedInd[pointInd, seedCol]],
+                point_index=pointInd, max_iter=max_iter, xtol=xtol, max_crossovers=max_crossovers,
+            )
+            closestMPs = [[e, x] for e, x in zip(elems, xi)]
+            if verbose:
+                log.debug('mean closest distance: %5.3f' % (distances.mean()))
+
+            return closestMPs, closestPoints, distances
+        elif method != 'fmin':
+            raise ValueError('unknown method ' + str(method))
+
+        initClosestInd = initEPTree.query(data_points)[1]
+
         closestMPs = []
         for epInd in initClosestInd:
             closestMPs.append([epElems[epInd], initXi[epInd]])
 
+        if processes is not None:
+            closestXi, closestPoints, distances = self.findXiParallel(
+                epElems[initClosestInd], data_points, initXi[initClosestInd], processes=processes
+            )
+            for pi, xi in enumerate(closestXi):
+                closestMPs[pi][1] = xi.clip(0.0, 1.0)
+            return closestMPs, closestPoints, distances
+
+        elemXiObjs = {}
+        for e in elemNumbers:
+            elemXiObjs[e] = self._makeXiObj(e)
+
         # for each datapoint, do findXi in its closest element
         closestPoints = []
         distances = []
@@ -1278,6 +1437,262 @@ class GeometricField:
 
         return closestMPs, closestPoints, distances
 
+    def project_points(self, data_points, elems, xi, point_index=None, max_iter=50, xtol=1e-8,
+                       max_crossovers=4):
+        """ projects data points onto the field by damped Gauss-Newton
+        iterations run on all points at once, starting from element
+        numbers elems and element coordinates xi. Element coordinates are
+        clamped to the element domain. Points whose projection wants to
+        leave their element through its boundary are retried in the
+        neighbouring elements, up to max_crossovers times.
+
+        If point_index is given, elems and xi are several starting points
+        for data points data_points[point_index], and the closest
+        projection of each data point is kept.
+
+        returns
+        elems = array of element numbers
+        xi = (n, element dimensions) array of element coordinates
+        closestPoints = (n, field dimensions) array
+        distances = array of distances
+        """
+        data_points = numpy.asarray(data_points, dtype=float)
+        if point_index is None:
+            point_index = numpy.arange(data_points.shape[0])
+        else:
+            point_index = numpy.asarray(point_index, dtype=int)
+
+        targets = data_points[point_index]
+        elems = numpy.array(elems, dtype=int)
+        xi = numpy.array(xi, dtype=float).reshape((targets.shape[0], -1))
+        coords = numpy.zeros((targets.shape[0], self.dimensions), dtype=float)
+        sqDist = numpy.zeros(targets.shape[0], dtype=float)
+        exits = numpy.zeros(targets.shape[0], dtype=bool)
+
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
+        for e in numpy.unique(elems):
+            pts = numpy.where(elems == e)[0]
+            xi[pts], coords[pts], sqDist[pts], exits[pts] = self._project_to_element(
+                e, targets[pts], xi[pts], max_iter, xtol
+            )
+
+        # keep the closest projection of each data point
+        tried = set(zip(point_index, elems))
+        order = numpy.lexsort((sqDist, point_index))
+        best = order[numpy.hstack([0, numpy.where(numpy.diff(point_index[order]))[0] + 1])]
+        point_index = point_index[best]
+        elems = elems[best]
+        xi = xi[best]
+        coords = coords[best]
+        sqDist = sqDist[best]
+        exits = exits[best]
+
+        # cross over element boundaries into neighbouring elements
+        neighbours = self._get_element_neighbours()
+        for crossover in range(max_crossovers):
+            pairs = {}
+            for p in numpy.where(exits)[0]:
+                for e in neighbours[elems[p]]:
+                    if (point_index[p], e) not in tried:
+                        tried.add((point_index[p], e))
+                        pairs.setdefault(e, []).append(p)
+
+            if not pairs:
+                break
+
+            exits[:] = False
+            for e, pts in pairs.items():
+                pts = numpy.array(pts, dtype=int)
+                x0 = self._closest_grid_xi(e, data_points[point_index[pts]])
+                eXi, eCoords, eSqDist, eExits = self._project_to_element(
+                    e, data_points[point_index[pts]], x0, max_iter, xtol
+                )
+                better = eSqDist < sqDist[pts] - xtol
+                pts = pts[better]
+                elems[pts] = e
+                xi[pts] = eXi[better]
+                coords[pts] = eCoords[better]
+                sqDist[pts] = eSqDist[better]
+                exits[pts] = eExits[better]
+
+        return elems, xi, coords, numpy.sqrt(sqDist)
+
+    def get_element_bvh(self, leaf_size=4):
+        """ returns a bounding volume hierarchy of the element bounding
+        boxes of the current ensemble field function, see
+        tools.bvh.ElementBVH. The hierarchy is kept between calls, rebuilt
+        if the mesh changed and refitted if the field parameters changed.
+        """
+        F = self.ensemble_field_function
+        P = self._get_component_parameters()
+        tree = getattr(self, '_element_bvh', None)
+        if (tree is None) or (tree.f is not F) or (tree.leaf_size != leaf_size) or \
+                (tree.n_ensemble_points != F.get_number_of_ensemble_points()) or \
+                (tree.mesh_key != bvh.mesh_key(F)):
+            self._element_bvh = bvh.ElementBVH(F, P, leaf_size=leaf_size)
+            self._element_bvh_params = P.copy()
+        elif not numpy.array_equal(P, self._element_bvh_params):
+            tree.refit(P)
+            self._element_bvh_params = P.copy()
+
+        return self._element_bvh
+
+    def get_surface_winding(self, GD=(10, 10)):
+        """ returns a tools.winding.SurfaceWindingNumber of the surface
+        triangulated with element discretisation GD. It is kept between
+        calls and rebuilt if GD, the mesh or the field parameters changed.
+        """
+        P = self._get_component_parameters()
+        GD = tuple(GD)
+        meshKey = bvh.mesh_key(self.ensemble_field_function)
+        key = getattr(self, '_surface_winding_key', None)
+        if (getattr(self, '_surface_winding', None) is None) or (key[0] != GD) or (key[2] != meshKey) or \
+                (key[1].shape != P.shape) or (not numpy.array_equal(key[1], P)):
+            V, T = self.triangulate(GD)
+            self._surface_winding = winding.SurfaceWindingNumber(V, T)
+            self._surface_winding_key = (GD, P.copy(), meshKey)
+
+        return self._surface_winding
+
+    # ==================================================================#
+    def _get_element_neighbours(self):
+        """ returns a dict of the elements sharing at least one ensemble
+        point with each element. It is kept between calls and rebuilt if
+        the mesh changed.
+        """
+        meshKey = bvh.mesh_key(self.ensemble_field_function)
+        if (getattr(self, '_element_neighbours', None) is not None) and (self._element_neighbours_key == meshKey):
+            return self._element_neighbours
+
+        el2en = self.ensemble_field_function.mapper._element_to_ensemble_map
+        en2el = {}
+        for e, emap in el2en.items():
+            for n in emap.values():
+                en2el.setdefault(n[0][0], set()).add(e)
+
+        neighbours = {}
+        for e, emap in el2en.items():
+            nbs = set()
+            for n in emap.values():
+                nbs.update(en2el[n[0][0]])
+            nbs.discard(e)
+            neighbours[e] = sorted(nbs)
+
+        self._element_neighbours = neighbours
+        self._element_neighbours_key = meshKey
+        return neighbours
+
+    def _closest_grid_xi(self, elem, targets, density=5):
+        """ returns for each target the element coordinates of its closest
+        point in a coarse discretisation of element elem
+        """
+        element = self.ensemble_field_function.mesh.elements[elem]
+        gridXi = element.generate_eval_grid([density] * element.dimensions).reshape((-1, element.dimensions))
+        gridX = self.evaluate_geometric_field_at_element_points(elem, gridXi).T
+        return gridXi[cKDTree(gridX).query(targets)[1]]
+
+    def _project_to_element(self, elem, targets, xi, max_iter, xtol):
+        """ Gauss-Newton minimisation of the squared distance of each target
+        to element elem, starting from element coordinates xi. Steps are
+        clamped to the element and damped until the distance decreases.
+        Element coordinates on the element boundary whose descent
+        direction points out of the element are held on the boundary.
+        Assumes the ensemble field function parameters have been set.
+
+        returns the element coordinates, coordinates, squared distances,
+        and whether the constrained minimum lies on the element boundary
+        with the unconstrained minimum outside it, for each target.
+        """
+        F = self.ensemble_field_function
+        element = F.mesh.elements[elem]
+        basis = F.basis[element.type]
+        P = F._get_element_parameters(elem).T
+        nXi = element.dimensions
+        nS = element.simplex_dimensions
+        lower = element.interior[:, 0]
+        upper = element.interior[:, 1]
+        btol = 10.0 * xtol
+
+        def evaluate(x):
+            # coordinates (n, field dimensions) and jacobians
+            # (n, field dimensions, xi dimensions) at x
+            if nXi == 1:
+                X = x[:, 0]
+            else:
+                X = x.T
+            if hasattr(basis, 'eval_with_gradient'):
+                B, dB = basis.eval_with_gradient(X)
+            else:
+                B = basis.eval(X)
+                dB = [getattr(basis, 'eval_dx%i' % i)(X) for i in range(nXi)]
+            J = numpy.array([numpy.dot(P, b) for b in dB]).transpose((2, 1, 0))
+            return numpy.dot(P, B).T, J
+
+        def activeConstraints(x, g):
+            # bounds the descent direction -g would cross
+            low = (x <= lower + btol) & (g > 0.0)
+            high = (x >= upper - btol) & (g < 0.0)
+            if nS:
+                face = (x[:, :nS].sum(1) >= 1.0 - btol) & (g[:, :nS].sum(1) < 0.0)
+            else:
+                face = numpy.zeros(x.shape[0], dtype=bool)
+            return low | high, face
+
+        def step(x, r, J, damping):
+            g = numpy.einsum('ndk,nd->nk', J, r)
+            H = numpy.einsum('ndk,ndl->nkl', J, J)
+            scale = numpy.trace(H, axis1=1, axis2=2) / nXi + 1e-12
+            H += (damping * scale)[:, numpy.newaxis, numpy.newaxis] * numpy.eye(nXi)
+
+            # penalise moves through active constraints
+            bounds, face = activeConstraints(x, g)
+            k = numpy.arange(nXi)
+            H[:, k, k] += 1e8 * scale[:, numpy.newaxis] * bounds
+            H[face, :nS, :nS] += 1e8 * scale[face, numpy.newaxis, numpy.newaxis]
+            return -numpy.linalg.solve(H, g[:, :, numpy.newaxis])[:, :, 0]
+
+        xi = element.clamp(numpy.array(xi, dtype=float).reshape((-1, nXi)))
+        x, J = evaluate(xi)
+        r = x - targets
+        f = (r * r).sum(1)
+        damping = numpy.full(xi.shape[0], 1e-3)
+        active = numpy.arange(xi.shape[0])
+
+        for it in range(max_iter):
+            if not len(active):
+                break
+
+            xiA = xi[active]
+            xiNew = element.clamp(xiA + step(xiA, r[active], J[active], damping[active]))
+            xNew, JNew = evaluate(xiNew)
+            rNew = xNew - targets[active]
+            fNew = (rNew * rNew).sum(1)
+
+            # converged if a lightly damped step no longer moves xi, or a
+            # step no longer reduces the distance
+            accept = fNew <= f[active]
+            converged = accept & (
+                ((abs(xiNew - xiA).max(1) < xtol) & (damping[active] < 1.0)) |
+                (f[active] - fNew <= 1e-8 * f[active])
+            )
+
+            acc = active[accept]
+            xi[acc] = xiNew[accept]
+            x[acc] = xNew[accept]
+            J[acc] = JNew[accept]
+            r[acc] = rNew[accept]
+            f[acc] = fNew[accept]
+            damping[acc] = numpy.maximum(damping[acc] * 0.1, 1e-9)
+            damping[active[~accept]] *= 10.0
+
+            converged |= damping[active] > 1e10
+            active = active[~converged]
+
+        bounds, face = activeConstraints(xi, numpy.einsum('ndk,nd->nk', J, r))
+        exits = bounds.any(1) | face
+
+        return xi, x, f, exits
+
     # ==================================================================#
     def calc_CoM(self):
         x = self.get_all_point_positions()
@@ -1307,16 +1722,16 @@ class GeometricField:
         """
 
         if element is not None:
-            ep = numpy.array([self.ensemble_field_function.evaluate_field_in_element(element, d, p) for p in
-                              self.field_parameters]).T
+            ep = self.ensemble_field_function.evaluate_field_in_element(
+                element, d, self._get_component_parameters()
+            ).T
             elem = self.ensemble_field_function.mesh.elements[element]
             if elem.is_element:
                 T = triangulate.triangulate([elem], d)
             else:
                 T = triangulate.triangulate(elem.get_true_elements(), d)
         else:
-            ep = numpy.array(
-                [self.ensemble_field_function.evaluate_field_in_mesh(d, p) for p in self.field_parameters]).T
+            ep = self.ensemble_field_function.evaluate_field_in_mesh(d, self._get_component_parameters()).T
             T = triangulate.triangulate(self.ensemble_field_function.mesh.get_true_elements(), d)
 
         # calculate the side lengths of each triangle
@@ -1532,12 +1947,10 @@ class GeometricField:
             log.debug('No field found')
             return
         else:
-            evaluation = []
-
-            # evaluate each coordinate in field
-            for d in self.field_parameters:
-                evaluation.append(
-                    numpy.array(self.ensemble_field_function.evaluate_field_in_mesh(density, d)).flatten())
+            # evaluate all coordinates in field
+            evaluation = self.ensemble_field_function.evaluate_field_in_mesh(
+                density, self._get_component_parameters()
+            )
 
             if self.dimensions == 3:
                 field_plot = mlab.points3d(evaluation[0], evaluation[1], evaluation[2], mode=glyph, scale_factor=0.8,
@@ -1858,11 +2271,8 @@ class GeometricField:
         element = self.ensemble_field_function.mesh.elements[element_number]
         elemBasis = self.ensemble_field_function.basis[element.type]
         elemEvaluator = self.ensemble_field_function.evaluators[element.type]
-        elemParameters = []
-        for p in self.field_parameters:
-            self.ensemble_field_function.set_parameters(p)
-            elemParameters.append(self.ensemble_field_function._get_element_parameters(element_number))
-        elemParameters = numpy.array(elemParameters)
+        self.ensemble_field_function.set_parameters(self._get_component_parameters())
+        elemParameters = self.ensemble_field_function._get_element_parameters(element_number).T
 
         return ElementGeometryEvaluator(element, elemBasis, elemEvaluator, elemParameters)
 
@@ -1926,12 +2336,14 @@ class GeometricField:
 
         return dataCoords, regionDataMap, dataXi
 
-    def triangulate(self, GD, merge=True, ret_vert_map=False):
+    def triangulate(self, GD, merge=True, ret_vert_map=False, executor=None):
         """Create a triangulated discretisation of the geometric field.
         Inputs:
         GD: 2-tuple of the element dicretisation in each xi direction
         merge: Boolean, whether to connect triangles on element boundaries
         retVertMap: Boolean, return uniqueVertexIndices and vertMap
+        executor: [optional] executor or number of threads for evaluating
+            elements concurrently, see evaluate_geometric_field
 
         Returns:
         P: (nx3) array of vertex coordinates
@@ -1942,7 +2354,7 @@ class GeometricField:
             to merged vertex indices
         """
         self.flatten_ensemble_field_function()
-        P = self.evaluate_geometric_field(GD).T
+        P = self.evaluate_geometric_field(GD, executor=executor).T
         T = self.triangulator._triangulate(GD)
         uniqueVertexIndices = None
         vertMap = None
@@ -1961,11 +2373,24 @@ class GeometricField:
     # ==================================================================#
     # volume functions                                                   #
     # ==================================================================#
-    def isInteriorToSurface(self, points, GD=2.0, max_out_dist=None, exact_search=False):
-        """
-        classify n points as either inside or outside the GF surface. A 
-        point P is interior if dot(PX, N_X)<0, where X is the closest 
-        point to P on the GF, and N_X is the normal at X.
+    def isInteriorToSurface(self, points, GD=2.0, max_out_dist=None, exact_search=False, method='normal',
+                            winding_gd=(10, 10), chunk_size=4096):
+        """
+        classify n points as either inside or outside the GF surface. 
+
+        With method 'normal', a point P is interior if dot(PX, N_X)<0,
+        where X is the closest point to P on the GF, and N_X is the
+        normal at X.
+
+        With method 'winding', a point is interior if the absolute
+        generalised winding number of the surface triangulated with
+        discretisation winding_gd is greater than 0.5, see
+        get_surface_winding. This is
+        reliable near thin features and for coarse triangulations, and does
+        not depend on the orientation of the elements. Points are
+        processed in chunks of chunk_size, though memory use of the exact
+        near-surface sums is not bounded by chunk_size. Distances for
+        max_out_dist are to the closest triangulation vertex.
         
         if maxOutDist is not None, it should be a float. if maxOutDist 
         is +ve, points outside within distance maxOutDist will be 
@@ -1975,10 +2400,23 @@ class GeometricField:
         return an n long binary array. 1 = interior, 0 = exterior
         """
 
+        if method == 'winding':
+            surface = self.get_surface_winding(winding_gd)
+            mask = surface.contains(points, chunk_size=chunk_size)
+            if max_out_dist is not None:
+                closestDist = surface.closest_vertex_distance(points)
+                if max_out_dist > 0.0:
+                    mask = mask | (closestDist < max_out_dist)
+                else:
+                    mask = mask & (closestDist > abs(max_out_dist))
+            return mask
+        elif method != 'normal':
+            raise ValueError('unknown method ' + str(method))
+
         self.flatten_ensemble_field_function()
 
         if exact_search:
-            GFXi, GFX, closestDist = self.find_closest_material_points(points, init_gd=[80, 80])
+            GFXi, GFX, closestDist = self.find_closest_material_points(points, init_gd=[10, 10], use_bvh=True)
             NX = [self.evaluate_normal_in_mesh(None, elemXi={Xi[0]: Xi[1]}).squeeze() for Xi in GFXi]
             NX = numpy.array(NX)
             PX = points - GFX
@@ -2017,10 +2455,16 @@ class GeometricField:
 
         return mask
 
-    def generateInternalPointsGrid(self, spacing, max_out_dist=None, exact_closest_search=False):
+    def generateInternalPointsGrid(self, spacing, max_out_dist=None, exact_closest_search=False, method='normal',
+                                   chunk_size=262144):
         """
         generate a grid of points internal to surface mesh with spacing 
-        specified by tuple spacing.
+        specified by tuple spacing. Grid points are classified in chunks of
+        chunk_size using isInteriorToSurface with the given method,
+        'normal' or 'winding'. exact_closest_search only applies to method
+        'normal'. With 'winding', memory use of the exact near-surface
+        sums is not bounded by chunk_size, see
+        tools.winding.SurfaceWindingNumber.
         """
 
         # sample surface to get bounding box
@@ -2032,17 +2476,249 @@ class GeometricField:
             bboxMin = s.min(0) - max_out_dist
             bboxMax = s.max(0) + max_out_dist
 
-        N = (bboxMax - bboxMin) / spacing
+        N = ((bboxMax - bboxMin) / spacing).astype(int)
 
-        # generate grid of points in bounding box
-        PAll = numpy.array([[x, y, z] for z in numpy.linspace(bboxMin[2], bboxMax[2], N[2]) \
-                            for y in numpy.linspace(bboxMin[1], bboxMax[1], N[1]) \
-                            for x in numpy.linspace(bboxMin[0], bboxMax[0], N[0])])
+        # grid of points in bounding box, x varying fastest
+        axes = [numpy.linspace(bboxMin[i], bboxMax[i], N[i]) for i in range(3)]
+        Z, Y, X = numpy.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+        PAll = numpy.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
 
         # filter out exterior points
-        isInterior = self.isInteriorToSurface(PAll, max_out_dist=max_out_dist, exact_search=exact_closest_search)
+        internal = [numpy.empty((0, 3), dtype=float)]
+        for i in range(0, PAll.shape[0], chunk_size):
+            P = PAll[i:i + chunk_size]
+            isInterior = self.isInteriorToSurface(
+                P, max_out_dist=max_out_dist, exact_search=exact_closest_search, method=method
+            )
+            internal.append(P[isInterior, :])
 
-        return PAll[isInterior, :]
+        return numpy.vstack(internal)
+
+    def rasterise_to_memmap(self, filename, shape, origin, spacing, mode='sdf', band=None, slab_size=16,
+                            winding_gd=(10, 10), sample_gd=(20, 20), dtype=None, chunk_size=4096):
+        """
+        Rasterise the surface into a memory-mapped image file, one slab of
+        slab_size z-planes at a time, so that memory use is bounded by the
+        slab size and not the image size.
+
+        Inputs:
+        filename: path of the numpy.memmap file to create
+        shape: (nx, ny, nz) number of voxels along x, y and z
+        origin: (x, y, z) coordinates of voxel [0, 0, 0]
+        spacing: (x, y, z) voxel spacing
+        mode: 'sdf' for signed distances to the surface, negative inside,
+            or 'occupancy' for 1 inside and 0 outside
+        band: [optional] distances are truncated to [-band, band] and
+            only computed for voxels within band of an element bounding box
+        slab_size: number of z-planes per slab
+        winding_gd: discretisation of the triangulation for the inside
+            test, see get_surface_winding
+        sample_gd: discretisation of the surface samples distances are
+            measured to
+        dtype: output dtype, defaults to float32 for 'sdf' and uint8 for
+            'occupancy'
+        chunk_size: number of points per chunk of the inside test
+
+        Slabs are pruned with the element bounding boxes of
+        get_element_bvh. Voxels outside the boxes of the elements
+        spanning their z-plane are exterior without an inside test.
+
+        Returns:
+        the numpy.memmap, indexed [z, y, x]
+        """
+        if mode not in ('sdf', 'occupancy'):
+            raise ValueError('unknown mode ' + str(mode))
+        if dtype is None:
+            dtype = numpy.float32 if mode == 'sdf' else numpy.uint8
+        nx, ny, nz = [int(n) for n in shape]
+        origin = numpy.asarray(origin, dtype=float)
+        spacing = numpy.asarray(spacing, dtype=float)
+        out = numpy.memmap(filename, dtype=dtype, mode='w+', shape=(nz, ny, nx))
+
+        surface = self.get_surface_winding(winding_gd)
+        tree = self.get_element_bvh()
+        elemLower = tree.element_lower
+        elemUpper = tree.element_upper
+        sampleTree = None
+        if mode == 'sdf':
+            sampleTree = cKDTree(self.evaluate_geometric_field(sample_gd).T)
+        pad = 0.0 if band is None else band
+
+        xs = origin[0] + spacing[0] * numpy.arange(nx)
+        ys = origin[1] + spacing[1] * numpy.arange(ny)
+        for z0 in range(0, nz, slab_size):
+            z1 = min(z0 + slab_size, nz)
+            zs = origin[2] + spacing[2] * numpy.arange(z0, z1)
+            Z, Y, X = numpy.meshgrid(zs, ys, xs, indexing='ij')
+            P = numpy.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
+
+            # elements whose boxes span the slab, padded by the band
+            slabElems = (elemUpper[:, 2] >= zs.min() - pad) & (elemLower[:, 2] <= zs.max() + pad)
+            inside = numpy.zeros(P.shape[0], dtype=bool)
+            if slabElems.any():
+                lower = elemLower[slabElems].min(0)
+                upper = elemUpper[slabElems].max(0)
+                candidates = numpy.where(((P >= lower) & (P <= upper)).all(1))[0]
+                if len(candidates):
+                    inside[candidates] = surface.contains(P[candidates], chunk_size=chunk_size)
+
+            if mode == 'occupancy':
+                out[z0:z1] = inside.reshape((z1 - z0, ny, nx))
+                continue
+
+            if band is None:
+                dist = sampleTree.query(P)[0]
+            else:
+                dist = numpy.full(P.shape[0], band, dtype=float)
+                if slabElems.any():
+                    near = numpy.unique(tree.query_containing(P, tol=band)[0])
+                    if len(near):
+                        d = sampleTree.query(P[near], distance_upper_bound=band)[0]
+                        dist[near] = numpy.minimum(d, band)
+
+            dist[inside] *= -1.0
+            out[z0:z1] = dist.reshape((z1 - z0, ny, nx))
+
+        out.flush()
+        return out
+
+
+# ======================================================================#
+class FieldEvaluationSnapshot(object):
+    """ Compact, picklable copy of what is needed to evaluate a geometric
+    field in its elements: the basis type of each element type, the type
+    of each element and each element's parameters. Unlike the geometric
+    field, it does not reference the mesh, mapper or points, so it is
+    cheap to send to worker processes. Bases are instantiated in the
+    receiving process.
+    """
+
+    def __init__(self, gf):
+        F = gf.ensemble_field_function
+        elementParams = F.mapper.get_all_element_parameters(gf._get_component_parameters())
+        self.dimensions = gf.dimensions
+        self.basis_types = dict((t, b.type) for t, b in F.basis.items())
+        self.element_types = dict((e, el.type) for e, el in F.mesh.elements.items() if el.is_element)
+        self.element_parameters = dict(
+            (e, numpy.asarray(elementParams[e]).reshape((-1, gf.dimensions)).T) for e in self.element_types
+        )
+        self._basis = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_basis'] = {}
+        return state
+
+    def get_basis(self, elem):
+        eType = self.element_types[elem]
+        b = self._basis.get(eType)
+        if b is None:
+            b = make_basis(self.basis_types[eType])
+            self._basis[eType] = b
+        return b
+
+    def evaluate(self, elem, xi):
+        """ field coordinates at element coordinates xi of element elem
+        """
+        return numpy.dot(self.element_parameters[elem], self.get_basis(elem).eval(xi))
+
+    def find_xi(self, elem, target, init_xi):
+        """ as GeometricField.findXi
+        """
+        P = self.element_parameters[elem]
+        basis = self.get_basis(elem)
+
+        def findXiObj(xi):
+            v = numpy.dot(P, basis.eval(xi))
+            return ((v - target) * (v - target)).sum()
+
+        xiOpt = fmin(findXiObj, init_xi, disp=False)
+        d = numpy.sqrt(findXiObj(xiOpt))
+        coord = numpy.dot(P, basis.eval(xiOpt))
+        return xiOpt, coord, d
+
+
+# snapshot held by each findXiParallel worker process
+_worker_snapshot = None
+
+
+def _init_snapshot_worker(snapshot):
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _find_xi_chunk(chunk):
+    elems, targets, initXis = chunk
+    return [_worker_snapshot.find_xi(e, t, x) for e, t, x in zip(elems, targets, initXis)]
+
+
+# ======================================================================#
+class MaterialPointCache(object):
+    """ Keeps the closest material point (element, xi) on a geometric field
+    of each of a fixed set of data points between searches. For fits that
+    search for correspondences once per iteration while the mesh only
+    moves a little.
+
+    The first search is a global find_closest_material_points search.
+    Later searches re-project each data point from its last material point
+    with a few Newton iterations (see GeometricField.project_points). Only
+    points that moved to another element, or whose distance to the mesh
+    grew by more than rel_tol times its last distance plus abs_tol, are
+    searched for globally again.
+    """
+
+    def __init__(self, gf, data_points, n_newton=5, rel_tol=0.5, abs_tol=1e-6, init_gd=None):
+        self.gf = gf
+        self.data_points = numpy.asarray(data_points, dtype=float)
+        self.n_newton = n_newton
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.init_gd = init_gd
+        self.elems = None
+        self.xi = None
+        self.distances = None
+        self.n_global = 0  # number of points searched globally in the last search
+
+    def reset(self):
+        """ forget all material points so that the next search is global
+        """
+        self.elems = None
+        self.xi = None
+        self.distances = None
+
+    def _global_search(self, point_index):
+        closestMPs, closestPoints, distances = self.gf.find_closest_material_points(
+            self.data_points[point_index], init_gd=self.init_gd, use_bvh=True
+        )
+        elems = numpy.array([mp[0] for mp in closestMPs], dtype=int)
+        xi = numpy.array([mp[1] for mp in closestMPs], dtype=float)
+        return elems, xi, numpy.asarray(closestPoints), numpy.asarray(distances)
+
+    def search(self):
+        """ returns closestMPs, closestPoints and distances for all data
+        points, as find_closest_material_points does
+        """
+        if self.elems is None:
+            pointInd = numpy.arange(self.data_points.shape[0])
+            elems, xi, closestPoints, distances = self._global_search(pointInd)
+        else:
+            elems, xi, closestPoints, distances = self.gf.project_points(
+                self.data_points, self.elems, self.xi, max_iter=self.n_newton, max_crossovers=1
+            )
+            tol = self.rel_tol * self.distances + self.abs_tol
+            pointInd = numpy.where((elems != self.elems) | (distances > (self.distances + tol)))[0]
+            if len(pointInd):
+                elems[pointInd], xi[pointInd], closestPoints[pointInd], distances[pointInd] = \
+                    self._global_search(pointInd)
+
+        self.n_global = len(pointInd)
+        log.debug('global material point search for {} of {} points'.format(
+            self.n_global, self.data_points.shape[0])
+        )
+        self.elems = elems
+        self.xi = xi
+        self.distances = distances
+        return [[e, x] for e, x in zip(elems, xi)], closestPoints, distances
 
 
 # ======================================================================#
@@ -2055,6 +2731,7 @@ class GeometricPoint(object):
 
         self.field_parameters = None
         self.ensemble_point_number = None
+        self._bound = False
 
         self.dimensions = dimensions
         if field_parameters is not None:
@@ -2081,9 +2758,21 @@ class GeometricPoint(object):
             raise ValueError(
                 'ERROR: geometric_point.set_field_parameters: dimension and number of coordinates mismatch')
 
-        self.field_parameters = field_parameters.copy()
+        if self._bound and (numpy.shape(field_parameters) == self.field_parameters.shape):
+            numpy.copyto(self.field_parameters, field_parameters)
+        else:
+            self.field_parameters = field_parameters.copy()
+            self._bound = False
         return 1
 
+    # ==================================================================#
+    def bind_field_parameters(self, view):
+        """ make this point a view of its column in the parent
+        geometric field's parameter array
+        """
+        self.field_parameters = view
+        self._bound = True
+
     # ==================================================================#
     def get_field_parameters(self):
         return self.field_parameters.copy()
@@ -2223,7 +2912,7 @@ def makeGeometricFieldEvaluator(G, eval_d):
     return evaluator
 
 
-def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_points=None):
+def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_points=None, dtype=None):
     """ create a function for evaluation the geometric field values,
     taking advantage of a precomputed sparse matrix of basis function
     values at fixed element coordinates
@@ -2240,11 +2929,19 @@ def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_
     
     epXi, if defined, with evalD=None, is a list of lists of
     element xi coordinates at which the field is to be evaluated
+
+    The sparse basis matrix is attached to the returned function as its
+    A attribute, e.g. for assembling analytic jacobians.
+
+    dtype is the floating point type of the evaluated values, by default
+    that of the field's ensemble field function. A stays float64.
     """
 
     f = G.ensemble_field_function
     if not f.is_flat():
         f = f.flatten()[0]
+    if dtype is None:
+        dtype = f.dtype
 
     if mat_points is not None:
         epMode = 3
@@ -2264,7 +2961,7 @@ def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_
         epMode = 2
 
     d = G.dimensions
-    A = numpy.zeros((nEPs, f.get_number_of_ensemble_points()), dtype=float)
+    triplets = []
 
     if epMode == 3:
         # ~ pdb.set_trace()
@@ -2278,7 +2975,9 @@ def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_
                 ensNodes = [emap[k][0][0] for k in list(emap.keys())]
                 elemEnsNodes[elem] = ensNodes
 
-            A[mpI, ensNodes] = b
+            triplets.append(EFF.basis_matrix_triplets(numpy.reshape(b, (1, -1)), mpI, ensNodes))
+
+        As = EFF.assemble_sparse_matrix(triplets, (nEPs, f.get_number_of_ensemble_points()))
 
     else:
         # calculate static basis values for the required evalD and assemble
@@ -2305,32 +3004,79 @@ def makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=None, ep_xi=None, mat_
                 # regular xi discretisation
                 if basisValues.get(element.type) is None:
                     evalGrid = element.generate_eval_grid(eval_d).squeeze()
-                    basisValues[element.type] = f.basis[element.type].eval(evalGrid.T).T
+                    basisValues[element.type] = basis_value_cache.eval(f.basis[element.type], evalGrid.T).T
 
                 b = basisValues[element.type]  # basis values
 
-            # fill in A matrix                                
+            # add element block to A matrix
             emap = f.mapper._element_to_ensemble_map[elementNumber]  # element to ensemble map
-            for n in range(b.shape[1]):
-                A[row:row + b.shape[0], emap[n][0][0]] = b[:, n]
+            ensNodes = [emap[n][0][0] for n in range(b.shape[1])]
+            triplets.append(EFF.basis_matrix_triplets(b, row, ensNodes))
 
             row += b.shape[0]
 
+        As = EFF.assemble_sparse_matrix(triplets, (nEPs, f.get_number_of_ensemble_points()))
+
         # if epIndex is defined, remove rows not defined in epIndex
-        # ~ pdb.set_trace()
         if ep_index is not None:
-            A = A[ep_index, :]
+            As = As.tocsr()[ep_index, :].tocsc()
 
-    # sparsify A
-    As = sparse.csc_matrix(A)
+    AsTyped = As.astype(dtype) if numpy.dtype(dtype) != As.dtype else As
 
     def evaluator(P):
-        E = As * P.reshape((d, -1)).T
+        E = AsTyped * numpy.asarray(P, dtype=dtype).reshape((d, -1)).T
         return E.T
 
+    evaluator.A = As
     return evaluator
 
 
+def makeIncrementalEvaluatorSparse(evaluator, dimensions=3, max_dirty_fraction=0.25):
+    """ wrap a sparse evaluator, e.g. from makeGeometricFieldEvaluatorSparse,
+    so that each call only re-evaluates the points supported by nodes whose
+    parameters changed since the previous call. The last parameters and
+    evaluated points are kept between calls.
+
+    This makes finite-difference jacobians cheap, since each perturbed call
+    changes the parameters of one node. A full evaluation is done on the
+    first call and when more than max_dirty_fraction of the nodes changed.
+
+    The basis matrix of the wrapped evaluator is attached as the A
+    attribute.
+    """
+    A = evaluator.A
+    Acsr = sparse.csr_matrix(A)
+    Acsc = sparse.csc_matrix(A)
+    nNodes = A.shape[1]
+    maxDirty = max(1, int(max_dirty_fraction * nNodes))
+    state = {'P': None, 'E': None}
+
+    def incrementalEvaluator(P):
+        P = numpy.array(P, dtype=float).reshape((dimensions, nNodes))
+        lastP = state['P']
+        if lastP is None:
+            E = evaluator(P)
+        else:
+            dirtyNodes = numpy.where((P != lastP).any(0))[0]
+            if len(dirtyNodes) > maxDirty:
+                E = evaluator(P)
+            else:
+                E = state['E']
+                if len(dirtyNodes):
+                    # rows of points supported by the changed nodes
+                    rows = numpy.unique(numpy.hstack(
+                        [Acsc.indices[Acsc.indptr[n]:Acsc.indptr[n + 1]] for n in dirtyNodes]
+                    ))
+                    E[:, rows] = (Acsr[rows] * P.T).T
+
+        state['P'] = P
+        state['E'] = E
+        return E.copy()
+
+    incrementalEvaluator.A = A
+    return incrementalEvaluator
+
+
 def makeGeometricFieldElementsEvaluatorSparse(gf, elems, eval_d):
     """Create a function to efficiently evaluate given elements
     in a geometric_field at fixed material points defined by 
@@ -2376,7 +3122,7 @@ def buildEvaluatorSparse(A, entries, node_map, dimensions):
     return evaluator
 
 
-def makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d, dim=3, ep_index=None, ep_xi=None):
+def makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d, dim=3, ep_index=None, ep_xi=None, dtype=None):
     """ create a function for evaluating the geometric field derivatives,
     taking advantage of a precomputed sparse matrix of basis function
     values at fixed element coordinates
@@ -2390,8 +3136,16 @@ def makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d, dim=3, ep_index=None
     
     epIndex, if defined, is a list of the row numbers (ep numbers) that
     should be in the final system. All other rows are droppped
+
+    The list of per-derivative sparse basis matrices is attached to the
+    returned function as its A attribute.
+
+    dtype is the floating point type of the evaluated derivatives, by
+    default that of the field's ensemble field function. A stays float64.
     """
     f0 = G.ensemble_field_function
+    if dtype is None:
+        dtype = f0.dtype
     f = f0.flatten()[0]
     G.ensemble_field_function = f
 
@@ -2413,7 +3167,7 @@ def makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d, dim=3, ep_index=None
     # calculate static basis values for the required evalD and assemble
     # matrices
     basisValues = {}
-    A = [numpy.zeros((nEPs, f.get_number_of_ensemble_points()), dtype=float) for i in range(nDerivs)]
+    triplets = [[] for i in range(nDerivs)]
     row = 0
     for ei, elementNumber in enumerate(numpy.sort(list(f.mesh.elements.keys()))):
         # get element
@@ -2427,39 +3181,37 @@ def makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d, dim=3, ep_index=None
         elif epMode == 2:
             if basisValues.get(element.type) is None:
                 evalGrid = element.generate_eval_grid(eval_d)
-                basisValues[element.type] = f.basis[element.type].eval_derivatives(evalGrid.T, None)
+                basisValues[element.type] = basis_value_cache.eval_derivatives(f.basis[element.type], evalGrid.T, None)
 
             b = basisValues[element.type]
 
-        # fill in A matrix
+        # add element blocks to A matrices
         emap = f.mapper._element_to_ensemble_map[elementNumber]  # element to ensemble map
+        ensNodes = [emap[n][0][0] for n in range(b.shape[1])]
         for d in range(b.shape[0]):
-            for n in range(b.shape[1]):
-                A[d][row:row + b.shape[2], emap[n][0][0]] = b[d, n, :]
-
+            triplets[d].append(EFF.basis_matrix_triplets(b[d].T, row, ensNodes))
 
         row += b.shape[2]
 
+    A = [EFF.assemble_sparse_matrix(t, (nEPs, f.get_number_of_ensemble_points())) for t in triplets]
     if ep_index is not None:
-        AStacked = []
-        for a in A:
-            AStacked.append(a[:, ep_index])
-        AStacked = numpy.vstack(AStacked)
-    else:
-        AStacked = numpy.vstack(A)
+        A = [a[:, ep_index] for a in A]
 
     # stack all derivative A matrices
-    AStackedSparse = sparse.csc_matrix(AStacked)
+    AStackedSparse = sparse.vstack(A, format='csc')
+    if numpy.dtype(dtype) != AStackedSparse.dtype:
+        AStackedSparse = AStackedSparse.astype(dtype)
     nDerivs = len(A)
 
     def evaluator(P):
         """ uses a A matrix that is the vstack of all derivative A matrices
         """
 
-        Pd = P.reshape((dim, -1)).T
+        Pd = numpy.asarray(P, dtype=dtype).reshape((dim, -1)).T
         D = AStackedSparse * Pd
         return D.T.reshape((dim, nDerivs, -1))
 
+    evaluator.A = A
     return evaluator
 
 
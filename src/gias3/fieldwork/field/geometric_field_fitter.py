@@ -16,19 +16,24 @@ import pdb
 
 from scipy import sparse
 from scipy.optimize import leastsq
+from scipy.sparse import linalg as splinalg
 from scipy.spatial import cKDTree as KDTree
 
 from gias3.common import math
 from gias3.fieldwork.field import ensemble_field_function as EFF
 from gias3.fieldwork.field import geometric_field
+from gias3.fieldwork.field.basis.basis import basis_value_cache
 from gias3.fieldwork.field.tools import curvature_tools as CT
 from gias3.fieldwork.field.topology import element_types
 
 from numpy import array, newaxis, ones, sqrt, mean, dot, cos, sin, hstack, where, inf, digitize, linspace, zeros, cross, \
-    dstack
+    dstack, arange, broadcast_to, setdiff1d, atleast_1d
 
 log = logging.getLogger(__name__)
 
+# largest number of jacobian entries that is densified for leastsq
+DENSE_JACOBIAN_MAX_SIZE = 4000000
+
 
 class geometryFit(object):
     """ object for fitting the geometry of a mesh
@@ -73,6 +78,8 @@ class geometryFit(object):
         self.epIBins = None
         self.dataCoordBins = None
         self.EPDPProjection = None
+        self.epA = None
+        self._epEvaluator = None
 
         self.G = G
         self.data = data
@@ -101,20 +108,26 @@ class geometryFit(object):
             if self.projectionDirection == 'EPDP':
                 if self.projectionFreq == 'percall':
                     self.findClosestErr = self._findClosestErrEPDPPerCall
+                    self.findClosestJac = self._findClosestJacEPDPPerCall
                 elif self.projectionFreq == 'fixed':
                     self.findClosestErr = self._findClosestErrEPDPFixed
+                    self.findClosestJac = self._findClosestJacEPDPFixed
                     self.projectEPDP()
             elif self.projectionDirection == 'DPEP':
                 if self.projectionFreq == 'percall':
                     self.findClosestErr = self._findClosestErrDPEPPerCall
+                    self.findClosestJac = self._findClosestJacDPEPPerCall
                 elif self.projectionFreq == 'fixed':
                     self.findClosestErr = self._findClosestErrDPEPFixed
+                    self.findClosestJac = self._findClosestJacDPEPFixed
                     self.projectDPEP()
             elif self.projectionDirection == 'both':
                 if self.projectionFreq == 'percall':
                     self.findClosestErr = self._findClosestErrPerCallBoth
+                    self.findClosestJac = self._findClosestJacPerCallBoth
                 elif self.projectionFreq == 'fixed':
                     self.findClosestErr = self._findClosestErrFixedBoth
+                    self.findClosestJac = self._findClosestJacFixedBoth
                     self.projectDPEP()
         elif self.fitMode == 'curvature':
             self.dataCurvatureTree = KDTree(self.dataCurvature[:, newaxis], self.leaf_size)
@@ -193,7 +206,8 @@ class geometryFit(object):
         if verbose:
             log.debug('initial rms:', initRMS)
 
-        output = leastsq(self.objMesh, self.p0, ftol=self.ftol, xtol=self.xtol, epsfcn=self.epsfcn, maxfev=maxFEval)
+        output = leastsqJacobian(self.objMesh, self.p0, self._makeJacMesh(), self.xtol, ftol=self.ftol,
+                                 maxfev=maxFEval, epsfcn=self.epsfcn)
 
         finalRMS = sqrt(self.objMesh(output[0]).mean())
         if verbose:
@@ -297,7 +311,11 @@ class geometryFit(object):
         # calc slave node xi in host
         if slave_xi is None:
             log.debug('calculating slave xi...')
-            slave_xi = array([host.findXi(0, node) for node in self.G.field_parameters[:, :, 0].T])
+            slaveNodes = self.G.field_parameters[:, :, 0].T
+            slave_xi = host.project_points(
+                slaveNodes, zeros(len(slaveNodes), dtype=int), ones((len(slaveNodes), host.ensemble_field_function.dimensions)) * 0.5,
+                max_crossovers=0
+            )[1]
             # ~ savetxt( 'host_mesh_fitting/slaveXi.txt', slaveXi )
 
         # calc host basis values at slaveXis
@@ -434,10 +452,37 @@ class geometryFit(object):
             self.it += 1
             return dGeom
 
+    def _makeJacMesh(self):
+        """ make the analytic jacobian of objMesh. Only available for the
+        unsmoothed geometry objective, else returns None.
+        """
+        if self.fitMode != 'geometry' or self.smoothing or self._obj != self._objGeometry:
+            return None
+
+        epEvaluator = self._getEPEvaluator()
+        self.epA = epEvaluator.A.tocsr()
+
+        def jac(params):
+            ep_coord = epEvaluator(params)
+            return self.findClosestJac(ep_coord.T)
+
+        return jac
+
+    def _getEPEvaluator(self):
+        """ sparse ep evaluator that only re-evaluates eps around nodes
+        changed since the last call
+        """
+        if self._epEvaluator is None:
+            self._epEvaluator = geometric_field.makeIncrementalEvaluatorSparse(
+                geometric_field.makeGeometricFieldEvaluatorSparse(self.G, self.eval_d),
+                self.G.dimensions
+            )
+        return self._epEvaluator
+
     def _objGeometry(self, params):
         # get new ep positions
         self.G.set_field_parameters(self.reshapeParams(params))
-        ep_coord = self.G.evaluate_geometric_field(self.eval_d)
+        ep_coord = self._getEPEvaluator()(params)
         # calculate error
         d = self.findClosestErr(ep_coord.T)
         return d
@@ -939,6 +984,28 @@ class geometryFit(object):
         d = self.data - ep[self.DPEPProjectionI]
         return (d * d).sum(1)
 
+    def _findClosestJacPerCallBoth(self, ep):
+        return sparse.vstack((self._findClosestJacEPDPPerCall(ep), self._findClosestJacDPEPPerCall(ep)), format='csr')
+
+    def _findClosestJacFixedBoth(self, ep):
+        return sparse.vstack((self._findClosestJacEPDPFixed(ep), self._findClosestJacDPEPFixed(ep)), format='csr')
+
+    def _findClosestJacEPDPFixed(self, ep):
+        return assembleFieldJacobian([(self.epA, 2.0 * (ep - self.EPDPProjection))])
+
+    def _findClosestJacDPEPFixed(self, ep):
+        I = self.DPEPProjectionI
+        return assembleFieldJacobian([(self.epA[I], 2.0 * (ep[I] - self.data))])
+
+    def _findClosestJacEPDPPerCall(self, ep):
+        # closest data points are held fixed for the derivative
+        projection = self.dataTree.query(list(ep), 1, p=2)[1]
+        return assembleFieldJacobian([(self.epA, 2.0 * (ep - self.data[projection]))])
+
+    def _findClosestJacDPEPPerCall(self, ep):
+        I = KDTree(ep, self.leaf_size).query(list(self.data), 1)[1]
+        return assembleFieldJacobian([(self.epA[I], 2.0 * (ep[I] - self.data))])
+
     def _findClosestErrEPDPPerCall(self, ep):
         # ~ projection = self.dataTree.query( list(ep), 1, p=2 )[1]
         # ~ d = ep - self.data[projection]
@@ -993,8 +1060,88 @@ class geometryFit(object):
 
 
 # ======================================================================#
+def assembleFieldJacobian(terms):
+    """ assemble the sparse jacobian of a per-point objective with respect
+    to the flattened (dimension-major) field parameters.
+
+    terms is a list of (A, g) pairs, where A is a sparse matrix evaluating
+    some field quantity at each point and g[:,c] is the derivative of each
+    point's error with respect to the c-th component of that quantity.
+    """
+    blocks = []
+    for c in range(terms[0][1].shape[1]):
+        Jc = None
+        for A, g in terms:
+            JcTerm = sparse.diags(g[:, c]) * A
+            Jc = JcTerm if Jc is None else Jc + JcTerm
+        blocks.append(Jc)
+
+    return sparse.hstack(blocks, format='csr')
+
+
+def fieldJacobianSparsity(A, dim):
+    """ sparsity pattern of the jacobian of per-point residuals with
+    respect to the flattened (dimension-major) field parameters, given a
+    sparse matrix, or list of sparse matrices, evaluating the field
+    quantities each residual depends on. Each residual is assumed to
+    depend on all dim components of its quantities.
+
+    The pattern of each matrix is that of the element to ensemble map of
+    the mesh, so a residual only depends on the nodes of its elements.
+    """
+    if not isinstance(A, (list, tuple)):
+        A = [A]
+
+    P = None
+    for a in A:
+        a = sparse.csr_matrix(a, copy=True)
+        a.data[:] = 1.0
+        P = a if P is None else P + a
+
+    P = sparse.csr_matrix(P > 0)
+    return sparse.hstack([P] * dim, format='csr')
+
+
+def makeDfun(jac):
+    """ wrap a sparse jacobian callback as a Dfun for
+    scipy.optimize.leastsq, which expects a dense array. Returns None if
+    jac is None so that leastsq falls back to finite differences.
+    """
+    if jac is None:
+        return None
+
+    def Dfun(p):
+        return jac(p).toarray()
+
+    return Dfun
+
+
+def leastsqJacobian(obj, p0, jac, xtol, ftol=1.49012e-08, maxfev=0, epsfcn=None):
+    """ minimise the sum of squares of obj(p) from p0 with leastsq, using
+    the sparse jacobian callback jac if it is not None. Returns
+    (optimal parameters, status flag) as leastsq does.
+
+    maxfev is a number of objective evaluations sized for finite
+    difference jacobians, so it is divided by len(p0) when jac is given.
+    MINPACK needs the jacobian dense, so a warning is logged if it would
+    have more than DENSE_JACOBIAN_MAX_SIZE entries. Use
+    fitting_tools.minimiseLeastSquares with solver='least_squares' to keep
+    large jacobians sparse.
+    """
+    if jac is None:
+        return leastsq(obj, p0, xtol=xtol, ftol=ftol, maxfev=maxfev, epsfcn=epsfcn)
+
+    maxIt = max(maxfev // len(p0), 1) if maxfev else 0
+    nResiduals, nParams = jac(p0).shape
+    if nResiduals * nParams > DENSE_JACOBIAN_MAX_SIZE:
+        log.warning('leastsq densifies a {} x {} jacobian, consider solver=\'least_squares\''.format(
+            nResiduals, nParams))
+    return leastsq(obj, p0, Dfun=makeDfun(jac), xtol=xtol, ftol=ftol, maxfev=maxIt)
+
+
 def makeObjEPEP(G, data, eval_d, data_weights=None, evaluator=None, n_closest_points=None, tree_args=None, ep_index=None,
                 ep_xi=None, mat_points=None):
+    dataPoints = array(data)
     if evaluator is None:
         evaluator = geometric_field.makeGeometricFieldEvaluatorSparse(G, eval_d, ep_index=ep_index, ep_xi=ep_xi,
                                                                       mat_points=mat_points)
@@ -1007,6 +1154,10 @@ def makeObjEPEP(G, data, eval_d, data_weights=None, evaluator=None, n_closest_po
             err = ((ep - data) ** 2.0).sum(1)
             # err = ne.evaluate( 'sum((ep - data)**2.0, axis=1)', local_dict={'data':data, 'ep':ep} )
             return err
+
+        def jac(p):
+            ep = evaluator(p).T
+            return assembleFieldJacobian([(evaluator.A, 2.0 * (ep - data))])
     else:
         data = array(data.T)
 
@@ -1015,6 +1166,21 @@ def makeObjEPEP(G, data, eval_d, data_weights=None, evaluator=None, n_closest_po
             err = (data_weights * ((ep - data) ** 2.0)).sum(0)
             return err
 
+        def jac(p):
+            ep = evaluator(p)
+            return assembleFieldJacobian([(evaluator.A, (2.0 * data_weights * (ep - data)).T)])
+
+    # ep coordinates are linear in p through the evaluator's basis matrix
+    if hasattr(evaluator, 'A'):
+        obj.jac = jac
+        obj.jac_sparsity = fieldJacobianSparsity(evaluator.A, G.dimensions)
+
+        # terms of the equivalent linear least-squares problem, see
+        # solveLinearFit
+        obj.A = evaluator.A
+        obj.data = dataPoints
+        obj.data_weights = data_weights
+
     return obj
 
 
@@ -1137,6 +1303,11 @@ def makeObjEPDP(G, data, eval_d, data_weights=None, evaluator=None, n_closest_po
                     w = data_weights[i]
                     return d * d * w
 
+    # each ep's error only depends on the ep's element
+    if hasattr(evaluator, 'A'):
+        A = evaluator.A if ep_index is None else evaluator.A.tocsr()[ep_index]
+        obj.jac_sparsity = fieldJacobianSparsity(A, G.dimensions)
+
     return obj
 
 
@@ -1188,72 +1359,16 @@ class normalSmoother2(object):
         Create a list of tuples containing pairs of element edge instances that are overlapped
         """
 
-        def _findCommonElem(c):
-            """Given a list contain lists of elemnum and elem node number connected to 
-            edge nodes, find the element that is connect to all edge points
-
-            e.g. c = [[(1,0),(2,1)], [(1,1)], [(1,2),(3,2)]] will return 1 since nodes
-            from elem 1 is connect in all cases.
-            """
-
-            # create sets of elements connects to each point
-            elemSets = []
-            for ci in c:
-                elemSets.append(set([t[0] for t in ci]))
-
-            if len(elemSets) == 0:
-                return None, None
-
-            # find the intersection of the sets
-            sCommon = elemSets[0]
-            for s in elemSets[1:]:
-                sCommon = sCommon.intersection(s)
-
-            if len(sCommon) == 1:
-                # the only elem left is the one that is connected
-                connElemNum = sCommon.pop()
-
-                # get the connected element's edge points
-                connPoints = []
-                for ci in c:
-                    connPoints += [t[1] for t in ci if t[0] == connElemNum]
-
-                return connElemNum, connPoints
-
-            if len(sCommon) == 0:
-                return None, None
-
-            if len(sCommon) > 1:
-                raise RuntimeError('Edge shared between more than 2 elements.')
-
         # list of shared edges
         # each tuple contains (elem1, edge1, elem2, edge2, [1|-1]) where the
         # last element is 1 if direction is align or -1 if direction is
-        # opposite 
-        self.commonEdges = []
-        doneEdges = set()
-
-        # loop through each element
-        for elemNum, elem in self.F.mesh.elements.items():
-            # loop through each set of edge points
-            for edgeInd, edgePoints in enumerate(elem.edge_points):
-                if (elemNum, edgeInd) not in doneEdges:
-                    edge = elem.edges[edgeInd]
-                    # get elem number and elem node number connected to each edge point
-                    connections = [self.F.mesh.connectivity[(elemNum, ep)] for ep in edgePoints]
-                    # find the element and its edge points that are connected to this edge
-                    connElemNum, connPoints = _findCommonElem(connections)
-
-                    if connElemNum is not None:
-                        # find the edge that overlaps with this edge
-                        connElem = self.F.mesh.elements[connElemNum]
-                        connEdge, direction = connElem.get_edge_by_edge_points(connPoints)
-
-                        self.commonEdges.append(
-                            (elemNum, edge, connElemNum, connEdge, direction)
-                        )
-                        doneEdges.add((elemNum, edgeInd))
-                        doneEdges.add((connElemNum, connEdge.edge_number))
+        # opposite
+        elements = self.F.mesh.elements
+        self.commonEdges = [
+            (elemNum, elements[elemNum].edges[edgeInd], connElemNum, elements[connElemNum].edges[connEdgeInd], direction)
+            for elemNum, edgeInd, connElemNum, connEdgeInd, direction
+            in self.F.mesh.get_topology_index().common_edges()
+        ]
 
     def _procEdge(self, D):
         """ for each pair in edgePoints, find the element and edge shared
@@ -1278,8 +1393,8 @@ class normalSmoother2(object):
                 eval2 = edge2.get_elem_coord(linspace(0.0, 1.0, D))
 
             # get basis values for these
-            basis1 = [self.F.basis[e1.type].eval_derivatives(eval1.T, d).T for d in ((1, 0), (0, 1))]
-            basis2 = [self.F.basis[e2.type].eval_derivatives(eval2.T, d).T for d in ((1, 0), (0, 1))]
+            basis1 = [basis_value_cache.eval_derivatives(self.F.basis[e1.type], eval1.T, d).T for d in ((1, 0), (0, 1))]
+            basis2 = [basis_value_cache.eval_derivatives(self.F.basis[e2.type], eval2.T, d).T for d in ((1, 0), (0, 1))]
 
             self.edgeEvalPoints.append((enum1, eval1, enum2, eval2))  # ( element1, ep1, element2, ep2 )
             self.edgeEvalBasis.append((enum1, basis1, enum2, basis2))  # ( element1, basis1, element2, basis2 )
@@ -1350,10 +1465,10 @@ class normalSmoother2(object):
         self._procEdge(D)
 
         # make derivatives evaluation matrices
-        A1dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A1dxi2 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi2 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
+        A1dxi1 = []
+        A1dxi2 = []
+        A2dxi1 = []
+        A2dxi2 = []
         row1 = 0
         row2 = 0
 
@@ -1362,24 +1477,25 @@ class normalSmoother2(object):
             emap2 = self.el2en[e2]
 
             # make dxi1 and dxi2 matrices for points on one side
-            for n in range(b1[0].shape[1]):
-                A1dxi1[row1:row1 + b1[0].shape[0], emap1[n][0][0]] = b1[0][:, n]
-                A1dxi2[row1:row1 + b1[1].shape[0], emap1[n][0][0]] = b1[1][:, n]
+            ensNodes1 = [emap1[n][0][0] for n in range(b1[0].shape[1])]
+            A1dxi1.append(EFF.basis_matrix_triplets(b1[0], row1, ensNodes1))
+            A1dxi2.append(EFF.basis_matrix_triplets(b1[1], row1, ensNodes1))
 
             row1 += b1[0].shape[0]
 
             # make dxi1 and dxi2 matrices for points on the other side
-            for n in range(b2[0].shape[1]):
-                A2dxi1[row2:row2 + b2[0].shape[0], emap2[n][0][0]] = b2[0][:, n]
-                A2dxi2[row2:row2 + b2[1].shape[0], emap2[n][0][0]] = b2[1][:, n]
+            ensNodes2 = [emap2[n][0][0] for n in range(b2[0].shape[1])]
+            A2dxi1.append(EFF.basis_matrix_triplets(b2[0], row2, ensNodes2))
+            A2dxi2.append(EFF.basis_matrix_triplets(b2[1], row2, ensNodes2))
 
             row2 += b2[0].shape[0]
 
-        # sparsify matrices
-        sA1dxi1 = sparse.csc_matrix(A1dxi1)
-        sA1dxi2 = sparse.csc_matrix(A1dxi2)
-        sA2dxi1 = sparse.csc_matrix(A2dxi1)
-        sA2dxi2 = sparse.csc_matrix(A2dxi2)
+        # assemble sparse matrices
+        shape = (self.nPairs, self.F.get_number_of_ensemble_points())
+        sA1dxi1 = EFF.assemble_sparse_matrix(A1dxi1, shape)
+        sA1dxi2 = EFF.assemble_sparse_matrix(A1dxi2, shape)
+        sA2dxi1 = EFF.assemble_sparse_matrix(A2dxi1, shape)
+        sA2dxi2 = EFF.assemble_sparse_matrix(A2dxi2, shape)
 
         def obj(x):
             P = x.reshape((3, -1)).T
@@ -1410,6 +1526,33 @@ class normalSmoother2(object):
 
             return err
 
+        def jac(x):
+            P = x.reshape((3, -1)).T
+            d1dxi1 = sA1dxi1 * P
+            d1dxi2 = sA1dxi2 * P
+            d2dxi1 = sA2dxi1 * P
+            d2dxi2 = sA2dxi2 * P
+            u1 = cross(d1dxi1, d1dxi2)
+            u2 = cross(d2dxi1, d2dxi2)
+            u1Mag = sqrt((u1 * u1).sum(1))[:, newaxis]
+            u2Mag = sqrt((u2 * u2).sum(1))[:, newaxis]
+            n1 = u1 / u1Mag
+            n2 = u2 / u2Mag
+
+            # derivative of err w.r.t. each unnormalised normal, then
+            # through the cross products to each tangent
+            n12 = (n1 * n2).sum(1)[:, newaxis]
+            q1 = (n12 * n1 - n2) / u1Mag
+            q2 = (n12 * n2 - n1) / u2Mag
+
+            return assembleFieldJacobian([(sA1dxi1, cross(d1dxi2, q1)),
+                                          (sA1dxi2, cross(q1, d1dxi1)),
+                                          (sA2dxi1, cross(d2dxi2, q2)),
+                                          (sA2dxi2, cross(q2, d2dxi1)),
+                                          ])
+
+        obj.jac = jac
+        obj.jac_sparsity = fieldJacobianSparsity([sA1dxi1, sA1dxi2, sA2dxi1, sA2dxi2], 3)
         return obj
 
 
@@ -1423,26 +1566,6 @@ class tangentSmoother2(object):
 
         self.F = F
         self.en2el, self.el2en = self.F.get_mapping()  # ens2elem, elem2ens maps
-        self._procMap()
-
-    def _procMap(self):
-        """ find element points of shared nodes
-        """
-        self.edgePoints = []
-        self.vertexPoints = []  # not implemented
-
-        # for each ensemble point
-        for p in list(self.en2el.keys()):
-            # edge nodes
-            if len(self.en2el[p]) == 2:
-                E = list(self.en2el[p].items())  # element points mapped to by ensemble point p
-                self.edgePoints.append(((E[0][0], list(E[0][1].keys())[0]), (
-                    E[1][0], list(E[1][1].keys())[0])))  # ((element1, elementnode1), (element2, elementnode2))
-            # vertex nodes
-            elif len(self.en2el[p]) > 2:
-                pass
-
-        return
 
     def _whichDeriv(self, elem, edge):
         """
@@ -1459,56 +1582,36 @@ class tangentSmoother2(object):
             return triMap[edge]
 
     def _procEdge(self, D):
-        """ for each pair in edgePoints, find the element and edge shared
-        and generate eval points along the shared edges, also record with
-        element direction derivative needs to be calculated
+        """ for each pair of shared element edges, generate eval points
+        along the shared edges, also record with element direction
+        derivative needs to be calculated
         """
         self.edgeEvalBasis = []
         self.edgeEvalPoints = []
         self.edgeEvalXiDirection = []
         self.nPairs = 0  # number of pairs of edge points
-        doneEdges = []  # list of element edges that have been done
-        # for each pair
-        for ep1, ep2 in self.edgePoints:
-            # get elements
-            e1 = self.F.mesh.elements[ep1[0]]
-            e2 = self.F.mesh.elements[ep2[0]]
-            # get edges for element points
-            edgeList1 = e1.get_point_edge(ep1[1])
-            edgeList2 = e2.get_point_edge(ep2[1])
+        # for each shared edge
+        for en1, ei1, en2, ei2, direction in self.F.mesh.get_topology_index().common_edges():
+            # get elements and edges
+            e1 = self.F.mesh.elements[en1]
+            e2 = self.F.mesh.elements[en2]
+            edge1 = e1.edges[ei1]
+            edge2 = e2.edges[ei2]
 
-            # ignore corners
-            if len(edgeList1) > 1 or len(edgeList2) > 2:
-                pass
+            # check if element edges are reversed
+            eval1 = edge1.get_elem_coord(linspace(0.0, 1.0, D))
+            if direction < 0:
+                eval2 = edge2.get_elem_coord(linspace(1.0, 0.0, D))
             else:
-                try:
-                    (ei1, pi1, edge1) = edgeList1[0]
-                    (ei2, pi2, edge2) = edgeList2[0]
-                except IndexError:
-                    pdb.set_trace()
-                # ignore repeat element edges
-                if ((ep1[0], ei1) in doneEdges) and ((ep2[0], ei2)) in doneEdges:
-                    pass
-                else:
-                    # check if element edges are reversed
-                    # assumes no hanging nodes and same number of nodes per edge!!!
-                    if pi1 != pi2:
-                        eval1 = edge1.get_elem_coord(linspace(0.0, 1.0, D))
-                        eval2 = edge2.get_elem_coord(linspace(1.0, 0.0, D))
-                    else:
-                        eval1 = edge1.get_elem_coord(linspace(0.0, 1.0, D))
-                        eval2 = edge2.get_elem_coord(linspace(0.0, 1.0, D))
+                eval2 = edge2.get_elem_coord(linspace(0.0, 1.0, D))
 
-                    # get basis values for these
-                    basis1 = [self.F.basis[e1.type].eval_derivatives(eval1.T, d).T for d in ((1, 0), (0, 1))]
-                    basis2 = [self.F.basis[e2.type].eval_derivatives(eval2.T, d).T for d in ((1, 0), (0, 1))]
+            # get basis values for these
+            basis1 = [self.F.basis[e1.type].eval_derivatives(eval1.T, d).T for d in ((1, 0), (0, 1))]
+            basis2 = [self.F.basis[e2.type].eval_derivatives(eval2.T, d).T for d in ((1, 0), (0, 1))]
 
-                    self.edgeEvalPoints.append((ep1[0], eval1, ep2[0], eval2))  # ( element1, ep1, element2, ep2 )
-                    self.edgeEvalBasis.append(
-                        (ep1[0], basis1, ep2[0], basis2))  # ( element1, basis1, element2, basis2 )
-                    doneEdges.append((ep1[0], ei1))
-                    doneEdges.append((ep2[0], ei2))
-                    self.nPairs += eval1.shape[0]
+            self.edgeEvalPoints.append((en1, eval1, en2, eval2))  # ( element1, ep1, element2, ep2 )
+            self.edgeEvalBasis.append((en1, basis1, en2, basis2))  # ( element1, basis1, element2, basis2 )
+            self.nPairs += eval1.shape[0]
 
         return
 
@@ -1521,10 +1624,10 @@ class tangentSmoother2(object):
         self._procEdge(D)
 
         # make derivatives evaluation matrices
-        A1dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A1dxi2 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi2 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
+        A1dxi1 = []
+        A1dxi2 = []
+        A2dxi1 = []
+        A2dxi2 = []
         row1 = 0
         row2 = 0
 
@@ -1533,24 +1636,25 @@ class tangentSmoother2(object):
             emap2 = self.el2en[e2]
 
             # make dxi1 and dxi2 matrices for points on one side
-            for n in range(b1[0].shape[1]):
-                A1dxi1[row1:row1 + b1[0].shape[0], emap1[n][0][0]] = b1[0][:, n]
-                A1dxi2[row1:row1 + b1[1].shape[0], emap1[n][0][0]] = b1[1][:, n]
+            ensNodes1 = [emap1[n][0][0] for n in range(b1[0].shape[1])]
+            A1dxi1.append(EFF.basis_matrix_triplets(b1[0], row1, ensNodes1))
+            A1dxi2.append(EFF.basis_matrix_triplets(b1[1], row1, ensNodes1))
 
             row1 += b1[0].shape[0]
 
             # make dxi1 and dxi2 matrices for points on the other side
-            for n in range(b2[0].shape[1]):
-                A2dxi1[row2:row2 + b2[0].shape[0], emap2[n][0][0]] = b2[0][:, n]
-                A2dxi2[row2:row2 + b2[1].shape[0], emap2[n][0][0]] = b2[1][:, n]
+            ensNodes2 = [emap2[n][0][0] for n in range(b2[0].shape[1])]
+            A2dxi1.append(EFF.basis_matrix_triplets(b2[0], row2, ensNodes2))
+            A2dxi2.append(EFF.basis_matrix_triplets(b2[1], row2, ensNodes2))
 
             row2 += b2[0].shape[0]
 
-        # sparsify matrices
-        sA1dxi1 = sparse.csc_matrix(A1dxi1)
-        sA1dxi2 = sparse.csc_matrix(A1dxi2)
-        sA2dxi1 = sparse.csc_matrix(A2dxi1)
-        sA2dxi2 = sparse.csc_matrix(A2dxi2)
+        # assemble sparse matrices
+        shape = (self.nPairs, self.F.get_number_of_ensemble_points())
+        sA1dxi1 = EFF.assemble_sparse_matrix(A1dxi1, shape)
+        sA1dxi2 = EFF.assemble_sparse_matrix(A1dxi2, shape)
+        sA2dxi1 = EFF.assemble_sparse_matrix(A2dxi1, shape)
+        sA2dxi2 = EFF.assemble_sparse_matrix(A2dxi2, shape)
 
         def obj(x):
             P = x.reshape((3, -1)).T
@@ -1669,8 +1773,8 @@ class tangentSmoother(object):
             return obj
 
         # make derivatives evaluation matrices
-        A1dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi1 = zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
+        A1dxi1 = []
+        A2dxi1 = []
         row1 = 0
         row2 = 0
 
@@ -1679,18 +1783,19 @@ class tangentSmoother(object):
             emap2 = self.el2en[e2]
 
             # make dxi1 matrix for points on one side
-            for n in range(b1.shape[0]):
-                A1dxi1[row1, emap1[n][0][0]] = b1[n]
+            ensNodes1 = [emap1[n][0][0] for n in range(b1.shape[0])]
+            A1dxi1.append(EFF.basis_matrix_triplets(b1.reshape((1, -1)), row1, ensNodes1))
             row1 += 1
 
             # make dxi1 and dxi2 matrices for points on the other side  
-            for n in range(b2.shape[0]):
-                A2dxi1[row2, emap2[n][0][0]] = b2[n]
+            ensNodes2 = [emap2[n][0][0] for n in range(b2.shape[0])]
+            A2dxi1.append(EFF.basis_matrix_triplets(b2.reshape((1, -1)), row2, ensNodes2))
             row2 += 1
 
-        # sparsify matrices
-        sA1dxi1 = sparse.csc_matrix(A1dxi1)
-        sA2dxi1 = sparse.csc_matrix(A2dxi1)
+        # assemble sparse matrices
+        shape = (self.nPairs, self.F.get_number_of_ensemble_points())
+        sA1dxi1 = EFF.assemble_sparse_matrix(A1dxi1, shape)
+        sA2dxi1 = EFF.assemble_sparse_matrix(A2dxi1, shape)
 
         def obj(x):
             P = x.reshape((3, -1)).T
@@ -1968,6 +2073,15 @@ class normalSmoother(object):
 
 # penalty functions for meshing fitting obj
 
+def _component_params(p):
+    """ reshape per-coordinate parameters (n_dims, n_points[, 1]) into the
+    (n_points, n_dims) layout used to evaluate all coordinates of a field
+    in one pass
+    """
+    p = array(p)
+    return p.reshape((p.shape[0], -1)).T
+
+
 # element area ratio
 class elementAreaPenalty1(object):
 
@@ -1975,22 +2089,24 @@ class elementAreaPenalty1(object):
 
         self.F = F
         self.evalD = evalD
+        self.aR0 = None
         self.calcAR0(p0)
         self.w = w
-        self.aR0 = None
 
-    def calcAR0(self, p0):
+    def _calcElementAreas(self, params):
         # evaluate 1st derivatives on eval_grid over mesh
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[0], derivs=(1, 0), unpack=False)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[0], derivs=(0, 1), unpack=False)
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[1], derivs=(1, 0), unpack=False)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[1], derivs=(0, 1), unpack=False)
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[2], derivs=(1, 0), unpack=False)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[2], derivs=(0, 1), unpack=False)
-
-        aElem = zeros(D1P1.__len__())
+        self.F.set_parameters(_component_params(params))
+        D1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0), unpack=False)
+        D2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1), unpack=False)
+
+        aElem = zeros(len(D1))
         for e in range(aElem.shape[0]):
-            aElem[e] = cross(array([D1P1[e], D1P2[e], D1P3[e]]).T, array([D2P1[e], D2P2[e], D2P3[e]]).T).sum()
+            aElem[e] = cross(D1[e].T, D2[e].T).sum()
+
+        return aElem
+
+    def calcAR0(self, p0):
+        aElem = self._calcElementAreas(p0)
 
         self.aR0 = aElem / aElem.max()
 
@@ -2004,16 +2120,7 @@ class elementAreaPenalty1(object):
         minimise
         """
 
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[0], derivs=(1, 0), unpack=False)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[0], derivs=(0, 1), unpack=False)
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[1], derivs=(1, 0), unpack=False)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[1], derivs=(0, 1), unpack=False)
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[2], derivs=(1, 0), unpack=False)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[2], derivs=(0, 1), unpack=False)
-
-        aElem = zeros(D1P1.__len__())
-        for e in range(aElem.shape[0]):
-            aElem[e] = cross(array([D1P1[e], D1P2[e], D1P3[e]]).T, array([D2P1[e], D2P2[e], D2P3[e]]).T).sum()
+        aElem = self._calcElementAreas(params)
 
         # get largest area and divide the rest by it
         d = self.aR0 - aElem / aElem.max()
@@ -2031,32 +2138,23 @@ class elementDotPenalty2D(object):
     def __init__(self, F, evalD, p0, w):
         self.F = F
         self.evalD = evalD
+        self.dot0 = None
         self.calcDot0(p0)
         self.w = w
-        self.dot0 = None
 
-    def calcDot0(self, p0):
+    def _calcDot(self, params):
         # evaluate 1st derivatives on eval_grid over mesh
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[0], derivs=(1, 0), unpack=True)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[0], derivs=(0, 1), unpack=True)
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[1], derivs=(1, 0), unpack=True)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[1], derivs=(0, 1), unpack=True)
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[2], derivs=(1, 0), unpack=True)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=p0[2], derivs=(0, 1), unpack=True)
-
-        self.dot0 = D1P1 * D2P1 + D1P2 * D2P2 + D1P3 * D2P3
+        self.F.set_parameters(_component_params(params))
+        D1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0), unpack=True)
+        D2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1), unpack=True)
+        return (D1 * D2).sum(0)
+
+    def calcDot0(self, p0):
+        self.dot0 = self._calcDot(p0)
         return
 
     def obj(self, params):
-        # evaluate 1st derivatives on eval_grid over mesh
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[0], derivs=(1, 0), unpack=True)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[0], derivs=(0, 1), unpack=True)
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[1], derivs=(1, 0), unpack=True)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[1], derivs=(0, 1), unpack=True)
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[2], derivs=(1, 0), unpack=True)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, parameters=params[2], derivs=(0, 1), unpack=True)
-
-        dot0 = D1P1 * D2P1 + D1P2 * D2P2 + D1P3 * D2P3
+        dot0 = self._calcDot(params)
         d = self.dot0 - dot0
         d = self.w * d * d
         return d
@@ -2089,48 +2187,25 @@ class elementDotPenalty3D(object):
         self.F = F
         self.evalD = evalD
         self.w = w
-        self.calcDot0(p0)
         self.dot012 = None
         self.dot013 = None
         self.dot023 = None
+        self.calcDot0(p0)
+
+    def _calcDots(self, p):
+        # evaluate derivatives on eval_grid over mesh for all coordinates
+        self.F.set_parameters(_component_params(p))
+        D1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
+        D2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
+        D3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
+
+        return (D1 * D2).sum(0), (D1 * D3).sum(0), (D2 * D3).sum(0)
 
     def calcDot0(self, p):
-        # evaluate derivatives on eval_grid over mesh
-        self.F.set_parameters(p[0])
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        self.F.set_parameters(p[1])
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        self.F.set_parameters(p[2])
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-
-        self.dot012 = D1P1 * D2P1 + D1P2 * D2P2 + D1P3 * D2P3
-        self.dot013 = D1P1 * D3P1 + D1P2 * D3P2 + D1P3 * D3P3
-        self.dot023 = D2P1 * D3P1 + D2P2 * D3P2 + D2P3 * D3P3
+        self.dot012, self.dot013, self.dot023 = self._calcDots(p)
 
     def obj(self, p):
-        # evaluate derivatives on eval_grid over mesh
-        self.F.set_parameters(p[0])
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        self.F.set_parameters(p[1])
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        self.F.set_parameters(p[2])
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D3P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-
-        dot12 = D1P1 * D2P1 + D1P2 * D2P2 + D1P3 * D2P3
-        dot13 = D1P1 * D3P1 + D1P2 * D3P2 + D1P3 * D3P3
-        dot23 = D2P1 * D3P1 + D2P2 * D3P2 + D2P3 * D3P3
+        dot12, dot13, dot23 = self._calcDots(p)
 
         d1 = self.w * (self.dot012 - dot12)
         d2 = self.w * (self.dot013 - dot13)
@@ -2147,28 +2222,16 @@ class sobelovPenalty3D(object):
         self.w = w
 
     def obj(self, p):
-        # evaluate derivatives on eval_grid over mesh
-        self.F.set_parameters(p[0])
-        D1P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D11P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(2, 0, 0), unpack=True)
-        D2P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D22P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 2, 0), unpack=True)
-        D3P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        D33P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 2), unpack=True)
-        self.F.set_parameters(p[1])
-        D1P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D11P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(2, 0, 0), unpack=True)
-        D2P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D22P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 2, 0), unpack=True)
-        D3P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        D33P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 2), unpack=True)
-        self.F.set_parameters(p[2])
-        D1P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(1, 0, 0), unpack=True)
-        D11P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(2, 0, 0), unpack=True)
-        D2P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 1, 0), unpack=True)
-        D22P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 2, 0), unpack=True)
-        D3P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 1), unpack=True)
-        D33P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=(0, 0, 2), unpack=True)
+        # evaluate derivatives on eval_grid over mesh for all coordinates
+        self.F.set_parameters(_component_params(p))
+        D = [self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=d, unpack=True) for d in
+             ((1, 0, 0), (2, 0, 0), (0, 1, 0), (0, 2, 0), (0, 0, 1), (0, 0, 2))]
+
+        S = 0.0
+        for wi, Di in zip(self.w, D):
+            S = S + wi * (Di * Di).sum(0)
+
+        return S
 
 
 class sobelovPenalty2D(object):
@@ -2179,13 +2242,12 @@ class sobelovPenalty2D(object):
         self.w = w
 
     def obj(self, p):
-        # evaluate derivatives on eval_grid over mesh
-        self.F.set_parameters(p[0])
-        D1P1, D2P1, D11P1, D22P1, D12P1 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=-1, unpack=True)
-        self.F.set_parameters(p[1])
-        D1P2, D2P2, D11P2, D22P2, D12P2 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=-1, unpack=True)
-        self.F.set_parameters(p[2])
-        D1P3, D2P3, D11P3, D22P3, D12P3 = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=-1, unpack=True)
+        # evaluate derivatives on eval_grid over mesh for all coordinates
+        self.F.set_parameters(_component_params(p))
+        D = self.F.evaluate_derivatives_in_mesh(self.evalD, derivs=-1, unpack=True)
+        D1P1, D2P1, D11P1, D22P1, D12P1 = D[0]
+        D1P2, D2P2, D11P2, D22P2, D12P2 = D[1]
+        D1P3, D2P3, D11P3, D22P3, D12P3 = D[2]
 
         S = self.w[0] * (D1P1 * D1P1 + D1P2 * D1P2 + D1P3 * D1P3) + \
             self.w[1] * (D11P1 * D11P1 + D11P2 * D11P2 + D11P3 * D11P3) + \
@@ -2216,6 +2278,8 @@ def makeSobelovPenalty3D(G, eval_d, w):
 
         return S
 
+    obj.jac = _makeSobelovJacobian(gDEval, w)
+    obj.jac_sparsity = fieldJacobianSparsity(gDEval.A, G.dimensions)
     return obj
 
 
@@ -2244,6 +2308,8 @@ def makeSobelovPenalty2D(G, eval_d, w):
 
         return S
 
+    obj.jac = _makeSobelovJacobian(gDEval, w)
+    obj.jac_sparsity = fieldJacobianSparsity(gDEval.A, G.dimensions)
     return obj
 
 
@@ -2261,9 +2327,232 @@ def makeSobelovPenalty1D(G, eval_d, w):
 
         return S
 
+    obj.jac = _makeSobelovJacobian(gDEval, w)
+    obj.jac_sparsity = fieldJacobianSparsity(gDEval.A, G.dimensions)
     return obj
 
 
+def _makeSobelovJacobian(gDEval, w):
+    """ jacobian of the weighted sum of squared derivatives at each eval
+    point. Each derivative is linear in p through gDEval's basis matrices.
+    """
+
+    w = ones(len(gDEval.A)) * w
+
+    def jac(p):
+        D = gDEval(p)
+        return assembleFieldJacobian([(A, 2.0 * w[k] * D[:, k, :].T) for k, A in enumerate(gDEval.A)])
+
+    return jac
+
+
+def makeSobelovStiffness(G, eval_d, w):
+    """ make the sparse symmetric stiffness matrix K of the Sobolev
+    smoothing energy, sampled at the eval_d grid of every element, so that
+    the energy of each dimension c of the field parameters is
+    p_c^T K p_c. w weights each derivative as in makeSobelovPenalty*.
+    """
+    gDEval = geometric_field.makeGeometricFieldDerivativesEvaluatorSparse(G, eval_d)
+    w = ones(len(gDEval.A)) * w
+
+    K = None
+    for wk, A in zip(w, gDEval.A):
+        A = sparse.csr_matrix(A)
+        Kk = wk * (A.T * A)
+        K = Kk if K is None else K + Kk
+
+    return K.tocsr()
+
+
+def makeSobelovFactorQuadrature(G, w, degree=None):
+    """ make the sparse matrix R whose rows are the weighted derivatives
+    of the field basis at Gauss quadrature points of every element, so
+    that for each dimension c of the field parameters, |R p_c|^2 is the
+    Sobolev smoothing energy integrated over the mesh in xi space, and
+    R^T R is its stiffness matrix.
+
+    Quads and hexes use Gauss-Legendre rules, triangles Dunavant rules and
+    other simplices collapsed Gauss rules, see element_types. If degree
+    is None, the rule of each element type is exact for the products of
+    its basis derivatives. Element types without a quadrature rule are
+    sampled on their evaluation grid of degree + 1 points per dimension
+    with equal weights summing to 1. w weights each derivative as in
+    makeSobelovPenalty*.
+    """
+    f = G.ensemble_field_function
+    if not f.is_flat():
+        f = f.flatten()[0]
+
+    derivValues = {}
+    triplets = None
+    row = 0
+    for elementNumber in sorted(f.mesh.elements.keys()):
+        element = f.mesh.elements[elementNumber]
+        if element.type not in derivValues:
+            basis = f.basis[element.type]
+            if degree is None:
+                elemDegree = 2 * int(max(atleast_1d(basis.basis_order)))
+            else:
+                elemDegree = degree
+            try:
+                xi, qw = element.quadrature(elemDegree)
+            except NotImplementedError:
+                xi = element.generate_eval_grid([elemDegree + 1] * element.dimensions)
+                if xi.shape[-1] != element.dimensions:
+                    xi = xi.T
+                qw = ones(len(xi)) / len(xi)
+            b = basis_value_cache.eval_derivatives(basis, xi.T, None)
+            derivValues[element.type] = (b, qw)
+
+        b, qw = derivValues[element.type]
+        if triplets is None:
+            triplets = [[] for k in range(b.shape[0])]
+            w = ones(b.shape[0]) * w
+
+        emap = f.mapper._element_to_ensemble_map[elementNumber]
+        ensNodes = [emap[n][0][0] for n in range(b.shape[1])]
+        for k in range(b.shape[0]):
+            rowScale = sqrt(w[k] * qw)[:, newaxis]
+            triplets[k].append(EFF.basis_matrix_triplets(rowScale * b[k].T, row, ensNodes))
+
+        row += len(qw)
+
+    shape = (row, f.get_number_of_ensemble_points())
+    return sparse.vstack([EFF.assemble_sparse_matrix(t, shape) for t in triplets], format='csr')
+
+
+def makeSobelovStiffnessQuadrature(G, w, degree=None):
+    """ make the sparse symmetric stiffness matrix K of the Sobolev
+    smoothing energy integrated exactly by Gauss quadrature, see
+    makeSobelovFactorQuadrature. The energy of each dimension c of the
+    field parameters is p_c^T K p_c.
+    """
+    R = makeSobelovFactorQuadrature(G, w, degree)
+    return (R.T * R).tocsr()
+
+
+def makeSobelovPenaltyQuadrature(G, w, degree=None):
+    """ make a Sobolev smoothing penalty from the quadrature factor R of
+    makeSobelovFactorQuadrature. The penalty returns the residuals R p_c
+    for all dimensions, whose sum of squares is the integrated smoothing
+    energy, so each call is a single sparse matvec. Since the residuals
+    are linear, the jacobian is constant.
+
+    The stiffness matrix is attached as obj.K, and obj.energy and
+    obj.gradient evaluate the quadratic form and its gradient.
+    """
+    R = makeSobelovFactorQuadrature(G, w, degree)
+    K = (R.T * R).tocsr()
+    dim = G.dimensions
+    J = sparse.block_diag([R] * dim, format='csr')
+
+    def obj(p):
+        return (R * p.reshape((dim, -1)).T).T.ravel()
+
+    def jac(p):
+        return J
+
+    def energy(p):
+        P = p.reshape((dim, -1)).T
+        return (P * (K * P)).sum()
+
+    def gradient(p):
+        return 2.0 * (K * p.reshape((dim, -1)).T).T.ravel()
+
+    obj.jac = jac
+    obj.jac_sparsity = J != 0
+    obj.K = K
+    obj.energy = energy
+    obj.gradient = gradient
+    return obj
+
+
+def solveLinearFit(A, data, K, data_weights=None, rhs=None, fixed_params=None, x0=None, method='direct'):
+    """ solve the linear least-squares fit of field parameters x
+
+    min sum_i w_ic * ((A x_c)_i - data_ic)^2 + x_c^T K x_c - 2 rhs_c^T x_c
+
+    independently for each dimension c through the sparse normal
+    equations
+
+    (A^T W_c A + K) x_c = A^T W_c data_c + rhs_c
+
+    A is the (n_points, n_params) sparse evaluator matrix, data is
+    (n_points, dim) and K is a sparse symmetric stiffness matrix, e.g.
+    from makeSobelovStiffness. data_weights is broadcastable to
+    (dim, n_points), as in makeObjEPEP. Parameters in fixed_params are
+    held at their values in x0 (dim, n_params).
+
+    method is 'direct' for a sparse LU solve, or 'cg' for conjugate
+    gradients with a Jacobi preconditioner warm-started from x0.
+
+    returns x (dim, n_params)
+    """
+    A = sparse.csr_matrix(A)
+    data = array(data, dtype=float)
+    nData, dim = data.shape
+    nParams = A.shape[1]
+
+    if data_weights is None:
+        W = ones((dim, nData))
+    else:
+        W = broadcast_to(data_weights, (dim, nData))
+
+    if x0 is None:
+        X = zeros((dim, nParams))
+    else:
+        X = array(x0, dtype=float).reshape((dim, nParams))
+
+    if fixed_params is None:
+        free = arange(nParams)
+        fixed = None
+    else:
+        fixed = array(fixed_params, dtype=int).ravel()
+        free = setdiff1d(arange(nParams), fixed)
+
+    solve = None
+    for c in range(dim):
+        b = A.T * (W[c] * data[:, c])
+        if rhs is not None:
+            b = b + rhs[c]
+
+        # the system matrix only changes with the data weights
+        if (solve is None) or (W[c] != W[c - 1]).any():
+            M = (A.T * sparse.diags(W[c]) * A + K).tocsr()
+            Mff = M[free][:, free].tocsc()
+            if fixed is not None:
+                Mfx = M[free][:, fixed]
+
+            if method == 'direct':
+                solve = splinalg.factorized(Mff)
+            elif method == 'cg':
+                solve = _makeCGSolver(Mff)
+            else:
+                raise ValueError('unknown method ' + method)
+
+        if fixed is not None:
+            b = b[free] - Mfx * X[c, fixed]
+
+        X[c, free] = solve(b, X[c, free]) if method == 'cg' else solve(b)
+
+    return X
+
+
+def _makeCGSolver(M):
+    """ Jacobi preconditioned conjugate gradient solver for the spd
+    matrix M
+    """
+    precon = sparse.diags(1.0 / M.diagonal())
+
+    def solve(b, x0):
+        x, info = splinalg.cg(M, b, x0=x0, M=precon)
+        if info > 0:
+            log.warning('cg did not converge in {} iterations'.format(info))
+        return x
+
+    return solve
+
+
 # ======================================================================#
 # Host mesh fitting functions                                          #
 # ======================================================================#
@@ -14,7 +14,10 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """
 import logging
 
-import scipy
+import numpy
+from scipy import sparse
+
+from gias3.fieldwork.field.topology import mesh
 
 log = logging.getLogger(__name__)
 
@@ -36,6 +39,9 @@ class Mapper:
         self.debug = debug
         self.has_custom_map = False
         self.field = None
+        self._gather_operator = None  # sparse (n_element_points, n_ensemble_points) matrix
+        self._gather_rows = {}  # { element_number: (first row, last row + 1) in self._gather_operator }
+        self._typed_gather_operators = {}  # { dtype: (source gather operator, gather operator cast to dtype) }
 
         # ==================================================================#
     def set_parent_field(self, parent_field):
@@ -46,6 +52,8 @@ class Mapper:
 
         self._ensemble_to_element_map = {}
         self._element_to_ensemble_map = {}
+        self._gather_operator = None
+        self._gather_rows = {}
 
         self.field = parent_field
         self.number_of_ensemble_points = self.field.mesh.get_number_of_ensemble_points()
@@ -74,63 +82,35 @@ class Mapper:
         """ map the current mesh topology
         """
 
-        gp = 0  # global points number
-        assigned = []  # list of element points already assigned a global number
-        ep = list(self.field.mesh.connectivity.keys())  # list of all element points and hanging points
-        ep.sort()
-        i = 0
+        if self.field.mesh.compact is not None:
+            return self._do_mapping_compact()
+
+        connectivity = self.field.mesh.connectivity
+        ep, roots, labels = mesh.label_connected_points(connectivity)  # sorted element points and hanging points
+        i = sum([1 for k in ep if k[0] == -1])  # number of hanging points, which sort first
 
         if self.debug:
             log.debug('sorted element points:', ep)
 
-        # account for points connected to hanging nodes
-        while ep[i][0] == -1:
-            assigned += self.field.mesh.connectivity[ep[i]]
-            i += 1
-
-        # map conventional points
-        for j in range(i, len(ep)):
-
-            if self.debug:
-                log.debug('mapping ep:', ep[j])
-
-            # loop through each element point in the connectivity dict
+        # map conventional points, in order of ensemble point number
+        for j in numpy.where((roots == numpy.arange(len(ep))) & (labels >= 0))[0]:
             (e, p) = ep[j]
-            # check if point has already been assigned a global number
-            if (e, p) not in assigned:
+            gp = int(labels[j])
 
-                if self.debug:
-                    log.debug('assigning global', gp, 'to', [(e, p)] + self.field.mesh.connectivity[(e, p)])
+            if self.debug:
+                log.debug('assigning global', gp, 'to', [(e, p)] + connectivity[(e, p)])
 
+            # the root element point and the points connected to it
+            for (ec, pc) in [(e, p)] + connectivity[(e, p)]:
                 # update ensemble to element map
                 try:
-                    self._ensemble_to_element_map[gp][e][p] = 1.0
+                    self._ensemble_to_element_map[gp][ec][pc] = 1.0
                 except KeyError:
-                    self._ensemble_to_element_map[gp][e] = {p: 1.0}
+                    self._ensemble_to_element_map[gp][ec] = {pc: 1.0}
 
                 # update element to ensemble map
-                # ~ self._element_to_ensemble_map[e][p].append( [ gp, [1.0] ] )
-                self._element_to_ensemble_map[e][p][0].append(gp)  ###
-                self._element_to_ensemble_map[e][p][1].append(1.0)  ###
-                assigned.append((e, p))
-
-                # map points connected to the current element point
-                for [ec, pc] in self.field.mesh.connectivity[(e, p)]:
-                    # update ensemble to element map
-                    try:
-                        self._ensemble_to_element_map[gp][ec][pc] = 1.0
-                    except KeyError:
-                        self._ensemble_to_element_map[gp][ec] = {pc: 1.0}
-
-                    # update element to ensemble map
-                    # ~ self._element_to_ensemble_map[ec][pc].append( [ gp, [1.0] ] )
-                    self._element_to_ensemble_map[ec][pc][0].append(gp)
-                    self._element_to_ensemble_map[ec][pc][1].append(1.0)
-                    assigned.append((ec, pc))
-
-                if self.debug:
-                    log.debug('assigned:', assigned)
-                gp += 1
+                self._element_to_ensemble_map[ec][pc][0].append(gp)
+                self._element_to_ensemble_map[ec][pc][1].append(1.0)
 
         if self.debug:
             log.debug('element to ensemble map:', self._element_to_ensemble_map)
@@ -181,8 +161,172 @@ class Mapper:
                             self._element_to_ensemble_map[e][p][0].append(host_gp[host_gp_i])  ###
                             self._element_to_ensemble_map[e][p][1].append(weights[host_gp_i])  ###
 
+        self.compile_gather_operator()
         return 1
 
+    # ==================================================================#
+    def _do_mapping_compact(self):
+        """ map the current mesh topology from the mesh's compact
+        connectivity store. Hanging point weights are written back to the
+        store as CSR arrays, and the gather operator is assembled from the
+        store's arrays before the element and ensemble maps are filled
+        from it.
+        """
+        store = self.field.mesh.compact
+        point_ids = store.point_ids
+
+        # hanging point weights
+        indptr = [0]
+        indices = []
+        hanging_weights = []
+        host_rows = store.element_rows(store.hanging_host)
+        for h in range(store.number_of_hanging_points):
+            row = host_rows[h]
+            host_gp = point_ids[row, :store.point_counts[row]]
+            if (host_gp < 0).any():
+                raise ValueError('hanging point {} has a host element with hanging points'.format(h))
+
+            xi = store.hanging_xi[h]
+            element_type = store.type_names[store.element_types[row]]
+            weights = self.field.basis[element_type].eval(xi[~numpy.isnan(xi)])
+            if isinstance(weights, int):
+                log.debug('ERROR: mapper._do_mapping_compact: unable to evaluate weights')
+                return
+
+            indices += host_gp.tolist()
+            hanging_weights += numpy.ravel(weights).tolist()
+            indptr.append(len(indices))
+
+        store.set_hanging_weights(indptr, indices, hanging_weights)
+
+        # gather operator rows, stacked by element number then element point
+        G = self._compile_compact_gather_operator(custom=False)
+        for row_e, element_number in enumerate(store.element_numbers):
+            element_number = int(element_number)
+            row0, row1 = self._gather_rows[element_number]
+            for p, row in enumerate(range(row0, row1)):
+                gp = G.indices[G.indptr[row]:G.indptr[row + 1]].tolist()
+                w = G.data[G.indptr[row]:G.indptr[row + 1]].tolist()
+                self._element_to_ensemble_map[element_number][p] = (gp, w)
+                for gp_i, w_i in zip(gp, w):
+                    try:
+                        self._ensemble_to_element_map[gp_i][element_number][p] = w_i
+                    except KeyError:
+                        self._ensemble_to_element_map[gp_i][element_number] = {p: w_i}
+
+        self.compile_gather_operator()
+        return 1
+
+    def _compile_compact_gather_operator(self, custom=True):
+        """ Assemble the gather operator directly from the point ids and
+        hanging point weights of the mesh's compact connectivity store.
+        """
+        store = self.field.mesh.compact
+        point_ids = store.point_ids
+        flat_ids = point_ids[point_ids != -1].astype(int)
+        n_rows = len(flat_ids)
+        rows = numpy.arange(n_rows)
+
+        # ensemble points map with weight 1
+        normal = flat_ids >= 0
+        normal_rows = rows[normal]
+        normal_cols = flat_ids[normal]
+
+        # hanging points expand to their CSR rows
+        h = -2 - flat_ids[~normal]
+        counts = store.hanging_indptr[h + 1] - store.hanging_indptr[h]
+        starts = numpy.repeat(store.hanging_indptr[h], counts)
+        offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        hanging_rows = numpy.repeat(rows[~normal], counts)
+        hanging_cols = store.hanging_indices[starts + offsets]
+
+        cols = numpy.hstack([normal_cols, hanging_cols])
+        if custom and self.has_custom_map:
+            order = numpy.array([self._custom_ensemble_order[i] for i in range(self.number_of_ensemble_points)])
+            cols = order[cols]
+
+        row_bounds = numpy.hstack([0, numpy.cumsum(store.point_counts)])
+        self._gather_rows = dict(
+            (int(e), (int(row_bounds[i]), int(row_bounds[i + 1]))) for i, e in enumerate(store.element_numbers)
+        )
+        return sparse.csr_matrix(
+            (
+                numpy.hstack([numpy.ones(len(normal_rows)), store.hanging_weights[starts + offsets]]),
+                (numpy.hstack([normal_rows, hanging_rows]), cols)
+            ),
+            shape=(n_rows, self.number_of_ensemble_points)
+        )
+
+    # ==================================================================#
+    def compile_gather_operator(self):
+        """ Assemble the element to ensemble map into a sparse CSR matrix
+        that maps the ensemble parameters to the element point parameters
+        of every element, stacked by element number then element point
+        number. Hanging point weights and any custom ensemble ordering are
+        built into the matrix.
+        """
+        if self.field is not None and self.field.mesh.compact is not None:
+            self._gather_operator = self._compile_compact_gather_operator()
+            return
+
+        rows = []
+        cols = []
+        weights = []
+        self._gather_rows = {}
+        row = 0
+        for element_number in sorted(self._element_to_ensemble_map.keys()):
+            element_map = self._element_to_ensemble_map[element_number]
+            row0 = row
+            for element_point in sorted(element_map.keys()):
+                ensemble_i, w = element_map[element_point]
+                if self.has_custom_map:
+                    ensemble_i = [self._custom_ensemble_order[i] for i in ensemble_i]
+
+                rows += [row] * len(ensemble_i)
+                cols += ensemble_i
+                weights += w
+                row += 1
+
+            self._gather_rows[element_number] = (row0, row)
+
+        self._gather_operator = sparse.csr_matrix(
+            (numpy.array(weights, dtype=float), (numpy.array(rows, dtype=int), numpy.array(cols, dtype=int))),
+            shape=(row, self.number_of_ensemble_points)
+        )
+
+    def _get_gather_operator(self, dtype=None):
+        if self._gather_operator is None:
+            self.compile_gather_operator()
+
+        if dtype is None or numpy.dtype(dtype) == self._gather_operator.dtype:
+            return self._gather_operator
+
+        # cast copies are kept until the gather operator is recompiled
+        dtype = numpy.dtype(dtype)
+        source, typed = self._typed_gather_operators.get(dtype, (None, None))
+        if source is not self._gather_operator:
+            typed = self._gather_operator.astype(dtype)
+            self._typed_gather_operators[dtype] = (self._gather_operator, typed)
+
+        return typed
+
+    def get_gather_operator(self, element_numbers=None, dtype=None):
+        """ Returns the sparse matrix mapping ensemble parameters to
+        element point parameters. If element_numbers is given, only the
+        rows of those elements are returned, stacked in the given order.
+        If dtype is given, the matrix values are of that type.
+        """
+        gather_operator = self._get_gather_operator(dtype)
+        if element_numbers is None:
+            return gather_operator
+
+        try:
+            rows = [numpy.arange(*self._gather_rows[e]) for e in element_numbers]
+        except KeyError as e:
+            raise ValueError('invalid element_number {}'.format(e.args[0]))
+
+        return gather_operator[numpy.hstack(rows)]
+
     # ==================================================================#
     def remove_element(self, element_number):
         """ removes element from the _element_to_ensemble_map
@@ -206,6 +350,7 @@ class Mapper:
 
             # remove mapping in _element_to_ensemble_map
             del self._element_to_ensemble_map[element_number]
+            self._gather_operator = None
 
             return
         else:
@@ -237,6 +382,15 @@ class Mapper:
         required element. 
         """
 
+        if not do_hack:
+            gather_operator = self._get_gather_operator()
+            try:
+                row0, row1 = self._gather_rows[element_number]
+            except KeyError:
+                raise ValueError('invalid element_number {}'.format(element_number))
+
+            return gather_operator[row0:row1].dot(numpy.asarray(parameters)).squeeze()
+
         # get mapping for specified element
         try:
             element_map = self._element_to_ensemble_map[element_number]
@@ -252,40 +406,27 @@ class Mapper:
         points = list(element_map.keys())
         points.sort()
 
-        element_parameters = []
-        if do_hack:
-            # use only when absolutely no hanging points!!!! Assumes all weights are 1, and 1 to 1 mapping
-            element_parameters = scipy.array([parameters[i] for i in [element_map[ep][0] for ep in points]])
-            element_parameters = element_parameters.squeeze()
-        else:
-            # for each element point
-            for element_point in points:
-
-                ensemble_i = element_map[element_point][0]
-                if self.has_custom_map:
-                    ensemble_i = [self._custom_ensemble_order[i] for i in ensemble_i]
-
-                ensemble_parameters = [parameters[i] for i in ensemble_i]  ###
-                weights = element_map[element_point][1]  ###
-                element_parameters.append(scipy.dot(weights, ensemble_parameters))  ###
-
-            element_parameters = scipy.array(element_parameters).squeeze()
-
-            # ~ # for each global point mapped to this element point
-            # ~ for [g, w] in element_map[ element_point ]:
-            # ~
-            # ~ # if custom ensemble point ordering, map g to the right ensemble point
-            # ~ if self.has_custom_map:
-            # ~ g = self._custom_ensemble_order[g]
-            # ~
-            # ~ # calculated the weighted contribution of this global point
-            # ~ mapped_values.append( scipy.multiply( parameters[g], w ) )
-        # ~
-        # ~ # sum contributions and append element_point parameter to element_parameters
-        # ~ element_parameters.append( list( scipy.sum( mapped_values, axis = 0 ) ) )
+        # use only when absolutely no hanging points!!!! Assumes all weights are 1, and 1 to 1 mapping
+        element_parameters = numpy.array([parameters[i] for i in [element_map[ep][0] for ep in points]])
+        element_parameters = element_parameters.squeeze()
 
         return element_parameters
 
+    # ==================================================================#
+    def get_all_element_parameters(self, parameters, dtype=None):
+        """ Uses the compiled gather operator to return the element
+        parameters of every element with a single sparse matrix product.
+        Returns a dict of {element_number: element_parameters}, where each
+        element_parameters is the same as returned by
+        get_element_parameters. If dtype is given, parameters are
+        gathered in that type.
+        """
+        gather_operator = self._get_gather_operator(dtype)
+        all_parameters = gather_operator.dot(numpy.asarray(parameters, dtype=dtype))
+        return dict(
+            (e, all_parameters[row0:row1].squeeze()) for e, (row0, row1) in self._gather_rows.items()
+        )
+
     # ==================================================================#
     def get_number_of_ensemble_points(self):
         return self.number_of_ensemble_points
@@ -312,4 +453,5 @@ class Mapper:
             self._custom_ensemble_order_inverse = {}  # {custom number: original number}
             for k in list(self._custom_ensemble_order.keys()):
                 self._custom_ensemble_order_inverse[self._custom_ensemble_order[k]] = k
+            self.compile_gather_operator()
             return 1
@@ -153,7 +153,7 @@ def makeScalarFieldEvaluatorSparse(S, eval_d, mat_points=None):
         ep = S.evaluate_geometric_field(eval_d)
         nEPs = ep.shape[1]
 
-    A = numpy.zeros((nEPs, f.get_number_of_ensemble_points()), dtype=float)
+    triplets = []
 
     if mat_points is not None:
         # ~ pdb.set_trace()
@@ -167,12 +167,12 @@ def makeScalarFieldEvaluatorSparse(S, eval_d, mat_points=None):
                 ensNodes = [emap[k][0][0] for k in list(emap.keys())]
                 elemEnsNodes[elem] = ensNodes
 
-            A[mpI, ensNodes] = b
+            triplets.append(EFF.basis_matrix_triplets(numpy.reshape(b, (1, -1)), mpI, ensNodes))
     else:
         # calculate static basis values for the required evalD and assemble
         # matrix
         basisValues = {}
-        A = numpy.zeros((ep.shape[0], f.get_number_of_ensemble_points()), dtype=float)
+        nEPs = ep.shape[0]
         row = 0
         for elementNumber in numpy.sort(list(f.mesh.elements.keys())):
             # get element
@@ -182,16 +182,15 @@ def makeScalarFieldEvaluatorSparse(S, eval_d, mat_points=None):
                 evalGrid = element.generate_eval_grid(eval_d).squeeze()
                 basisValues[element.type] = f.basis[element.type].eval(evalGrid.T).T
 
-            # fill in A matrix
+            # add element block to A matrix
             b = basisValues[element.type]  # basis values
             emap = f.mapper._element_to_ensemble_map[elementNumber]  # element to ensemble map
-            for n in range(b.shape[1]):
-                A[row:row + b.shape[0], emap[n][0][0]] = b[:, n]
+            ensNodes = [emap[n][0][0] for n in range(b.shape[1])]
+            triplets.append(EFF.basis_matrix_triplets(b, row, ensNodes))
 
             row += b.shape[0]
 
-    # sparsify A
-    As = sparse.csc_matrix(A)
+    As = EFF.assemble_sparse_matrix(triplets, (nEPs, f.get_number_of_ensemble_points()))
 
     def evaluator(P):
         E = As * P
@@ -215,7 +214,7 @@ def makeScalarFieldDerivativesEvaluatorSparse(S, eval_d):
     # calculate static basis values for the required evalD and assemble
     # matrices
     basisValues = {}
-    A = [numpy.zeros((ep.shape[0], f.get_number_of_ensemble_points()), dtype=float) for i in range(epd.shape[0])]
+    triplets = [[] for i in range(epd.shape[0])]
     row = 0
     for elementNumber in numpy.sort(list(f.mesh.elements.keys())):
         # get element
@@ -225,12 +224,12 @@ def makeScalarFieldDerivativesEvaluatorSparse(S, eval_d):
             evalGrid = element.generate_eval_grid(eval_d)
             basisValues[element.type] = f.basis[element.type].eval_derivatives(evalGrid.T, None)
 
-        # fill in A matrix
-        b = basisValues[element.type].copy()  # basis values dongdong
+        # add element blocks to A matrices
+        b = basisValues[element.type]  # basis values
         emap = f.mapper._element_to_ensemble_map[elementNumber]  # element to ensemble map
+        ensNodes = [emap[n][0][0] for n in range(b.shape[1])]
         for d in range(b.shape[0]):
-            for n in range(b.shape[1]):
-                A[d][row:row + b.shape[2], emap[n][0][0]] = b[d, n, :]
+            triplets[d].append(EFF.basis_matrix_triplets(b[d].T, row, ensNodes))
 
         row += b.shape[2]
 
@@ -250,7 +249,8 @@ def makeScalarFieldDerivativesEvaluatorSparse(S, eval_d):
     # ~ return numpy.array([Dx1,Dx2,DDx1,DDx2,Dx1x2]).swapaxes(0,1)
 
     # stack all derivative A matrices
-    AStackedSparse = sparse.csc_matrix(numpy.vstack(A))
+    A = [EFF.assemble_sparse_matrix(t, (ep.shape[0], f.get_number_of_ensemble_points())) for t in triplets]
+    AStackedSparse = sparse.vstack(A, format='csc')
     nDerivs = len(A)
 
     def evaluator(P):
@@ -356,10 +356,10 @@ class normalSmoother(object):
         self._procEdge(D)
 
         # make derivatives evaluation matrices
-        A1dxi1 = numpy.zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A1dxi2 = numpy.zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi1 = numpy.zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
-        A2dxi2 = numpy.zeros((self.nPairs, self.F.get_number_of_ensemble_points()), dtype=float)
+        A1dxi1 = []
+        A1dxi2 = []
+        A2dxi1 = []
+        A2dxi2 = []
         row1 = 0
         row2 = 0
 
@@ -368,24 +368,25 @@ class normalSmoother(object):
             emap2 = self.el2en[e2]
 
             # make dxi1 and dxi2 matrices for points on one side
-            for n in range(b1[0].shape[1]):
-                A1dxi1[row1:row1 + b1[0].shape[0], emap1[n][0][0]] = b1[0][:, n]
-                A1dxi2[row1:row1 + b1[1].shape[0], emap1[n][0][0]] = b1[1][:, n]
+            ensNodes1 = [emap1[n][0][0] for n in range(b1[0].shape[1])]
+            A1dxi1.append(EFF.basis_matrix_triplets(b1[0], row1, ensNodes1))
+            A1dxi2.append(EFF.basis_matrix_triplets(b1[1], row1, ensNodes1))
 
             row1 += b1[0].shape[0]
 
             # make dxi1 and dxi2 matrices for points on the other side
-            for n in range(b2[0].shape[1]):
-                A2dxi1[row2:row2 + b2[0].shape[0], emap2[n][0][0]] = b2[0][:, n]
-                A2dxi2[row2:row2 + b2[1].shape[0], emap2[n][0][0]] = b2[1][:, n]
+            ensNodes2 = [emap2[n][0][0] for n in range(b2[0].shape[1])]
+            A2dxi1.append(EFF.basis_matrix_triplets(b2[0], row2, ensNodes2))
+            A2dxi2.append(EFF.basis_matrix_triplets(b2[1], row2, ensNodes2))
 
             row2 += b2[0].shape[0]
 
-        # sparsify matrices
-        sA1dxi1 = sparse.csc_matrix(A1dxi1)
-        sA1dxi2 = sparse.csc_matrix(A1dxi2)
-        sA2dxi1 = sparse.csc_matrix(A2dxi1)
-        sA2dxi2 = sparse.csc_matrix(A2dxi2)
+        # assemble sparse matrices
+        shape = (self.nPairs, self.F.get_number_of_ensemble_points())
+        sA1dxi1 = EFF.assemble_sparse_matrix(A1dxi1, shape)
+        sA1dxi2 = EFF.assemble_sparse_matrix(A1dxi2, shape)
+        sA2dxi1 = EFF.assemble_sparse_matrix(A2dxi1, shape)
+        sA2dxi2 = EFF.assemble_sparse_matrix(A2dxi2, shape)
 
         V1 = numpy.ones([self.nPairs, 3], dtype=float)
         V2 = numpy.ones([self.nPairs, 3], dtype=float)
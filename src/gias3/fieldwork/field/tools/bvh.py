@@ -0,0 +1,273 @@
+"""
+FILE: bvh.py
+LAST MODIFIED: 16-10-2026
+DESCRIPTION:
+Bounding volume hierarchy of the element bounding boxes of a mesh, for
+finding the elements that can contain, or be closest to, query points.
+
+===============================================================================
+This file is part of GIAS2. (https://bitbucket.org/jangle/gias2)
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+===============================================================================
+"""
+import logging
+
+import numpy
+
+from gias3.fieldwork.field.basis.basis import basis_value_cache
+
+log = logging.getLogger(__name__)
+
+LEBESGUE_DENSITY = 20
+
+
+def element_lebesgue_constant(element, basis, density=LEBESGUE_DENSITY):
+    """ estimates the Lebesgue constant max(sum(|N_i|)) of an element's
+    basis functions N_i from their values on a density discretisation
+    of the element.
+
+    A point of the element lies within this factor of the half-width of
+    the box around the element's nodes, measured from the box centre.
+    """
+    grid = element.generate_eval_grid([density] * element.dimensions).reshape((-1, element.dimensions))
+    B = basis_value_cache.eval(basis, grid.T)
+    return numpy.abs(B).sum(0).max()
+
+
+def mesh_key(field_function):
+    """ key identifying the elements of a field function's mesh: the
+    number, type and ensemble point mapping of each element. Element
+    boxes, and so the tree, are only valid for the mesh of this key.
+    """
+    el2en = field_function.mapper._element_to_ensemble_map
+    key = []
+    for e in sorted(field_function.mesh.elements.keys()):
+        element = field_function.mesh.elements[e]
+        emap = el2en.get(e, {})
+        key.append((e, element.type, element.is_element,
+                    tuple(tuple(emap[p][0]) for p in sorted(emap.keys()))))
+    return tuple(key)
+
+
+def build_median_tree(centres, leaf_size):
+    """ builds a binary tree over the (n, d) array centres by recursive
+    median splits along the longest axis of the centres under each node,
+    until nodes hold no more than leaf_size centres. Nodes are numbered in
+    depth-first order.
+
+    returns order, the centre indices sorted so that each node holds a
+    contiguous range of them, and the left child, right child, start in
+    order, count and depth of each node. Leaves have left child -1.
+    """
+    order = numpy.arange(len(centres))
+    left = []
+    right = []
+    start = []
+    count = []
+    depth = []
+
+    def build_node(i0, i1, d):
+        node = len(left)
+        left.append(-1)
+        right.append(-1)
+        start.append(i0)
+        count.append(i1 - i0)
+        depth.append(d)
+        if (i1 - i0) > leaf_size:
+            ind = order[i0:i1]
+            axis = numpy.argmax(numpy.ptp(centres[ind], axis=0))
+            mid = (i0 + i1) // 2
+            order[i0:i1] = ind[numpy.argpartition(centres[ind, axis], mid - i0)]
+            left[node] = build_node(i0, mid, d + 1)
+            right[node] = build_node(mid, i1, d + 1)
+        return node
+
+    build_node(0, len(centres), 0)
+    return (order, numpy.array(left, dtype=int), numpy.array(right, dtype=int), numpy.array(start, dtype=int),
+            numpy.array(count, dtype=int), numpy.array(depth, dtype=int))
+
+
+class ElementBVH(object):
+    """ Bounding volume hierarchy over axis-aligned boxes bounding the
+    elements of an ensemble field function.
+
+    Element boxes are built from the element nodal coordinates. Since
+    Lagrange elements can overshoot the box of their nodes, each box is
+    inflated about its centre by the Lebesgue constant of the element
+    basis, times safety. Nodes of the tree are stored in flat arrays in
+    depth-first order, and queries traverse the tree for all query
+    points at once, one level at a time.
+
+    When only the nodal coordinates change, refit updates the boxes
+    without rebuilding the tree.
+    """
+
+    def __init__(self, field_function, parameters, leaf_size=4, safety=1.05):
+        """ field_function is an ensemble field function, parameters its
+        (n_ensemble_points, n_dimensions) nodal coordinates.
+        """
+        self.f = field_function
+        self.leaf_size = leaf_size
+        self.safety = safety
+        self.element_numbers = numpy.array(
+            sorted(e for e, element in field_function.mesh.elements.items() if element.is_element),
+            dtype=int
+        )
+        self.n_ensemble_points = field_function.get_number_of_ensemble_points()
+        self.mesh_key = mesh_key(field_function)
+        if len(self.element_numbers) == 0:
+            raise ValueError('mesh has no elements')
+
+        self._lebesgue = {}
+        self._type_slots = {}
+        for slot, e in enumerate(self.element_numbers):
+            element = field_function.mesh.elements[e]
+            if element.type not in self._lebesgue:
+                self._lebesgue[element.type] = element_lebesgue_constant(
+                    element, field_function.basis[element.type]
+                )
+            self._type_slots.setdefault(element.type, []).append(slot)
+
+        self.element_lower = None
+        self.element_upper = None
+        self._compute_element_boxes(parameters)
+        self._build()
+
+    # ==================================================================#
+    def _compute_element_boxes(self, parameters):
+        parameters = numpy.asarray(parameters, dtype=float)
+        element_parameters = self.f.mapper.get_all_element_parameters(parameters)
+        n_dims = parameters.shape[1] if parameters.ndim > 1 else 1
+        lower = numpy.empty((len(self.element_numbers), n_dims), dtype=float)
+        upper = numpy.empty((len(self.element_numbers), n_dims), dtype=float)
+
+        for e_type, slots in self._type_slots.items():
+            X = numpy.array([element_parameters[self.element_numbers[s]] for s in slots])
+            X = X.reshape((len(slots), -1, n_dims))
+            x_min = X.min(1)
+            x_max = X.max(1)
+            centre = 0.5 * (x_min + x_max)
+            half_width = 0.5 * (x_max - x_min) * self._lebesgue[e_type] * self.safety
+            lower[slots] = centre - half_width
+            upper[slots] = centre + half_width
+
+        self.element_lower = lower
+        self.element_upper = upper
+
+    def _build(self):
+        centres = 0.5 * (self.element_lower + self.element_upper)
+        self.order, self.left, self.right, self.start, self.count, self.depth = \
+            build_median_tree(centres, self.leaf_size)
+        self._leaves = numpy.where(self.left < 0)[0]
+        self._refit_nodes()
+
+    def _refit_nodes(self):
+        n_nodes = len(self.left)
+        self.node_lower = numpy.empty((n_nodes, self.element_lower.shape[1]), dtype=float)
+        self.node_upper = numpy.empty((n_nodes, self.element_upper.shape[1]), dtype=float)
+
+        # leaves bound their elements, then parents their children,
+        # deepest level first
+        leaf_starts = self.start[self._leaves]
+        self.node_lower[self._leaves] = numpy.minimum.reduceat(self.element_lower[self.order], leaf_starts, axis=0)
+        self.node_upper[self._leaves] = numpy.maximum.reduceat(self.element_upper[self.order], leaf_starts, axis=0)
+        for d in range(self.depth.max(), -1, -1):
+            nodes = numpy.where((self.depth == d) & (self.left >= 0))[0]
+            self.node_lower[nodes] = numpy.minimum(self.node_lower[self.left[nodes]],
+                                                   self.node_lower[self.right[nodes]])
+            self.node_upper[nodes] = numpy.maximum(self.node_upper[self.left[nodes]],
+                                                   self.node_upper[self.right[nodes]])
+
+    def refit(self, parameters):
+        """ updates the element and tree boxes for new nodal coordinates
+        without changing the tree
+        """
+        self._compute_element_boxes(parameters)
+        self._refit_nodes()
+
+    # ==================================================================#
+    @staticmethod
+    def _box_sq_distances(points, lower, upper):
+        """ squared distances from each point to the nearest and furthest
+        point of its box
+        """
+        d_min = numpy.maximum(lower - points, 0.0) + numpy.maximum(points - upper, 0.0)
+        d_max = numpy.maximum(numpy.abs(points - lower), numpy.abs(points - upper))
+        return (d_min * d_min).sum(1), (d_max * d_max).sum(1)
+
+    def _expand_leaves(self, point_index, leaves):
+        """ expands (point, leaf node) pairs into (point, element slot)
+        pairs
+        """
+        counts = self.count[leaves]
+        offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        slots = self.order[numpy.repeat(self.start[leaves], counts) + offsets]
+        return numpy.repeat(point_index, counts), slots
+
+    def _traverse(self, points, prune):
+        """ traverses the tree for all points at once. prune is called
+        with the point indices, their squared nearest and furthest box
+        distances, and returns a mask of the pairs to keep.
+        """
+        point_index = numpy.arange(points.shape[0])
+        nodes = numpy.zeros(points.shape[0], dtype=int)
+        leaf_points = []
+        leaf_nodes = []
+        while len(point_index):
+            d_min, d_max = self._box_sq_distances(
+                points[point_index], self.node_lower[nodes], self.node_upper[nodes]
+            )
+            keep = prune(point_index, d_min, d_max)
+            point_index = point_index[keep]
+            nodes = nodes[keep]
+
+            is_leaf = self.left[nodes] < 0
+            leaf_points.append(point_index[is_leaf])
+            leaf_nodes.append(nodes[is_leaf])
+            point_index = numpy.repeat(point_index[~is_leaf], 2)
+            nodes = numpy.column_stack([self.left[nodes[~is_leaf]], self.right[nodes[~is_leaf]]]).ravel()
+
+        point_index, slots = self._expand_leaves(numpy.hstack(leaf_points), numpy.hstack(leaf_nodes))
+        d_min, d_max = self._box_sq_distances(
+            points[point_index], self.element_lower[slots], self.element_upper[slots]
+        )
+        keep = prune(point_index, d_min, d_max)
+        return point_index[keep], self.element_numbers[slots[keep]]
+
+    def query_containing(self, points, tol=0.0):
+        """ returns (point_index, element_numbers) arrays of the pairs of
+        points and elements whose bounding box, enlarged by tol, contains
+        the point. Pairs are grouped by point.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        tol2 = tol * tol
+
+        def prune(point_index, d_min, d_max):
+            return d_min <= tol2
+
+        point_index, elems = self._traverse(points, prune)
+        order = numpy.argsort(point_index, kind='stable')
+        return point_index[order], elems[order]
+
+    def query_nearest(self, points):
+        """ returns (point_index, element_numbers) arrays of the pairs of
+        points and elements that can contain the closest point on the mesh
+        to the point. Pairs are grouped by point.
+
+        The furthest distance from a point to any box bounds its distance
+        to the mesh, so elements whose box is further than the smallest
+        such bound are pruned.
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        upper_bound = numpy.full(points.shape[0], numpy.inf)
+
+        def prune(point_index, d_min, d_max):
+            numpy.minimum.at(upper_bound, point_index, d_max)
+            return d_min <= upper_bound[point_index]
+
+        point_index, elems = self._traverse(points, prune)
+        order = numpy.argsort(point_index, kind='stable')
+        return point_index[order], elems[order]
@@ -17,7 +17,8 @@ import logging
 import sys
 
 import numpy as np
-from scipy.optimize import leastsq, fmin
+from scipy import sparse
+from scipy.optimize import leastsq, least_squares, fmin
 from scipy.spatial import cKDTree
 
 from gias3.common import transform3D
@@ -26,6 +27,9 @@ from gias3.fieldwork.field import geometric_field_fitter as GFF
 
 log = logging.getLogger(__name__)
 
+# weights of the 10 3D Sobolev terms of host mesh smoothing, scaled by host_sob_w
+HOST_SOBOLEV_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 2.0, 2.0, 3.0])
+
 
 # ======================================================================#
 def _sampleData(data, N):
@@ -489,6 +493,30 @@ def combObjGeomSobNormalStack(g_obj, sob_obj, n_obj, sob_w, n_w, fixed_node_i=No
 
             return err
 
+    # stacked jacobian if every term provides one
+    if all(hasattr(o, 'jac') for o in (g_obj, sob_obj, n_obj)):
+        if fixed_node_i is None:
+            def jac(p):
+                return sparse.vstack((g_obj.jac(p), sob_obj.jac(p) * sob_w, n_obj.jac(p) * n_w), format='csr')
+        else:
+            def jac(p):
+                p = p.reshape(3, -1).T
+                p[fixed_node_i] = fixed_node_val
+                nNodes = p.shape[0]
+                p = p.T.ravel()
+
+                J = sparse.vstack((g_obj.jac(p), sob_obj.jac(p) * sob_w, n_obj.jac(p) * n_w), format='csr')
+                # fixed node parameters are overwritten so have no effect
+                fixedCols = (np.arange(3)[:, np.newaxis] * nNodes + np.atleast_1d(fixed_node_i)).ravel()
+                colMask = np.ones(J.shape[1])
+                colMask[fixedCols] = 0.0
+                return J * sparse.diags(colMask)
+
+        obj.jac = jac
+
+    if all(hasattr(o, 'jac_sparsity') for o in (g_obj, sob_obj, n_obj)):
+        obj.jac_sparsity = sparse.vstack((g_obj.jac_sparsity, sob_obj.jac_sparsity, n_obj.jac_sparsity), format='csr')
+
     return obj
 
 
@@ -531,6 +559,77 @@ def combObjGeomSobNormalSum(g_obj, sob_obj, n_obj, sob_w, n_w, fixed_node_i=None
     return obj
 
 
+def minimiseLeastSquares(obj, p0, xtol, maxfev, solver='leastsq', jac=None, jac_sparsity=None):
+    """ minimise the sum of squares of obj(p) starting from p0 and return
+    the optimal parameters.
+
+    solver='leastsq' uses scipy.optimize.leastsq. jac, if given, should
+    return the sparse jacobian of obj and is densified for MINPACK, see
+    GFF.leastsqJacobian. Prefer solver='least_squares' for large fits.
+
+    solver='least_squares' uses the trust-region reflective method of
+    scipy.optimize.least_squares, keeping the jacobian sparse. Without
+    jac, the jacobian is estimated by finite differences using the sparse
+    jac_sparsity pattern to group columns. maxfev, as in leastsq, is
+    converted to an iteration limit of maxfev/len(p0).
+    """
+    if solver == 'leastsq':
+        return GFF.leastsqJacobian(obj, p0, jac, xtol, maxfev=maxfev)[0]
+    elif solver == 'least_squares':
+        maxNFev = (maxfev // len(p0)) or None
+        if jac is None:
+            output = least_squares(obj, p0, jac='2-point', jac_sparsity=jac_sparsity, method='trf',
+                                   xtol=xtol, max_nfev=maxNFev)
+        else:
+            output = least_squares(obj, p0, jac=jac, method='trf', tr_solver='lsmr', xtol=xtol, max_nfev=maxNFev)
+        return output.x
+    else:
+        raise ValueError('unknown solver ' + solver)
+
+
+def makeHostMeshJacobianSparsity(slave_sparsity, slave_eval, smoother, d=3):
+    """ make the sparsity pattern of the jacobian of the stacked slave and
+    host smoothing errors of a host mesh fit with respect to the flattened
+    host mesh parameters, given the sparsity pattern of the slave errors
+    with respect to the flattened slave parameters.
+    """
+    A = sparse.csr_matrix(slave_eval.A, copy=True)
+    A.data[:] = 1.0
+    dSlave = sparse.block_diag([A] * d, format='csr')
+    slaveS = sparse.csr_matrix(slave_sparsity, dtype=float) * dSlave
+    return sparse.vstack((sparse.csr_matrix(slaveS > 0), smoother.jac_sparsity), format='csr')
+
+
+def makeHostMeshJacobian(slave_jac, slave_eval, smoother, fixed_slave_inds=None, fixed_slave_params=None):
+    """ make the jacobian of the stacked slave and host smoothing errors of
+    a host mesh fit with respect to the flattened host mesh parameters.
+
+    slave_jac(slave_params) should return the sparse jacobian of the slave
+    errors with respect to the flattened (dimension-major) slave
+    parameters. These are linear in the host parameters through the basis
+    matrix of slave_eval. Slave parameters at fixed_slave_inds are held at
+    fixed_slave_params and so do not depend on the host parameters.
+    """
+    A = slave_eval.A
+    nHostPoints = A.shape[1]
+
+    def jac(host_params):
+        host_params = host_params.ravel()
+        d = len(host_params) // nHostPoints
+        slaveParams = slave_eval(host_params).ravel()
+        dSlave = sparse.block_diag([A] * d, format='csr')
+        if fixed_slave_inds is not None:
+            slaveParams[fixed_slave_inds] = fixed_slave_params
+            rowMask = np.ones(dSlave.shape[0])
+            rowMask[fixed_slave_inds] = 0.0
+            dSlave = sparse.diags(rowMask) * dSlave
+
+        slaveJ = sparse.csr_matrix(slave_jac(slaveParams)) * dSlave
+        return sparse.vstack((slaveJ, smoother.jac(host_params)), format='csr')
+
+    return jac
+
+
 # ======================================================================#
 # mesh fitting function                                                #
 # ======================================================================#
@@ -893,9 +992,11 @@ use these instead of the ones above
 def fitSurface(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
                xtol=1e-6, it_max=10, data_weights=None, n_closest_points=1, tree_args=None,
                fit_verbose=False, sob_obj=None, n_obj=None, g_obj=None, gf_eval=None,
-               full_errors=False):
+               full_errors=False, solver='leastsq'):
     """
     both EPDP and DPEP
+
+    solver is 'leastsq' or 'least_squares', see minimiseLeastSquares.
     """
     tree_args = {} if tree_args is None else tree_args
 
@@ -906,6 +1007,10 @@ def fitSurface(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
         normalSmoother = GFF.normalSmoother2(GF.ensemble_field_function.flatten()[0])
         n_obj = normalSmoother.makeObj(normal_d)
     if g_obj is None:
+        if gf_eval is None:
+            gf_eval = geometric_field.makeIncrementalEvaluatorSparse(
+                geometric_field.makeGeometricFieldEvaluatorSparse(GF, GD), GF.dimensions
+            )
         g_obj = gObjMakers[g_obj_type](GF, data, GD, data_weights=data_weights,
                                        n_closest_points=n_closest_points, tree_args=tree_args,
                                        evaluator=gf_eval
@@ -916,8 +1021,9 @@ def fitSurface(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
     # initialise geometric field fitter
     p0 = GF.get_field_parameters().ravel()
     maxFEval = len(p0) * it_max
-    output = leastsq(obj, p0, xtol=xtol, maxfev=maxFEval)
-    Opt = output[0].reshape((GF.dimensions, -1, 1))
+    pOpt = minimiseLeastSquares(obj, p0, xtol, maxFEval, solver=solver, jac=getattr(obj, 'jac', None),
+                                jac_sparsity=getattr(obj, 'jac_sparsity', None))
+    Opt = pOpt.reshape((GF.dimensions, -1, 1))
 
     fE = g_obj(Opt.ravel())
     finalErr = np.sqrt(fE[np.where(np.isfinite(fE))].mean())
@@ -932,7 +1038,7 @@ def fitSurface(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
 def fitSurfaceFixNodes(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
                        fixed_nodes, xtol=1e-6, it_max=10, data_weights=None, n_closest_points=1,
                        tree_args=None, fit_verbose=False, sob_obj=None, n_obj=None, g_obj=None,
-                       gf_eval=None, full_errors=False):
+                       gf_eval=None, full_errors=False, solver='leastsq'):
     # get indices of params free to fit
     tree_args = {} if tree_args is None else tree_args
 
@@ -946,6 +1052,10 @@ def fitSurfaceFixNodes(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_
         normalSmoother = GFF.normalSmoother2(GF.ensemble_field_function.flatten()[0])
         n_obj = normalSmoother.makeObj(normal_d)
     if g_obj is None:
+        if gf_eval is None:
+            gf_eval = geometric_field.makeIncrementalEvaluatorSparse(
+                geometric_field.makeGeometricFieldEvaluatorSparse(GF, GD), GF.dimensions
+            )
         g_obj = gObjMakers[g_obj_type](GF, data, GD, data_weights=data_weights,
                                        n_closest_points=n_closest_points, tree_args=tree_args, evaluator=gf_eval
                                        )
@@ -958,12 +1068,23 @@ def fitSurfaceFixNodes(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_
         X[nonFixedInd] = x
         return obj(X)
 
+    if hasattr(obj, 'jac'):
+        def fixedJac(x):
+            X[nonFixedInd] = x
+            return obj.jac(X).tocsc()[:, nonFixedInd[0]]
+    else:
+        fixedJac = None
+
+    if hasattr(obj, 'jac_sparsity'):
+        fixedJacSparsity = obj.jac_sparsity.tocsc()[:, nonFixedInd[0]]
+    else:
+        fixedJacSparsity = None
+
     # initialise geometric field fitter
     p0 = GF.get_field_parameters().ravel()[nonFixedInd]
     maxFEval = len(p0) * it_max
-    output = leastsq(fixedObj, p0, xtol=xtol, maxfev=maxFEval)
-
-    X[nonFixedInd] = output[0]
+    X[nonFixedInd] = minimiseLeastSquares(fixedObj, p0, xtol, maxFEval, solver=solver, jac=fixedJac,
+                                          jac_sparsity=fixedJacSparsity)
     Opt = X.copy().reshape((GF.dimensions, -1, 1))
 
     fE = g_obj(Opt.ravel())
@@ -976,6 +1097,33 @@ def fitSurfaceFixNodes(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_
         return GF, Opt, finalErr
 
 
+def fitSurfaceLinear(GF, g_obj, sob_k, fixed_nodes=None, method='direct', full_errors=False):
+    """
+    fit GF to the fixed correspondences of an EPEP objective g_obj with
+    Sobolev smoothing by solving the linear least-squares problem with
+    stiffness matrix sob_k in one sparse solve, see GFF.solveLinearFit.
+    Returns the same outputs as fitSurface.
+
+    The solve minimises sum(d**2) + p.T*sob_k*p, where d are the data
+    distances. This is not the objective of the leastsq fits, which
+    minimise the sum of squares of g_obj and the Sobolev penalty, i.e.
+    sum(d**4) + sum(sum_k(w_k*D_k**2)**2). Sobolev weights therefore do
+    not carry over between the two.
+    """
+    X = GFF.solveLinearFit(g_obj.A, g_obj.data, sob_k, data_weights=g_obj.data_weights,
+                           fixed_params=fixed_nodes, x0=GF.get_field_parameters()[:, :, 0], method=method)
+    Opt = X[:, :, np.newaxis]
+
+    fE = g_obj(Opt.ravel())
+    finalErr = np.sqrt(fE[np.where(np.isfinite(fE))].mean())
+    GF.set_field_parameters(Opt.copy())
+
+    if full_errors:
+        return GF, Opt, finalErr, fE
+    else:
+        return GF, Opt, finalErr
+
+
 def closestSearch(X, Y, k=1, tree_args={}):
     """
     for each point in X, find the closest point in Y
@@ -1002,10 +1150,22 @@ def calcRelError(x1, x2):
 def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, normal_w,
                           fixed_nodes=None, sample_elems=None, xtol=1e-6, it_max=10,
                           it_max_per_it=3, data_weights=None, n_closest_points=1, tree_args=None,
-                          fit_verbose=False, full_errors=False, fit_output_callback=None):
+                          fit_verbose=False, full_errors=False, fit_output_callback=None, solver='leastsq',
+                          material_point_search=False):
     """
     search for closest points once per leastsq iteration
     gObjType='EPDP' or 'DPEP' supported only
+    solver is 'leastsq' or 'least_squares', see minimiseLeastSquares, or
+    'linear' to fit each iteration in one sparse solve, see
+    fitSurfaceLinear. 'linear' falls back to 'leastsq' if normal_w is
+    non-zero since the normal penalty is nonlinear. Note that 'linear'
+    minimises squared distances plus the Sobolev energy, while the other
+    solvers minimise the squares of the distance and Sobolev residuals,
+    so sob_w is not on the same scale for both.
+    if material_point_search is True and gObjType is 'DPEP', each data
+    point is matched to its closest material point on the mesh instead of
+    the closest discretised point. Material points are warm-started from
+    the previous iteration, see geometric_field.MaterialPointCache.
     returns fitOutput = [GF, pOpt, fitRMS, [fitErrors]]
     """
     fitOutput = None
@@ -1030,6 +1190,13 @@ def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, norm
         log.debug('maxIt:', it_max)
         log.debug('it_maxPerIt:', it_max_per_it)
 
+    if solver == 'linear':
+        if normal_w:
+            log.debug('normal smoothing is nonlinear, using leastsq')
+            solver = 'leastsq'
+        else:
+            sobK = GFF.makeSobelovStiffness(GF, sob_d, sob_w)
+
     sobObj = GFF.makeSobelovPenalty2D(GF, sob_d, sob_w)
     normalSmoother = GFF.normalSmoother2(GF.ensemble_field_function.flatten()[0])
     nObj = normalSmoother.makeObj(normal_d)
@@ -1042,11 +1209,14 @@ def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, norm
     # if gObjType=='EPDP':
     # GFEval = geometric_field.makeGeometricFieldEvaluatorSparse( GF, GD )
 
+    if material_point_search:
+        mpCache = geometric_field.MaterialPointCache(GF, data)
+
     it = 0
     fitRMSOld = 9999999999
     while it < it_max:
         if g_obj_type == 'EPDP':
-            ep = GFEval(GF.get_field_parameters().ravel()).T
+            ep = GFEval(GF.get_field_parameters(copy=False).ravel()).T
             fitData, fitDataI, fitDataDist = closestSearch(ep, data, 1, tree_args)
             if data_weights is not None:
                 gObj = gObjMakers['EPEP'](GF, fitData, GD, data_weights=data_weights[fitDataI], evaluator=GFEval)
@@ -1056,18 +1226,19 @@ def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, norm
             if sample_elems is None:
                 fitData = data
 
-                # KD-tree search
-                if useGFEval:
-                    ep = GFEval(GF.get_field_parameters().ravel()).T
+                if material_point_search:
+                    # minisation search, warm-started from the last iteration
+                    closestMPs = mpCache.search()[0]
+                    gObj = gObjMakers['EPEP'](GF, fitData, GD, data_weights=data_weights, mat_points=closestMPs)
                 else:
-                    ep = GF.discretiseAllElementsRegularGeoD(GD, geo_coordinates=True)[1]
-
-                fitEP, fitEPI, fitEPDist = closestSearch(data, ep, 1, tree_args)
-                gObj = gObjMakers['EPEP'](GF, fitData, GD, data_weights=data_weights, ep_index=fitEPI)
-
-                # minisation search
-                # ~ closestMPs, fitEP, fitEPDist = GF.find_closest_material_points( data, initGD=[10,10], verbose=True )
-                # ~ gObj = gObjMakers['EPEP']( GF, fitData, GD, data_weights=data_weights, mat_points=closestMPs )
+                    # KD-tree search
+                    if useGFEval:
+                        ep = GFEval(GF.get_field_parameters(copy=False).ravel()).T
+                    else:
+                        ep = GF.discretiseAllElementsRegularGeoD(GD, geo_coordinates=True)[1]
+
+                    fitEP, fitEPI, fitEPDist = closestSearch(data, ep, 1, tree_args)
+                    gObj = gObjMakers['EPEP'](GF, fitData, GD, data_weights=data_weights, ep_index=fitEPI)
             else:
                 ep = np.vstack([GF.discretiseElementRegularGeoD(e, GD, geo_coords=True)[1] for e in sample_elems])
 
@@ -1076,15 +1247,18 @@ def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, norm
             # ~ geometric_field.mlab.points3d(fitData[:,0],fitData[:,1],fitData[:,2])
 
         # fit output = [GF, pOpt, fitRMS, [fitErrors]]
-        if fixed_nodes is not None:
+        if solver == 'linear':
+            fitOutput = fitSurfaceLinear(GF, gObj, sobK, fixed_nodes=fixed_nodes, full_errors=full_errors)
+        elif fixed_nodes is not None:
             fitOutput = fitSurfaceFixNodes('EPEP', GF, fitData, GD, sob_d, sob_w, normal_d, normal_w, fixed_nodes,
                                            xtol=xtol, it_max=it_max_per_it, data_weights=None, n_closest_points=1, tree_args={},
                                            fit_verbose=fit_verbose, sob_obj=sobObj, n_obj=nObj, g_obj=gObj,
-                                           full_errors=full_errors)
+                                           full_errors=full_errors, solver=solver)
         else:
             fitOutput = fitSurface('EPEP', GF, fitData, GD, sob_d, sob_w, normal_d, normal_w,
                                    xtol=xtol, it_max=it_max_per_it, data_weights=None, n_closest_points=1, tree_args={},
-                                   fit_verbose=fit_verbose, sob_obj=sobObj, n_obj=nObj, g_obj=gObj, full_errors=full_errors)
+                                   fit_verbose=fit_verbose, sob_obj=sobObj, n_obj=nObj, g_obj=gObj, full_errors=full_errors,
+                                   solver=solver)
 
         fitRMS = fitOutput[2]
         sys.stdout.write('\nit: %(i)i\tRMSE: %(RMSE)8.6f\n' % {'i': it, 'RMSE': fitRMS})
@@ -1103,9 +1277,12 @@ def fitSurfacePerItSearch(g_obj_type, GF, data, GD, sob_d, sob_w, normal_d, norm
 
 
 def hostMeshFit(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
-                sob_d=None, sob_w=1e-5, xtol=1e-6, fixed_slave_nodes=None, verbose=True):
+                sob_d=None, sob_w=1e-5, xtol=1e-6, fixed_slave_nodes=None, verbose=True,
+                solver='leastsq'):
     """ host mesh fit slaveGF using hostGF as the 
     host mesh and slaveObj as the objective function to minimise
+
+    solver is 'leastsq' or 'least_squares', see minimiseLeastSquares.
     """
 
     sob_d = [4, 4, 4] if sob_d is None else sob_d
@@ -1134,13 +1311,16 @@ def hostMeshFit(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
     if slave_xi is None:
         slave_xi = host_gf.find_closest_material_points(
             slave_gf.field_parameters[:, :, 0].T,
-            init_gd=[40, 40, 40],
-            verbose=True
+            init_gd=[10, 10, 10],
+            verbose=True,
+            use_bvh=True
         )[0]
 
-    # calc host basis values at slaveXis
-    evalSlaveParams = geometric_field.makeGeometricFieldEvaluatorSparse(
-        host_gf, [1, 1], mat_points=slave_xi
+    # calc host basis values at slaveXis. Only slave nodes embedded in
+    # elements around changed host nodes are re-evaluated per call
+    evalSlaveParams = geometric_field.makeIncrementalEvaluatorSparse(
+        geometric_field.makeGeometricFieldEvaluatorSparse(host_gf, [1, 1], mat_points=slave_xi),
+        host_gf.dimensions
     )
 
     # initialise smoothing for host mesh
@@ -1152,12 +1332,13 @@ def hostMeshFit(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
     if fixed_slave_nodes is not None:
         slaveP0 = slave_gf.get_field_parameters()
         slaveP0[:, fixed_slave_nodes, :] = np.inf
-        fixedSlaveInds = np.where(~np.isfinite(slaveP0.ravel()))[0]
-        fixedSlaveParams = slave_gf.get_field_parameters().ravel()[fixedSlaveInds]
+        fixedSlaveInd = np.where(~np.isfinite(slaveP0.ravel()))[0]
+        fixedSlaveParams = slave_gf.get_field_parameters().ravel()[fixedSlaveInd]
         fixedSlave = True
     else:
         fixedSlave = False
         fixedSlaveInd = None
+        fixedSlaveParams = None
 
     c = itertools.count(0)
 
@@ -1191,10 +1372,21 @@ def hostMeshFit(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
     if verbose:
         log.info('HMF initial rms: %s', np.sqrt(hostMeshObj(hostParam0).mean()))
 
+    # use the analytic jacobian if the slave objective provides one
+    if hasattr(slave_obj, 'jac'):
+        hostMeshJac = makeHostMeshJacobian(slave_obj.jac, evalSlaveParams, smoother, fixedSlaveInd, fixedSlaveParams)
+    else:
+        hostMeshJac = None
+
+    if hasattr(slave_obj, 'jac_sparsity'):
+        hostMeshJacSparsity = makeHostMeshJacobianSparsity(slave_obj.jac_sparsity, evalSlaveParams, smoother)
+    else:
+        hostMeshJacSparsity = None
+
     # do fit
-    hostParamsOpt = leastsq(hostMeshObj, hostParam0.ravel(), xtol=xtol,
-                            maxfev=maxf
-                            )[0].reshape((3, -1, 1))
+    hostParamsOpt = minimiseLeastSquares(hostMeshObj, hostParam0.ravel(), xtol, maxf, solver=solver,
+                                         jac=hostMeshJac, jac_sparsity=hostMeshJacSparsity
+                                         ).reshape((3, -1, 1))
     host_gf.set_field_parameters(hostParamsOpt)
     slaveParamsOpt = evalSlaveParams(hostParamsOpt)[:, :, np.newaxis]
     if fixedSlave:
@@ -1214,9 +1406,12 @@ def hostMeshFit(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
 
 
 def hostMeshFitMulti(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
-                     sob_d=None, sob_w=1e-5, xtol=1e-6, fixed_slave_nodes=None, verbose=True):
+                     sob_d=None, sob_w=1e-5, xtol=1e-6, fixed_slave_nodes=None, verbose=True,
+                     solver='leastsq'):
     """ host mesh fit self.G using host (geometric_field) as the 
     host mesh and slaveObj as the objective function to minimise
+
+    solver is 'leastsq' or 'least_squares', see minimiseLeastSquares.
     """
     log.debug('host mesh fit...')
     sob_d = [4, 4, 4] if sob_d is None else sob_d
@@ -1225,27 +1420,28 @@ def hostMeshFitMulti(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
         if verbose:
             log.debug('calculating slave xi...')
         slave_xi = host_gf.find_closest_material_points(slave_gf.field_parameters[:, :, 0].T,
-                                                        init_gd=[40, 40, 40],
-                                                        verbose=False)[0]
+                                                        init_gd=[10, 10, 10],
+                                                        verbose=False,
+                                                        use_bvh=True)[0]
 
     # calc host basis values at slaveXis
     evalSlaveParams = geometric_field.makeGeometricFieldEvaluatorSparse(host_gf, [1, 1], mat_points=slave_xi)
 
     # initialise smoothing for host mesh
-    sobolevW = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 2.0, 2.0, 3.0])
     hostParam0 = host_gf.get_field_parameters()
-    smoother = GFF.makeSobelovPenalty3D(host_gf, sob_d, sobolevW * sob_w)
+    smoother = GFF.makeSobelovPenalty3D(host_gf, sob_d, HOST_SOBOLEV_WEIGHTS * sob_w)
 
     # handle fixed slave nodes
     if fixed_slave_nodes is not None:
         slaveP0 = slave_gf.get_field_parameters()
         slaveP0[:, fixed_slave_nodes, :] = np.inf
-        fixedSlaveInds = np.where(~np.isfinite(slaveP0.ravel()))[0]
-        fixedSlaveParams = slave_gf.get_field_parameters().ravel()[fixedSlaveInds]
+        fixedSlaveInd = np.where(~np.isfinite(slaveP0.ravel()))[0]
+        fixedSlaveParams = slave_gf.get_field_parameters().ravel()[fixedSlaveInd]
         fixedSlave = True
     else:
         fixedSlave = False
         fixedSlaveInd = None
+        fixedSlaveParams = None
 
     c = itertools.count(0)
 
@@ -1277,8 +1473,21 @@ def hostMeshFitMulti(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
     if verbose:
         log.debug('HMF initial rms: {}'.format(np.sqrt(hostMeshObj(hostParam0).mean())))
 
+    # use the analytic jacobian if the slave objective provides one
+    if hasattr(slave_obj, 'jac'):
+        hostMeshJac = makeHostMeshJacobian(slave_obj.jac, evalSlaveParams, smoother, fixedSlaveInd, fixedSlaveParams)
+    else:
+        hostMeshJac = None
+
+    if hasattr(slave_obj, 'jac_sparsity'):
+        hostMeshJacSparsity = makeHostMeshJacobianSparsity(slave_obj.jac_sparsity, evalSlaveParams, smoother)
+    else:
+        hostMeshJacSparsity = None
+
     # do fit
-    hostParamsOpt = leastsq(hostMeshObj, hostParam0.ravel(), xtol=xtol, maxfev=maxf)[0].reshape((3, -1, 1))
+    hostParamsOpt = minimiseLeastSquares(hostMeshObj, hostParam0.ravel(), xtol, maxf, solver=solver,
+                                         jac=hostMeshJac, jac_sparsity=hostMeshJacSparsity
+                                         ).reshape((3, -1, 1))
     host_gf.set_field_parameters(hostParamsOpt)
     # slaveParamsOpt = hostGF.evaluate_geometric_field_at_element_points( 0, slaveXi )[:,:,np.newaxis]
     slaveParamsOpt = evalSlaveParams(hostParamsOpt)[:, :, np.newaxis]
@@ -1298,10 +1507,63 @@ def hostMeshFitMulti(host_gf, slave_gf, slave_obj, slave_xi=None, max_it=0,
     return hostParamsOpt, slaveParamsOpt, slave_xi, finalSlaveRMS
 
 
+def hostMeshFitLinear(host_gf, slave_gf, slave_g_obj, eval_slave, slave_sob_k, host_sob_k,
+                      fixed_slave_nodes=None, method='direct'):
+    """ host mesh fit slave_gf to the fixed correspondences of an EPEP
+    objective slave_g_obj in one sparse solve. Slave parameters are
+    linear in the host parameters through eval_slave, so with slave
+    Sobolev stiffness slave_sob_k and host Sobolev stiffness host_sob_k
+    the fit is a linear least-squares problem in the host parameters, see
+    GFF.solveLinearFit.
+
+    As in fitSurfaceLinear, the solve minimises squared distances plus
+    the quadratic Sobolev energies, not the squared residuals minimised by
+    hostMeshFitMulti, so weights do not carry over between the two.
+
+    returns hostParamsOpt, slaveParamsOpt
+    """
+    A = sparse.csr_matrix(slave_g_obj.A)
+    B = sparse.csr_matrix(eval_slave.A)
+    slaveParams0 = slave_gf.get_field_parameters()[:, :, 0]
+
+    # fixed slave parameters do not move with the host mesh
+    F = np.zeros(slaveParams0.shape)
+    if fixed_slave_nodes is not None:
+        freeMask = np.ones(B.shape[0])
+        freeMask[fixed_slave_nodes] = 0.0
+        B = sparse.diags(freeMask) * B
+        F[:, fixed_slave_nodes] = slaveParams0[:, fixed_slave_nodes]
+
+    C = A * B
+    K = B.T * slave_sob_k * B + host_sob_k
+    data = slave_g_obj.data - A * F.T
+    rhs = -(B.T * (slave_sob_k * F.T)).T
+
+    X = GFF.solveLinearFit(C, data, K, data_weights=slave_g_obj.data_weights, rhs=rhs,
+                           x0=host_gf.get_field_parameters()[:, :, 0], method=method)
+    hostParamsOpt = X[:, :, np.newaxis]
+    slaveParamsOpt = (B * X.T + F.T).T[:, :, np.newaxis]
+    host_gf.set_field_parameters(hostParamsOpt)
+    slave_gf.set_field_parameters(slaveParamsOpt)
+
+    return hostParamsOpt, slaveParamsOpt
+
+
 def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave_gd,
                                 slave_sob_d, slave_sob_w, slave_nd, slave_nw, host_sob_d=None, host_sob_w=1e-5,
                                 data_weights=None, slave_xi=None, xtol=1e-6, max_it=5, max_it_per_it=2, tree_args=None,
-                                fit_output_callback=None, fixed_slave_nodes=None, verbose=True):
+                                fit_output_callback=None, fixed_slave_nodes=None, verbose=True,
+                                solver='leastsq', material_point_search=False):
+    """
+    solver is 'leastsq' or 'least_squares', see minimiseLeastSquares, or
+    'linear' to fit each iteration in one sparse solve, see
+    hostMeshFitLinear. 'linear' falls back to 'leastsq' if slave_nw is
+    non-zero since the normal penalty is nonlinear. 'linear' minimises a
+    different objective to the other solvers, see fitSurfaceLinear, so
+    slave_sob_w and host_sob_w are not on the same scale for both.
+    material_point_search is as for fitSurfacePerItSearch, for a 'DPEP'
+    slave_g_obj_type.
+    """
     log.debug('host mesh fit...')
     host_sob_d = [4, 4, 4] if host_sob_d is None else host_sob_d
     fitOutput = None
@@ -1311,8 +1573,9 @@ def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave
             log.debug('calculating slave xi...')
         slave_xi = host_gf.find_closest_material_points(
             slave_gf.field_parameters[:, :, 0].T,
-            init_gd=[40, 40, 40],
-            verbose=False)[0]
+            init_gd=[10, 10, 10],
+            verbose=False,
+            use_bvh=True)[0]
 
     # init slave params evaluator given host params
     evalSlaveParams = geometric_field.makeGeometricFieldEvaluatorSparse(
@@ -1333,11 +1596,22 @@ def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave
     if tree_args is None:
         tree_args = {}
 
+    if material_point_search:
+        mpCache = geometric_field.MaterialPointCache(slave_gf, data)
+
+    if solver == 'linear':
+        if slave_nw:
+            log.debug('normal smoothing is nonlinear, using leastsq')
+            solver = 'leastsq'
+        else:
+            slaveSobK = GFF.makeSobelovStiffness(slave_gf, slave_sob_d, slave_sob_w)
+            hostSobK = GFF.makeSobelovStiffness(host_gf, host_sob_d, HOST_SOBOLEV_WEIGHTS * host_sob_w)
+
     it = 1
     fitRMSOld = 9999999999.0
     while it <= max_it:
         if slave_g_obj_type == 'EPDP':
-            ep = slaveGFEval(slave_gf.get_field_parameters().ravel()).T
+            ep = slaveGFEval(slave_gf.get_field_parameters(copy=False).ravel()).T
             fitData, fitDataI, fitDataDist = closestSearch(ep, data, 1, tree_args)
             if data_weights is not None:
                 slaveGObj = gObjMakers['EPEP'](slave_gf, fitData, slave_gd,
@@ -1351,13 +1625,21 @@ def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave
                                                )
         elif slave_g_obj_type == 'DPEP':
             fitData = data
-            # KD-tree search
-            ep = slave_gf.discretiseAllElementsRegularGeoD(slave_gd, geo_coordinates=True)[1]
-            fitEP, fitEPI, fitEPDist = closestSearch(data, ep, 1, tree_args)
-            slaveGObj = gObjMakers['EPEP'](slave_gf, fitData, slave_gd,
-                                           data_weights=data_weights,
-                                           ep_index=fitEPI
-                                           )
+            if material_point_search:
+                # minisation search, warm-started from the last iteration
+                closestMPs = mpCache.search()[0]
+                slaveGObj = gObjMakers['EPEP'](slave_gf, fitData, slave_gd,
+                                               data_weights=data_weights,
+                                               mat_points=closestMPs
+                                               )
+            else:
+                # KD-tree search
+                ep = slave_gf.discretiseAllElementsRegularGeoD(slave_gd, geo_coordinates=True)[1]
+                fitEP, fitEPI, fitEPDist = closestSearch(data, ep, 1, tree_args)
+                slaveGObj = gObjMakers['EPEP'](slave_gf, fitData, slave_gd,
+                                               data_weights=data_weights,
+                                               ep_index=fitEPI
+                                               )
         else:
             raise ValueError('Unrecognised slaveGObj Type ' + slave_g_obj_type)
 
@@ -1368,15 +1650,32 @@ def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave
             errNorm = slaveNObj(x) * slave_nw
             return np.hstack([errSurface, errSob, errNorm])
 
-        # run iterations of HMF
-        fitOutput = hostMeshFitMulti(
-            host_gf, slave_gf, slaveObj,
-            slave_xi=slave_xi, max_it=max_it_per_it,
-            sob_d=host_sob_d, sob_w=host_sob_w,
-            fixed_slave_nodes=fixed_slave_nodes,
-            verbose=False
+        def slaveJac(x):
+            return sparse.vstack([slaveGObj.jac(x), slaveSobObj.jac(x), slaveNObj.jac(x) * slave_nw], format='csr')
+
+        slaveObj.jac = slaveJac
+        slaveObj.jac_sparsity = sparse.vstack(
+            [slaveGObj.jac_sparsity, slaveSobObj.jac_sparsity, slaveNObj.jac_sparsity], format='csr'
         )
 
+        # run iterations of HMF
+        if solver == 'linear':
+            hostParamsOpt, slaveParamsOpt = hostMeshFitLinear(
+                host_gf, slave_gf, slaveGObj, evalSlaveParams, slaveSobK, hostSobK,
+                fixed_slave_nodes=fixed_slave_nodes
+            )
+            finalSlaveRMS = np.sqrt(slaveObj(slaveParamsOpt.ravel().copy()).mean())
+            fitOutput = hostParamsOpt, slaveParamsOpt, slave_xi, finalSlaveRMS
+        else:
+            fitOutput = hostMeshFitMulti(
+                host_gf, slave_gf, slaveObj,
+                slave_xi=slave_xi, max_it=max_it_per_it,
+                sob_d=host_sob_d, sob_w=host_sob_w,
+                fixed_slave_nodes=fixed_slave_nodes,
+                verbose=False,
+                solver=solver
+            )
+
         fitRMS = fitOutput[3]
         sys.stdout.write('\nit: {i:d}\tRMSE: {RMSE:8.6f}\n'.format(i=it, RMSE=fitRMS))
         # sys.stdout.flush()
@@ -1394,8 +1693,8 @@ def hostMeshFitMultiPerItSearch(data, host_gf, slave_gf, slave_g_obj_type, slave
 
 
 def hostMeshFitPoints(host_mesh, slave_points, slave_func, slave_xi=None, max_it=0,
-                      xtol=1e-6, sob_d=[4, 4, 4], sob_w=1e-5, fixed_points=None, verbose=True
-                      ):
+                      xtol=1e-6, sob_d=[4, 4, 4], sob_w=1e-5, fixed_points=None, verbose=True,
+                      solver='leastsq'):
     """
     Host mesh fit slave_points. Minimises slave_func by deforming host_mesh
     in which slave_points are embedded.
@@ -1410,7 +1709,9 @@ def hostMeshFitPoints(host_mesh, slave_points, slave_func, slave_xi=None, max_it
         slave points
     slave_points: a nx3 array of point coordinates to fit.
     slave_func: a function that takes slave point coordinates as input and
-        returns an error vector
+        returns an error vector. If it has a jac attribute, jac(coordinates)
+        should return the sparse jacobian of the error vector w.r.t. the
+        coordinates flattened dimension-major, and is used in the fit.
     slave_xi (optional): material coordinates of slave_points in host_mesh if
         known.
     max_it (optional): maximum number of fitting iterations.
@@ -1421,6 +1722,10 @@ def hostMeshFitPoints(host_mesh, slave_points, slave_func, slave_xi=None, max_it
     fixed_points (optional): a list of slave point numbers for slave points
         to be fixed during the fit
     verbose (optional): print extra info
+    solver (optional): 'leastsq' or 'least_squares', see
+        minimiseLeastSquares. If slave_func has a jac_sparsity attribute,
+        the sparsity pattern of its jacobian w.r.t. the flattened slave
+        point coordinates, it is used with 'least_squares'.
 
     Returns:
     host_x_opt: fitted host mesh
@@ -1435,8 +1740,9 @@ def hostMeshFitPoints(host_mesh, slave_points, slave_func, slave_xi=None, max_it
             log.debug('calculating slave xi...')
         slave_xi = host_mesh.find_closest_material_points(
             slave_points,
-            init_gd=[100, 100, 100],
+            init_gd=[10, 10, 10],
             verbose=verbose,
+            use_bvh=True,
         )[0]
 
     # make slave coordinates evaluator function
@@ -1489,10 +1795,31 @@ def hostMeshFitPoints(host_mesh, slave_points, slave_func, slave_xi=None, max_it
     if verbose:
         log.debug(('HMF initial rms: {:6.4f}'.format(np.sqrt(host_func(host_x_0).mean()))))
 
+    # use the analytic jacobian if slave_func provides one
+    if hasattr(slave_func, 'jac'):
+        def slave_jac(slave_x):
+            return slave_func.jac(slave_x.reshape((3, -1)).T)
+
+        if has_fixed_points:
+            n_slave = len(slave_points)
+            fixed_inds = (np.arange(3)[:, np.newaxis] * n_slave + np.atleast_1d(fixed_points)).ravel()
+            host_jac = makeHostMeshJacobian(
+                slave_jac, eval_slave, host_smoother, fixed_inds, fixed_point_coords.T.ravel()
+            )
+        else:
+            host_jac = makeHostMeshJacobian(slave_jac, eval_slave, host_smoother)
+    else:
+        host_jac = None
+
+    if hasattr(slave_func, 'jac_sparsity'):
+        host_jac_sparsity = makeHostMeshJacobianSparsity(slave_func.jac_sparsity, eval_slave, host_smoother)
+    else:
+        host_jac_sparsity = None
+
     # do fit
-    host_x_opt = leastsq(
-        host_func, host_x_0.ravel(), xtol=xtol, maxfev=maxf
-    )[0].reshape((3, -1, 1))
+    host_x_opt = minimiseLeastSquares(
+        host_func, host_x_0.ravel(), xtol, maxf, solver=solver, jac=host_jac, jac_sparsity=host_jac_sparsity
+    ).reshape((3, -1, 1))
     host_mesh.set_field_parameters(host_x_opt)
     slave_points_opt = eval_slave(host_x_opt).T
     if has_fixed_points:
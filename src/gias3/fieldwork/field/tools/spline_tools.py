@@ -12,6 +12,8 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 ===============================================================================
 """
 import logging
+import multiprocessing
+import os
 import shelve
 
 import numpy
@@ -86,16 +88,31 @@ class SplineParametric(object):
         """ returns coords and parameters u of point on the line closest
         to p
         """
+        return _find_closest_on_spline(self.tck, p)
 
-        def obj(u):
-            pLine = self.eval(u[0])
-            d = (numpy.subtract(p, pLine) ** 2.0).sum()
-            return d
+    def findClosestParallel(self, points, processes=None, chunk_size=None):
+        """ findClosest for each of points in a pool of worker processes.
+        Only the spline's tck is sent to the workers, once when the pool
+        starts. processes defaults to the number of cpus.
 
-        u0 = [0.5]
-        uMin = fmin(obj, u0, disp=0)
-        pClosest = self.eval(uMin)
-        return pClosest, uMin
+        returns a list of (coords, u) for each point, in the order of
+        points.
+        """
+        points = numpy.asarray(points, dtype=float)
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, int(numpy.ceil(len(points) / (4.0 * processes))))
+
+        chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+        if processes == 1:
+            _init_spline_worker(self.tck)
+            results = [_find_closest_chunk(c) for c in chunks]
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_spline_worker, initargs=(self.tck,)) as pool:
+                results = pool.map(_find_closest_chunk, chunks)
+
+        return [r for chunk in results for r in chunk]
 
     # ==================================================================#
     def integrate(self, a, b):
@@ -119,6 +136,31 @@ class SplineParametric(object):
     # ==================================================================#
 
 
+def _find_closest_on_spline(tck, p):
+    def obj(u):
+        pLine = numpy.array(splev(u[0], tck))
+        d = (numpy.subtract(p, pLine) ** 2.0).sum()
+        return d
+
+    u0 = [0.5]
+    uMin = fmin(obj, u0, disp=0)
+    pClosest = numpy.array(splev(uMin, tck))
+    return pClosest, uMin
+
+
+# spline tck held by each findClosestParallel worker process
+_worker_tck = None
+
+
+def _init_spline_worker(tck):
+    global _worker_tck
+    _worker_tck = tck
+
+
+def _find_closest_chunk(points):
+    return [_find_closest_on_spline(_worker_tck, p) for p in points]
+
+
 def fitSplineCoeffDPEPObj(x, data, c_shape, spline, n_ep):
     spline.tck[1] = x.reshape(c_shape)
     EP = spline.eval(numpy.linspace(0.0, 1.0, n_ep)).T
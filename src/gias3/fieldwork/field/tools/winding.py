@@ -0,0 +1,198 @@
+"""
+FILE: winding.py
+LAST MODIFIED: 16-10-2026
+DESCRIPTION:
+Generalised winding numbers of triangulated surfaces, for classifying
+points as inside or outside a surface.
+
+===============================================================================
+This file is part of GIAS2. (https://bitbucket.org/jangle/gias2)
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+===============================================================================
+"""
+import logging
+
+import numpy
+from scipy.spatial import cKDTree
+
+from gias3.fieldwork.field.tools import bvh
+
+log = logging.getLogger(__name__)
+
+
+def triangle_solid_angles(points, v0, v1, v2):
+    """ signed solid angles subtended by triangles (v0, v1, v2) at points,
+    using the formula of Van Oosterom and Strackee. All arguments are
+    (n, 3) arrays. Angles are positive for points behind triangles with
+    anticlockwise vertices.
+    """
+    a = v0 - points
+    b = v1 - points
+    c = v2 - points
+    la = numpy.sqrt((a * a).sum(1))
+    lb = numpy.sqrt((b * b).sum(1))
+    lc = numpy.sqrt((c * c).sum(1))
+    num = (a * numpy.cross(b, c)).sum(1)
+    den = la * lb * lc + (a * b).sum(1) * lc + (b * c).sum(1) * la + (c * a).sum(1) * lb
+    return 2.0 * numpy.arctan2(num, den)
+
+
+class SurfaceWindingNumber(object):
+    """ Generalised winding number of a triangulated surface, following
+    Barill et al. 2018, "Fast winding numbers for soups and clouds".
+
+    The winding number is about 1 inside and 0 outside a closed surface
+    with outward normals, -1 inside if the normals point inwards, and
+    degrades gracefully for surfaces with gaps or overlaps. Triangles are
+    clustered in a bounding volume hierarchy, see bvh.build_median_tree.
+    Clusters further than beta times their radius from a query point
+    contribute through a dipole approximation, nearer clusters are summed
+    exactly.
+
+    Queries are processed in chunks of chunk_size points, which bounds the
+    tree traversal. The exact near-field sum is not bounded by chunk_size
+    alone: each point close to the surface pairs with every triangle of
+    its near leaves, so memory also grows with the triangle density
+    around the query points.
+    """
+
+    def __init__(self, vertices, triangles, leaf_size=8, beta=2.0):
+        """ vertices is a (n, 3) array of coordinates, triangles a (m, 3)
+        array of vertex indices with anticlockwise ordering when viewed
+        from outside.
+        """
+        self.vertices = numpy.asarray(vertices, dtype=float)
+        self.triangles = numpy.asarray(triangles, dtype=int)
+        if len(self.triangles) == 0:
+            raise ValueError('surface has no triangles')
+        self.leaf_size = leaf_size
+        self.beta = beta
+        self._vertex_tree = None
+
+        self.v0 = self.vertices[self.triangles[:, 0]]
+        self.v1 = self.vertices[self.triangles[:, 1]]
+        self.v2 = self.vertices[self.triangles[:, 2]]
+        self.area_vectors = 0.5 * numpy.cross(self.v1 - self.v0, self.v2 - self.v0)
+        self.centroids = (self.v0 + self.v1 + self.v2) / 3.0
+        self._build()
+
+    # ==================================================================#
+    def _build(self):
+        self.order, self.left, self.right, self.start, self.count, self.depth = \
+            bvh.build_median_tree(self.centroids, self.leaf_size)
+        self._leaves = numpy.where(self.left < 0)[0]
+        self._compute_node_moments()
+
+    def _compute_node_moments(self):
+        """ area vector sum, area weighted centre and bounding radius of
+        the triangles under each node
+        """
+        n_nodes = len(self.left)
+        areas = numpy.sqrt((self.area_vectors * self.area_vectors).sum(1))
+        self.node_area_vector = numpy.empty((n_nodes, 3), dtype=float)
+        self.node_area = numpy.empty(n_nodes, dtype=float)
+        self.node_centre = numpy.empty((n_nodes, 3), dtype=float)
+        self.node_radius = numpy.empty(n_nodes, dtype=float)
+
+        # leaves from their triangles
+        leaf_starts = self.start[self._leaves]
+        ordered = self.order
+        w_area = areas[ordered]
+        self.node_area_vector[self._leaves] = numpy.add.reduceat(self.area_vectors[ordered], leaf_starts, axis=0)
+        self.node_area[self._leaves] = numpy.add.reduceat(w_area, leaf_starts)
+        weighted = numpy.add.reduceat(self.centroids[ordered] * w_area[:, numpy.newaxis], leaf_starts, axis=0)
+        mean = numpy.add.reduceat(self.centroids[ordered], leaf_starts, axis=0) / self.count[self._leaves, numpy.newaxis]
+        has_area = self.node_area[self._leaves] > 0.0
+        centre = numpy.where(
+            has_area[:, numpy.newaxis],
+            weighted / numpy.where(has_area, self.node_area[self._leaves], 1.0)[:, numpy.newaxis],
+            mean
+        )
+        self.node_centre[self._leaves] = centre
+
+        leaf_of_tri = numpy.repeat(numpy.arange(len(self._leaves)), self.count[self._leaves])
+        tri_centre = centre[leaf_of_tri]
+        tri_radius = numpy.max([
+            numpy.sqrt(((v[ordered] - tri_centre) ** 2.0).sum(1)) for v in (self.v0, self.v1, self.v2)
+        ], axis=0)
+        self.node_radius[self._leaves] = numpy.maximum.reduceat(tri_radius, leaf_starts)
+
+        # parents from their children, deepest level first
+        for d in range(self.depth.max(), -1, -1):
+            nodes = numpy.where((self.depth == d) & (self.left >= 0))[0]
+            if len(nodes) == 0:
+                continue
+            lc = self.left[nodes]
+            rc = self.right[nodes]
+            self.node_area_vector[nodes] = self.node_area_vector[lc] + self.node_area_vector[rc]
+            area = self.node_area[lc] + self.node_area[rc]
+            self.node_area[nodes] = area
+            w_l = numpy.where(area > 0.0, self.node_area[lc] / numpy.where(area > 0.0, area, 1.0), 0.5)
+            centre = w_l[:, numpy.newaxis] * self.node_centre[lc] + (1.0 - w_l)[:, numpy.newaxis] * self.node_centre[rc]
+            self.node_centre[nodes] = centre
+            self.node_radius[nodes] = numpy.maximum(
+                self.node_radius[lc] + numpy.sqrt(((self.node_centre[lc] - centre) ** 2.0).sum(1)),
+                self.node_radius[rc] + numpy.sqrt(((self.node_centre[rc] - centre) ** 2.0).sum(1)),
+            )
+
+    # ==================================================================#
+    def _winding_chunk(self, points):
+        n = points.shape[0]
+        omega = numpy.zeros(n, dtype=float)
+        point_index = numpy.arange(n)
+        nodes = numpy.zeros(n, dtype=int)
+        while len(point_index):
+            dx = self.node_centre[nodes] - points[point_index]
+            dist = numpy.sqrt((dx * dx).sum(1))
+            far = dist > self.beta * self.node_radius[nodes]
+
+            # dipole approximation of far clusters
+            if far.any():
+                fd = dist[far]
+                dipole = (self.node_area_vector[nodes[far]] * dx[far]).sum(1) / (fd * fd * fd)
+                omega += numpy.bincount(point_index[far], weights=dipole, minlength=n)
+
+            # exact sum over the triangles of near leaves
+            near_leaf = ~far & (self.left[nodes] < 0)
+            if near_leaf.any():
+                leaves = nodes[near_leaf]
+                counts = self.count[leaves]
+                offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+                tris = self.order[numpy.repeat(self.start[leaves], counts) + offsets]
+                pts = numpy.repeat(point_index[near_leaf], counts)
+                angles = triangle_solid_angles(points[pts], self.v0[tris], self.v1[tris], self.v2[tris])
+                omega += numpy.bincount(pts, weights=angles, minlength=n)
+
+            # descend into near internal nodes
+            descend = ~far & ~near_leaf
+            point_index = numpy.repeat(point_index[descend], 2)
+            nodes = numpy.column_stack([self.left[nodes[descend]], self.right[nodes[descend]]]).ravel()
+
+        return omega / (4.0 * numpy.pi)
+
+    def winding_number(self, points, chunk_size=4096):
+        """ returns the generalised winding number of the surface at each
+        of the (n, 3) points
+        """
+        points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+        w = numpy.empty(points.shape[0], dtype=float)
+        for i in range(0, points.shape[0], chunk_size):
+            w[i:i + chunk_size] = self._winding_chunk(points[i:i + chunk_size])
+        return w
+
+    def contains(self, points, chunk_size=4096, threshold=0.5):
+        """ returns a boolean array, True for points whose absolute winding
+        number is greater than threshold, so that either orientation of
+        the triangles is classified correctly
+        """
+        return numpy.abs(self.winding_number(points, chunk_size=chunk_size)) > threshold
+
+    def closest_vertex_distance(self, points):
+        """ distance from each point to the closest surface vertex
+        """
+        if self._vertex_tree is None:
+            self._vertex_tree = cKDTree(self.vertices)
+        return self._vertex_tree.query(points)[0]
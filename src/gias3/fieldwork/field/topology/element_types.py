@@ -20,12 +20,108 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 # interior: tuple of tuples of the range of value define in the interior 
 #           of the elements for each dimension
 import logging
+from functools import lru_cache
 
-from numpy import array, cos, sin, eye, pi, sqrt, linspace, newaxis, all, any, bitwise_and, bitwise_or, hstack
+from numpy import array, cos, sin, eye, pi, sqrt, linspace, newaxis, all, any, bitwise_and, bitwise_or, hstack, clip, \
+    meshgrid, prod, vstack, concatenate, ones, arange, repeat, cumsum, maximum, where
+from numpy.polynomial.legendre import leggauss
 from scipy.linalg import det
 
 log = logging.getLogger(__name__)
 
+EVAL_GRID_CACHE_SIZE = 128  # number of (element type, density) eval grids cached
+
+
+# ======================================================================#
+# quadrature rules                                                     #
+# ======================================================================#
+def gauss_legendre(n, a=0.0, b=1.0):
+    """ n point Gauss-Legendre rule on [a, b], exact for polynomials of
+    degree 2n - 1. Returns points (n,) and weights (n,).
+    """
+    x, w = leggauss(n)
+    return a + 0.5 * (b - a) * (x + 1.0), 0.5 * (b - a) * w
+
+
+def tensor_rule(rules):
+    """ tensor product of the 1D rules in rules, a list of (points,
+    weights). Returns points (n, len(rules)) and weights (n,).
+    """
+    X = meshgrid(*[r[0] for r in rules], indexing='ij')
+    W = meshgrid(*[r[1] for r in rules], indexing='ij')
+    return array([x.ravel() for x in X]).T, prod([w.ravel() for w in W], axis=0)
+
+
+# Dunavant rules on the triangle. Each entry is a list of
+# (weight, barycentric coordinates) orbits of the rule of that degree,
+# with weights summing to 1.
+dunavant_rules = {
+    1: [(1.0, (1 / 3., 1 / 3., 1 / 3.))],
+    2: [(1 / 3., (2 / 3., 1 / 6., 1 / 6.))],
+    3: [(-27 / 48., (1 / 3., 1 / 3., 1 / 3.)),
+        (25 / 48., (0.6, 0.2, 0.2))],
+    4: [(0.223381589678011, (0.108103018168070, 0.445948490915965, 0.445948490915965)),
+        (0.109951743655322, (0.816847572980459, 0.091576213509771, 0.091576213509771))],
+    5: [(0.225, (1 / 3., 1 / 3., 1 / 3.)),
+        (0.132394152788506, (0.059715871789770, 0.470142064105115, 0.470142064105115)),
+        (0.125939180544827, (0.797426985353087, 0.101286507323456, 0.101286507323456))],
+    6: [(0.116786275726379, (0.501426509658179, 0.249286745170910, 0.249286745170910)),
+        (0.050844906370207, (0.873821971016996, 0.063089014491502, 0.063089014491502)),
+        (0.082851075618374, (0.053145049844817, 0.310352451033784, 0.636502499121399))],
+}
+
+
+def _barycentric_orbit(l):
+    """ unique permutations of the barycentric coordinates l
+    """
+    perms = [(l[0], l[1], l[2]), (l[1], l[2], l[0]), (l[2], l[0], l[1]),
+             (l[0], l[2], l[1]), (l[2], l[1], l[0]), (l[1], l[0], l[2])]
+    return sorted(set(perms), key=perms.index)
+
+
+def dunavant(degree):
+    """ Dunavant rule on the unit triangle for polynomials of the given
+    degree. Returns points (n, 2) and weights (n,).
+    """
+    if degree not in dunavant_rules:
+        raise ValueError('no Dunavant rule of degree ' + str(degree))
+
+    points = []
+    weights = []
+    for w, l in dunavant_rules[degree]:
+        orbit = _barycentric_orbit(l)
+        points += [(li[1], li[2]) for li in orbit]
+        weights += [0.5 * w] * len(orbit)
+
+    return array(points), array(weights)
+
+
+def collapsed_simplex_rule(dimensions, degree):
+    """ rule on the unit simplex from a Gauss-Legendre rule on the unit
+    cube collapsed by the Duffy transform, exact for polynomials of the
+    given degree. Returns points (n, dimensions) and weights (n,).
+    """
+    g = gauss_legendre(degree // 2 + dimensions)
+    U, W = tensor_rule([g] * dimensions)
+    X = U.copy()
+    scale = 1.0 - U[:, 0]
+    for d in range(1, dimensions):
+        X[:, d] = U[:, d] * scale
+        W = W * scale
+        scale = scale * (1.0 - U[:, d])
+
+    return X, W
+
+
+def simplex_rule(dimensions, degree):
+    """ quadrature rule on the unit simplex for polynomials of the given
+    degree. Uses Dunavant rules on triangles where available.
+    """
+    if dimensions == 2 and degree in dunavant_rules:
+        return dunavant(degree)
+    else:
+        return collapsed_simplex_rule(dimensions, degree)
+
 
 class Edge(object):
     """ element edge object.
@@ -64,7 +160,10 @@ class Element:
 
     number_of_points: need to be removed. This should be inferred from
     the field basis?
+    simplex_dimensions: number of leading coordinates constrained to sum
+    to no more than 1
     """
+    simplex_dimensions = 0
 
     def __init__(self, dimensions, interior, number_of_points, type):
         self.dimensions = dimensions  # int
@@ -74,10 +173,18 @@ class Element:
         self.is_element = True
         self.edges = None
         self.edge_points = None
+        self._edge_lookup = None  # { edge point tuple: (edge number, direction) }
 
     def get_number_of_ensemble_points(self):
         return self.number_of_points
 
+    def quadrature(self, degree):
+        """ returns the points (n, dimensions), or (n,) in 1D, and
+        weights (n,) of a quadrature rule over the element interior that
+        is exact for polynomials of the given degree in each coordinate.
+        """
+        raise NotImplementedError('quadrature not implemented for element type ' + self.type)
+
     def get_edge_points(self, edge):
         return self.edge_points[edge]
 
@@ -85,26 +192,46 @@ class Element:
         return self.edges[edge].get_elem_coord(x)
 
     def generate_eval_grid(self, density):
+        """ returns a read-only array of the element coordinates of a
+        regular grid of density[i] points in each dimension, keeping
+        interior points. Grids are cached per element type and density.
+        """
+        return _cached_eval_grid(self, tuple(int(d) for d in density))
+
+    def _generate_eval_grid(self, density):
         eval_coords = [linspace(self.interior[i][0], self.interior[i][1], density[i]) for i in range(self.dimensions)]
-        grid = []
+        # last dimension varies fastest
+        grid = array([g.ravel() for g in meshgrid(*eval_coords, indexing='ij')]).T
+        grid = grid[self.interior_mask(grid)]
 
         if self.dimensions == 1:
-            for i in eval_coords[0]:
-                if self.is_interior([i]):
-                    grid.append(i)
-        elif self.dimensions == 2:
-            for i in eval_coords[0]:
-                for j in eval_coords[1]:
-                    if self.is_interior([i, j]):
-                        grid.append([i, j])
-        elif self.dimensions == 3:
-            for i in eval_coords[0]:
-                for j in eval_coords[1]:
-                    for k in eval_coords[2]:
-                        if self.is_interior([i, j, k]):
-                            grid.append([i, j, k])
-
-        return array(grid)
+            return grid[:, 0]
+        return grid
+
+    def interior_mask(self, coords):
+        """ vectorised is_interior of an (n, dimensions) array of element
+        coordinates
+        """
+        mask = ((self.interior[:, 0] <= coords) & (coords <= self.interior[:, 1])).all(1)
+        n = self.simplex_dimensions
+        if n:
+            mask &= coords[:, :n].sum(1) <= 1.0
+        return mask
+
+    def clamp(self, coords):
+        """ returns a copy of the (n, dimensions) array of element
+        coordinates coords moved onto the element interior
+        """
+        coords = clip(coords, self.interior[:, 0], self.interior[:, 1])
+        n = self.simplex_dimensions
+        if n:
+            # shift equally back onto the simplex face
+            excess = coords[:, :n].sum(1) - 1.0
+            out = excess > 0.0
+            coords[out, :n] -= excess[out, newaxis] / n
+            coords[out] = clip(coords[out], self.interior[:, 0], self.interior[:, 1])
+
+        return coords
 
     def get_point_edge(self, p):
         """ return the (edge number, point index, edge object) element
@@ -124,18 +251,67 @@ class Element:
         edge that matches the sequence (1 if along, -1 if opposite). Returns
         None, None if no match.
         """
-        _p = tuple(p)
-        for edge_i, edge_points in enumerate(self.edge_points):
-            if _p == edge_points:
-                return self.edges[edge_i], 1
-            elif _p[::-1] == edge_points:
-                return self.edges[edge_i], -1
+        if self._edge_lookup is None:
+            # filled last to first so that the first matching edge, and
+            # a forward match within an edge, take precedence
+            self._edge_lookup = {}
+            for edge_i, edge_points in reversed(list(enumerate(self.edge_points))):
+                self._edge_lookup[tuple(edge_points)[::-1]] = (edge_i, -1)
+                self._edge_lookup[tuple(edge_points)] = (edge_i, 1)
+
+        try:
+            edge_i, direction = self._edge_lookup[tuple(p)]
+        except KeyError:
+            return None, None
+
+        return self.edges[edge_i], direction
 
-        return None, None
+    def get_vertex_points(self):
+        """ returns the sorted element points at the ends of the element's
+        edges
+        """
+        vertices = set()
+        for edge_points in self.edge_points:
+            vertices.update((edge_points[0], edge_points[-1]))
+        return sorted(vertices)
+
+    def get_face_vertex_points(self):
+        """ returns a list of the vertex points of each boundary face of a
+        3D element, being the vertices on each xi bound, and on the
+        simplex face of simplex dimensions. Returns an empty list for
+        lower dimension elements.
+        """
+        if self.dimensions != 3:
+            return []
+
+        vertices = array(self.get_vertex_points())
+        X = array(self.node_coordinates)[vertices]
+        faces = []
+        for d in range(self.dimensions):
+            for bound in self.interior[d]:
+                if d < self.simplex_dimensions and bound == self.interior[d][1]:
+                    continue
+                faces.append(tuple(vertices[X[:, d] == bound]))
+        if self.simplex_dimensions:
+            faces.append(tuple(vertices[X[:, :self.simplex_dimensions].sum(1) == 1.0]))
+
+        return faces
+
+
+@lru_cache(maxsize=EVAL_GRID_CACHE_SIZE)
+def _cached_eval_grid(element, density):
+    """ element eval grids keyed on the shared element type instances
+    """
+    grid = element._generate_eval_grid(density)
+    grid.flags.writeable = False
+    return grid
 
 
 # ======================================================================#
 class Line(Element):
+    def quadrature(self, degree):
+        return gauss_legendre(degree // 2 + 1, self.interior[0][0], self.interior[0][1])
+
     def is_interior(self, coords):
 
         if len(coords) != 1:
@@ -157,6 +333,9 @@ class Quad(Element):
     """ quadralateral elements
     """
 
+    def quadrature(self, degree):
+        return tensor_rule([gauss_legendre(degree // 2 + 1, a, b) for a, b in self.interior])
+
     def is_interior(self, coords):
 
         if len(coords) != self.dimensions:
@@ -178,6 +357,15 @@ class Quad(Element):
 class Prism(Element):
     """ quadralateral elements
     """
+    simplex_dimensions = 2
+
+    def quadrature(self, degree):
+        # triangle rule times a line rule along the third dimension
+        triX, triW = simplex_rule(2, degree)
+        lineX, lineW = gauss_legendre(degree // 2 + 1, self.interior[2][0], self.interior[2][1])
+        X = vstack([concatenate([triX, x * ones((len(triX), 1))], 1) for x in lineX])
+        W = concatenate([triW * w for w in lineW])
+        return X, W
 
     def is_interior(self, coords):
 
@@ -204,6 +392,9 @@ class Tri(Element):
     """
     O = eye(9, 9)
 
+    def quadrature(self, degree):
+        return simplex_rule(self.dimensions, degree)
+
     def is_interior(self, coords):
 
         if len(coords) != self.dimensions:
@@ -222,6 +413,10 @@ class Tri(Element):
             return self.is_interior(coords) and ((sum(coords[:2]) == 1.0) or any(
                 bitwise_or((self.interior[:, 0] == coords), coords == self.interior[:, 1])))
 
+    @property
+    def simplex_dimensions(self):
+        return self.dimensions
+
     def set_angle(self, a):
         """ calculates matrix for transforming derivatives to element
         orientation. Angles in degrees
@@ -298,6 +493,9 @@ class TriBezier(Element):
     def get_number_of_ensemble_points(self):
         return self.number_of_points
 
+    def quadrature(self, degree):
+        return simplex_rule(self.dimensions, degree)
+
     def is_interior(self, coords):
 
         if len(coords) != self.dimensions:
@@ -307,6 +505,9 @@ class TriBezier(Element):
         else:
             return sum(coords) <= 1.0
 
+    def interior_mask(self, coords):
+        return coords.sum(1) <= 1.0
+
     def is_boundary(self, coords):
 
         if len(coords) != self.dimensions:
@@ -369,22 +570,26 @@ class TriEquilateral(Element):
         return ((y - b) / a)
 
     # ==================================================================#
-    def generate_eval_grid(self, d):
+    def interior_mask(self, coords):
+        return coords[:, 1] <= (-abs(coords[:, 0]) * self.a + self.a / 2.0)
+
+    def _generate_eval_grid(self, d):
         """ generate element points for a equilateral triangle.
         Returns array( [[xcoords], [ycoords]] ).
         d: list of evaluation density in each direction
         int: interior bounds of the element ( (xmin, xmax), (ymin, ymax) )
         """
 
-        e_points = array([[], []])
         y_divs = linspace(self.interior[1][0], self.interior[1][1], d[1])
-        xn = d[0]
-        for y_row in y_divs:
-            x_edge = self._equi_evalx(y_row, self.interior[1][1])
-            x = linspace(x_edge, -x_edge, xn)
-            e_points = hstack([e_points, array([x, [y_row] * xn])])
-            xn -= 1
-        return e_points
+        # rows have d[0], d[0] - 1, ... points spanning the triangle
+        xn = maximum(d[0] - arange(d[1]), 0)
+        row = repeat(arange(d[1]), xn)
+        k = arange(xn.sum()) - repeat(cumsum(xn) - xn, xn)
+        n = xn[row]
+        x_edge = self._equi_evalx(y_divs[row], self.interior[1][1])
+        step = where(n > 1, -2.0 * x_edge / maximum(n - 1, 1), 0.0)
+        x = where((k == n - 1) & (n > 1), -x_edge, x_edge + k * step)
+        return array([x, y_divs[row]])
 
 
 # ======================================================================#
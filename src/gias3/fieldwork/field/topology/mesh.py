@@ -18,13 +18,659 @@ import logging
 import os
 import shelve
 
-from numpy import linspace, sort
+import numpy
+from numpy import linspace, sort, arange, array, cumsum, full
 
 from gias3.fieldwork.field.topology import element_types
 
 log = logging.getLogger(__name__)
 
 
+# =============================================================================#
+def _find_roots(parent, i):
+    """ roots of the union-find parent array at indices i, compressing
+    only their paths
+    """
+    roots = parent[i]
+    up = parent[roots]
+    while (up != roots).any():
+        roots = up
+        up = parent[roots]
+    parent[i] = roots
+    return roots
+
+
+def _union_groups(parent, a, b):
+    """ merges the groups of the union-find parent array at indices a and
+    b pairwise, in place, keeping the smallest index as the root of each
+    group. Only the paths of a and b are visited.
+    """
+    while True:
+        ra = _find_roots(parent, a)
+        rb = _find_roots(parent, b)
+        differ = ra != rb
+        if not differ.any():
+            break
+        lo = numpy.minimum(ra[differ], rb[differ])
+        hi = numpy.maximum(ra[differ], rb[differ])
+        numpy.minimum.at(parent, hi, lo)
+
+
+def label_connected_points(connectivity):
+    """ groups the element points of a connectivity dict into ensemble
+    points using an array-based union-find over the sorted connectivity
+    keys.
+
+    Returns the sorted keys, the root of each key, being the index of the
+    first key of its group, and the ensemble point number of each key.
+    Ensemble points are numbered in order of their first key. Groups
+    containing a hanging point (element -1) are not ensemble points and
+    are labelled -1.
+    """
+    keys = sorted(connectivity.keys())
+    index = dict(zip(keys, range(len(keys))))
+    a = array([i for i, key in enumerate(keys) for other in connectivity[key]], dtype=int)
+    b = array([index[other] for key in keys for other in connectivity[key]], dtype=int)
+    parent = arange(len(keys))
+    _union_groups(parent, a, b)
+    roots = _find_roots(parent, arange(len(keys)))
+
+    # hanging point keys sort first, so a group is hanging if its root is
+    is_hanging = array([k[0] == -1 for k in keys], dtype=bool)
+    is_ensemble_root = (roots == arange(len(keys))) & ~is_hanging[roots]
+    ensemble_number = cumsum(is_ensemble_root) - 1
+    labels = full(len(keys), -1, dtype=int)
+    labels[~is_hanging[roots]] = ensemble_number[roots[~is_hanging[roots]]]
+
+    return keys, roots, labels
+
+
+# =============================================================================#
+class _GrowableArray(object):
+    """ array with amortised appends along its first axis. The buffer
+    doubles in capacity when full, and array is a view of the used rows.
+    """
+
+    def __init__(self, width=None, dtype=int, fill=0):
+        shape = (0,) if width is None else (0, width)
+        self.fill = fill
+        self.n = 0
+        self._data = numpy.full(shape, fill, dtype=dtype)
+
+    @property
+    def array(self):
+        return self._data[:self.n]
+
+    def set(self, a):
+        self._data = numpy.array(a, dtype=self._data.dtype)
+        self.n = len(self._data)
+
+    def widen(self, width):
+        """ pad 2D rows with fill up to width columns
+        """
+        if self._data.shape[1] < width:
+            pad = numpy.full((self._data.shape[0], width - self._data.shape[1]), self.fill, dtype=self._data.dtype)
+            self._data = numpy.hstack([self._data, pad])
+
+    def append(self, rows):
+        rows = numpy.asarray(rows, dtype=self._data.dtype)
+        n1 = self.n + len(rows)
+        if n1 > len(self._data):
+            data = numpy.full((max(n1, 2 * len(self._data), 16),) + self._data.shape[1:], self.fill,
+                              dtype=self._data.dtype)
+            data[:self.n] = self._data[:self.n]
+            self._data = data
+        if rows.ndim > 1 and rows.shape[1] < self._data.shape[1]:
+            self._data[self.n:n1] = self.fill
+            self._data[self.n:n1, :rows.shape[1]] = rows
+        else:
+            self._data[self.n:n1] = rows
+        self.n = n1
+
+
+def _growable_property(name, doc):
+    def get(self):
+        return getattr(self, name).array
+
+    def set_(self, a):
+        getattr(self, name).set(a)
+
+    return property(get, set_, doc=doc)
+
+
+class CompactConnectivity(object):
+    """ Array-backed store of the topology of a flat mesh, kept alongside
+    the connectivity dicts of a MeshEnsemble.
+
+    element_numbers: (n_elements,) sorted element numbers
+    element_types: (n_elements,) indices into type_names
+    point_counts: (n_elements,) number of element points of each element
+    point_ids: (n_elements, max_points) int32 ensemble point number of
+        each element point. Rows are padded with -1, and element points
+        bound to hanging point h are -2 - h.
+    hanging_host, hanging_xi: host element number and element coordinates
+        of each hanging point
+    hanging_indptr, hanging_indices, hanging_weights: CSR arrays of the
+        ensemble points and basis weights of each hanging point, set by
+        the Mapper
+
+    Connected element points are grouped by an array-based union-find
+    over point slots, which are numbered in order of creation. Arrays grow
+    by doubling their capacity, so adding elements one at a time costs
+    amortised constant time per element point.
+    """
+
+    element_numbers = _growable_property('_element_numbers', 'sorted element numbers')
+    element_types = _growable_property('_element_types', 'index into type_names of each element')
+    point_counts = _growable_property('_point_counts', 'number of element points of each element')
+    hanging_host = _growable_property('_hanging_host', 'host element of each hanging point')
+    hanging_xi = _growable_property('_hanging_xi', 'element coordinates of each hanging point, nan padded')
+    _slots = _growable_property('_slots_array', 'slot of each element point, -1 padded')
+    _hanging_slots = _growable_property('_hanging_slots_array', 'slot of each hanging point')
+    _slot_keys = _growable_property('_slot_keys_array', '(element, point) of each slot')
+    _parent = _growable_property('_parent_array', 'union-find parent of each slot')
+
+    def __init__(self):
+        self._element_numbers = _GrowableArray()
+        self._element_types = _GrowableArray()
+        self.type_names = []
+        self._point_counts = _GrowableArray()
+        self._hanging_host = _GrowableArray()
+        self._hanging_xi = _GrowableArray(0, dtype=float, fill=numpy.nan)
+        self._hanging_csr = None  # (indptr, indices, weights), None until set by the Mapper
+
+        self._slots_array = _GrowableArray(0, fill=-1)
+        self._hanging_slots_array = _GrowableArray()
+        self._slot_keys_array = _GrowableArray(2)
+        self._parent_array = _GrowableArray()
+        self._point_ids = None
+        self._number_of_points = None
+
+    @classmethod
+    def from_mesh(cls, mesh):
+        """ build the store from the elements, hanging points and
+        connectivity dict of a flat mesh
+        """
+        if not mesh.is_flat():
+            raise ValueError('compact connectivity requires a flat mesh')
+
+        store = cls()
+        element_numbers = sorted(mesh.elements.keys())
+        store.add_elements(
+            element_numbers,
+            [mesh.elements[e].type for e in element_numbers],
+            [mesh.elements[e].get_number_of_ensemble_points() for e in element_numbers]
+        )
+
+        hanging = [mesh.hanging_points[h] for h in sorted(mesh.hanging_points.keys())]
+        store.add_hanging_points([hp.get_host_element() for hp in hanging],
+                                 [hp.get_element_coordinates() for hp in hanging])
+
+        keys1 = []
+        keys2 = []
+        for k, connected in mesh.connectivity.items():
+            keys1 += [k] * len(connected)
+            keys2 += connected
+        store.connect_keys(keys1, keys2)
+
+        return store
+
+    # ==================================================================#
+    def _add_slots(self, keys):
+        n0 = self._parent_array.n
+        self._parent_array.append(numpy.arange(n0, n0 + len(keys)))
+        self._slot_keys_array.append(numpy.asarray(keys, dtype=int).reshape((-1, 2)))
+        self._invalidate()
+        return numpy.arange(n0, n0 + len(keys))
+
+    def _invalidate(self):
+        self._point_ids = None
+        self._number_of_points = None
+
+    def add_element(self, element_number, type_name, number_of_points):
+        """ append an element with unconnected element points. Element
+        numbers must be added in increasing order.
+        """
+        self.add_elements([element_number], [type_name], [number_of_points])
+
+    def add_elements(self, element_numbers, type_names, point_counts):
+        """ append elements with unconnected element points. Element
+        numbers must be increasing and greater than those in the store.
+        """
+        element_numbers = numpy.asarray(element_numbers, dtype=int)
+        point_counts = numpy.asarray(point_counts, dtype=int)
+        if not len(element_numbers):
+            return
+        last = self.element_numbers[-1] if len(self.element_numbers) else None
+        if ((last is not None) and element_numbers[0] <= last) or (numpy.diff(element_numbers) <= 0).any():
+            raise ValueError('element {} added out of order'.format(element_numbers[0]))
+
+        for type_name in type_names:
+            if type_name not in self.type_names:
+                self.type_names.append(type_name)
+        type_index = dict((t, i) for i, t in enumerate(self.type_names))
+
+        # element points take consecutive slots in element order
+        offsets = numpy.cumsum(point_counts) - point_counts
+        points = numpy.arange(point_counts.sum()) - numpy.repeat(offsets, point_counts)
+        slots = self._add_slots(numpy.column_stack([numpy.repeat(element_numbers, point_counts), points]))
+        width = int(point_counts.max())
+        rows = numpy.full((len(element_numbers), width), -1, dtype=int)
+        rows[numpy.arange(width) < point_counts[:, numpy.newaxis]] = slots
+        self._slots_array.widen(width)
+        self._slots_array.append(rows)
+
+        self._element_numbers.append(element_numbers)
+        self._element_types.append([type_index[t] for t in type_names])
+        self._point_counts.append(point_counts)
+
+    def remove_element(self, element_number):
+        """ remove an element. Points connected through it stay connected.
+        """
+        row = self.element_rows([element_number])[0]
+        removed = self._slots[row][self._slots[row] >= 0]
+
+        # re-root each group on its smallest remaining slot
+        roots = self._find_all()
+        keep = numpy.ones(len(roots), dtype=bool)
+        keep[removed] = False
+        best = numpy.full(len(roots), len(roots), dtype=int)
+        numpy.minimum.at(best, roots[keep], numpy.where(keep)[0])
+        parent = numpy.arange(len(roots))
+        parent[keep] = best[roots[keep]]
+        self._parent = parent
+
+        self._slots = numpy.delete(self._slots, row, axis=0)
+        self.element_numbers = numpy.delete(self.element_numbers, row)
+        self.element_types = numpy.delete(self.element_types, row)
+        self.point_counts = numpy.delete(self.point_counts, row)
+        self._invalidate()
+
+    def add_hanging_point(self, host_element, element_coordinates):
+        """ append a hanging point in host_element at element_coordinates.
+        Its weights are cleared until the Mapper sets them again.
+        """
+        self.add_hanging_points([host_element], [element_coordinates])
+
+    def add_hanging_points(self, host_elements, element_coordinates):
+        """ append hanging points in host_elements at element_coordinates
+        """
+        if not len(host_elements):
+            return
+
+        h0 = self.number_of_hanging_points
+        xis = [numpy.asarray(xi, dtype=float).ravel() for xi in element_coordinates]
+        width = max(len(xi) for xi in xis)
+        rows = numpy.full((len(xis), width), numpy.nan)
+        for i, xi in enumerate(xis):
+            rows[i, :len(xi)] = xi
+        self._hanging_xi.widen(width)
+        self._hanging_xi.append(rows)
+        self._hanging_host.append(host_elements)
+        self._hanging_slots_array.append(self._add_slots([(-1, h) for h in range(h0, h0 + len(xis))]))
+        self._hanging_csr = None
+
+    def set_hanging_weights(self, indptr, indices, weights):
+        """ set the CSR arrays of hanging point ensemble points and
+        weights
+        """
+        self._hanging_csr = (
+            numpy.asarray(indptr, dtype=int), numpy.asarray(indices, dtype=int), numpy.asarray(weights, dtype=float)
+        )
+
+    @property
+    def hanging_indptr(self):
+        if self._hanging_csr is None:
+            return numpy.zeros(self.number_of_hanging_points + 1, dtype=int)
+        return self._hanging_csr[0]
+
+    @property
+    def hanging_indices(self):
+        return numpy.zeros(0, dtype=int) if self._hanging_csr is None else self._hanging_csr[1]
+
+    @property
+    def hanging_weights(self):
+        return numpy.zeros(0, dtype=float) if self._hanging_csr is None else self._hanging_csr[2]
+
+    # ==================================================================#
+    def element_rows(self, element_numbers):
+        """ row of each element number in the element arrays
+        """
+        element_numbers = numpy.asarray(element_numbers, dtype=int)
+        rows = numpy.searchsorted(self.element_numbers, element_numbers)
+        bad = (rows >= len(self.element_numbers)) | \
+              (self.element_numbers[numpy.minimum(rows, len(self.element_numbers) - 1)] != element_numbers)
+        if bad.any():
+            raise ValueError('element {} does not exist'.format(element_numbers[bad][0]))
+        return rows
+
+    def key_slots(self, keys):
+        """ slot of each (element, point) key. Element -1 denotes a
+        hanging point.
+        """
+        keys = numpy.array(keys, dtype=int).reshape((-1, 2))
+        slots = numpy.empty(len(keys), dtype=int)
+        hanging = keys[:, 0] == -1
+        slots[hanging] = self._hanging_slots[keys[hanging, 1]]
+        rows = self.element_rows(keys[~hanging, 0])
+        points = keys[~hanging, 1]
+        if (points >= self.point_counts[rows]).any():
+            raise ValueError('element point does not exist')
+        slots[~hanging] = self._slots[rows, points]
+        return slots
+
+    def _find_all(self):
+        return _find_roots(self._parent, numpy.arange(len(self._parent)))
+
+    def _find(self, slots):
+        """ roots of slots, compressing only their paths
+        """
+        return _find_roots(self._parent, slots)
+
+    def connect_keys(self, keys1, keys2):
+        """ connect each key in keys1 to the key at the same position in
+        keys2, keeping the smaller slot as the root of each group
+        """
+        if not len(keys1):
+            return
+
+        self._union(self.key_slots(keys1), self.key_slots(keys2))
+
+    def _union(self, a, b):
+        """ merges the groups of slots a and b pairwise
+        """
+        _union_groups(self._parent, a, b)
+        self._invalidate()
+
+    def groups(self, keys=None):
+        """ returns {key: [connected keys]} for every key. If keys is
+        given, only those keys are grouped, so they should include every
+        member of the groups wanted, e.g. the keys of a connection and
+        their connectivity entries from before it.
+        """
+        if keys is None:
+            roots = self._find_all()
+            live = numpy.zeros(len(roots), dtype=bool)
+            live[self._slots[self._slots >= 0]] = True
+            live[self._hanging_slots] = True
+            slots = numpy.where(live)[0]
+            slot_roots = roots[slots]
+        else:
+            slots = numpy.unique(self.key_slots(keys))
+            slot_roots = self._find(slots)
+
+        order = numpy.argsort(slot_roots, kind='stable')
+        slots = slots[order]
+        bounds = numpy.flatnonzero(numpy.diff(slot_roots[order])) + 1
+        connectivity = {}
+        for group in numpy.split(slots, bounds):
+            group_keys = [tuple(int(x) for x in k) for k in self._slot_keys[group]]
+            for i, k in enumerate(group_keys):
+                connectivity[k] = group_keys[:i] + group_keys[i + 1:]
+        return connectivity
+
+    def to_connectivity(self):
+        """ returns a connectivity dict equivalent to the store
+        """
+        return self.groups()
+
+    # ==================================================================#
+    @property
+    def point_ids(self):
+        if self._point_ids is None:
+            self._label()
+        return self._point_ids
+
+    @property
+    def number_of_points(self):
+        if self._number_of_points is None:
+            self._label()
+        return self._number_of_points
+
+    @property
+    def number_of_hanging_points(self):
+        return len(self.hanging_host)
+
+    def _label(self):
+        """ number groups not containing a hanging point in order of their
+        first (element, point) key, as label_connected_points does
+        """
+        roots = self._find_all()
+        valid = self._slots >= 0
+        slot_roots = roots[self._slots[valid]]  # in (element, point) order
+        uniq, first, inverse = numpy.unique(slot_roots, return_index=True, return_inverse=True)
+
+        # hanging group label is -2 - its smallest hanging point
+        hanging_label = numpy.full(len(roots), -2 - len(self._hanging_slots), dtype=int)
+        hanging_root = numpy.zeros(len(roots), dtype=bool)
+        h = numpy.arange(len(self._hanging_slots))
+        numpy.maximum.at(hanging_label, roots[self._hanging_slots], -2 - h)
+        hanging_root[roots[self._hanging_slots]] = True
+
+        labels = numpy.empty(len(uniq), dtype=int)
+        is_hanging = hanging_root[uniq]
+        labels[is_hanging] = hanging_label[uniq[is_hanging]]
+        ensemble = numpy.where(~is_hanging)[0]
+        labels[ensemble[numpy.argsort(first[ensemble])]] = numpy.arange(len(ensemble))
+
+        point_ids = numpy.full(self._slots.shape, -1, dtype=numpy.int32)
+        point_ids[valid] = labels[inverse.ravel()]
+        self._point_ids = point_ids
+        self._number_of_points = len(ensemble)
+
+    # ==================================================================#
+    def serialise(self):
+        """ returns a json-compatible dict of the store
+        """
+        return {
+            'element_numbers': self.element_numbers.tolist(),
+            'element_types': self.element_types.tolist(),
+            'type_names': list(self.type_names),
+            'point_counts': self.point_counts.tolist(),
+            'point_ids': self.point_ids.tolist(),
+            'hanging_host': self.hanging_host.tolist(),
+            'hanging_xi': [list(xi[~numpy.isnan(xi)]) for xi in self.hanging_xi],
+        }
+
+    @classmethod
+    def deserialise(cls, d):
+        """ build the store from a dict made by serialise
+        """
+        store = cls()
+        store.add_elements(d['element_numbers'], [d['type_names'][t] for t in d['element_types']], d['point_counts'])
+        store.add_hanging_points(d['hanging_host'], d['hanging_xi'])
+
+        # element points sharing an id share an ensemble or hanging point
+        point_ids = numpy.array(d['point_ids'], dtype=int).reshape(store._slots.shape)
+        valid = point_ids != -1
+        slots = store._slots[valid]
+        ids = point_ids[valid]
+        order = numpy.argsort(ids, kind='stable')
+        first = numpy.ones(len(ids), dtype=bool)
+        first[1:] = ids[order][1:] != ids[order][:-1]
+        group_first = order[first][numpy.cumsum(first) - 1]
+        a = numpy.hstack([slots[order], store._hanging_slots[-2 - ids[ids <= -2]]])
+        b = numpy.hstack([slots[group_first], slots[ids <= -2]])
+        store._union(a, b)
+        return store
+
+
+# =============================================================================#
+def _csr(rows, n_rows, *values):
+    """ returns the indptr of rows sorted into n_rows, and each of values
+    ordered by row
+    """
+    rows = numpy.asarray(rows, dtype=int)
+    order = numpy.argsort(rows, kind='stable')
+    indptr = numpy.zeros(n_rows + 1, dtype=int)
+    indptr[1:] = numpy.cumsum(numpy.bincount(rows, minlength=n_rows))
+    return (indptr,) + tuple(numpy.asarray(v)[order] for v in values)
+
+
+class TopologyIndex(object):
+    """ Edge, face and vertex incidence of a flat mesh. Edges and faces
+    are identified by hashing the sorted group numbers of their points, so
+    the index is built in one pass over the elements.
+
+    edge_indptr, edge_elements, edge_local, edge_directions: CSR arrays of
+        the element number, element edge number and direction (1 if along,
+        -1 if opposite to the edge's first incidence) of each edge's
+        incident elements
+    face_indptr, face_elements, face_local: the same for the faces of 3D
+        elements, given by Element.get_face_vertex_points
+    edge_adjacency_indptr, edge_adjacency: CSR arrays of the elements
+        sharing an edge with each element in element_numbers order
+    face_adjacency_indptr, face_adjacency: the same across faces
+    boundary_edges, boundary_faces: (n, 2) arrays of the (element, edge or
+        face number) of edges and faces with one incident element
+    vertex_points, vertex_indptr, vertex_elements: CSR arrays of the
+        elements incident to each vertex ensemble point
+    """
+
+    def __init__(self, mesh):
+        if not mesh.is_flat():
+            raise ValueError('topology index requires a flat mesh')
+
+        self.element_numbers = numpy.array(sorted(mesh.elements.keys()), dtype=int)
+        groups, numbers = self._point_groups(mesh)
+
+        edges = {}  # { sorted group tuple: edge index }
+        edge_sequences = []
+        edge_rows, edge_inc = [], []
+        faces = {}
+        face_rows, face_inc = [], []
+        vertex_rows, vertex_elements = [], []
+        for element_number in self.element_numbers:
+            element_number = int(element_number)
+            element = mesh.elements[element_number]
+            g = groups[element_number]
+
+            for edge_i, edge_points in enumerate(element.edge_points or ()):
+                sequence = tuple(g[p] for p in edge_points)
+                k = edges.setdefault(tuple(sorted(sequence)), len(edges))
+                if k == len(edge_sequences):
+                    edge_sequences.append(sequence)
+                edge_rows.append(k)
+                edge_inc.append((element_number, edge_i, 1 if sequence == edge_sequences[k] else -1))
+
+            for face_i, face_points in enumerate(element.get_face_vertex_points()):
+                k = faces.setdefault(tuple(sorted(g[p] for p in face_points)), len(faces))
+                face_rows.append(k)
+                face_inc.append((element_number, face_i))
+
+            for p in set(numbers[element_number][v] for v in element.get_vertex_points()):
+                if p >= 0:
+                    vertex_rows.append(p)
+                    vertex_elements.append(element_number)
+
+        edge_inc = numpy.array(edge_inc, dtype=int).reshape((-1, 3))
+        self.edge_indptr, self.edge_elements, self.edge_local, self.edge_directions = _csr(
+            edge_rows, len(edges), edge_inc[:, 0], edge_inc[:, 1], edge_inc[:, 2]
+        )
+        face_inc = numpy.array(face_inc, dtype=int).reshape((-1, 2))
+        self.face_indptr, self.face_elements, self.face_local = _csr(
+            face_rows, len(faces), face_inc[:, 0], face_inc[:, 1]
+        )
+
+        self.edge_adjacency_indptr, self.edge_adjacency = self._adjacency(self.edge_indptr, self.edge_elements)
+        self.face_adjacency_indptr, self.face_adjacency = self._adjacency(self.face_indptr, self.face_elements)
+        self.boundary_edges = self._boundary(self.edge_indptr, self.edge_elements, self.edge_local)
+        self.boundary_faces = self._boundary(self.face_indptr, self.face_elements, self.face_local)
+
+        self.vertex_points = numpy.unique(numpy.array(vertex_rows, dtype=int))
+        self.vertex_indptr, self.vertex_elements = _csr(
+            numpy.searchsorted(self.vertex_points, vertex_rows), len(self.vertex_points), vertex_elements
+        )
+
+    def _point_groups(self, mesh):
+        """ returns {element: [group of each point]}, where points share a
+        group if connected, and {element: [ensemble point number of each
+        point]}, -1 for points bound to hanging points
+        """
+        groups = {}
+        numbers = {}
+        if mesh.compact is not None:
+            point_ids = mesh.compact.point_ids
+            for row, element_number in enumerate(mesh.compact.element_numbers):
+                ids = point_ids[row, :mesh.compact.point_counts[row]].tolist()
+                groups[int(element_number)] = ids
+                numbers[int(element_number)] = [i if i >= 0 else -1 for i in ids]
+        else:
+            keys, roots, labels = label_connected_points(mesh.connectivity)
+            group = dict(zip(keys, roots.tolist()))
+            number = dict(zip(keys, labels.tolist()))
+            for element_number, element_points in mesh.element_points.items():
+                groups[element_number] = [group[k] for k in element_points]
+                numbers[element_number] = [number[k] for k in element_points]
+
+        return groups, numbers
+
+    def _adjacency(self, indptr, elements):
+        """ element to element CSR arrays of elements sharing an entry
+        """
+        # every ordered pair of incidences of each entry
+        counts = numpy.diff(indptr)
+        squares = counts ** 2
+        starts = numpy.repeat(indptr[:-1], squares)
+        n = numpy.repeat(counts, squares)
+        k = numpy.arange(squares.sum()) - numpy.repeat(numpy.cumsum(squares) - squares, squares)
+        a = elements[starts + k // n]
+        b = elements[starts + k % n]
+
+        pairs = numpy.array([a, b], dtype=int).T[a != b]
+        if len(pairs):
+            pairs = numpy.unique(pairs, axis=0)
+        return _csr(numpy.searchsorted(self.element_numbers, pairs[:, 0]), len(self.element_numbers), pairs[:, 1])
+
+    def _boundary(self, indptr, elements, local):
+        single = numpy.where(numpy.diff(indptr) == 1)[0]
+        return numpy.array([elements[indptr[single]], local[indptr[single]]], dtype=int).T
+
+    # ==================================================================#
+    def _row(self, element_number):
+        row = numpy.searchsorted(self.element_numbers, element_number)
+        if row >= len(self.element_numbers) or self.element_numbers[row] != element_number:
+            raise ValueError('element {} does not exist'.format(element_number))
+        return row
+
+    def edge_neighbours(self, element_number):
+        """ elements sharing an edge with element_number
+        """
+        row = self._row(element_number)
+        return self.edge_adjacency[self.edge_adjacency_indptr[row]:self.edge_adjacency_indptr[row + 1]]
+
+    def face_neighbours(self, element_number):
+        """ elements sharing a face with element_number
+        """
+        row = self._row(element_number)
+        return self.face_adjacency[self.face_adjacency_indptr[row]:self.face_adjacency_indptr[row + 1]]
+
+    def vertex_incidence(self, ensemble_point):
+        """ elements with ensemble_point as a vertex
+        """
+        i = numpy.searchsorted(self.vertex_points, ensemble_point)
+        if i >= len(self.vertex_points) or self.vertex_points[i] != ensemble_point:
+            return self.vertex_elements[:0]
+        return self.vertex_elements[self.vertex_indptr[i]:self.vertex_indptr[i + 1]]
+
+    def common_edges(self):
+        """ returns a list of (element1, edge1 number, element2, edge2
+        number, direction) for each edge shared by two elements, where
+        direction is 1 if the edges are aligned and -1 if opposite.
+        """
+        counts = numpy.diff(self.edge_indptr)
+        if (counts > 2).any():
+            raise RuntimeError('Edge shared between more than 2 elements.')
+
+        i = self.edge_indptr[:-1][counts == 2]
+        j = i + 1
+        return list(zip(
+            self.edge_elements[i].tolist(), self.edge_local[i].tolist(),
+            self.edge_elements[j].tolist(), self.edge_local[j].tolist(),
+            (self.edge_directions[i] * self.edge_directions[j]).tolist()
+        ))
+
+
 # =============================================================================#
 class MeshEnsemble:
     """ Class for holding information about field topology
@@ -43,6 +689,8 @@ class MeshEnsemble:
         self.connectivity = {}  # { ( element_num, point_num, ?? ) : [(element_num, point_num, ??), ...]] }
         self.hanging_points = {}  # { hanging_point number: hanging_point, ... }
         self.element_points = {}  # { element_number: [ element_points ] } maps element to its element points
+        self.compact = None  # optional CompactConnectivity kept alongside the dicts above
+        self._topology_index = None  # TopologyIndex, built on demand
 
         self.is_element = False
         self.submesh_counter = 0
@@ -131,6 +779,29 @@ class MeshEnsemble:
 
         S.close()
 
+    # ==================================================================#
+    def enable_compact_connectivity(self):
+        """ builds a CompactConnectivity store from the current topology.
+        Once enabled, the store is kept up to date by add_element,
+        remove_element, connect and connect_to_hanging_point, and is used
+        for serialisation and by the Mapper.
+        """
+        self.compact = CompactConnectivity.from_mesh(self)
+        return self.compact
+
+    # ==================================================================#
+    def get_topology_index(self):
+        """ returns the TopologyIndex of the mesh's edge, face and vertex
+        incidence, building it if the topology has changed since it was
+        last built.
+        """
+        if self._topology_index is None:
+            self._topology_index = TopologyIndex(self)
+        return self._topology_index
+
+    def invalidate_topology_index(self):
+        self._topology_index = None
+
     # ==================================================================#
     def add_element(self, element):
         """ adds an element to the mesh. Element can either be an element
@@ -151,6 +822,10 @@ class MeshEnsemble:
             self.connectivity.update({(self.element_counter, p): []})
             self.element_points[self.element_counter].append((self.element_counter, p))
 
+        if self.compact is not None:
+            self.compact.add_element(self.element_counter, element.type, element.get_number_of_ensemble_points())
+        self._topology_index = None
+
         self.element_counter += 1
 
         return self.element_counter - 1
@@ -186,6 +861,10 @@ class MeshEnsemble:
         # removed element points map entry
         del self.element_points[element_number]
 
+        if self.compact is not None:
+            self.compact.remove_element(element_number)
+        self._topology_index = None
+
         # decrease element counter
         # shouldn't decrease since this is used when adding new elements - if a non-last element is removed, new element will overwrite last element ###
         # self.element_counter -= 1
@@ -236,32 +915,15 @@ class MeshEnsemble:
         by going through the connectivity dict.
         """
 
-        gp = 0  # global points number
-        assigned = []  # list of element points already assigned a global number
+        if self.compact is not None:
+            self.number_of_points = self.compact.number_of_points
+            return self.number_of_points
 
-        # account for points connected to hanging nodes
-        # ~ if self.hanging_points:
-        # ~ for points in self.hanging_point_connectivity.values():
-        # ~ assigned += points
-
-        # loop through each element point in the connectivity dict
-        element_points = list(self.connectivity.keys())
-        element_points.sort()
+        labels = label_connected_points(self.connectivity)[2]
         if self.debug:
-            log.debug('sorted element points:', element_points)
-        for element_point in element_points:
-            # check if point has already been assigned a global number
-            if element_point not in assigned:
-                # record element points assigned
-                assigned += [element_point] + self.connectivity[element_point]
-                if self.debug:
-                    log.debug('assigned:', assigned)
-
-                # if not a hanging point, count as an ensemble point
-                if element_point[0] != -1:
-                    gp += 1
+            log.debug('ensemble point labels:', labels)
 
-        self.number_of_points = gp
+        self.number_of_points = int(labels.max()) + 1 if len(labels) else 0
 
         return self.number_of_points
 
@@ -285,8 +947,10 @@ class MeshEnsemble:
                 p_i += 1
         else:
             if len(elem1_points) == len(elem2_points):
-                for i in range(len(elem1_points)):
-                    self.connect([(elem1, elem1_points[i]), (elem2, elem2_points[i])])
+                self.connect_points(
+                    [(elem1, p) for p in elem1_points],
+                    [(elem2, p) for p in elem2_points]
+                )
             else:
                 self.connect([(elem1, elem1_points[0]), (elem2, elem2_points[0])])
                 self.connect([(elem1, elem1_points[-1]), (elem2, elem2_points[-1])])
@@ -335,6 +999,34 @@ class MeshEnsemble:
                     self.connectivity[p].append(point)
                     [self.connect((point, pp)) for pp in self.connectivity[p]]
 
+        if self.compact is not None:
+            self.compact.connect_keys(common_points[:-1], common_points[1:])
+        self._topology_index = None
+
+        return 1
+
+    # ==================================================================#
+    def connect_points(self, points1, points2):
+        """ connects each element point in points1 to the element point at
+        the same position in points2. With a compact store the connections
+        are made in one vectorised union and the connectivity dict entries
+        of the affected points are rebuilt from the store.
+        """
+        if len(points1) != len(points2):
+            raise ValueError('points1 and points2 must be the same length')
+
+        if self.compact is None:
+            for p1, p2 in zip(points1, points2):
+                self.connect([p1, p2])
+            return 1
+
+        # the merged groups are the connected keys and their old groups
+        touched = set(tuple(k) for k in points1) | set(tuple(k) for k in points2)
+        for k in list(touched):
+            touched.update(self.connectivity.get(k, ()))
+        self.compact.connect_keys(points1, points2)
+        self.connectivity.update(self.compact.groups(sorted(touched)))
+        self._topology_index = None
         return 1
 
     # ==================================================================#
@@ -420,6 +1112,9 @@ class MeshEnsemble:
                 self.hanging_points[self.hanging_point_counter] = hp
                 self.connectivity[(-1, self.hanging_point_counter)] = []
                 self.hanging_point_counter += 1
+                if self.compact is not None:
+                    self.compact.add_hanging_point(host_element, element_coordinates)
+                self._topology_index = None
 
                 return 1
             else:
@@ -577,6 +1272,7 @@ def load_mesh_shelve(filename, mesh, filedir=None):
 
     # set connectivity
     mesh.connectivity = S['connectivity']
+    mesh.invalidate_topology_index()
     # set element_points
     mesh.element_points = S['element_points']
     # set others
@@ -621,7 +1317,10 @@ class MeshJSONWriter(object):
         d = {}
         self._serialise_meta(d)
         self._serialise_elements(d, submeshfns)
-        self._serialise_connectivity(d)
+        if self.mesh.compact is not None:
+            d['compact'] = self.mesh.compact.serialise()
+        else:
+            self._serialise_connectivity(d)
         return d
 
     def _serialise_meta(self, mesh_dict):
@@ -730,7 +1429,10 @@ class MeshJSONReader(object):
         """
         self._parse_meta(jsonstr)
         self._parse_elements(jsonstr)
-        self._parse_connectivity(jsonstr)
+        if 'compact' in jsonstr:
+            self._parse_compact(jsonstr)
+        else:
+            self._parse_connectivity(jsonstr)
 
     def _parse_meta(self, mesh_dict):
         self.mesh.name = mesh_dict['name']
@@ -762,6 +1464,17 @@ class MeshJSONReader(object):
             _k = tuple(int(ki) for ki in k.split('_'))
             _v = [tuple(int(vii) for vii in vi.split('_')) for vi in v.split()]
             self.mesh.connectivity[_k] = _v
+        self.mesh.invalidate_topology_index()
+
+    def _parse_compact(self, mesh_dict):
+        compact = CompactConnectivity.deserialise(mesh_dict['compact'])
+        for h in range(compact.number_of_hanging_points):
+            xi = compact.hanging_xi[h]
+            self.mesh.hanging_points[h] = HangingPoint(int(compact.hanging_host[h]), xi[~numpy.isnan(xi)])
+        self.mesh.hanging_point_counter = compact.number_of_hanging_points
+        self.mesh.connectivity = compact.to_connectivity()
+        self.mesh.compact = compact
+        self.mesh.invalidate_topology_index()
 
 
 def load_mesh_json(filename, mesh, filedir=None):
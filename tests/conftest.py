@@ -0,0 +1,68 @@
+"""
+Shared fixtures for the gias3.fieldwork tests.
+"""
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field
+from gias3.fieldwork.field import template_fields
+from gias3.fieldwork.field.topology import element_types
+
+
+def cube_sphere(radius=1.0, flip=False):
+    """ closed 6 element quad33 surface, the faces of a cube with their
+    nodes projected onto a sphere of the given radius. Element normals
+    point outwards, or inwards if flip is True.
+    """
+    F = template_fields.empty_field('sphere', 2, {'quad33': 'quad_L2_L2'})
+    gf = geometric_field.GeometricField('sphere', 3, ensemble_field_function=F)
+    u = numpy.array([0.0, 0.5, 1.0])
+    for axis in range(3):
+        for sign in (-1.0, 1.0):
+            a, b = (axis + 1) % 3, (axis + 2) % 3
+            if sign < 0:
+                a, b = b, a
+            P = []
+            for v in u:
+                for w in u:
+                    x = numpy.zeros(3)
+                    x[axis] = sign
+                    x[a] = 2.0 * w - 1.0
+                    x[b] = 2.0 * v - 1.0
+                    P.append(radius * x / numpy.linalg.norm(x))
+            P = numpy.array(P)
+            if flip:
+                P = P.reshape((3, 3, 3)).transpose((1, 0, 2)).reshape((9, 3))
+            gf.add_element_with_parameters(element_types.create_element('quad33'), P.T[:, :, numpy.newaxis], tol=1e-6)
+
+    return gf
+
+
+@pytest.fixture
+def sphere():
+    return cube_sphere()
+
+
+@pytest.fixture
+def make_sphere():
+    return cube_sphere
+
+
+def reference_evaluate(gf, xi, derivs=None):
+    """ evaluates every element of gf at element coordinates xi (n, dims)
+    one element at a time, with the per-element mapping of the mapper.
+    Returns (dims, n_elements * n) values, or derivatives
+    (dims, n_derivs, n_elements * n) if derivs is -1.
+    """
+    F = gf.ensemble_field_function
+    P = gf._get_component_parameters()
+    out = []
+    for e in sorted(F.mesh.elements.keys()):
+        basis = F.basis[F.mesh.elements[e].type]
+        ep = F.mapper.get_element_parameters(e, P, do_hack=1)
+        if derivs == -1:
+            B = basis.eval_derivatives(xi.T, None)
+            out.append(numpy.einsum('kbn,bc->ckn', B, ep))
+        else:
+            out.append(numpy.dot(ep.T, basis.eval(xi.T)))
+    return numpy.concatenate(out, axis=-1)
@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy
+import pytest
+
+from gias3.fieldwork.field.basis import basis
+
+polynomial_types = sorted(t for t, b in basis.basis_types.items() if issubclass(b, basis.PolynomialBasis))
+
+# the simplex L4 x L1 bases do not sum to one inside the triangle
+lagrange_types = [t for t in polynomial_types if t not in ('simplex_L4_L1', 'prism_sL4_sL1_qL4')]
+
+# values and derivatives of the pre-registry basis classes at a fixed xi,
+# keyed by the derivative orders, e.g. '0,0,2'. Derivatives the old classes
+# did not implement are absent.
+with open(os.path.join(os.path.dirname(__file__), 'data', 'basis_reference.json')) as f:
+    reference = json.load(f)
+
+
+def _simplex_points(b, n, rs):
+    """ random points inside the element domain of basis b, with the
+    leading simplex coordinates summing to no more than 1
+    """
+    x = rs.uniform(0.05, 0.45, (b.dimensions, n))
+    return x
+
+
+@pytest.mark.parametrize('basis_type', lagrange_types)
+def test_partition_of_unity(basis_type):
+    b = basis.make_basis(basis_type)
+    x = _simplex_points(b, 20, numpy.random.RandomState(0))
+    numpy.testing.assert_allclose(b.eval(x).sum(0), 1.0, atol=1e-10)
+
+
+@pytest.mark.parametrize('basis_type', polynomial_types)
+def test_first_derivatives_match_finite_differences(basis_type):
+    b = basis.make_basis(basis_type)
+    x = _simplex_points(b, 10, numpy.random.RandomState(1))
+    h = 1e-6
+    for d in range(b.dimensions):
+        deriv = tuple(int(i == d) for i in range(b.dimensions))
+        step = numpy.zeros((b.dimensions, 1))
+        step[d] = h
+        fd = (b.eval(x + step) - b.eval(x - step)) / (2.0 * h)
+        numpy.testing.assert_allclose(b.eval_derivatives(x, deriv), fd, atol=1e-6)
+
+
+
+def test_reference_covers_polynomial_bases():
+    assert set(basis.basis_types[t] for t in reference['bases']) == \
+        set(basis.basis_types[t] for t in polynomial_types)
+
+
+@pytest.mark.parametrize('basis_type', sorted(reference['bases']))
+def test_matches_reference_values(basis_type):
+    b = basis.make_basis(basis_type)
+    x = numpy.array(reference['xi'][:b.dimensions])[:, numpy.newaxis]
+    for key, expected in reference['bases'][basis_type].items():
+        if key == 'eval':
+            value = b.eval(x)
+        else:
+            value = b.eval_derivatives(x, tuple(int(d) for d in key.split(',')))
+        numpy.testing.assert_allclose(numpy.ravel(value), expected, rtol=1e-10, atol=1e-10, err_msg=key)
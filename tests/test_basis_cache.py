@@ -0,0 +1,54 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.basis import basis
+
+
+def _xi(n, seed):
+    return numpy.random.RandomState(seed).uniform(0.0, 1.0, (2, n))
+
+
+def test_cached_values_match_basis():
+    cache = basis.BasisValueCache()
+    b = basis.make_basis('quad_L2_L2')
+    x = _xi(10, 0)
+
+    v = cache.eval(b, x)
+    numpy.testing.assert_array_equal(v, b.eval(x))
+    assert not v.flags.writeable
+    with pytest.raises(ValueError):
+        v[0, 0] = 1.0
+
+    # a copy of the same xi hits the same entry
+    assert cache.eval(b, x.copy()) is v
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    # another basis type, xi set or derivative misses
+    cache.eval(basis.make_basis('quad_L3_L3'), x)
+    cache.eval(b, _xi(10, 1))
+    d = cache.eval_derivatives(b, x, (1, 0))
+    numpy.testing.assert_array_equal(d, b.eval_derivatives(x, (1, 0)))
+    numpy.testing.assert_array_equal(cache.eval_derivatives(b, x), b.eval_derivatives(x, None))
+    assert cache.stats()['misses'] == 5
+    assert cache.eval_derivatives(b, x, []) is cache.eval_derivatives(b, x, None)
+
+
+def test_cache_eviction():
+    b = basis.make_basis('quad_L2_L2')
+    nbytes = b.eval(_xi(50, 0)).nbytes
+    cache = basis.BasisValueCache(max_bytes=2 * nbytes)
+
+    first = cache.eval(b, _xi(50, 0))
+    cache.eval(b, _xi(50, 1))
+    cache.eval(b, _xi(50, 0))  # most recently used
+    cache.eval(b, _xi(50, 2))
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['nbytes'] <= cache.max_bytes
+    assert cache.eval(b, _xi(50, 0)) is first
+
+    # values larger than the cache are returned without being kept
+    cache.eval(b, _xi(200, 3))
+    assert cache.stats()['entries'] == 2
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'entries': 0, 'nbytes': 0}
@@ -0,0 +1,89 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.tools import bvh
+
+
+def _perturbed(gf, seed):
+    rs = numpy.random.RandomState(seed)
+    gf.set_field_parameters(gf.get_field_parameters() + rs.normal(scale=0.05, size=gf.field_parameters.shape))
+    return gf
+
+
+def _element_samples(gf, density):
+    xi = gf.ensemble_field_function.mesh.elements[0].generate_eval_grid([density, density])
+    elems = sorted(gf.ensemble_field_function.mesh.elements.keys())
+    X = numpy.array([gf.evaluate_geometric_field_at_element_points(e, xi).T for e in elems])
+    return numpy.array(elems), xi, X
+
+
+def _candidates(point_index, elems, n):
+    c = [set() for i in range(n)]
+    for i, e in zip(point_index, elems):
+        c[i].add(e)
+    return c
+
+
+@pytest.mark.parametrize('leaf_size', [1, 4])
+def test_containing_candidates_include_source_element(sphere, leaf_size):
+    gf = _perturbed(sphere, 0)
+    elems, xi, X = _element_samples(gf, 9)
+    points = X.reshape((-1, 3))
+    source = numpy.repeat(elems, X.shape[1])
+
+    tree = bvh.ElementBVH(gf.ensemble_field_function, gf._get_component_parameters(), leaf_size=leaf_size)
+    candidates = _candidates(*tree.query_containing(points, tol=1e-9), n=len(points))
+    assert all(e in c for e, c in zip(source, candidates))
+
+
+@pytest.mark.parametrize('leaf_size', [1, 4])
+def test_nearest_candidates_include_brute_force_element(sphere, leaf_size):
+    gf = _perturbed(sphere, 1)
+    elems, xi, X = _element_samples(gf, 40)
+    rs = numpy.random.RandomState(2)
+    points = rs.uniform(-2.0, 2.0, (300, 3))
+
+    d = ((X[:, :, numpy.newaxis, :] - points) ** 2.0).sum(-1).min(1)
+    closest = elems[d.argmin(0)]
+
+    tree = bvh.ElementBVH(gf.ensemble_field_function, gf._get_component_parameters(), leaf_size=leaf_size)
+    candidates = _candidates(*tree.query_nearest(points), n=len(points))
+    assert all(e in c for e, c in zip(closest, candidates))
+
+
+def test_containing_misses_far_points(sphere):
+    tree = sphere.get_element_bvh()
+    point_index, elems = tree.query_containing(numpy.array([[5.0, 0.0, 0.0], [0.0, 0.0, 0.0]]), tol=0.1)
+    assert len(point_index) == 0
+
+
+def test_get_element_bvh_cache(sphere):
+    tree = sphere.get_element_bvh()
+    assert sphere.get_element_bvh() is tree
+
+    # new parameters refit the same tree
+    lower = tree.element_lower.copy()
+    sphere.set_field_parameters(sphere.get_field_parameters() * 2.0)
+    assert sphere.get_element_bvh() is tree
+    numpy.testing.assert_allclose(tree.element_lower, 2.0 * lower)
+
+    # remapping element nodes without changing the element count rebuilds
+    emap = sphere.ensemble_field_function.mapper._element_to_ensemble_map[0]
+    emap[0], emap[2] = emap[2], emap[0]
+    rebuilt = sphere.get_element_bvh()
+    assert rebuilt is not tree
+    assert rebuilt.mesh_key == bvh.mesh_key(sphere.ensemble_field_function)
+
+
+def test_build_median_tree():
+    centres = numpy.random.RandomState(3).uniform(size=(37, 3))
+    order, left, right, start, count, depth = bvh.build_median_tree(centres, 4)
+    assert sorted(order) == list(range(37))
+    leaves = left < 0
+    assert count[leaves].max() <= 4 and count[leaves].sum() == 37
+    # children split their parent's range at the median
+    inner = numpy.where(~leaves)[0]
+    numpy.testing.assert_array_equal(start[left[inner]], start[inner])
+    numpy.testing.assert_array_equal(start[right[inner]], start[inner] + count[inner] // 2)
+    numpy.testing.assert_array_equal(count[left[inner]] + count[right[inner]], count[inner])
+    numpy.testing.assert_array_equal(depth[left[inner]], depth[inner] + 1)
@@ -0,0 +1,49 @@
+import itertools
+
+import numpy
+import pytest
+
+from gias3.fieldwork.field.topology import element_types
+
+
+def _loop_grid(element, density):
+    """ grid of interior points from per-point is_interior calls
+    """
+    axes = [numpy.linspace(element.interior[i][0], element.interior[i][1], density[i])
+            for i in range(element.dimensions)]
+    grid = [list(x) for x in itertools.product(*axes) if element.is_interior(list(x))]
+    grid = numpy.array(grid)
+    return grid[:, 0] if element.dimensions == 1 else grid
+
+
+@pytest.mark.parametrize('type_', ['line3l', 'quad33', 'quad444', 'tri6', 'tri10', 'tri16', 'prism6-5'])
+@pytest.mark.parametrize('d', [2, 5, 8])
+def test_eval_grid_matches_is_interior(type_, d):
+    element = element_types.element_types[type_]
+    density = [d + i for i in range(element.dimensions)]
+    numpy.testing.assert_array_equal(element.generate_eval_grid(density), _loop_grid(element, density))
+
+
+def test_tri_equilateral_grid():
+    element = element_types.element_types['tri3e']
+    d = [6, 6]
+    grid = element.generate_eval_grid(d)
+
+    # rows of d[0], d[0] - 1, ... points spanning the triangle at each height
+    expected = []
+    xn = d[0]
+    for y in numpy.linspace(element.interior[1][0], element.interior[1][1], d[1]):
+        xEdge = element._equi_evalx(y, element.interior[1][1])
+        expected.append([numpy.linspace(xEdge, -xEdge, xn), [y] * xn])
+        xn -= 1
+    numpy.testing.assert_allclose(grid, numpy.hstack(expected), atol=1e-12)
+
+
+def test_eval_grid_cache():
+    element = element_types.element_types['quad33']
+    grid = element.generate_eval_grid([4, 5])
+    assert element.generate_eval_grid(numpy.array([4, 5])) is grid
+    assert element.generate_eval_grid([5, 4]) is not grid
+    assert not grid.flags.writeable
+    with pytest.raises(ValueError):
+        grid[0, 0] = 1.0
@@ -0,0 +1,40 @@
+import numpy
+import pytest
+
+from conftest import reference_evaluate
+
+
+@pytest.mark.parametrize('density', [[3, 3], [5, 4]])
+def test_plan_matches_per_element_evaluation(sphere, density):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    xi = F.mesh.elements[0].generate_eval_grid(density)
+
+    plan = F.make_evaluation_plan(density=density)
+    numpy.testing.assert_allclose(plan.evaluate_field(P), reference_evaluate(sphere, xi), atol=1e-12)
+
+
+def test_plan_derivatives_match_per_element_evaluation(sphere):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    xi = F.mesh.elements[0].generate_eval_grid([4, 4])
+
+    plan = F.make_evaluation_plan(density=[4, 4], derivs=-1)
+    numpy.testing.assert_allclose(plan.evaluate_derivatives(P), reference_evaluate(sphere, xi, derivs=-1),
+                                  atol=1e-12)
+
+
+def test_plan_matches_evaluate_geometric_field(sphere):
+    F = sphere.ensemble_field_function
+    X = sphere.evaluate_geometric_field([4, 4])
+    plan = F.get_evaluation_plan([4, 4])
+    numpy.testing.assert_allclose(plan.evaluate_field(sphere._get_component_parameters()), X, atol=1e-12)
+    assert F.get_evaluation_plan([4, 4]) is plan
+
+
+def test_plan_at_explicit_xi(sphere):
+    F = sphere.ensemble_field_function
+    xi = numpy.random.RandomState(0).uniform(0.0, 1.0, (7, 2))
+    plan = F.make_evaluation_plan(xi=xi)
+    numpy.testing.assert_allclose(plan.evaluate_field(sphere._get_component_parameters()),
+                                  reference_evaluate(sphere, xi), atol=1e-12)
@@ -0,0 +1,53 @@
+import copy
+import pickle
+
+import numpy
+
+from gias3.fieldwork.field.topology import element_types
+
+
+def _point(gf, ensemble_point):
+    return gf.points[gf.ensemble_to_points_map[ensemble_point]]
+
+
+def test_set_field_parameters_updates_in_place(sphere):
+    array = sphere.field_parameters
+    view = sphere.get_field_parameters(copy=False)
+    snapshot = sphere.get_field_parameters()
+
+    new = 2.0 * snapshot
+    sphere.set_field_parameters(new)
+    assert sphere.field_parameters is array
+    numpy.testing.assert_array_equal(view, new)
+    numpy.testing.assert_array_equal(snapshot, new / 2.0)
+    # geometric points see the new parameters
+    numpy.testing.assert_array_equal(_point(sphere, 5).get_position(), new[:, 5, 0])
+
+    # points write through to the field
+    _point(sphere, 3).set_field_parameters(numpy.zeros((3, 1)))
+    numpy.testing.assert_array_equal(sphere.field_parameters[:, 3], 0.0)
+
+
+def test_parameter_view_is_read_only(sphere):
+    view = sphere.get_field_parameters(copy=False)
+    assert not view.flags.writeable
+    assert sphere.field_parameters.flags.writeable
+
+
+def test_point_views_survive_copies(sphere):
+    for gf in (copy.deepcopy(sphere), pickle.loads(pickle.dumps(sphere))):
+        gf.set_field_parameters(gf.get_field_parameters() + 1.0)
+        numpy.testing.assert_array_equal(_point(gf, 7).get_position(), sphere.field_parameters[:, 7, 0] + 1.0)
+        # the original is unchanged
+        assert not numpy.shares_memory(gf.field_parameters, sphere.field_parameters)
+
+
+def test_add_element_rebinds_point_views(sphere):
+    n = sphere.get_number_of_points()
+    P = numpy.random.RandomState(0).uniform(3.0, 4.0, (3, 9, 1))
+    sphere.add_element_with_parameters(element_types.create_element('quad33'), P, tol=1e-6)
+    assert sphere.field_parameters.shape == (3, n + 9, 1)
+
+    sphere.set_field_parameters(sphere.get_field_parameters() * 3.0)
+    for i in range(n + 9):
+        numpy.testing.assert_array_equal(_point(sphere, i).get_position(), sphere.field_parameters[:, i, 0])
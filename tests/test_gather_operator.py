@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+
+def test_gather_matches_element_maps(sphere):
+    M = sphere.ensemble_field_function.mapper
+    P = sphere._get_component_parameters()
+    G = M.get_gather_operator()
+    assert G.shape == (6 * 9, P.shape[0])
+    numpy.testing.assert_array_equal(G.sum(1), 1.0)
+
+    allParams = M.get_all_element_parameters(P)
+    assert sorted(allParams.keys()) == list(range(6))
+    for e in range(6):
+        expected = M.get_element_parameters(e, P, do_hack=1)
+        numpy.testing.assert_array_equal(M.get_element_parameters(e, P), expected)
+        numpy.testing.assert_array_equal(allParams[e], expected)
+        numpy.testing.assert_array_equal(M.get_element_parameters(e, P[:, 0]), expected[:, 0])
+
+
+def test_gather_element_subset(sphere):
+    M = sphere.ensemble_field_function.mapper
+    P = sphere._get_component_parameters()
+    rows = M.get_gather_operator([3, 1]).dot(P)
+    numpy.testing.assert_array_equal(rows[:9], M.get_element_parameters(3, P))
+    numpy.testing.assert_array_equal(rows[9:], M.get_element_parameters(1, P))
+
+    with pytest.raises(ValueError):
+        M.get_gather_operator([7])
+    with pytest.raises(ValueError):
+        M.get_element_parameters(7, P)
+
+
+def test_gather_after_remove_element(sphere):
+    M = sphere.ensemble_field_function.mapper
+    P = sphere._get_component_parameters()
+    before = M.get_all_element_parameters(P)
+
+    M.remove_element(2)
+    after = M.get_all_element_parameters(P)
+    assert sorted(after.keys()) == [0, 1, 3, 4, 5]
+    for e in after:
+        numpy.testing.assert_array_equal(after[e], before[e])
+
+
+def test_gather_custom_ordering(sphere):
+    M = sphere.ensemble_field_function.mapper
+    P = sphere._get_component_parameters()
+    before = M.get_all_element_parameters(P)
+
+    perm = numpy.random.RandomState(0).permutation(P.shape[0])
+    M.set_custom_ensemble_ordering(dict(enumerate(perm.tolist())))
+    customP = numpy.empty_like(P)
+    customP[perm] = P
+    after = M.get_all_element_parameters(customP)
+    for e in before:
+        numpy.testing.assert_array_equal(after[e], before[e])
@@ -0,0 +1,32 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field
+
+
+@pytest.mark.parametrize('n_changed', [0, 1, 3, 20])
+def test_incremental_matches_full_evaluation(sphere, n_changed):
+    evaluator = geometric_field.makeGeometricFieldEvaluatorSparse(sphere, [5, 5])
+    incremental = geometric_field.makeIncrementalEvaluatorSparse(evaluator)
+    assert incremental.A is evaluator.A
+
+    rs = numpy.random.RandomState(n_changed)
+    p = sphere.field_parameters.ravel().copy()
+    numpy.testing.assert_allclose(incremental(p), evaluator(p), atol=1e-12)
+
+    for it in range(3):
+        P = p.reshape((3, -1)).copy()
+        nodes = rs.choice(P.shape[1], n_changed, replace=False)
+        P[:, nodes] += rs.normal(scale=0.1, size=(3, n_changed))
+        p = P.ravel()
+        numpy.testing.assert_allclose(incremental(p), evaluator(p), atol=1e-12)
+
+
+def test_incremental_results_are_copies(sphere):
+    evaluator = geometric_field.makeGeometricFieldEvaluatorSparse(sphere, [5, 5])
+    incremental = geometric_field.makeIncrementalEvaluatorSparse(evaluator)
+    p = sphere.field_parameters.ravel().copy()
+
+    first = incremental(p)
+    first[:] = 0.0
+    numpy.testing.assert_allclose(incremental(p), evaluator(p), atol=1e-12)
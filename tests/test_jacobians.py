@@ -0,0 +1,90 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field_fitter as GFF
+from gias3.fieldwork.field.tools import fitting_tools
+
+
+def _fd_jacobian(obj, x, h=1e-6):
+    J = numpy.empty((numpy.atleast_1d(obj(x)).size, x.size))
+    for i in range(x.size):
+        dx = numpy.zeros_like(x)
+        dx[i] = h
+        J[:, i] = (obj(x + dx) - obj(x - dx)) / (2.0 * h)
+    return J
+
+
+def _perturbed_parameters(gf, seed=0):
+    rs = numpy.random.RandomState(seed)
+    return gf.field_parameters.ravel() + rs.normal(scale=0.05, size=gf.field_parameters.size)
+
+
+def _data(n, seed):
+    rs = numpy.random.RandomState(seed)
+    d = rs.normal(size=(n, 3))
+    return 1.1 * d / numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+
+
+def _check_jacobian(obj, x):
+    J = obj.jac(x)
+    numpy.testing.assert_allclose(J.toarray(), _fd_jacobian(obj, x), atol=1e-6)
+    # analytic non-zeros fall inside the declared sparsity pattern
+    if hasattr(obj, 'jac_sparsity'):
+        outside = (abs(J.toarray()) > 0) & (obj.jac_sparsity.toarray() == 0)
+        assert not outside.any()
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_epep_jacobian(sphere, weighted):
+    eval_d = [4, 4]
+    n = 6 * 16
+    weights = numpy.random.RandomState(2).uniform(0.5, 2.0, n) if weighted else None
+    obj = GFF.makeObjEPEP(sphere, _data(n, 1), eval_d, data_weights=weights)
+    _check_jacobian(obj, _perturbed_parameters(sphere))
+
+
+def test_sobelov_2d_jacobian(sphere):
+    obj = GFF.makeSobelovPenalty2D(sphere, [4, 4], [1.0, 2.0, 0.5, 1.5, 0.25])
+    _check_jacobian(obj, _perturbed_parameters(sphere))
+
+
+def test_normal_smoother_jacobian(sphere):
+    obj = GFF.normalSmoother2(sphere.ensemble_field_function).makeObj(5)
+    _check_jacobian(obj, _perturbed_parameters(sphere))
+
+
+def test_stacked_jacobian_with_fixed_nodes(sphere):
+    eval_d = [4, 4]
+    gObj = GFF.makeObjEPEP(sphere, _data(6 * 16, 3), eval_d)
+    sobObj = GFF.makeSobelovPenalty2D(sphere, eval_d, [1.0, 1.0, 1.0, 1.0, 1.0])
+    nObj = GFF.normalSmoother2(sphere.ensemble_field_function).makeObj(5)
+    fixed = [0, 5]
+    fixedVal = sphere.get_field_parameters()[:, fixed, 0].T
+    obj = fitting_tools.combObjGeomSobNormalStack(gObj, sobObj, nObj, 0.1, 0.5, fixed_node_i=fixed, fixed_node_val=fixedVal)
+    _check_jacobian(obj, _perturbed_parameters(sphere))
+
+
+def test_leastsq_jacobian_paths_agree(sphere):
+    eval_d = [4, 4]
+    obj = GFF.makeObjEPEP(sphere, _data(6 * 16, 4), eval_d)
+    p0 = sphere.field_parameters.ravel().copy()
+
+    fd = GFF.leastsqJacobian(obj, p0, None, 1e-8, maxfev=100000)[0]
+    dense = GFF.leastsqJacobian(obj, p0, obj.jac, 1e-8, maxfev=100000)[0]
+    sparse = fitting_tools.minimiseLeastSquares(obj, p0, 1e-8, 100000, solver='least_squares', jac=obj.jac)
+
+    rms = [numpy.sqrt(obj(p).mean()) for p in (fd, dense, sparse)]
+    numpy.testing.assert_allclose(rms[1:], rms[0], rtol=1e-4)
+
+
+def test_leastsq_jacobian_keeps_minpack(sphere, monkeypatch, caplog):
+    obj = GFF.makeObjEPEP(sphere, _data(6 * 16, 4), [4, 4])
+    p0 = sphere.field_parameters.ravel().copy()
+    expected = GFF.leastsqJacobian(obj, p0, obj.jac, 1e-8, maxfev=100000)
+
+    # a large jacobian is only warned about, the solver and status are leastsq's
+    monkeypatch.setattr(GFF, 'DENSE_JACOBIAN_MAX_SIZE', 0)
+    output = GFF.leastsqJacobian(obj, p0, obj.jac, 1e-8, maxfev=100000)
+    assert 'least_squares' in caplog.text
+    numpy.testing.assert_array_equal(output[0], expected[0])
+    assert output[1] == expected[1]
@@ -0,0 +1,67 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field_fitter as GFF
+from gias3.fieldwork.field.tools import fitting_tools
+
+EVAL_D = [4, 4]
+
+
+def _data(n, seed):
+    rs = numpy.random.RandomState(seed)
+    d = rs.normal(size=(n, 3))
+    return 1.1 * d / numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+
+
+def _stacked_obj(gf, data):
+    gObj = GFF.makeObjEPEP(gf, data, EVAL_D)
+    sobObj = GFF.makeSobelovPenalty2D(gf, EVAL_D, [1e-3, 1e-3, 1e-3, 1e-3, 1e-3])
+    nObj = GFF.normalSmoother2(gf.ensemble_field_function).makeObj(5)
+    return fitting_tools.combObjGeomSobNormalStack(gObj, sobObj, nObj, 1.0, 0.1)
+
+
+def _fd_jacobian(obj, x, h=1e-6):
+    J = numpy.empty((obj(x).size, x.size))
+    for i in range(x.size):
+        dx = numpy.zeros_like(x)
+        dx[i] = h
+        J[:, i] = (obj(x + dx) - obj(x - dx)) / (2.0 * h)
+    return J
+
+
+def test_epdp_sparsity_covers_jacobian(sphere):
+    data = _data(300, 0)
+    obj = GFF.makeObjEPDP(sphere, data, EVAL_D)
+    p = sphere.field_parameters.ravel()
+    J = _fd_jacobian(obj, p)
+    S = obj.jac_sparsity.toarray()
+    assert S.shape == J.shape
+    assert not ((abs(J) > 1e-8) & (S == 0)).any()
+
+
+def test_stacked_sparsity_covers_jacobian(sphere):
+    obj = _stacked_obj(sphere, _data(96, 1))
+    rs = numpy.random.RandomState(2)
+    p = sphere.field_parameters.ravel() + rs.normal(scale=0.05, size=sphere.field_parameters.size)
+    J = _fd_jacobian(obj, p)
+    assert not ((abs(J) > 1e-8) & (obj.jac_sparsity.toarray() == 0)).any()
+
+
+@pytest.mark.parametrize('use_jac', [False, True])
+def test_least_squares_solver_matches_leastsq(sphere, use_jac):
+    obj = _stacked_obj(sphere, _data(96, 3))
+    p0 = sphere.field_parameters.ravel().copy()
+    maxfev = 100 * len(p0)
+
+    pLeastsq = fitting_tools.minimiseLeastSquares(obj, p0, 1e-8, maxfev, jac=obj.jac)
+    pTrf = fitting_tools.minimiseLeastSquares(obj, p0, 1e-8, maxfev, solver='least_squares',
+                                              jac=obj.jac if use_jac else None, jac_sparsity=obj.jac_sparsity)
+    cost = [(obj(p) ** 2.0).sum() for p in (p0, pLeastsq, pTrf)]
+    assert cost[2] < cost[0]
+    numpy.testing.assert_allclose(cost[2], cost[1], rtol=1e-3)
+
+
+def test_unknown_solver(sphere):
+    obj = GFF.makeObjEPEP(sphere, _data(96, 4), EVAL_D)
+    with pytest.raises(ValueError):
+        fitting_tools.minimiseLeastSquares(obj, sphere.field_parameters.ravel(), 1e-6, 100, solver='newton')
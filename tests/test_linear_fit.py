@@ -0,0 +1,70 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field_fitter as GFF
+
+EVAL_D = [4, 4]
+SOB_W = [1e-3, 2e-3, 1e-3, 2e-3, 1e-3]
+
+
+def _data(n, seed):
+    rs = numpy.random.RandomState(seed)
+    d = rs.normal(size=(n, 3))
+    return 1.2 * d / numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+
+
+def _dense_solution(A, data, K, W):
+    """ minimiser of sum_i w_ic ((A x_c)_i - data_ic)^2 + x_c^T K x_c for
+    each dimension from the dense normal equations
+    """
+    A = A.toarray()
+    K = K.toarray()
+    return numpy.array([numpy.linalg.solve(A.T.dot(W[c][:, numpy.newaxis] * A) + K, A.T.dot(W[c] * data[:, c]))
+                        for c in range(data.shape[1])])
+
+
+def test_stiffness_matches_sobelov_penalty(sphere):
+    K = GFF.makeSobelovStiffness(sphere, EVAL_D, SOB_W)
+    sobObj = GFF.makeSobelovPenalty2D(sphere, EVAL_D, SOB_W)
+    rs = numpy.random.RandomState(0)
+    p = sphere.field_parameters.ravel() + rs.normal(scale=0.1, size=sphere.field_parameters.size)
+    P = p.reshape((3, -1))
+    numpy.testing.assert_allclose(sum(P[c].dot(K * P[c]) for c in range(3)), sobObj(p).sum(), rtol=1e-10)
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+@pytest.mark.parametrize('method', ['direct', 'cg'])
+def test_linear_fit_matches_normal_equations(sphere, weighted, method):
+    data = _data(6 * 16, 1)
+    weights = numpy.random.RandomState(2).uniform(0.5, 2.0, len(data)) if weighted else None
+    gObj = GFF.makeObjEPEP(sphere, data, EVAL_D, data_weights=weights)
+    K = GFF.makeSobelovStiffness(sphere, EVAL_D, SOB_W)
+
+    X = GFF.solveLinearFit(gObj.A, gObj.data, K, data_weights=weights, method=method,
+                           x0=sphere.get_field_parameters()[:, :, 0])
+    W = numpy.ones((3, len(data))) if weights is None else numpy.broadcast_to(weights, (3, len(data)))
+    numpy.testing.assert_allclose(X, _dense_solution(gObj.A, data, K, W), atol=1e-5)
+
+
+def test_linear_fit_fixed_params(sphere):
+    data = _data(6 * 16, 3)
+    gObj = GFF.makeObjEPEP(sphere, data, EVAL_D)
+    K = GFF.makeSobelovStiffness(sphere, EVAL_D, SOB_W)
+    x0 = sphere.get_field_parameters()[:, :, 0]
+    fixed = [0, 4, 7]
+
+    X = GFF.solveLinearFit(gObj.A, gObj.data, K, fixed_params=fixed, x0=x0)
+    numpy.testing.assert_array_equal(X[:, fixed], x0[:, fixed])
+
+    # free parameters are stationary for the objective with the fixed ones held
+    A = gObj.A.toarray()
+    grad = numpy.array([A.T.dot(A.dot(X[c]) - data[:, c]) + K.dot(X[c]) for c in range(3)])
+    free = numpy.setdiff1d(numpy.arange(X.shape[1]), fixed)
+    numpy.testing.assert_allclose(grad[:, free], 0.0, atol=1e-8)
+
+
+def test_linear_fit_unknown_method(sphere):
+    gObj = GFF.makeObjEPEP(sphere, _data(6 * 16, 4), EVAL_D)
+    K = GFF.makeSobelovStiffness(sphere, EVAL_D, SOB_W)
+    with pytest.raises(ValueError):
+        GFF.solveLinearFit(gObj.A, gObj.data, K, method='qr')
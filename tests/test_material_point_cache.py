@@ -0,0 +1,51 @@
+import numpy
+
+from gias3.fieldwork.field import geometric_field
+
+
+def _data(n, seed):
+    rs = numpy.random.RandomState(seed)
+    d = rs.normal(size=(n, 3))
+    return d * rs.uniform(0.8, 1.2, (n, 1)) / numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+
+
+def test_cache_warm_starts_searches(sphere):
+    data = _data(100, 0)
+    cache = geometric_field.MaterialPointCache(sphere, data, init_gd=[5, 5])
+
+    mps, coords, dist = cache.search()
+    assert cache.n_global == len(data)
+    numpy.testing.assert_allclose(numpy.linalg.norm(coords - data, axis=1), dist, atol=1e-10)
+
+    # an unchanged mesh needs no global searches
+    mps2, coords2, dist2 = cache.search()
+    assert cache.n_global == 0
+    numpy.testing.assert_allclose(dist2, dist, atol=1e-8)
+    assert [m[0] for m in mps2] == [m[0] for m in mps]
+
+    cache.reset()
+    cache.search()
+    assert cache.n_global == len(data)
+
+
+def test_cache_follows_moving_mesh(sphere):
+    data = _data(100, 1)
+    cache = geometric_field.MaterialPointCache(sphere, data, init_gd=[5, 5])
+    cache.search()
+
+    rs = numpy.random.RandomState(2)
+    for it in range(3):
+        sphere.set_field_parameters(sphere.get_field_parameters() * 1.02 +
+                                    rs.normal(scale=0.005, size=sphere.field_parameters.shape))
+        mps, coords, dist = cache.search()
+        assert cache.n_global < len(data)
+
+        # warm-started distances are mostly those of a fresh global search,
+        # local minima are only accepted within the cache's tolerance
+        globalDist = numpy.asarray(sphere.find_closest_material_points(data, init_gd=[5, 5], use_bvh=True)[2])
+        excess = dist - globalDist
+        assert numpy.mean(excess < 1e-6) > 0.95
+        assert (excess < cache.rel_tol * globalDist + cache.abs_tol).all()
+
+        X = [sphere.evaluate_geometric_field_at_element_points(e, x[numpy.newaxis]).ravel() for e, x in mps]
+        numpy.testing.assert_allclose(X, coords, atol=1e-10)
@@ -0,0 +1,105 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.topology import element_types, mesh
+
+
+def _as_groups(connectivity):
+    return set(frozenset([k] + list(v)) for k, v in connectivity.items())
+
+
+def test_label_connected_points():
+    connectivity = {
+        (0, 0): [(1, 1)], (1, 1): [(0, 0), (2, 0)], (2, 0): [(1, 1)],
+        (0, 1): [],
+        (1, 0): [(-1, 0)], (-1, 0): [(1, 0)],
+    }
+    keys, roots, labels = mesh.label_connected_points(connectivity)
+    assert keys == sorted(connectivity.keys())
+    label = dict(zip(keys, labels.tolist()))
+    root = dict(zip(keys, roots.tolist()))
+
+    # groups are numbered in order of their first key, hanging groups are -1
+    assert label[(0, 0)] == label[(1, 1)] == label[(2, 0)] == 0
+    assert label[(0, 1)] == 1
+    assert label[(1, 0)] == label[(-1, 0)] == -1
+    assert root[(2, 0)] == keys.index((0, 0))
+    assert root[(1, 0)] == keys.index((-1, 0))
+
+
+def test_sphere_ensemble_points(sphere):
+    F = sphere.ensemble_field_function
+    assert F.mesh.get_number_of_ensemble_points() == 26
+    assert F.get_number_of_ensemble_points() == 26
+
+    # removing a face leaves its centre node unused
+    F.mesh.remove_element(0)
+    assert F.mesh.get_number_of_ensemble_points() == 25
+
+
+def test_sphere_mapping_is_consistent(sphere):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    emap = F.mapper._element_to_ensemble_map
+    for e in F.mesh.elements:
+        # element points mapped to the same ensemble point have the same coordinates
+        X = sphere.evaluate_geometric_field_at_element_points(e, F.mesh.elements[e].node_coordinates).T
+        gp = [emap[e][p][0][0] for p in range(9)]
+        numpy.testing.assert_allclose(X, P[gp], atol=1e-12)
+
+
+def test_compact_store_matches_connectivity(sphere):
+    M = sphere.ensemble_field_function.mesh
+    store = M.enable_compact_connectivity()
+    assert store.number_of_points == 26
+    assert _as_groups(store.to_connectivity()) == _as_groups(M.connectivity)
+
+    # point ids agree with the labels of the connectivity dict
+    keys, roots, labels = mesh.label_connected_points(M.connectivity)
+    label = dict(zip(keys, labels.tolist()))
+    for row, e in enumerate(store.element_numbers):
+        ids = store.point_ids[row, :store.point_counts[row]]
+        numpy.testing.assert_array_equal(ids, [label[(e, p)] for p in range(len(ids))])
+
+
+@pytest.mark.parametrize('remove', [False, True])
+def test_compact_mapping_matches_dict_mapping(sphere, remove):
+    F = sphere.ensemble_field_function
+    if remove:
+        F.mesh.remove_element(3)
+        F.map_parameters()
+    emap = dict((e, dict(m)) for e, m in F.mapper._element_to_ensemble_map.items() if e in F.mesh.elements)
+    G = F.mapper.get_gather_operator().toarray()
+
+    F.mesh.enable_compact_connectivity()
+    F.map_parameters()
+    assert dict((e, F.mapper._element_to_ensemble_map[e]) for e in emap) == emap
+    numpy.testing.assert_array_equal(F.mapper.get_gather_operator().toarray(), G)
+
+
+def test_compact_store_serialisation(sphere):
+    M = sphere.ensemble_field_function.mesh
+    M.enable_compact_connectivity()
+    d = mesh.MeshJSONWriter(M).serialise(None)
+    assert 'compact' in d and 'connectivity' not in d
+
+    M2 = mesh.MeshEnsemble(None, None)
+    mesh.MeshJSONReader(M2).deserialise(d)
+    assert _as_groups(M2.connectivity) == _as_groups(M.connectivity)
+    numpy.testing.assert_array_equal(M2.compact.point_ids, M.compact.point_ids)
+
+
+def test_compact_incremental_matches_from_mesh():
+    M = mesh.MeshEnsemble('chain', 2)
+    M.enable_compact_connectivity()
+    for i in range(40):
+        M.add_element(element_types.create_element('quad33'))
+    for i in range(39):
+        M.connect_points([(i, 2), (i, 5), (i, 8)], [(i + 1, 0), (i + 1, 3), (i + 1, 6)])
+    M.connect_points([(0, 0)], [(39, 8)])
+
+    store = mesh.CompactConnectivity.from_mesh(M)
+    assert M.compact.number_of_points == store.number_of_points == 40 * 6 + 3 - 1
+    assert _as_groups(M.connectivity) == _as_groups(store.to_connectivity())
+    assert _as_groups(M.compact.to_connectivity()) == _as_groups(store.to_connectivity())
+    numpy.testing.assert_array_equal(M.compact.point_ids, store.point_ids)
@@ -0,0 +1,38 @@
+import numpy
+import pytest
+
+from conftest import reference_evaluate
+
+
+def test_component_parameters_accept_2d_parameters(sphere):
+    P = sphere._get_component_parameters()
+    assert P.shape == (sphere.get_number_of_points(), 3)
+
+    sphere.field_parameters = sphere.field_parameters[:, :, 0]
+    numpy.testing.assert_array_equal(sphere._get_component_parameters(), P)
+
+
+@pytest.mark.parametrize('derivs', [None, (1, 0), (0, 1), (1, 1)])
+def test_multi_component_matches_per_component(sphere, derivs):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    if derivs is None:
+        values = F.evaluate_field_in_mesh([5, 4], P)
+    else:
+        values = F.evaluate_derivatives_in_mesh([5, 4], P, derivs=derivs)
+
+    for c in range(3):
+        if derivs is None:
+            component = F.evaluate_field_in_mesh([5, 4], P[:, c])
+        else:
+            component = F.evaluate_derivatives_in_mesh([5, 4], P[:, c], derivs=derivs)
+        numpy.testing.assert_allclose(values[c], component, atol=1e-12)
+
+
+def test_multi_component_element_evaluation(sphere):
+    xi = numpy.random.RandomState(0).uniform(0.0, 1.0, (7, 2))
+    expected = reference_evaluate(sphere, xi)
+    for e in range(6):
+        X = sphere.evaluate_geometric_field_at_element_points(e, xi)
+        assert X.shape == (3, 7)
+        numpy.testing.assert_allclose(X, expected[:, e * 7:(e + 1) * 7], atol=1e-12)
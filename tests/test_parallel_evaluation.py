@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import pytest
+
+
+@pytest.mark.parametrize('executor', [1, 3, 'pool'])
+@pytest.mark.parametrize('chunk_size', [None, 1, 4])
+def test_threaded_values_match_serial(sphere, executor, chunk_size):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    expected = F.evaluate_field_in_mesh([5, 4], P)
+
+    if executor == 'pool':
+        with ThreadPoolExecutor(2) as pool:
+            values = F.evaluate_field_in_mesh([5, 4], P, executor=pool, chunk_size=chunk_size)
+    else:
+        values = F.evaluate_field_in_mesh([5, 4], P, executor=executor, chunk_size=chunk_size)
+    numpy.testing.assert_allclose(values, expected, atol=1e-12)
+
+
+@pytest.mark.parametrize('derivs', [(1, 0), (1, 1), -1])
+def test_threaded_derivatives_match_serial(sphere, derivs):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    expected = F.evaluate_derivatives_in_mesh([5, 4], P, derivs=derivs)
+    values = F.evaluate_derivatives_in_mesh([5, 4], P, derivs=derivs, executor=2, chunk_size=2)
+    numpy.testing.assert_allclose(values, expected, atol=1e-12)
+
+
+def test_geometric_field_executor(sphere):
+    numpy.testing.assert_allclose(sphere.evaluate_geometric_field([6, 6], executor=2),
+                                  sphere.evaluate_geometric_field([6, 6]), atol=1e-12)
+    V, T = sphere.triangulate([4, 4])
+    V2, T2 = sphere.triangulate([4, 4], executor=2)
+    numpy.testing.assert_allclose(V2, V, atol=1e-12)
+    numpy.testing.assert_array_equal(T2, T)
@@ -0,0 +1,56 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.tools import spline_tools
+
+
+def _targets(gf, n, seed):
+    rs = numpy.random.RandomState(seed)
+    elems = rs.randint(0, 6, n)
+    xi = rs.uniform(0.1, 0.9, (n, 2))
+    X = numpy.array([gf.evaluate_geometric_field_at_element_points(e, x[numpy.newaxis]).ravel()
+                     for e, x in zip(elems, xi)])
+    return elems, xi, X
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_find_xi_parallel_matches_serial(sphere, processes):
+    elems, xi, X = _targets(sphere, 12, 0)
+    pXi, pCoords, pDist = sphere.findXiParallel(elems, X, processes=processes, chunk_size=5)
+
+    for i, (e, x) in enumerate(zip(elems, X)):
+        sXi, sCoord, sDist = sphere.findXi(e, x)
+        numpy.testing.assert_allclose(pXi[i], sXi, atol=1e-10)
+        numpy.testing.assert_allclose(pCoords[i], sCoord, atol=1e-10)
+        numpy.testing.assert_allclose(pDist[i], sDist, atol=1e-10)
+    # targets on the surface are found at their xi
+    numpy.testing.assert_allclose(pXi, xi, atol=1e-3)
+
+
+def test_fmin_search_with_processes(sphere):
+    rs = numpy.random.RandomState(1)
+    d = rs.normal(size=(20, 3))
+    mps, coords, dist = sphere.find_closest_material_points(d, init_gd=[5, 5], method='fmin')
+    pMps, pCoords, pDist = sphere.find_closest_material_points(d, init_gd=[5, 5], method='fmin', processes=1)
+    assert [m[0] for m in pMps] == [m[0] for m in mps]
+    numpy.testing.assert_allclose(pCoords, coords, atol=1e-10)
+    numpy.testing.assert_allclose(pDist, dist, atol=1e-10)
+
+
+def test_newton_search_rejects_processes(sphere):
+    with pytest.raises(ValueError):
+        sphere.find_closest_material_points(numpy.zeros((2, 3)), processes=2)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_spline_find_closest_parallel(processes):
+    t = numpy.linspace(0.0, 2.0 * numpy.pi, 40, endpoint=False)
+    spline = spline_tools.SplineParametric(numpy.array([numpy.cos(t), numpy.sin(t), 0.1 * t]), smoothing=0.0)
+    points = numpy.random.RandomState(2).uniform(-1.0, 1.0, (9, 3))
+
+    results = spline.findClosestParallel(points, processes=processes, chunk_size=4)
+    assert len(results) == len(points)
+    for (coords, u), p in zip(results, points):
+        sCoords, sU = spline.findClosest(p)
+        numpy.testing.assert_allclose(coords, sCoords, atol=1e-10)
+        numpy.testing.assert_allclose(u, sU, atol=1e-10)
@@ -0,0 +1,41 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field
+
+
+def test_float32_field_evaluation(sphere):
+    values = sphere.evaluate_geometric_field([6, 6])
+    derivs = sphere.evaluate_geometric_field([6, 6], derivs=(1, 0))[1]
+
+    sphere.set_dtype(numpy.float32)
+    values32 = sphere.evaluate_geometric_field([6, 6])
+    derivs32 = sphere.evaluate_geometric_field([6, 6], derivs=(1, 0))[1]
+    assert values32.dtype == numpy.float32 and derivs32.dtype == numpy.float32
+    numpy.testing.assert_allclose(values32, values, atol=1e-5)
+    numpy.testing.assert_allclose(derivs32, derivs, atol=1e-5)
+
+    # back to double precision gives the original values
+    sphere.set_dtype(float)
+    values64 = sphere.evaluate_geometric_field([6, 6])
+    assert values64.dtype == numpy.float64
+    numpy.testing.assert_array_equal(values64, values)
+
+
+@pytest.mark.parametrize('derivatives', [False, True])
+def test_float32_sparse_evaluators(sphere, derivatives):
+    if derivatives:
+        make = geometric_field.makeGeometricFieldDerivativesEvaluatorSparse
+    else:
+        make = geometric_field.makeGeometricFieldEvaluatorSparse
+    p = sphere.field_parameters.ravel()
+    expected = make(sphere, [5, 5])(p)
+
+    sphere.set_dtype(numpy.float32)
+    evaluator = make(sphere, [5, 5])
+    values = evaluator(p)
+    assert numpy.asarray(values).dtype == numpy.float32
+    numpy.testing.assert_allclose(values, expected, atol=1e-5)
+
+    # an explicit dtype overrides the field's
+    assert numpy.asarray(make(sphere, [5, 5], dtype=float)(p)).dtype == numpy.float64
@@ -0,0 +1,63 @@
+import numpy
+import pytest
+from scipy.spatial import cKDTree
+
+
+def _surface_points(gf, n, seed):
+    rs = numpy.random.RandomState(seed)
+    elems = rs.randint(0, 6, n)
+    xi = rs.uniform(0.0, 1.0, (n, 2))
+    X = numpy.array([gf.evaluate_geometric_field_at_element_points(e, x[numpy.newaxis, :]).ravel()
+                     for e, x in zip(elems, xi)])
+    return elems, xi, X
+
+
+def test_points_on_surface_project_onto_themselves(sphere):
+    elems, xi, X = _surface_points(sphere, 50, 0)
+    mps, coords, dist = sphere.find_closest_material_points(X, init_gd=[5, 5])
+    numpy.testing.assert_allclose(coords, X, atol=1e-6)
+    assert dist.max() < 1e-6
+
+
+@pytest.mark.parametrize('use_bvh', [False, True])
+def test_projection_is_no_further_than_dense_sampling(sphere, use_bvh):
+    rs = numpy.random.RandomState(1)
+    d = rs.normal(size=(200, 3))
+    d *= rs.uniform(0.5, 1.5, (200, 1)) / numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+
+    mps, coords, dist = sphere.find_closest_material_points(d, init_gd=[5, 5], use_bvh=use_bvh)
+    numpy.testing.assert_allclose(numpy.linalg.norm(coords - d, axis=1), dist, atol=1e-10)
+
+    dense = sphere.evaluate_geometric_field([60, 60]).T
+    denseDist = cKDTree(dense).query(d)[0]
+    assert (dist <= denseDist + 1e-9).all()
+
+    # closest points are where the material points evaluate to
+    for (e, xi), x in zip(mps, coords):
+        numpy.testing.assert_allclose(
+            sphere.evaluate_geometric_field_at_element_points(e, numpy.asarray(xi)[numpy.newaxis, :]).ravel(),
+            x, atol=1e-10)
+
+
+def test_newton_is_no_further_than_fmin(sphere):
+    d = numpy.random.RandomState(2).uniform(-1.2, 1.2, (20, 3))
+    dist = sphere.find_closest_material_points(d, init_gd=[10, 10])[2]
+
+    # fmin searches unconstrained xi, so measure its clipped material points
+    mps = sphere.find_closest_material_points(d, init_gd=[10, 10], method='fmin')[0]
+    X = numpy.array([sphere.evaluate_geometric_field_at_element_points(e, numpy.asarray(xi)[numpy.newaxis, :]).ravel()
+                     for e, xi in mps])
+    assert (dist <= numpy.linalg.norm(X - d, axis=1) + 1e-6).all()
+
+
+def test_element_neighbours_cache(sphere):
+    neighbours = sphere._get_element_neighbours()
+    # each face of the cube sphere touches the four faces around it
+    assert all(len(nbs) == 4 for nbs in neighbours.values())
+    assert sphere._get_element_neighbours() is neighbours
+
+    # removing an element changes the mesh key and so the neighbours
+    F = sphere.ensemble_field_function
+    F.mesh.remove_element(0)
+    F.map_parameters()
+    assert 0 not in sphere._get_element_neighbours()
@@ -0,0 +1,106 @@
+from math import factorial
+
+import numpy
+import pytest
+
+from gias3.fieldwork.field import geometric_field_fitter as GFF
+from gias3.fieldwork.field.topology import element_types
+
+
+def _simplex_monomial_integral(powers):
+    """ integral of prod(x_i^powers_i) over the unit simplex
+    """
+    return numpy.prod([factorial(p) for p in powers]) / float(factorial(sum(powers) + len(powers)))
+
+
+def _box_monomial_integral(powers, interior):
+    return numpy.prod([(b ** (p + 1) - a ** (p + 1)) / (p + 1.0) for p, (a, b) in zip(powers, interior)])
+
+
+def _monomials(dims, degree):
+    if dims == 0:
+        yield ()
+        return
+    for p in range(degree + 1):
+        for rest in _monomials(dims - 1, degree - p):
+            yield (p,) + rest
+
+
+def _integrate(X, W, powers):
+    X = numpy.atleast_2d(X.T).T
+    return (W * numpy.prod(X ** numpy.array(powers), axis=1)).sum()
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 5])
+def test_gauss_legendre_exactness(n):
+    x, w = element_types.gauss_legendre(n, -0.5, 2.0)
+    for p in range(2 * n):
+        numpy.testing.assert_allclose((w * x ** p).sum(), _box_monomial_integral([p], [(-0.5, 2.0)]), rtol=1e-12)
+
+
+def test_tensor_rule_exactness():
+    rules = [element_types.gauss_legendre(2), element_types.gauss_legendre(3, 0.0, 2.0)]
+    X, W = element_types.tensor_rule(rules)
+    assert X.shape == (6, 2)
+    for a in range(4):
+        for b in range(6):
+            numpy.testing.assert_allclose(_integrate(X, W, (a, b)),
+                                          _box_monomial_integral((a, b), [(0.0, 1.0), (0.0, 2.0)]), rtol=1e-12)
+
+
+@pytest.mark.parametrize('degree', sorted(element_types.dunavant_rules))
+def test_dunavant_exactness(degree):
+    X, W = element_types.dunavant(degree)
+    numpy.testing.assert_allclose(W.sum(), 0.5, rtol=1e-12)
+    assert (X >= 0.0).all() and (X.sum(1) <= 1.0).all()
+    for powers in _monomials(2, degree):
+        numpy.testing.assert_allclose(_integrate(X, W, powers), _simplex_monomial_integral(powers), rtol=1e-9)
+
+
+def test_dunavant_unknown_degree():
+    with pytest.raises(ValueError):
+        element_types.dunavant(max(element_types.dunavant_rules) + 1)
+
+
+@pytest.mark.parametrize('dims', [2, 3])
+@pytest.mark.parametrize('degree', [1, 4, 7])
+def test_collapsed_simplex_rule_exactness(dims, degree):
+    X, W = element_types.collapsed_simplex_rule(dims, degree)
+    assert (X.sum(1) <= 1.0 + 1e-12).all()
+    for powers in _monomials(dims, degree):
+        numpy.testing.assert_allclose(_integrate(X, W, powers), _simplex_monomial_integral(powers), rtol=1e-10)
+
+
+@pytest.mark.parametrize('type_', ['line3l', 'quad33', 'quad333', 'tri6', 'tri16', 'prism6-5', 'tri10Bezier'])
+def test_element_quadrature_exactness(type_):
+    element = element_types.element_types[type_]
+    degree = 4
+    X, W = element.quadrature(degree)
+    X = numpy.atleast_2d(X.T).T
+    assert X.shape == (len(W), element.dimensions)
+    if isinstance(element, element_types.TriBezier):
+        simplexDims = element.dimensions
+    else:
+        simplexDims = getattr(element, 'simplex_dimensions', 0)
+    box = [tuple(r) for r in element.interior][simplexDims:]
+    for powers in _monomials(element.dimensions, degree):
+        expected = _simplex_monomial_integral(powers[:simplexDims]) if simplexDims else 1.0
+        expected *= _box_monomial_integral(powers[simplexDims:], box)
+        numpy.testing.assert_allclose(_integrate(X, W, powers), expected, rtol=1e-10)
+
+
+def test_sobelov_factor_grid_fallback(sphere, monkeypatch):
+    def no_quadrature(self, degree):
+        raise NotImplementedError
+
+    w = [1.0, 1.0, 1.0, 1.0, 1.0]
+    monkeypatch.setattr(element_types.Quad, 'quadrature', no_quadrature)
+    R = GFF.makeSobelovFactorQuadrature(sphere, w, degree=3)
+
+    # five derivatives, each sampled on a 4 x 4 grid in every element
+    nElems = len(sphere.ensemble_field_function.mesh.elements)
+    assert R.shape == (5 * nElems * 16, sphere.get_number_of_points())
+    # derivatives of a constant field vanish
+    numpy.testing.assert_allclose(R * numpy.ones(R.shape[1]), 0.0, atol=1e-10)
+    x = sphere.field_parameters[0, :, 0]
+    assert (R * x).dot(R * x) > 0.0
@@ -0,0 +1,49 @@
+import numpy
+import pytest
+
+SHAPE = (24, 20, 22)
+ORIGIN = (-1.5, -1.4, -1.45)
+SPACING = (0.13, 0.14, 0.135)
+
+
+def _voxel_points():
+    axes = [o + s * numpy.arange(n) for o, s, n in zip(ORIGIN, SPACING, SHAPE)]
+    Z, Y, X = numpy.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+    return numpy.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
+
+
+@pytest.mark.parametrize('slab_size', [1, 5, 64])
+def test_sdf_matches_analytic_sphere(sphere, tmp_path, slab_size):
+    img = sphere.rasterise_to_memmap(str(tmp_path / 'sdf.dat'), SHAPE, ORIGIN, SPACING, slab_size=slab_size)
+    assert img.shape == SHAPE[::-1]
+    assert img.dtype == numpy.float32
+
+    P = _voxel_points()
+    expected = numpy.linalg.norm(P, axis=1) - 1.0
+    sdf = numpy.asarray(img).ravel()
+    # the element surface lies within a few percent of the unit sphere
+    numpy.testing.assert_allclose(sdf, expected, atol=0.06)
+    away = abs(expected) > 0.06
+    assert (numpy.sign(sdf[away]) == numpy.sign(expected[away])).all()
+
+
+def test_sdf_band(sphere, tmp_path):
+    band = 0.3
+    full = numpy.asarray(sphere.rasterise_to_memmap(str(tmp_path / 'full.dat'), SHAPE, ORIGIN, SPACING))
+    banded = numpy.asarray(sphere.rasterise_to_memmap(str(tmp_path / 'band.dat'), SHAPE, ORIGIN, SPACING,
+                                                      band=band))
+    assert abs(banded).max() <= band + 1e-6
+    numpy.testing.assert_allclose(banded, numpy.clip(full, -band, band), atol=1e-6)
+
+
+def test_occupancy_matches_contains(sphere, tmp_path):
+    img = sphere.rasterise_to_memmap(str(tmp_path / 'occ.dat'), SHAPE, ORIGIN, SPACING, mode='occupancy',
+                                     slab_size=7)
+    assert img.dtype == numpy.uint8
+    inside = sphere.isInteriorToSurface(_voxel_points(), method='winding')
+    numpy.testing.assert_array_equal(numpy.asarray(img).ravel(), inside.astype(numpy.uint8))
+
+
+def test_unknown_mode(sphere, tmp_path):
+    with pytest.raises(ValueError):
+        sphere.rasterise_to_memmap(str(tmp_path / 'x.dat'), SHAPE, ORIGIN, SPACING, mode='density')
@@ -0,0 +1,40 @@
+import numpy
+
+from gias3.fieldwork.field import ensemble_field_function as EFF
+from gias3.fieldwork.field import geometric_field
+
+from conftest import reference_evaluate
+
+
+def test_assemble_sparse_matrix_sums_repeated_entries():
+    triplets = [EFF.basis_matrix_triplets([[1.0, 2.0]], 0, [0, 2]),
+                EFF.basis_matrix_triplets([[3.0, 4.0], [5.0, 6.0]], 0, [2, 1])]
+    A = EFF.assemble_sparse_matrix(triplets, (2, 3))
+    numpy.testing.assert_array_equal(A.toarray(), [[1.0, 4.0, 5.0], [0.0, 6.0, 5.0]])
+
+
+def test_evaluator_matches_per_element_evaluation(sphere):
+    F = sphere.ensemble_field_function
+    xi = F.mesh.elements[0].generate_eval_grid([4, 5])
+    evaluator = geometric_field.makeGeometricFieldEvaluatorSparse(sphere, [4, 5])
+    assert evaluator.A.nnz <= evaluator.A.shape[0] * 9
+    numpy.testing.assert_allclose(evaluator(sphere.field_parameters.ravel()), reference_evaluate(sphere, xi),
+                                  atol=1e-12)
+
+
+def test_material_point_evaluator(sphere):
+    rs = numpy.random.RandomState(0)
+    mat_points = [(e, rs.uniform(0.0, 1.0, 2)) for e in rs.randint(0, 6, 20)]
+    evaluator = geometric_field.makeGeometricFieldEvaluatorSparse(sphere, None, mat_points=mat_points)
+    X = evaluator(sphere.field_parameters.ravel())
+    for i, (e, xi) in enumerate(mat_points):
+        x = sphere.evaluate_geometric_field_at_element_points(e, xi[numpy.newaxis, :])
+        numpy.testing.assert_allclose(X[:, i], numpy.ravel(x), atol=1e-12)
+
+
+def test_derivatives_evaluator_matches_per_element_evaluation(sphere):
+    F = sphere.ensemble_field_function
+    xi = F.mesh.elements[0].generate_eval_grid([4, 4])
+    evaluator = geometric_field.makeGeometricFieldDerivativesEvaluatorSparse(sphere, [4, 4])
+    D = evaluator(sphere.field_parameters.ravel())
+    numpy.testing.assert_allclose(D, reference_evaluate(sphere, xi, derivs=-1), atol=1e-12)
@@ -0,0 +1,51 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.basis import basis
+
+from conftest import reference_evaluate
+
+tensor_types = sorted(t for t, b in basis.basis_types.items()
+                      if issubclass(b, basis.PolynomialBasis) and basis.make_basis(t).is_tensor_product())
+
+
+def _eval(b, x):
+    return b.eval(x[0] if b.dimensions == 1 else x)
+
+
+@pytest.mark.parametrize('basis_type', tensor_types)
+def test_eval_factors_tensor_product(basis_type):
+    b = basis.make_basis(basis_type)
+    axes = [numpy.linspace(0.0, 1.0, 3 + d) for d in range(b.dimensions)]
+    grid = numpy.stack(numpy.meshgrid(*axes, indexing='ij'), axis=-1).reshape((-1, b.dimensions))
+
+    # the first factor varies fastest in the basis, the last axis fastest in the grid
+    phis = b.eval_factors(axes, (0,) * b.dimensions)
+    B = phis[0]
+    for phi in phis[1:]:
+        B = numpy.einsum('in,jm->jinm', B, phi).reshape((B.shape[0] * phi.shape[0], B.shape[1] * phi.shape[1]))
+    numpy.testing.assert_allclose(B, _eval(b, grid.T), atol=1e-12)
+
+
+@pytest.mark.parametrize('derivs', [None, (1, 0), (1, 1), -1])
+def test_sum_factorised_plan_matches_dense_plan(sphere, derivs):
+    F = sphere.ensemble_field_function
+    P = sphere._get_component_parameters()
+    dense = F.make_evaluation_plan(density=[6, 5], derivs=derivs, sum_factorise=False)
+    factorised = F.make_evaluation_plan(density=[6, 5], derivs=derivs, sum_factorise=True)
+    assert factorised.groups[0]['sum_factorise']
+    assert not dense.groups[0]['sum_factorise']
+
+    numpy.testing.assert_allclose(factorised.evaluate_field(P), dense.evaluate_field(P), atol=1e-12)
+    if derivs is not None:
+        numpy.testing.assert_allclose(factorised.evaluate_derivatives(P), dense.evaluate_derivatives(P), atol=1e-12)
+
+
+def test_sum_factorised_plan_matches_per_element_evaluation(sphere):
+    F = sphere.ensemble_field_function
+    xi = F.mesh.elements[0].generate_eval_grid([6, 5])
+    plan = F.make_evaluation_plan(density=[6, 5], derivs=-1, sum_factorise=True)
+    P = sphere._get_component_parameters()
+    numpy.testing.assert_allclose(plan.evaluate_field(P), reference_evaluate(sphere, xi), atol=1e-12)
+    numpy.testing.assert_allclose(plan.evaluate_derivatives(P), reference_evaluate(sphere, xi, derivs=-1),
+                                  atol=1e-12)
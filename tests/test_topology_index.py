@@ -0,0 +1,50 @@
+import numpy
+
+
+def _element_ensemble_points(F, e):
+    emap = F.mapper._element_to_ensemble_map[e]
+    return [emap[p][0][0] for p in range(len(emap))]
+
+
+def test_sphere_common_edges(sphere):
+    F = sphere.ensemble_field_function
+    T = F.mesh.get_topology_index()
+    common = T.common_edges()
+    assert len(common) == 12
+    assert len(T.boundary_edges) == 0
+
+    for e1, i1, e2, i2, direction in common:
+        p1 = [_element_ensemble_points(F, e1)[p] for p in F.mesh.elements[e1].edge_points[i1]]
+        p2 = [_element_ensemble_points(F, e2)[p] for p in F.mesh.elements[e2].edge_points[i2]]
+        assert p1 == (p2 if direction == 1 else p2[::-1])
+
+
+def test_sphere_adjacency(sphere):
+    F = sphere.ensemble_field_function
+    T = F.mesh.get_topology_index()
+    for e in F.mesh.elements:
+        # each face of a cube borders every face but the opposite one
+        neighbours = T.edge_neighbours(e)
+        assert len(neighbours) == 4 and e not in neighbours
+        shared = [set(_element_ensemble_points(F, e)) & set(_element_ensemble_points(F, n)) for n in neighbours]
+        assert all(len(s) == 3 for s in shared)
+
+    # cube corners are vertices of three faces
+    assert len(T.vertex_points) == 8
+    for p in T.vertex_points:
+        assert len(T.vertex_incidence(p)) == 3
+    assert len(T.vertex_incidence(-1)) == 0
+
+
+def test_topology_index_rebuilt_on_change(sphere):
+    M = sphere.ensemble_field_function.mesh
+    T = M.get_topology_index()
+    assert M.get_topology_index() is T
+
+    M.remove_element(0)
+    T = M.get_topology_index()
+    assert len(T.common_edges()) == 8
+    boundary = T.boundary_edges
+    assert len(boundary) == 4
+    assert 0 not in boundary[:, 0]
+    numpy.testing.assert_array_equal(numpy.sort(T.edge_neighbours(1)), [2, 3, 4, 5])
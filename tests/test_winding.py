@@ -0,0 +1,71 @@
+import numpy
+import pytest
+
+from gias3.fieldwork.field.tools import winding
+
+
+def _random_points(n, seed, r_min=0.0, r_max=2.0):
+    rs = numpy.random.RandomState(seed)
+    d = rs.normal(size=(n, 3))
+    d /= numpy.linalg.norm(d, axis=1)[:, numpy.newaxis]
+    return d * rs.uniform(r_min, r_max, (n, 1))
+
+
+def test_triangle_solid_angles_tetrahedron():
+    # the faces of a tetrahedron subtend the full sphere at an interior point
+    V = numpy.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    T = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+    p = numpy.array([[0.1, 0.2, 0.3]]).repeat(4, 0)
+    omega = winding.triangle_solid_angles(p, V[T[:, 0]], V[T[:, 1]], V[T[:, 2]])
+    numpy.testing.assert_allclose(omega.sum(), 4.0 * numpy.pi)
+
+    # an octant seen from its corner
+    omega = winding.triangle_solid_angles(numpy.zeros((1, 3)), V[[1]], V[[2]], V[[3]])
+    numpy.testing.assert_allclose(omega, 0.5 * numpy.pi)
+
+
+@pytest.mark.parametrize('flip', [False, True])
+def test_sphere_winding_number(make_sphere, flip):
+    gf = make_sphere(flip=flip)
+    V, T = gf.triangulate([8, 8])
+    surface = winding.SurfaceWindingNumber(V, T, leaf_size=4)
+
+    sign = -1.0 if flip else 1.0
+    inside = _random_points(200, 0, 0.0, 0.8)
+    outside = _random_points(200, 1, 1.2, 3.0)
+    numpy.testing.assert_allclose(surface.winding_number(inside, chunk_size=64), sign, atol=5e-2)
+    numpy.testing.assert_allclose(surface.winding_number(outside, chunk_size=64), 0.0, atol=5e-2)
+
+
+@pytest.mark.parametrize('flip', [False, True])
+def test_sphere_contains(make_sphere, flip):
+    gf = make_sphere(flip=flip)
+    points = _random_points(2000, 2)
+    r = numpy.linalg.norm(points, axis=1)
+    points = points[abs(r - 1.0) > 0.05]
+    r = r[abs(r - 1.0) > 0.05]
+
+    mask = gf.isInteriorToSurface(points, method='winding', chunk_size=256)
+    assert numpy.mean(mask == (r < 1.0)) > 0.98
+
+
+def test_far_field_matches_exact_sum(sphere):
+    V, T = sphere.triangulate([8, 8])
+    points = _random_points(100, 3, 0.0, 3.0)
+    exact = winding.triangle_solid_angles(
+        points.repeat(len(T), 0), *[numpy.tile(V[T[:, i]], (len(points), 1)) for i in range(3)]
+    ).reshape((len(points), -1)).sum(1) / (4.0 * numpy.pi)
+
+    surface = winding.SurfaceWindingNumber(V, T, leaf_size=4, beta=2.0)
+    numpy.testing.assert_allclose(surface.winding_number(points), exact, atol=2e-2)
+
+
+def test_internal_points_grid_winding(sphere):
+    points = sphere.generateInternalPointsGrid(0.1, method='winding', chunk_size=1000)
+    assert numpy.linalg.norm(points, axis=1).max() < 1.05
+
+    # grid cell volume times the number of points is the enclosed volume
+    h = [numpy.diff(numpy.unique(points[:, i])).min() for i in range(3)]
+    V, T = sphere.triangulate([10, 10])
+    volume = (numpy.cross(V[T[:, 0]], V[T[:, 1]]) * V[T[:, 2]]).sum() / 6.0
+    numpy.testing.assert_allclose(len(points) * numpy.prod(h), volume, rtol=0.02)